@@ -1,12 +1,53 @@
-from .config import AppConfig, DatabaseSettings, DiscordSettings, load_config
+from .config import (
+    AppConfig,
+    DatabaseSettings,
+    DiscordSettings,
+    EventAdmissionSettings,
+    GatewayRecordSettings,
+    HealthSettings,
+    LoggingSettings,
+    NicknameSyncSettings,
+    TracingSettings,
+    load_config,
+    load_logging_settings,
+    load_runtime_profile,
+    load_tracing_settings,
+)
 from .container import build_discord_app
-from .database import Database
+from .database import Database, DatabaseUnavailableError
+from .health import HealthMonitor, HealthServer, StartupTracker
+from .jobs import JobRegistry
+from .leadership import LeaderElection
+from .logging_setup import configure_logging, log_context
+from .speed import RuntimeProfile, apply_runtime_profile
+from .tracing import TRACER, configure_tracing
 
 __all__ = [
     "load_config",
+    "load_logging_settings",
+    "load_runtime_profile",
+    "load_tracing_settings",
     "AppConfig",
     "DatabaseSettings",
     "DiscordSettings",
+    "EventAdmissionSettings",
+    "GatewayRecordSettings",
+    "HealthSettings",
+    "LoggingSettings",
+    "NicknameSyncSettings",
+    "TracingSettings",
+    "RuntimeProfile",
+    "apply_runtime_profile",
     "Database",
+    "DatabaseUnavailableError",
+    "HealthMonitor",
+    "HealthServer",
+    "JobRegistry",
+    "LeaderElection",
+    "StartupTracker",
     "build_discord_app",
+    "TRACER",
+    "configure_logging",
+    "configure_tracing",
+    "log_context",
 ]
@@ -2,8 +2,9 @@ from __future__ import annotations
 
 import logging
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Mapping
 
 from dotenv import load_dotenv
 
@@ -16,6 +17,14 @@ class DiscordSettings:
     """Discord 関連の設定値を保持するデータクラス。"""
 
     token: str
+    shutdown_timeout: float = 10.0
+    member_cache_size: int = 5000
+    api_base_url: str | None = None
+    interaction_budget: float = 2.0
+    interaction_timeout: float = 60.0
+    outbound_concurrency: int = 8
+    outbound_call_timeout: float = 30.0
+    guild_state_sweep_interval: float = 3600.0
 
 
 @dataclass(frozen=True, slots=True)
@@ -23,6 +32,66 @@ class DatabaseSettings:
     """データベース接続に必要な設定値を保持するデータクラス。"""
 
     url: str
+    connect_timeout: float = 10.0
+    replica_urls: tuple[str, ...] = ()
+    read_your_writes_window: float = 5.0
+    replica_max_lag: float = 10.0
+    leader_election: bool = True
+    leader_election_interval: float = 5.0
+
+
+@dataclass(frozen=True, slots=True)
+class NicknameSyncSettings:
+    """ニックネーム同期のルール参照に関する設定値を保持するデータクラス。"""
+
+    rule_lookup_timeout: float = 0.5
+    snapshot_interval: float = 300.0
+
+
+@dataclass(frozen=True, slots=True)
+class TempVCSettings:
+    """一時VC機能の設定値を保持するデータクラス。"""
+
+    pool_size: int = 0
+    lobby_cooldown: float = 5.0
+    telemetry_minutes: int = 1440
+    telemetry_flush_interval: float = 300.0
+    user_quota: tuple[int, float] | None = (3, 60.0)
+    guild_quota: tuple[int, float] | None = (30, 60.0)
+    max_channels_per_category: int = 40
+
+
+@dataclass(frozen=True, slots=True)
+class EventAdmissionSettings:
+    """イベントハンドラーの同時実行数・待機列・間引き方の設定値を保持するデータクラス。"""
+
+    message_concurrency: int = 16
+    message_queue_size: int = 500
+    message_shedding: str = "drop_oldest"
+    voice_concurrency: int = 8
+    voice_queue_size: int = 500
+    voice_shedding: str = "collapse"
+    handler_timeout: float = 30.0
+
+
+@dataclass(frozen=True, slots=True)
+class GatewayRecordSettings:
+    """ゲートウェイイベント記録の設定値を保持するデータクラス。"""
+
+    enabled: bool = False
+    events: tuple[str, ...] = ()
+    max_bytes: int = 64 * 1024 * 1024
+    max_files: int = 5
+
+
+@dataclass(frozen=True, slots=True)
+class HealthSettings:
+    """ヘルスチェック用 HTTP エンドポイントの設定。port が None なら待ち受けない。"""
+
+    port: int | None = None
+    host: str = "0.0.0.0"
+    db_ping_budget: float = 0.5
+    max_loop_lag: float = 5.0
 
 
 @dataclass(frozen=True, slots=True)
@@ -31,6 +100,49 @@ class AppConfig:
 
     discord: DiscordSettings
     database: DatabaseSettings
+    temp_vc: TempVCSettings = field(default_factory=TempVCSettings)
+    nickname_sync: NicknameSyncSettings = field(default_factory=NicknameSyncSettings)
+    event_admission: EventAdmissionSettings = field(default_factory=EventAdmissionSettings)
+    gateway_record: GatewayRecordSettings = field(default_factory=GatewayRecordSettings)
+    health: HealthSettings = field(default_factory=HealthSettings)
+
+
+@dataclass(frozen=True, slots=True)
+class LogRateLimit:
+    """ロガー単位の WARNING のレート制限（window 秒あたり最大 count 件）。"""
+
+    count: int
+    window: float
+
+
+DEFAULT_LOG_RATE_LIMITS: Mapping[str, LogRateLimit] = {
+    "bot.nickname_sync.service": LogRateLimit(count=20, window=60.0),
+}
+
+
+@dataclass(frozen=True, slots=True)
+class LoggingSettings:
+    """ログ出力パイプラインの設定値を保持するデータクラス。"""
+
+    level: str = "INFO"
+    json: bool = False
+    sample_rates: Mapping[str, float] = field(default_factory=dict)
+    rate_limits: Mapping[str, LogRateLimit] = field(
+        default_factory=lambda: dict(DEFAULT_LOG_RATE_LIMITS)
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class TracingSettings:
+    """トレース（スパンの記録と書き出し）の設定値を保持するデータクラス。"""
+
+    exporter: str = "none"
+    sample_rate: float = 0.1
+    file_path: Path = Path("data/traces.jsonl")
+    otlp_endpoint: str | None = None
+    service_name: str = "discord-bot"
+    batch_size: int = 512
+    export_interval: float = 5.0
 
 
 def _load_env_file(env_file: str | Path | None) -> None:
@@ -64,25 +176,481 @@ def _prepare_database_url(raw_url: str | None) -> str:
     return raw_url.strip()
 
 
+def _prepare_replica_urls(raw_urls: str | None) -> tuple[str, ...]:
+    """カンマ区切りの読み取りレプリカ接続URLを整形する。未設定なら空のタプル。"""
+
+    if raw_urls is None:
+        return ()
+    return tuple(url.strip() for url in raw_urls.split(",") if url.strip())
+
+
+def _prepare_api_base_url(raw_url: str | None) -> str | None:
+    """REST API の接続先 URL（負荷試験用の疑似サーバーなど）を整形する。"""
+
+    if raw_url is None or raw_url.strip() == "":
+        return None
+    url = raw_url.strip().rstrip("/")
+    if not url.startswith(("http://", "https://")):
+        raise ValueError(f"DISCORD_API_BASE_URL must be an http(s) URL: {raw_url}")
+    return url
+
+
+def _prepare_otlp_endpoint(raw_url: str | None) -> str | None:
+    """OTLP/HTTP コレクターのトレース受信 URL を整形する。パスがなければ /v1/traces を補う。"""
+
+    if raw_url is None or raw_url.strip() == "":
+        return None
+    url = raw_url.strip().rstrip("/")
+    if not url.startswith(("http://", "https://")):
+        raise ValueError(f"TRACE_OTLP_ENDPOINT must be an http(s) URL: {raw_url}")
+    if not url.endswith("/v1/traces"):
+        url += "/v1/traces"
+    return url
+
+
+def _parse_positive_float(raw: str | None, *, name: str, default: float) -> float:
+    """正の小数として環境変数を解釈する。未設定なら既定値を返す。"""
+
+    if raw is None or raw.strip() == "":
+        return default
+    value = float(raw.strip())
+    if value <= 0:
+        raise ValueError(f"{name} must be positive: {raw}")
+    return value
+
+
+def _parse_positive_int(raw: str | None, *, name: str, default: int) -> int:
+    """正の整数として環境変数を解釈する。未設定なら既定値を返す。"""
+
+    if raw is None or raw.strip() == "":
+        return default
+    value = int(raw.strip())
+    if value <= 0:
+        raise ValueError(f"{name} must be positive: {raw}")
+    return value
+
+
+def _parse_non_negative_int(raw: str | None, *, name: str, default: int) -> int:
+    """0 以上の整数として環境変数を解釈する。未設定なら既定値を返す。"""
+
+    if raw is None or raw.strip() == "":
+        return default
+    value = int(raw.strip())
+    if value < 0:
+        raise ValueError(f"{name} must not be negative: {raw}")
+    return value
+
+
+def _parse_bool(raw: str | None, *, name: str, default: bool) -> bool:
+    """true/false 形式の環境変数を解釈する。未設定なら既定値を返す。"""
+
+    if raw is None or raw.strip() == "":
+        return default
+    value = raw.strip().lower()
+    if value in {"1", "true", "yes", "on"}:
+        return True
+    if value in {"0", "false", "no", "off"}:
+        return False
+    raise ValueError(f"{name} must be true or false: {raw}")
+
+
+def _prepare_shedding_policy(raw: str | None, *, name: str, default: str) -> str:
+    """イベントの間引き方（drop_oldest / drop_newest / collapse）を検証する。"""
+
+    if raw is None or raw.strip() == "":
+        return default
+    policy = raw.strip().lower()
+    if policy not in ("drop_oldest", "drop_newest", "collapse"):
+        raise ValueError(f"{name} must be 'drop_oldest', 'drop_newest' or 'collapse': {raw}")
+    return policy
+
+
+def _prepare_event_names(raw: str | None) -> tuple[str, ...]:
+    """`MESSAGE_CREATE,VOICE_STATE_UPDATE` 形式のイベント名一覧を整形する。"""
+
+    if raw is None:
+        return ()
+    return tuple(dict.fromkeys(item.strip().upper() for item in raw.split(",") if item.strip()))
+
+
+def _parse_quota(raw: str | None, *, name: str, default: tuple[int, float]) -> tuple[int, float] | None:
+    """`件数/秒数` 形式の作成数上限を解釈する。`off` なら None（無制限）を返す。"""
+
+    if raw is None or raw.strip() == "":
+        return default
+    value = raw.strip().lower()
+    if value in {"off", "none"}:
+        return None
+    count, separator, window = value.partition("/")
+    if not separator:
+        raise ValueError(f"{name} must be count/seconds or off: {raw}")
+    quota = (int(count), float(window))
+    if quota[0] < 1 or quota[1] <= 0:
+        raise ValueError(f"{name} must be positive: {raw}")
+    return quota
+
+
+def _parse_key_value_list(raw: str | None) -> dict[str, str]:
+    """`key=value,key=value` 形式の文字列を辞書に変換する。"""
+
+    result: dict[str, str] = {}
+    if raw is None:
+        return result
+
+    for item in raw.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        key, separator, value = item.partition("=")
+        if not separator or not key.strip() or not value.strip():
+            raise ValueError(f"Invalid key=value entry: {item!r}")
+        result[key.strip()] = value.strip()
+    return result
+
+
+def _prepare_log_sample_rates(raw: str | None) -> dict[str, float]:
+    """LOG_SAMPLING (`logger=rate,...`) を検証して整形する。"""
+
+    rates: dict[str, float] = {}
+    for logger_name, value in _parse_key_value_list(raw).items():
+        rate = float(value)
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError(f"LOG_SAMPLING rate must be between 0 and 1: {logger_name}={value}")
+        rates[logger_name] = rate
+    return rates
+
+
+def _prepare_log_rate_limits(raw: str | None) -> dict[str, LogRateLimit]:
+    """LOG_RATE_LIMITS (`logger=count/seconds,...`) を検証して整形する。"""
+
+    if raw is None:
+        return dict(DEFAULT_LOG_RATE_LIMITS)
+
+    limits: dict[str, LogRateLimit] = {}
+    for logger_name, value in _parse_key_value_list(raw).items():
+        count, separator, window = value.partition("/")
+        if not separator:
+            raise ValueError(f"LOG_RATE_LIMITS must be count/seconds: {logger_name}={value}")
+        limit = LogRateLimit(count=int(count), window=float(window))
+        if limit.count < 1 or limit.window <= 0:
+            raise ValueError(f"LOG_RATE_LIMITS must be positive: {logger_name}={value}")
+        limits[logger_name] = limit
+    return limits
+
+
+def load_logging_settings(env_file: str | Path | None = None) -> LoggingSettings:
+    """ログ設定を環境変数から読み込む。
+
+    ログ出力は設定ファイル全体の読み込みより先に初期化する必要があるため、
+    `load_config` とは独立して呼び出せるようにしている。
+    """
+
+    _load_env_file(env_file)
+
+    level = (os.getenv("LOG_LEVEL") or "INFO").strip().upper()
+    log_format = (os.getenv("LOG_FORMAT") or "text").strip().lower()
+    if log_format not in {"text", "json"}:
+        raise ValueError(f"LOG_FORMAT must be 'text' or 'json': {log_format}")
+
+    return LoggingSettings(
+        level=level,
+        json=log_format == "json",
+        sample_rates=_prepare_log_sample_rates(os.getenv("LOG_SAMPLING")),
+        rate_limits=_prepare_log_rate_limits(os.getenv("LOG_RATE_LIMITS")),
+    )
+
+
+def load_tracing_settings(env_file: str | Path | None = None) -> TracingSettings:
+    """トレース設定を環境変数から読み込む。
+
+    DB やクライアントの構築中の処理もトレースできるよう、
+    `load_config` とは独立して呼び出せるようにしている。
+    """
+
+    _load_env_file(env_file)
+
+    exporter = (os.getenv("TRACE_EXPORTER") or "none").strip().lower()
+    if exporter not in {"none", "file", "otlp"}:
+        raise ValueError(f"TRACE_EXPORTER must be 'none', 'file' or 'otlp': {exporter}")
+    raw_rate = os.getenv("TRACE_SAMPLE_RATE")
+    sample_rate = 0.1 if raw_rate is None or raw_rate.strip() == "" else float(raw_rate.strip())
+    if not 0.0 <= sample_rate <= 1.0:
+        raise ValueError(f"TRACE_SAMPLE_RATE must be between 0 and 1: {raw_rate}")
+    otlp_endpoint = _prepare_otlp_endpoint(os.getenv("TRACE_OTLP_ENDPOINT"))
+    if exporter == "otlp" and otlp_endpoint is None:
+        raise ValueError("TRACE_OTLP_ENDPOINT is required when TRACE_EXPORTER=otlp.")
+
+    return TracingSettings(
+        exporter=exporter,
+        sample_rate=sample_rate,
+        file_path=Path((os.getenv("TRACE_FILE") or "data/traces.jsonl").strip()),
+        otlp_endpoint=otlp_endpoint,
+        export_interval=_parse_positive_float(
+            os.getenv("TRACE_EXPORT_INTERVAL"),
+            name="TRACE_EXPORT_INTERVAL",
+            default=5.0,
+        ),
+    )
+
+
+def load_runtime_profile(env_file: str | Path | None = None) -> str:
+    """RUNTIME_PROFILE を読み込む。
+
+    イベントループの種類はループ作成前に決める必要があるため、
+    `load_config` とは独立して呼び出せるようにしている。
+    """
+
+    _load_env_file(env_file)
+
+    profile = (os.getenv("RUNTIME_PROFILE") or "default").strip().lower()
+    if profile not in {"default", "speed"}:
+        raise ValueError(f"RUNTIME_PROFILE must be 'default' or 'speed': {profile}")
+    return profile
+
+
 def load_config(env_file: str | Path | None = None) -> AppConfig:
     """環境変数と設定ファイルからアプリケーション設定を読み込む。"""
 
     _load_env_file(env_file)
 
     token = _prepare_client_token(raw_token=os.getenv("DISCORD_BOT_TOKEN"))
+    shutdown_timeout = _parse_positive_float(
+        os.getenv("SHUTDOWN_DRAIN_TIMEOUT"),
+        name="SHUTDOWN_DRAIN_TIMEOUT",
+        default=10.0,
+    )
+    api_base_url = _prepare_api_base_url(os.getenv("DISCORD_API_BASE_URL"))
+    member_cache_size = _parse_positive_int(
+        os.getenv("MEMBER_CACHE_SIZE"),
+        name="MEMBER_CACHE_SIZE",
+        default=5000,
+    )
+    interaction_budget = _parse_positive_float(
+        os.getenv("INTERACTION_LATENCY_BUDGET"),
+        name="INTERACTION_LATENCY_BUDGET",
+        default=2.0,
+    )
+    if interaction_budget >= 3.0:
+        raise ValueError(f"INTERACTION_LATENCY_BUDGET must be less than 3 seconds: {interaction_budget}")
+    interaction_timeout = _parse_positive_float(
+        os.getenv("INTERACTION_WORK_TIMEOUT"),
+        name="INTERACTION_WORK_TIMEOUT",
+        default=60.0,
+    )
+    outbound_concurrency = _parse_positive_int(
+        os.getenv("OUTBOUND_CONCURRENCY"),
+        name="OUTBOUND_CONCURRENCY",
+        default=8,
+    )
+    outbound_call_timeout = _parse_positive_float(
+        os.getenv("OUTBOUND_CALL_TIMEOUT"),
+        name="OUTBOUND_CALL_TIMEOUT",
+        default=30.0,
+    )
+    guild_state_sweep_interval = _parse_positive_float(
+        os.getenv("GUILD_STATE_SWEEP_INTERVAL"),
+        name="GUILD_STATE_SWEEP_INTERVAL",
+        default=3600.0,
+    )
+    event_admission = EventAdmissionSettings(
+        message_concurrency=_parse_positive_int(
+            os.getenv("MESSAGE_HANDLER_CONCURRENCY"),
+            name="MESSAGE_HANDLER_CONCURRENCY",
+            default=16,
+        ),
+        message_queue_size=_parse_non_negative_int(
+            os.getenv("MESSAGE_QUEUE_SIZE"),
+            name="MESSAGE_QUEUE_SIZE",
+            default=500,
+        ),
+        message_shedding=_prepare_shedding_policy(
+            os.getenv("MESSAGE_SHED_POLICY"),
+            name="MESSAGE_SHED_POLICY",
+            default="drop_oldest",
+        ),
+        voice_concurrency=_parse_positive_int(
+            os.getenv("VOICE_HANDLER_CONCURRENCY"),
+            name="VOICE_HANDLER_CONCURRENCY",
+            default=8,
+        ),
+        voice_queue_size=_parse_non_negative_int(
+            os.getenv("VOICE_QUEUE_SIZE"),
+            name="VOICE_QUEUE_SIZE",
+            default=500,
+        ),
+        voice_shedding=_prepare_shedding_policy(
+            os.getenv("VOICE_SHED_POLICY"),
+            name="VOICE_SHED_POLICY",
+            default="collapse",
+        ),
+        handler_timeout=_parse_positive_float(
+            os.getenv("EVENT_HANDLER_TIMEOUT"),
+            name="EVENT_HANDLER_TIMEOUT",
+            default=30.0,
+        ),
+    )
     database_url = _prepare_database_url(raw_url=os.getenv("DATABASE_URL"))
+    database_connect_timeout = _parse_positive_float(
+        os.getenv("DATABASE_CONNECT_TIMEOUT"),
+        name="DATABASE_CONNECT_TIMEOUT",
+        default=10.0,
+    )
+    database_replica_urls = _prepare_replica_urls(os.getenv("DATABASE_REPLICA_URLS"))
+    read_your_writes_window = _parse_positive_float(
+        os.getenv("DATABASE_READ_YOUR_WRITES_WINDOW"),
+        name="DATABASE_READ_YOUR_WRITES_WINDOW",
+        default=5.0,
+    )
+    replica_max_lag = _parse_positive_float(
+        os.getenv("DATABASE_REPLICA_MAX_LAG"),
+        name="DATABASE_REPLICA_MAX_LAG",
+        default=10.0,
+    )
+    leader_election = _parse_bool(os.getenv("LEADER_ELECTION"), name="LEADER_ELECTION", default=True)
+    leader_election_interval = _parse_positive_float(
+        os.getenv("LEADER_ELECTION_INTERVAL"),
+        name="LEADER_ELECTION_INTERVAL",
+        default=5.0,
+    )
+    nickname_sync = NicknameSyncSettings(
+        rule_lookup_timeout=_parse_positive_float(
+            os.getenv("NICKNAME_RULE_LOOKUP_TIMEOUT"),
+            name="NICKNAME_RULE_LOOKUP_TIMEOUT",
+            default=0.5,
+        ),
+        snapshot_interval=_parse_positive_float(
+            os.getenv("NICKNAME_RULE_SNAPSHOT_INTERVAL"),
+            name="NICKNAME_RULE_SNAPSHOT_INTERVAL",
+            default=300.0,
+        ),
+    )
+
+    temp_vc_pool_size = _parse_non_negative_int(
+        os.getenv("TEMP_VC_POOL_SIZE"),
+        name="TEMP_VC_POOL_SIZE",
+        default=0,
+    )
+    temp_vc_lobby_cooldown = _parse_positive_float(
+        os.getenv("TEMP_VC_LOBBY_COOLDOWN"),
+        name="TEMP_VC_LOBBY_COOLDOWN",
+        default=5.0,
+    )
+    temp_vc_telemetry_minutes = _parse_positive_int(
+        os.getenv("TEMP_VC_TELEMETRY_MINUTES"),
+        name="TEMP_VC_TELEMETRY_MINUTES",
+        default=1440,
+    )
+    temp_vc_telemetry_flush_interval = _parse_positive_float(
+        os.getenv("TEMP_VC_TELEMETRY_FLUSH_INTERVAL"),
+        name="TEMP_VC_TELEMETRY_FLUSH_INTERVAL",
+        default=300.0,
+    )
+    temp_vc_user_quota = _parse_quota(
+        os.getenv("TEMP_VC_USER_QUOTA"),
+        name="TEMP_VC_USER_QUOTA",
+        default=(3, 60.0),
+    )
+    temp_vc_guild_quota = _parse_quota(
+        os.getenv("TEMP_VC_GUILD_QUOTA"),
+        name="TEMP_VC_GUILD_QUOTA",
+        default=(30, 60.0),
+    )
+    temp_vc_max_channels_per_category = _parse_non_negative_int(
+        os.getenv("TEMP_VC_MAX_CHANNELS_PER_CATEGORY"),
+        name="TEMP_VC_MAX_CHANNELS_PER_CATEGORY",
+        default=40,
+    )
+
+    gateway_record = GatewayRecordSettings(
+        enabled=_parse_bool(os.getenv("GATEWAY_RECORD"), name="GATEWAY_RECORD", default=False),
+        events=_prepare_event_names(os.getenv("GATEWAY_RECORD_EVENTS")),
+        max_bytes=_parse_positive_int(
+            os.getenv("GATEWAY_RECORD_MAX_MB"),
+            name="GATEWAY_RECORD_MAX_MB",
+            default=64,
+        )
+        * 1024
+        * 1024,
+        max_files=_parse_positive_int(
+            os.getenv("GATEWAY_RECORD_FILES"),
+            name="GATEWAY_RECORD_FILES",
+            default=5,
+        ),
+    )
+
+    raw_health_port = os.getenv("HEALTH_PORT")
+    health = HealthSettings(
+        port=(
+            None
+            if raw_health_port is None or raw_health_port.strip() == ""
+            else _parse_positive_int(raw_health_port, name="HEALTH_PORT", default=0)
+        ),
+        host=(os.getenv("HEALTH_HOST") or "0.0.0.0").strip(),
+        db_ping_budget=_parse_positive_float(
+            os.getenv("HEALTH_DB_PING_BUDGET"),
+            name="HEALTH_DB_PING_BUDGET",
+            default=0.5,
+        ),
+        max_loop_lag=_parse_positive_float(
+            os.getenv("HEALTH_MAX_LOOP_LAG"),
+            name="HEALTH_MAX_LOOP_LAG",
+            default=5.0,
+        ),
+    )
 
     LOGGER.info("設定の読み込みが完了しました。")
 
     return AppConfig(
-        discord=DiscordSettings(token=token),
-        database=DatabaseSettings(url=database_url),
+        discord=DiscordSettings(
+            token=token,
+            shutdown_timeout=shutdown_timeout,
+            member_cache_size=member_cache_size,
+            api_base_url=api_base_url,
+            interaction_budget=interaction_budget,
+            interaction_timeout=interaction_timeout,
+            outbound_concurrency=outbound_concurrency,
+            outbound_call_timeout=outbound_call_timeout,
+            guild_state_sweep_interval=guild_state_sweep_interval,
+        ),
+        database=DatabaseSettings(
+            url=database_url,
+            connect_timeout=database_connect_timeout,
+            replica_urls=database_replica_urls,
+            read_your_writes_window=read_your_writes_window,
+            replica_max_lag=replica_max_lag,
+            leader_election=leader_election,
+            leader_election_interval=leader_election_interval,
+        ),
+        temp_vc=TempVCSettings(
+            pool_size=temp_vc_pool_size,
+            lobby_cooldown=temp_vc_lobby_cooldown,
+            telemetry_minutes=temp_vc_telemetry_minutes,
+            telemetry_flush_interval=temp_vc_telemetry_flush_interval,
+            user_quota=temp_vc_user_quota,
+            guild_quota=temp_vc_guild_quota,
+            max_channels_per_category=temp_vc_max_channels_per_category,
+        ),
+        nickname_sync=nickname_sync,
+        event_admission=event_admission,
+        gateway_record=gateway_record,
+        health=health,
     )
 
 
 __all__ = [
     "load_config",
+    "load_logging_settings",
+    "load_runtime_profile",
+    "load_tracing_settings",
     "AppConfig",
     "DiscordSettings",
     "DatabaseSettings",
+    "EventAdmissionSettings",
+    "GatewayRecordSettings",
+    "HealthSettings",
+    "LoggingSettings",
+    "LogRateLimit",
+    "NicknameSyncSettings",
+    "TempVCSettings",
+    "TracingSettings",
 ]
@@ -1,15 +1,62 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import signal
 from dataclasses import dataclass
 from pathlib import Path
+import discord
 from tinydb import TinyDB
 
-from app.config import AppConfig
-from app.database import Database
+from app.config import (
+    AppConfig,
+    DatabaseSettings,
+    EventAdmissionSettings,
+    GatewayRecordSettings,
+    HealthSettings,
+    TempVCSettings,
+)
+from app.database import DATABASE_ERRORS, Database
+from app.health import (
+    STEP_COMMAND_SYNC,
+    STEP_RULE_PRELOAD,
+    STEP_TEMP_VC_RECONCILE,
+    HealthMonitor,
+    HealthServer,
+    StartupTracker,
+)
+from app.jobs import JOB_INSTANCE, JOB_LEADER, JOB_SHARD, JobRegistry
 from bot import BotClient, register_commands
-from bot.nickname_sync import ChannelNicknameRuleRepository, NicknameSyncService
-from bot.temp_vc import TempVCChannelStore, TempVCCategoryStore, TempVoiceChannelManager
+from bot.admission import (
+    AdmissionController,
+    GatePolicy,
+    merge_messages,
+    merge_voice_states,
+    message_key,
+    voice_state_key,
+)
+from bot.diagnostics import RuntimeDiagnostics
+from bot.guild_state import GuildStateJanitor
+from bot.interactions import InteractionRunner
+from bot.member_cache import ActiveMemberCache
+from bot.outbound import OutboundScheduler
+from bot.recorder import DEFAULT_RECORDED_EVENTS, GatewayRecorder
+from bot.nickname_sync import (
+    BackfillCheckpointRepository,
+    ChannelNicknameRuleRepository,
+    NicknameSyncBackfill,
+    NicknameSyncService,
+    RuleSnapshotStore,
+)
+from bot.temp_vc import (
+    TempVCChannelPool,
+    TempVCChannelStore,
+    TempVCCategoryStore,
+    TempVCPoolStore,
+    TempVCQuotas,
+    TempVCTelemetry,
+    TempVoiceChannelManager,
+)
 
 
 LOGGER = logging.getLogger(__name__)
@@ -17,6 +64,9 @@ LOGGER = logging.getLogger(__name__)
 
 DATA_DIR_NAME = "data"
 TEMP_VC_DB_NAME = "temp_vc.json"
+TEMP_VC_TELEMETRY_NAME = "temp_vc_telemetry.bin"
+RECORDINGS_DIR_NAME = "recordings"
+RULE_SNAPSHOT_NAME = "nickname_rules.snapshot.json"
 
 
 @dataclass(slots=True)
@@ -26,16 +76,85 @@ class DiscordApplication:
     client: BotClient
     token: str
     database: Database
+    jobs: JobRegistry
+    health: HealthServer | None = None
+    shutdown_timeout: float = 10.0
 
     async def run(self) -> None:
-        """クライアントを起動する。"""
+        """クライアントを起動し、停止シグナル受信時は順序立てて終了する。"""
+
+        loop = asyncio.get_running_loop()
+        stop_requested = asyncio.Event()
+        installed_signals = _install_signal_handlers(loop, stop_requested)
 
         try:
+            if self.health is not None:
+                # 起動手順の進み具合を返せるよう、Discord への接続より先に待ち受ける。
+                await self.health.start()
             async with self.client:
-                await self.client.start(self.token)
+                # ジョブの多くは wait_until_ready を待つため、クライアントの初期化後に開始する。
+                self.jobs.start()
+                runner = asyncio.create_task(self.client.start(self.token), name="discord-client")
+                stopper = asyncio.create_task(stop_requested.wait(), name="shutdown-signal")
+                done, _ = await asyncio.wait(
+                    {runner, stopper},
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                stopper.cancel()
+                if stopper in done:
+                    await self._shutdown_client()
+                await runner
         finally:
+            for sig in installed_signals:
+                loop.remove_signal_handler(sig)
+            # リーダーのロックは DB 接続に結び付いているため、DB を閉じる前に解放する。
+            await self.jobs.close()
+            await self._close_state_janitor()
+            self._flush_stores()
+            if self.client.recorder is not None:
+                self.client.recorder.close()
+            if self.health is not None:
+                await self.health.close()
             await self.database.close()
 
+    async def _close_state_janitor(self) -> None:
+        janitor = self.client.state_janitor
+        if janitor is None:
+            return
+        try:
+            await janitor.close()
+        except Exception:  # pragma: no cover - 終了処理は可能な限り続行する
+            LOGGER.exception("削除済みチャンネル・ロールの同期ルールの整理に失敗しました。")
+
+    async def _shutdown_client(self) -> None:
+        LOGGER.info("停止シグナルを受信しました。シャットダウンを開始します。")
+        await self.client.drain(timeout=self.shutdown_timeout)
+        await self.client.close()
+
+    def _flush_stores(self) -> None:
+        manager = self.client.temp_vc_manager
+        if manager is None:
+            return
+        try:
+            manager.close()
+        except Exception:  # pragma: no cover - 終了処理は可能な限り続行する
+            LOGGER.exception("一時VCストアのクローズに失敗しました。")
+
+
+def _install_signal_handlers(
+    loop: asyncio.AbstractEventLoop,
+    stop_requested: asyncio.Event,
+) -> list[signal.Signals]:
+    installed: list[signal.Signals] = []
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop_requested.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows などシグナルハンドラー未対応の環境では従来通り終了する。
+            continue
+        installed.append(sig)
+    return installed
+
 
 def _initialise_data_directory(root: Path | None = None) -> Path:
     base = root or Path(DATA_DIR_NAME)
@@ -43,43 +162,276 @@ def _initialise_data_directory(root: Path | None = None) -> Path:
     return base
 
 
-def _build_temp_vc_manager(data_dir: Path) -> TempVoiceChannelManager:
+def _build_temp_vc_manager(
+    data_dir: Path,
+    settings: TempVCSettings,
+    *,
+    outbound: OutboundScheduler,
+) -> TempVoiceChannelManager:
     database = TinyDB(data_dir / TEMP_VC_DB_NAME)
     category_store = TempVCCategoryStore(database)
     channel_store = TempVCChannelStore(database)
+    pool = TempVCChannelPool(
+        store=TempVCPoolStore(database),
+        category_store=category_store,
+        default_size=settings.pool_size,
+        outbound=outbound,
+    )
     return TempVoiceChannelManager(
         category_store=category_store,
         channel_store=channel_store,
+        pool=pool,
+        lobby_cooldown=settings.lobby_cooldown,
+        outbound=outbound,
+        telemetry=TempVCTelemetry(
+            path=data_dir / TEMP_VC_TELEMETRY_NAME,
+            capacity=settings.telemetry_minutes,
+            flush_interval=settings.telemetry_flush_interval,
+        ),
+        quotas=TempVCQuotas(
+            user_rate=settings.user_quota,
+            guild_rate=settings.guild_quota,
+            max_channels_per_category=settings.max_channels_per_category,
+        ),
     )
 
 
+def _build_gateway_recorder(data_dir: Path, settings: GatewayRecordSettings) -> GatewayRecorder | None:
+    if not settings.enabled:
+        return None
+    recorder = GatewayRecorder(
+        data_dir / RECORDINGS_DIR_NAME,
+        events=settings.events or DEFAULT_RECORDED_EVENTS,
+        max_bytes=settings.max_bytes,
+        max_files=settings.max_files,
+    )
+    LOGGER.warning(
+        "ゲートウェイイベントの記録が有効です（メッセージ本文を含みます）: %s",
+        ", ".join(sorted(recorder.events)),
+    )
+    return recorder
+
+
+def _build_admission_controller(settings: EventAdmissionSettings) -> AdmissionController:
+    return AdmissionController(
+        {
+            "on_message": GatePolicy(
+                concurrency=settings.message_concurrency,
+                queue_size=settings.message_queue_size,
+                shedding=settings.message_shedding,
+                timeout=settings.handler_timeout,
+                key=message_key,
+                merge=merge_messages,
+            ),
+            "on_voice_state_update": GatePolicy(
+                concurrency=settings.voice_concurrency,
+                queue_size=settings.voice_queue_size,
+                shedding=settings.voice_shedding,
+                timeout=settings.handler_timeout,
+                key=voice_state_key,
+                merge=merge_voice_states,
+            ),
+        }
+    )
+
+
+def _build_job_registry(
+    database: Database,
+    settings: DatabaseSettings,
+    client: BotClient,
+    *,
+    startup: StartupTracker,
+) -> JobRegistry:
+    if not settings.leader_election:
+        return JobRegistry(startup=startup)
+    interval = settings.leader_election_interval
+    shard_id = client.shard_id or 0
+    shard_count = client.shard_count or 1
+    return JobRegistry(
+        leader=database.leader_election("global", retry_interval=interval, heartbeat_interval=interval),
+        shard=database.leader_election(
+            f"shard-{shard_id}-of-{shard_count}", retry_interval=interval, heartbeat_interval=interval
+        ),
+        startup=startup,
+    )
+
+
+def _build_health_server(
+    settings: HealthSettings,
+    client: BotClient,
+    database: Database,
+    startup: StartupTracker,
+) -> HealthServer | None:
+    if settings.port is None:
+        return None
+    monitor = HealthMonitor(
+        client,
+        database=database,
+        startup=startup,
+        db_budget=settings.db_ping_budget,
+        max_loop_lag=settings.max_loop_lag,
+    )
+    return HealthServer(monitor, host=settings.host, port=settings.port)
+
+
+def _register_jobs(
+    jobs: JobRegistry,
+    client: BotClient,
+    database: Database,
+    *,
+    startup: StartupTracker,
+    rule_snapshot_interval: float,
+    guild_state_sweep_interval: float,
+) -> None:
+    jobs.register(
+        "command_sync",
+        client.sync_commands,
+        scope=JOB_LEADER,
+        wait_for=client.wait_until_ready,
+        startup_step=STEP_COMMAND_SYNC,
+    )
+    if client.temp_vc_manager is not None:
+        jobs.register(
+            "temp_vc_warm_pools",
+            client.warm_temp_vc_pools,
+            scope=JOB_SHARD,
+            wait_for=client.wait_until_ready,
+            startup_step=STEP_TEMP_VC_RECONCILE,
+        )
+    janitor = client.state_janitor
+    if janitor is not None:
+
+        async def sweep_guild_state() -> None:
+            await janitor.sweep(client)
+
+        jobs.register(
+            "guild_state_sweep",
+            sweep_guild_state,
+            scope=JOB_SHARD,
+            interval=guild_state_sweep_interval,
+            immediate=False,
+            wait_for=client.wait_until_ready,
+        )
+    service = client.nickname_sync_service
+    if service is not None:
+        # スナップショットとキャッシュはプロセスごとに持つため、全レプリカで更新する。
+        # DB に接続できるまではスナップショットのルールで動作するため、読み込みの完了は
+        # readiness の必須条件にはしない。
+        startup.expect(STEP_RULE_PRELOAD, required=False)
+
+        async def refresh_rule_snapshot() -> None:
+            if await service.refresh_snapshot():
+                startup.complete(STEP_RULE_PRELOAD)
+            else:
+                startup.fail(STEP_RULE_PRELOAD, "database unreachable; serving rules from the snapshot")
+
+        jobs.register(
+            "rule_snapshot_refresh",
+            refresh_rule_snapshot,
+            scope=JOB_INSTANCE,
+            interval=rule_snapshot_interval,
+            wait_for=database.wait_connected,
+        )
+
+
+def _configure_api_base_url(url: str | None) -> None:
+    if url is None:
+        return
+    # discord.py の REST 呼び出しはすべて Route.BASE を起点に組み立てられる。
+    discord.http.Route.BASE = url
+    LOGGER.warning("Discord REST API の接続先を %s に変更しました。", url)
+
+
 async def build_discord_app(config: AppConfig) -> DiscordApplication:
     """アプリケーションの依存関係を構築し、DiscordApplication を返す。"""
 
+    _configure_api_base_url(config.discord.api_base_url)
     data_dir = _initialise_data_directory()
-    temp_vc_manager = _build_temp_vc_manager(data_dir)
-    database = Database(dsn=config.database.url)
-    await database.connect()
+    outbound = OutboundScheduler(
+        concurrency=config.discord.outbound_concurrency,
+        call_timeout=config.discord.outbound_call_timeout,
+    )
+    temp_vc_manager = _build_temp_vc_manager(data_dir, config.temp_vc, outbound=outbound)
+    database = Database(
+        dsn=config.database.url,
+        connect_timeout=config.database.connect_timeout,
+        replica_dsns=config.database.replica_urls,
+        read_your_writes_window=config.database.read_your_writes_window,
+        replica_max_lag=config.database.replica_max_lag,
+    )
+    try:
+        await database.connect()
+    except DATABASE_ERRORS as exc:
+        LOGGER.warning(
+            "データベースに接続できないため、同期ルールのスナップショットで起動し、接続を再試行します: %s",
+            exc,
+        )
+        database.connect_in_background()
 
     nickname_rule_repository = ChannelNicknameRuleRepository(database)
-    nickname_sync_service = NicknameSyncService(nickname_rule_repository)
+    member_cache = ActiveMemberCache(max_members=config.discord.member_cache_size)
+    nickname_sync_service = NicknameSyncService(
+        nickname_rule_repository,
+        member_cache=member_cache,
+        outbound=outbound,
+        snapshot=RuleSnapshotStore(data_dir / RULE_SNAPSHOT_NAME),
+        lookup_timeout=config.nickname_sync.rule_lookup_timeout,
+    )
+    nickname_sync_backfill = NicknameSyncBackfill(
+        service=nickname_sync_service,
+        checkpoints=BackfillCheckpointRepository(database),
+    )
 
     try:
         client = BotClient(
             temp_vc_manager=temp_vc_manager,
             nickname_sync_service=nickname_sync_service,
+            member_cache=member_cache,
+            interaction_runner=InteractionRunner(
+                budget=config.discord.interaction_budget,
+                timeout=config.discord.interaction_timeout,
+                outbound=outbound,
+            ),
+            recorder=_build_gateway_recorder(data_dir, config.gateway_record),
+            admission=_build_admission_controller(config.event_admission),
+            state_janitor=GuildStateJanitor(
+                nickname_sync_service=nickname_sync_service,
+                rule_repository=nickname_rule_repository,
+                temp_vc_manager=temp_vc_manager,
+                member_cache=member_cache,
+            ),
+        )
+        startup = StartupTracker()
+        jobs = _build_job_registry(database, config.database, client, startup=startup)
+        client.jobs = jobs
+        _register_jobs(
+            jobs,
+            client,
+            database,
+            startup=startup,
+            rule_snapshot_interval=config.nickname_sync.snapshot_interval,
+            guild_state_sweep_interval=config.discord.guild_state_sweep_interval,
         )
         await register_commands(
             client,
             nickname_sync_service=nickname_sync_service,
             nickname_rule_repository=nickname_rule_repository,
+            nickname_sync_backfill=nickname_sync_backfill,
+            diagnostics=RuntimeDiagnostics(database=database),
         )
         LOGGER.info("Discord クライアントの初期化が完了し、コマンドを登録しました。")
     except Exception:
         await database.close()
         raise
 
-    return DiscordApplication(client=client, token=config.discord.token, database=database)
+    return DiscordApplication(
+        client=client,
+        token=config.discord.token,
+        database=database,
+        jobs=jobs,
+        health=_build_health_server(config.health, client, database, startup),
+        shutdown_timeout=config.discord.shutdown_timeout,
+    )
 
 
 __all__ = ["DiscordApplication", "build_discord_app"]
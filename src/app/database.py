@@ -1,10 +1,21 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Any, Sequence
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Hashable, List, Sequence
 
 import asyncpg
 
+from app.metrics import REGISTRY, MetricsRegistry
+from app.tracing import TRACER
+
+
+if TYPE_CHECKING:
+    from app.leadership import LeaderElection
+
 
 LOGGER = logging.getLogger(__name__)
 
@@ -21,55 +32,431 @@ CREATE TABLE IF NOT EXISTS channel_nickname_rules (
 """
 
 
+# 既存のテーブルにも後から追加できるよう、ポリシー用の列は ALTER で追加する。
+_ALTER_CHANNEL_RULES_POLICY_COLUMNS = r"""
+ALTER TABLE channel_nickname_rules
+    ADD COLUMN IF NOT EXISTS extra_role_ids BIGINT[] NOT NULL DEFAULT '{}',
+    ADD COLUMN IF NOT EXISTS exempt_role_ids BIGINT[] NOT NULL DEFAULT '{}',
+    ADD COLUMN IF NOT EXISTS content_allowlist TEXT[] NOT NULL DEFAULT '{}',
+    ADD COLUMN IF NOT EXISTS rewrite_content BOOLEAN NOT NULL DEFAULT TRUE,
+    ADD COLUMN IF NOT EXISTS rate_limit_count INTEGER,
+    ADD COLUMN IF NOT EXISTS rate_limit_window INTEGER;
+"""
+
+
+_CREATE_BACKFILL_CHECKPOINTS_TABLE = r"""
+CREATE TABLE IF NOT EXISTS nickname_sync_backfill_checkpoints (
+    guild_id BIGINT NOT NULL,
+    channel_id BIGINT NOT NULL,
+    role_id BIGINT NOT NULL,
+    phase TEXT NOT NULL,
+    last_message_id BIGINT,
+    last_user_id BIGINT,
+    author_ids BIGINT[] NOT NULL DEFAULT '{}',
+    scanned_messages BIGINT NOT NULL DEFAULT 0,
+    granted_count BIGINT NOT NULL DEFAULT 0,
+    requested_by BIGINT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT (timezone('UTC', now())),
+    PRIMARY KEY (guild_id, channel_id)
+);
+"""
+
+_CREATE_BACKFILL_AUTHORS_TABLE = r"""
+CREATE TABLE IF NOT EXISTS nickname_sync_backfill_authors (
+    guild_id BIGINT NOT NULL,
+    channel_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    PRIMARY KEY (guild_id, channel_id, user_id)
+);
+"""
+
+
+class DatabaseUnavailableError(RuntimeError):
+    """データベースにまだ接続できていないときに送出される。"""
+
+
+# 接続断・タイムアウト・サーバー側のエラーなど、DB に依存する処理が
+# フォールバックすべき例外。asyncio.TimeoutError は OSError に含まれる。
+DATABASE_ERRORS: tuple[type[BaseException], ...] = (
+    asyncpg.PostgresError,
+    asyncpg.InterfaceError,
+    OSError,
+    asyncio.TimeoutError,
+    DatabaseUnavailableError,
+)
+
+# レプリカの再生遅延（秒）。受信済みの WAL をすべて再生し終えていれば、プライマリに
+# 書き込みがなく最後の再生時刻が古いだけなので 0 とする。再生時刻が不明なら NULL。
+_REPLICA_LAG_SQL = r"""
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0.0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0.0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::float8
+END;
+"""
+
+# レプリカを振り分け先から外す例外（接続できない・接続が切れた）。
+# 構文エラーや制約違反などクエリ自体のエラーはレプリカの故障として扱わない。
+_REPLICA_FAILURES: tuple[type[BaseException], ...] = (
+    OSError,
+    asyncpg.InterfaceError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.CannotConnectNowError,
+)
+
+
+@dataclass(slots=True)
+class _Replica:
+    label: str
+    dsn: str
+    pool: asyncpg.Pool | None = None
+    healthy: bool = False
+    lag: float | None = None
+
+
 class Database:
-    """asyncpg ベースのシンプルなデータベースラッパー。"""
+    """asyncpg ベースのシンプルなデータベースラッパー。
+
+    ``replica_dsns`` を指定すると読み取りレプリカごとに接続プールを持ち、
+    ``fetchrow_readonly`` / ``fetch_readonly`` をヘルスチェックに通った
+    レプリカへ順番に振り分ける。ヘルスチェックでは再生遅延も測り、
+    ``replica_max_lag`` 秒を超えて遅れているレプリカは追いつくまで振り分け先から外す。
+    ``mark_written`` で書き込みを記録したキーの読み取りは
+    ``read_your_writes_window`` 秒間プライマリで行う。
+    """
 
-    def __init__(self, *, dsn: str) -> None:
+    def __init__(
+        self,
+        *,
+        dsn: str,
+        connect_timeout: float = 10.0,
+        replica_dsns: Sequence[str] = (),
+        read_your_writes_window: float = 5.0,
+        replica_max_lag: float = 10.0,
+        health_check_interval: float = 10.0,
+        metrics: MetricsRegistry = REGISTRY,
+    ) -> None:
         self._dsn = dsn
+        self._connect_timeout = connect_timeout
         self._pool: asyncpg.Pool | None = None
+        self._connected = asyncio.Event()
+        self._connect_task: asyncio.Task[None] | None = None
+        self._replicas = [
+            _Replica(label=f"replica[{index}]", dsn=replica_dsn) for index, replica_dsn in enumerate(replica_dsns)
+        ]
+        self._next_replica = 0
+        self._monitor_task: asyncio.Task[None] | None = None
+        self._read_your_writes_window = read_your_writes_window
+        self._replica_max_lag = replica_max_lag
+        self._health_check_interval = health_check_interval
+        self._recent_writes: OrderedDict[Hashable, float] = OrderedDict()
+        self._metrics = metrics
+
+    @property
+    def is_connected(self) -> bool:
+        return self._pool is not None
 
     async def connect(self) -> None:
         if self._pool is not None:
             return
 
         LOGGER.info("データベースへの接続を開始します。")
-        self._pool = await asyncpg.create_pool(self._dsn)
-        await self._initialise_schema()
+        pool = await asyncio.wait_for(
+            asyncpg.create_pool(self._dsn, timeout=self._connect_timeout),
+            timeout=self._connect_timeout,
+        )
+        try:
+            await asyncio.wait_for(self._initialise_schema(pool), timeout=self._connect_timeout)
+        except BaseException:
+            pool.terminate()
+            raise
+        self._pool = pool
+        self._connected.set()
         LOGGER.info("データベース接続と初期化が完了しました。")
+        if self._replicas and self._monitor_task is None:
+            self._monitor_task = asyncio.create_task(self._monitor_replicas(), name="database-replicas")
+
+    def connect_in_background(self, *, initial_delay: float = 1.0, max_delay: float = 60.0) -> None:
+        """接続できるまで指数バックオフで再試行するタスクを開始する。
+
+        接続するまでのクエリは DatabaseUnavailableError になるため、
+        呼び出し側はローカルのデータで処理を続けること。
+        """
+
+        if self._pool is not None or self._connect_task is not None:
+            return
+        self._connect_task = asyncio.create_task(
+            self._connect_with_retry(initial_delay, max_delay),
+            name="database-connect",
+        )
+
+    async def wait_connected(self) -> None:
+        await self._connected.wait()
 
     async def close(self) -> None:
+        for task in (self._connect_task, self._monitor_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._connect_task = self._monitor_task = None
+
+        for replica in self._replicas:
+            replica_pool, replica.pool = replica.pool, None
+            replica.healthy = False
+            if replica_pool is not None:
+                await replica_pool.close()
+
         pool = self._pool
         if pool is None:
             return
 
         self._pool = None
+        self._connected.clear()
         LOGGER.info("データベース接続を終了します。")
         await pool.close()
 
     async def execute(self, query: str, *args: Any) -> str:
         pool = self._require_pool()
-        async with pool.acquire() as connection:
-            return await connection.execute(query, *args)
+        with TRACER.span("db.execute", db_statement=query, db_target="primary"):
+            async with pool.acquire() as connection:
+                return await connection.execute(query, *args)
 
     async def fetchrow(self, query: str, *args: Any) -> asyncpg.Record | None:
         pool = self._require_pool()
-        async with pool.acquire() as connection:
-            return await connection.fetchrow(query, *args)
+        with TRACER.span("db.fetchrow", db_statement=query, db_target="primary"):
+            async with pool.acquire() as connection:
+                return await connection.fetchrow(query, *args)
 
     async def fetch(self, query: str, *args: Any) -> Sequence[asyncpg.Record]:
         pool = self._require_pool()
-        async with pool.acquire() as connection:
-            return await connection.fetch(query, *args)
+        with TRACER.span("db.fetch", db_statement=query, db_target="primary"):
+            async with pool.acquire() as connection:
+                return await connection.fetch(query, *args)
+
+    async def fetchrow_readonly(
+        self,
+        query: str,
+        *args: Any,
+        key: Hashable | None = None,
+    ) -> asyncpg.Record | None:
+        """読み取り専用クエリをレプリカで実行する。
+
+        ``key`` に直近で書き込んでいる場合や、使えるレプリカがない場合はプライマリで実行する。
+        """
+
+        return await self._read("fetchrow", query, args, key)
+
+    async def fetch_readonly(
+        self,
+        query: str,
+        *args: Any,
+        key: Hashable | None = None,
+    ) -> Sequence[asyncpg.Record]:
+        """``fetchrow_readonly`` の複数行版。"""
+
+        return await self._read("fetch", query, args, key)
+
+    def mark_written(self, key: Hashable) -> None:
+        """``key`` に書き込んだことを記録し、しばらくの読み取りをプライマリに固定する。"""
+
+        now = time.monotonic()
+        self._recent_writes[key] = now
+        self._recent_writes.move_to_end(key)
+        cutoff = now - self._read_your_writes_window
+        while self._recent_writes:
+            oldest_key, written_at = next(iter(self._recent_writes.items()))
+            if written_at >= cutoff:
+                break
+            del self._recent_writes[oldest_key]
+
+    async def try_advisory_lock(self, key: int) -> asyncpg.Connection | None:
+        """セッションレベルのアドバイザリロックを取得し、保持している接続を返す。
+
+        他のセッションが保持している場合は None。ロックは返した接続のセッションに
+        結び付くため、``release_advisory_lock`` を呼ぶまで接続をプールに戻さないこと。
+        接続が切れればロックは PostgreSQL 側で自動的に解放される。
+        """
+
+        pool = self._require_pool()
+        connection = await pool.acquire(timeout=self._connect_timeout)
+        try:
+            acquired = await asyncio.wait_for(
+                connection.fetchval("SELECT pg_try_advisory_lock($1)", key),
+                timeout=self._connect_timeout,
+            )
+        except BaseException:
+            connection.terminate()
+            await pool.release(connection)
+            raise
+        if not acquired:
+            await pool.release(connection)
+            return None
+        return connection
+
+    async def release_advisory_lock(self, connection: asyncpg.Connection, key: int, *, broken: bool = False) -> None:
+        """``try_advisory_lock`` で取得したロックを解放し、接続をプールに戻す。
+
+        ``broken`` の場合や解放に失敗した場合は接続を破棄し、セッションの終了とともに解放させる。
+        """
+
+        pool = self._pool
+        if not broken and not connection.is_closed():
+            try:
+                await asyncio.wait_for(
+                    connection.fetchval("SELECT pg_advisory_unlock($1)", key),
+                    timeout=self._connect_timeout,
+                )
+            except DATABASE_ERRORS as exc:
+                LOGGER.warning("アドバイザリロックを解放できなかったため接続を破棄します: %s", exc)
+                broken = True
+        if broken:
+            connection.terminate()
+        if pool is not None:
+            await pool.release(connection)
+
+    async def ping(self, *, timeout: float) -> float:
+        """プライマリに ``SELECT 1`` を送り、応答までの秒数を返す。``timeout`` を超えたら TimeoutError。"""
+
+        pool = self._require_pool()
+        started = time.monotonic()
+
+        async def probe() -> None:
+            async with pool.acquire() as connection:
+                await connection.fetchval("SELECT 1")
+
+        await asyncio.wait_for(probe(), timeout=timeout)
+        return time.monotonic() - started
+
+    def leader_election(self, name: str, **kwargs: Any) -> "LeaderElection":
+        """``name`` ごとのアドバイザリロックでリーダーを 1 つに決める LeaderElection を作る。"""
+
+        # leadership は DATABASE_ERRORS を参照するため、循環しないようここで読み込む。
+        from app.leadership import LeaderElection
+
+        return LeaderElection(self, name, metrics=self._metrics, **kwargs)
+
+    def pool_stats(self) -> Dict[str, int] | None:
+        """接続プールのサイズと空き接続数を返す。未接続の場合は None。"""
+
+        pool = self._pool
+        if pool is None:
+            return None
+        stats = {
+            "size": pool.get_size(),
+            "idle": pool.get_idle_size(),
+            "min": pool.get_min_size(),
+            "max": pool.get_max_size(),
+        }
+        if self._replicas:
+            stats["replicas"] = len(self._replicas)
+            stats["replicas_healthy"] = sum(1 for replica in self._replicas if replica.healthy)
+        return stats
 
     def _require_pool(self) -> asyncpg.Pool:
         if self._pool is None:
-            raise RuntimeError("Database pool is not initialised. Call connect() first.")
+            raise DatabaseUnavailableError("Database pool is not initialised. Call connect() first.")
         return self._pool
 
-    async def _initialise_schema(self) -> None:
+    def _written_recently(self, key: Hashable) -> bool:
+        written_at = self._recent_writes.get(key)
+        return written_at is not None and time.monotonic() - written_at < self._read_your_writes_window
+
+    def _replica_order(self) -> List[_Replica]:
+        healthy = [replica for replica in self._replicas if replica.healthy and replica.pool is not None]
+        if not healthy:
+            return []
+        self._next_replica = (self._next_replica + 1) % len(healthy)
+        return healthy[self._next_replica :] + healthy[: self._next_replica]
+
+    async def _read(self, method: str, query: str, args: Sequence[Any], key: Hashable | None) -> Any:
+        if self._replicas and (key is None or not self._written_recently(key)):
+            for replica in self._replica_order():
+                assert replica.pool is not None
+                try:
+                    with TRACER.span(f"db.{method}", db_statement=query, db_target=replica.label):
+                        async with replica.pool.acquire() as connection:
+                            result = await getattr(connection, method)(query, *args)
+                except _REPLICA_FAILURES as exc:
+                    self._mark_replica_down(replica, exc)
+                    continue
+                self._metrics.increment("database.reads", target="replica")
+                return result
+
+        self._metrics.increment("database.reads", target="primary")
         pool = self._require_pool()
+        with TRACER.span(f"db.{method}", db_statement=query, db_target="primary"):
+            async with pool.acquire() as connection:
+                return await getattr(connection, method)(query, *args)
+
+    def _mark_replica_down(self, replica: _Replica, exc: BaseException) -> None:
+        if not replica.healthy:
+            return
+        replica.healthy = False
+        self._metrics.increment("database.replica_failovers")
+        LOGGER.warning("読み取りレプリカ %s を振り分け先から外しました: %s", replica.label, exc)
+
+    async def _monitor_replicas(self) -> None:
+        while True:
+            await asyncio.gather(*(self._check_replica(replica) for replica in self._replicas))
+            self._metrics.set_gauge(
+                "database.healthy_replicas",
+                sum(1 for replica in self._replicas if replica.healthy),
+            )
+            await asyncio.sleep(self._health_check_interval)
+
+    async def _check_replica(self, replica: _Replica) -> None:
+        try:
+            if replica.pool is None:
+                replica.pool = await asyncio.wait_for(
+                    asyncpg.create_pool(replica.dsn, timeout=self._connect_timeout),
+                    timeout=self._connect_timeout,
+                )
+            async with replica.pool.acquire(timeout=self._connect_timeout) as connection:
+                lag = await asyncio.wait_for(connection.fetchval(_REPLICA_LAG_SQL), timeout=self._connect_timeout)
+        except DATABASE_ERRORS as exc:
+            if replica.healthy:
+                self._mark_replica_down(replica, exc)
+            else:
+                LOGGER.debug("読み取りレプリカ %s はまだ利用できません: %s", replica.label, exc)
+            return
+        replica.lag = lag
+        if lag is not None:
+            self._metrics.set_gauge("database.replica_lag_seconds", lag, replica=replica.label)
+        if lag is None or lag > self._replica_max_lag:
+            if replica.healthy:
+                replica.healthy = False
+                self._metrics.increment("database.replica_lagging")
+                LOGGER.warning(
+                    "読み取りレプリカ %s の遅延が上限 %.1f 秒を超えたため振り分け先から外しました: lag=%s",
+                    replica.label,
+                    self._replica_max_lag,
+                    lag,
+                )
+            return
+        if not replica.healthy:
+            replica.healthy = True
+            LOGGER.info("読み取りレプリカ %s を振り分け先に追加しました。", replica.label)
+
+    async def _connect_with_retry(self, initial_delay: float, max_delay: float) -> None:
+        delay = initial_delay
+        while self._pool is None:
+            try:
+                await self.connect()
+            except DATABASE_ERRORS as exc:
+                LOGGER.warning("データベースに接続できませんでした。%.1f 秒後に再試行します: %s", delay, exc)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_delay)
+
+    @staticmethod
+    async def _initialise_schema(pool: asyncpg.Pool) -> None:
         async with pool.acquire() as connection:
             await connection.execute(_CREATE_CHANNEL_RULES_TABLE)
+            await connection.execute(_ALTER_CHANNEL_RULES_POLICY_COLUMNS)
+            await connection.execute(_CREATE_BACKFILL_CHECKPOINTS_TABLE)
+            await connection.execute(_CREATE_BACKFILL_AUTHORS_TABLE)
 
 
-__all__ = ["Database"]
+__all__ = ["DATABASE_ERRORS", "Database", "DatabaseUnavailableError"]
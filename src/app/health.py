@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+from aiohttp import web
+
+from app.database import DATABASE_ERRORS
+from app.metrics import REGISTRY, MetricsRegistry
+
+
+if TYPE_CHECKING:
+    from app.database import Database
+    from bot import BotClient
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+# 起動時の手順。
+STEP_COMMAND_SYNC = "command_sync"
+STEP_RULE_PRELOAD = "rule_preload"
+STEP_TEMP_VC_RECONCILE = "temp_vc_reconcile"
+
+# 手順の状態。delegated はリーダー選出で別のレプリカが担当していることを表す。
+# failed は直近の試行が失敗し、再試行を待っている状態。
+STEP_PENDING = "pending"
+STEP_DONE = "done"
+STEP_DELEGATED = "delegated"
+STEP_FAILED = "failed"
+
+# 応答の状態。degraded は DB に届かないなどでローカルのデータだけで動いている状態。
+STATUS_OK = "ok"
+STATUS_DEGRADED = "degraded"
+STATUS_STARTING = "starting"
+STATUS_UNAVAILABLE = "unavailable"
+
+HealthResponse = Tuple[int, Dict[str, Any]]
+
+
+class StartupTracker:
+    """起動時の手順の完了状況を記録する。
+
+    ``required`` の手順が終わるまでは準備中として扱う。``required`` でない手順
+    （DB からのルールの読み込みなど）は、終わっていなくてもスナップショットで
+    動作できるため縮退扱いにとどめる。失敗した手順は理由とともに記録し、
+    再試行で完了するまで縮退扱いにする（準備中のまま止まって見えないように）。
+    """
+
+    def __init__(self) -> None:
+        self._steps: Dict[str, str] = {}
+        self._required: Dict[str, bool] = {}
+        self._errors: Dict[str, str] = {}
+
+    def expect(self, step: str, *, required: bool = True) -> None:
+        self._steps.setdefault(step, STEP_PENDING)
+        self._required[step] = required
+
+    def complete(self, step: str, *, delegated: bool = False) -> None:
+        current = self._steps.get(step)
+        if current is None or current == STEP_DONE:
+            return
+        if current in (STEP_PENDING, STEP_FAILED):
+            LOGGER.info("起動手順が完了しました: %s%s", step, "（別のレプリカが担当）" if delegated else "")
+        self._steps[step] = STEP_DELEGATED if delegated else STEP_DONE
+        self._errors.pop(step, None)
+
+    def fail(self, step: str, reason: str) -> None:
+        """手順の試行が失敗したことを理由とともに記録する。完了済みの手順は変更しない。"""
+
+        current = self._steps.get(step)
+        if current is None or current in (STEP_DONE, STEP_DELEGATED):
+            return
+        self._steps[step] = STEP_FAILED
+        if current != STEP_FAILED:
+            LOGGER.warning("起動手順が失敗しました。再試行します: %s (%s)", step, reason)
+        self._errors[step] = reason[:200]
+
+    def pending(self, *, required: bool) -> List[str]:
+        return [
+            step
+            for step, state in self._steps.items()
+            if state == STEP_PENDING and self._required[step] == required
+        ]
+
+    def failed(self) -> List[str]:
+        return [step for step, state in self._steps.items() if state == STEP_FAILED]
+
+    def report(self) -> Dict[str, str]:
+        return dict(self._steps)
+
+    def errors(self) -> Dict[str, str]:
+        return dict(self._errors)
+
+
+class LoopLagMonitor:
+    """``interval`` 秒ごとのスリープの遅れからイベントループの詰まりを測る。"""
+
+    def __init__(self, *, interval: float = 0.5, window: int = 20, metrics: MetricsRegistry = REGISTRY) -> None:
+        self._interval = interval
+        self._window = window
+        self._metrics = metrics
+        self._samples: List[float] = []
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def last(self) -> float:
+        return self._samples[-1] if self._samples else 0.0
+
+    @property
+    def peak(self) -> float:
+        """直近 ``window`` 回の計測での最大の遅れ（秒）。"""
+
+        return max(self._samples, default=0.0)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="loop-lag-monitor")
+
+    async def close(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self._interval)
+            lag = max(0.0, time.monotonic() - started - self._interval)
+            self._samples.append(lag)
+            if len(self._samples) > self._window:
+                del self._samples[0]
+            self._metrics.set_gauge("event_loop.lag_seconds", lag)
+
+
+class HealthMonitor:
+    """ヘルスチェック用の状態を集める。毎秒の問い合わせに耐えるよう、DB への ping は共有する。
+
+    - liveness: イベントループが ``max_loop_lag`` 秒以上詰まっていなければ生きているとみなす。
+    - readiness: Discord ゲートウェイに接続済みで、必須の起動手順が終わっていれば受け付け可能。
+      DB に ``db_budget`` 秒以内に届かない場合や、必須でない手順が残っている場合、
+      起動手順が失敗して再試行を待っている場合は degraded（スナップショットや
+      ローカルのデータで動作中）として、理由を添えて 200 を返す。
+    """
+
+    def __init__(
+        self,
+        client: "BotClient",
+        *,
+        database: "Database | None" = None,
+        startup: StartupTracker | None = None,
+        loop_lag: LoopLagMonitor | None = None,
+        db_budget: float = 0.5,
+        db_check_interval: float = 1.0,
+        max_loop_lag: float = 5.0,
+    ) -> None:
+        self._client = client
+        self._database = database
+        self.startup = startup or StartupTracker()
+        self.loop_lag = loop_lag or LoopLagMonitor()
+        self._db_budget = db_budget
+        self._db_check_interval = db_check_interval
+        self._max_loop_lag = max_loop_lag
+        self._db_checked_at = -math.inf
+        self._db_result: Dict[str, Any] = {"ok": False, "error": "not checked"}
+        self._db_check: asyncio.Task[Dict[str, Any]] | None = None
+
+    def liveness(self) -> HealthResponse:
+        lag = self.loop_lag.peak
+        alive = lag < self._max_loop_lag
+        payload = {
+            "status": STATUS_OK if alive else STATUS_UNAVAILABLE,
+            "loop_lag_ms": round(lag * 1000, 1),
+        }
+        return (200 if alive else 503), payload
+
+    async def readiness(self) -> HealthResponse:
+        client = self._client
+        gateway_ready = client.is_ready() and not client.is_closed()
+        latency = client.latency
+        database = await self._database_status()
+        required = self.startup.pending(required=True)
+        optional = self.startup.pending(required=False)
+        failed = self.startup.failed()
+        lag = self.loop_lag.peak
+
+        reasons: List[str] = []
+        if client.is_draining:
+            status = STATUS_UNAVAILABLE
+            reasons.append("draining")
+        elif not gateway_ready:
+            status = STATUS_UNAVAILABLE
+            reasons.append("gateway_not_ready")
+        elif lag >= self._max_loop_lag:
+            status = STATUS_UNAVAILABLE
+            reasons.append("event_loop_stalled")
+        elif required:
+            status = STATUS_STARTING
+            reasons.extend(f"startup:{step}" for step in required)
+        else:
+            status = STATUS_OK
+        if status == STATUS_OK:
+            if not database["ok"]:
+                status = STATUS_DEGRADED
+                reasons.append("database_unreachable")
+            if optional:
+                status = STATUS_DEGRADED
+                reasons.extend(f"startup:{step}" for step in optional)
+            if failed:
+                status = STATUS_DEGRADED
+                reasons.extend(f"startup_failed:{step}" for step in failed)
+
+        payload = {
+            "status": status,
+            "reasons": reasons,
+            "gateway": {
+                "ready": gateway_ready,
+                # ハートビートの応答がまだないときは inf になる。
+                "latency_ms": round(latency * 1000, 1) if math.isfinite(latency) else None,
+            },
+            "database": database,
+            "loop_lag_ms": round(lag * 1000, 1),
+            "startup": self.startup.report(),
+            "startup_errors": self.startup.errors(),
+        }
+        return (200 if status in (STATUS_OK, STATUS_DEGRADED) else 503), payload
+
+    async def _database_status(self) -> Dict[str, Any]:
+        if self._database is None:
+            return {"ok": True, "configured": False}
+        if time.monotonic() - self._db_checked_at < self._db_check_interval:
+            return self._db_result
+        # 同時に届いた問い合わせは 1 回の ping の結果を共有する。
+        if self._db_check is None or self._db_check.done():
+            self._db_check = asyncio.create_task(self._ping_database(), name="health-db-ping")
+        return await asyncio.shield(self._db_check)
+
+    async def _ping_database(self) -> Dict[str, Any]:
+        assert self._database is not None
+        try:
+            elapsed = await self._database.ping(timeout=self._db_budget)
+        except DATABASE_ERRORS as exc:
+            result: Dict[str, Any] = {"ok": False, "error": type(exc).__name__}
+        else:
+            result = {"ok": True, "latency_ms": round(elapsed * 1000, 1)}
+        self._db_result = result
+        self._db_checked_at = time.monotonic()
+        return result
+
+
+class HealthServer:
+    """``/livez`` と ``/readyz`` を返す HTTP サーバー。"""
+
+    def __init__(self, monitor: HealthMonitor, *, host: str = "0.0.0.0", port: int = 8080) -> None:
+        self.monitor = monitor
+        self.host = host
+        self.port = port
+        self._runner: web.AppRunner | None = None
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/livez", self._livez)
+        app.router.add_get("/readyz", self._readyz)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.monitor.loop_lag.start()
+        LOGGER.info("ヘルスチェックの待ち受けを開始しました: http://%s:%s/readyz", self.host, self.port)
+
+    async def close(self) -> None:
+        await self.monitor.loop_lag.close()
+        runner, self._runner = self._runner, None
+        if runner is not None:
+            await runner.cleanup()
+
+    async def _livez(self, request: web.Request) -> web.Response:
+        status, payload = self.monitor.liveness()
+        return web.json_response(payload, status=status)
+
+    async def _readyz(self, request: web.Request) -> web.Response:
+        status, payload = await self.monitor.readiness()
+        return web.json_response(payload, status=status)
+
+
+__all__ = [
+    "HealthMonitor",
+    "HealthServer",
+    "LoopLagMonitor",
+    "STEP_COMMAND_SYNC",
+    "STEP_RULE_PRELOAD",
+    "STEP_TEMP_VC_RECONCILE",
+    "StartupTracker",
+]
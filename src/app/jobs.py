@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List
+
+from app.leadership import LeaderElection
+from app.metrics import REGISTRY, MetricsRegistry
+from app.tracing import TRACER
+
+
+if TYPE_CHECKING:
+    from app.health import StartupTracker
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+# ジョブをどのプロセスで実行するか。
+JOB_LEADER = "leader"  # 全レプリカの中でリーダーに選ばれた 1 プロセスだけ
+JOB_SHARD = "shard"  # 同じシャードを受け持つレプリカのうち 1 プロセスだけ
+JOB_INSTANCE = "instance"  # プロセスごと（ローカルのキャッシュやファイルを扱うもの）
+JOB_SCOPES = (JOB_LEADER, JOB_SHARD, JOB_INSTANCE)
+
+JobFunc = Callable[[], Awaitable[Any]]
+
+# 1 度きりのジョブが失敗したときの再試行間隔（秒）。失敗が続くたびに倍にする。
+RETRY_BACKOFF = 5.0
+MAX_RETRY_BACKOFF = 300.0
+
+
+@dataclass(slots=True)
+class _Job:
+    name: str
+    func: JobFunc
+    scope: str
+    interval: float | None
+    immediate: bool
+    wait_for: JobFunc | None
+    startup_step: str | None = None
+    runs: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    running: bool = False
+    last_success: float | None = None
+
+
+class JobRegistry:
+    """バックグラウンドジョブを実行範囲（リーダー・シャード・プロセス）ごとに動かす。
+
+    ``leader`` / ``shard`` の選出を渡さなかった範囲のジョブはプロセスごとに実行する
+    （レプリカが 1 つの構成ではリーダー選出は不要）。選出を伴うジョブはリーダーの間だけ
+    実行し、実行中にリーダーでなくなったら取り消す。``interval`` のないジョブは
+    リーダーの任期ごとに 1 度だけ成功するまで、``retry_backoff`` 秒から倍々に
+    （最大 ``max_retry_backoff`` 秒）間隔を空けて再試行する。
+
+    実行回数・失敗回数・所要時間・最終成功時刻をメトリクスとして記録する。
+    ``startup_step`` を指定したジョブは、初回の成功（別のレプリカがリーダーなら
+    選出の結果が出た時点）で ``startup`` の起動手順を完了にし、失敗したら理由を記録する。
+    """
+
+    def __init__(
+        self,
+        *,
+        leader: LeaderElection | None = None,
+        shard: LeaderElection | None = None,
+        startup: "StartupTracker | None" = None,
+        retry_backoff: float = RETRY_BACKOFF,
+        max_retry_backoff: float = MAX_RETRY_BACKOFF,
+        metrics: MetricsRegistry = REGISTRY,
+    ) -> None:
+        self._elections: Dict[str, LeaderElection | None] = {
+            JOB_LEADER: leader,
+            JOB_SHARD: shard,
+            JOB_INSTANCE: None,
+        }
+        self._startup = startup
+        self._retry_backoff = retry_backoff
+        self._max_retry_backoff = max_retry_backoff
+        self._metrics = metrics
+        self._jobs: Dict[str, _Job] = {}
+        self._tasks: List[asyncio.Task[None]] = []
+
+    @property
+    def elections(self) -> List[LeaderElection]:
+        unique = {id(election): election for election in self._elections.values() if election is not None}
+        return list(unique.values())
+
+    def register(
+        self,
+        name: str,
+        func: JobFunc,
+        *,
+        scope: str = JOB_INSTANCE,
+        interval: float | None = None,
+        immediate: bool = True,
+        wait_for: JobFunc | None = None,
+        startup_step: str | None = None,
+    ) -> None:
+        """ジョブを登録する。
+
+        ``interval`` 秒ごとに繰り返し、``immediate`` が False なら初回も ``interval``
+        秒待ってから実行する。``wait_for`` は初回の実行前に 1 度だけ待つ処理
+        （Discord の準備完了や DB への接続など）。``startup_step`` は完了を
+        readiness に反映する起動手順の名前。
+        """
+
+        if scope not in JOB_SCOPES:
+            raise ValueError(f"Unknown job scope: {scope}")
+        if name in self._jobs:
+            raise ValueError(f"Job already registered: {name}")
+        self._jobs[name] = _Job(
+            name=name,
+            func=func,
+            scope=scope,
+            interval=interval,
+            immediate=immediate or interval is None,
+            wait_for=wait_for,
+            startup_step=startup_step,
+        )
+        if startup_step is not None and self._startup is not None:
+            self._startup.expect(startup_step)
+
+    def start(self) -> None:
+        """リーダー選出と登録済みジョブの実行を開始する。"""
+
+        if self._tasks:
+            return
+        for election in self.elections:
+            election.start()
+        self._tasks = [
+            asyncio.create_task(self._supervise(job), name=f"job-{job.name}") for job in self._jobs.values()
+        ]
+
+    async def close(self) -> None:
+        """実行中のジョブを取り消し、保持しているリーダーのロックを解放する。"""
+
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for election in self.elections:
+            await election.close()
+
+    def stats(self) -> Dict[str, float]:
+        stats: Dict[str, float] = {}
+        for election in self.elections:
+            stats[f"leader_{election.name}"] = 1 if election.is_leader else 0
+        for job in self._jobs.values():
+            stats[f"{job.name}_runs"] = job.runs
+            stats[f"{job.name}_failures"] = job.failures
+            stats[f"{job.name}_running"] = 1 if job.running else 0
+            if job.last_success is not None:
+                stats[f"{job.name}_since_success_s"] = time.time() - job.last_success
+        return stats
+
+    async def _supervise(self, job: _Job) -> None:
+        if job.wait_for is not None:
+            await job.wait_for()
+        election = self._elections[job.scope]
+        if election is not None and job.startup_step is not None and self._startup is not None:
+            await election.wait_settled()
+            if not election.is_leader:
+                self._startup.complete(job.startup_step, delegated=True)
+        while True:
+            if election is not None:
+                await election.wait_leader()
+            if not job.immediate:
+                assert job.interval is not None  # interval のないジョブは常に immediate
+                if not await self._wait(job.interval, election):
+                    continue
+            outcome = await self._run_once(job, election)
+            if job.interval is not None:
+                job.immediate = False
+                if not await self._wait(job.interval, election):
+                    job.immediate = True
+                continue
+            if outcome == "failed":
+                # 成功するまで間隔を空けて再試行する。待つ間にリーダーでなくなったら次の任期で実行する。
+                await self._wait(self._backoff(job), election)
+                continue
+            if outcome == "interrupted":
+                continue
+            if election is None:
+                return
+            # 1 度きりのジョブは、次にリーダーに選ばれるまで実行しない。
+            await election.wait_lost()
+
+    def _backoff(self, job: _Job) -> float:
+        exponent = min(job.consecutive_failures - 1, 16)
+        delay = min(self._max_retry_backoff, self._retry_backoff * 2**exponent)
+        LOGGER.info("ジョブを %.0f 秒後に再試行します: %s", delay, job.name)
+        return delay
+
+    async def _wait(self, seconds: float, election: LeaderElection | None) -> bool:
+        """``seconds`` 秒待つ。その間にリーダーでなくなったら False を返す。"""
+
+        if election is None:
+            await asyncio.sleep(seconds)
+            return True
+        try:
+            await asyncio.wait_for(election.wait_lost(), timeout=seconds)
+        except asyncio.TimeoutError:
+            return True
+        return False
+
+    @staticmethod
+    async def _traced(job: _Job) -> Any:
+        with TRACER.span(f"job {job.name}", root=True, scope=job.scope):
+            return await job.func()
+
+    async def _run_once(self, job: _Job, election: LeaderElection | None) -> str:
+        """ジョブを 1 回実行し、結果（succeeded / failed / interrupted）を返す。"""
+
+        started = time.perf_counter()
+        job.running = True
+        self._metrics.set_gauge("jobs.running", 1, job=job.name)
+        work = asyncio.create_task(self._traced(job), name=f"job-{job.name}-run")
+        lost = asyncio.create_task(election.wait_lost(), name=f"job-{job.name}-lease") if election else None
+        try:
+            await asyncio.wait({work, lost} if lost is not None else {work}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            job.running = False
+            self._metrics.set_gauge("jobs.running", 0, job=job.name)
+            if lost is not None:
+                lost.cancel()
+            if not work.done():
+                work.cancel()
+                await asyncio.gather(work, return_exceptions=True)
+
+        if work.cancelled():
+            outcome = "interrupted"
+            LOGGER.warning("リーダーでなくなったためジョブを中断しました: %s", job.name)
+        elif work.exception() is not None:
+            outcome = "failed"
+            job.failures += 1
+            job.consecutive_failures += 1
+            error = work.exception()
+            LOGGER.error("ジョブが失敗しました: %s", job.name, exc_info=error)
+            if job.startup_step is not None and self._startup is not None:
+                self._startup.fail(job.startup_step, f"{type(error).__name__}: {error}")
+        else:
+            outcome = "succeeded"
+            job.consecutive_failures = 0
+            job.last_success = time.time()
+            self._metrics.set_gauge("jobs.last_success_timestamp", job.last_success, job=job.name)
+            if job.startup_step is not None and self._startup is not None:
+                self._startup.complete(job.startup_step)
+        job.runs += 1
+        self._metrics.increment("jobs.runs", job=job.name, outcome=outcome)
+        self._metrics.increment("jobs.duration_seconds", time.perf_counter() - started, job=job.name)
+        return outcome
+
+
+__all__ = ["JOB_INSTANCE", "JOB_LEADER", "JOB_SCOPES", "JOB_SHARD", "JobRegistry"]
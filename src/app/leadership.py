@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+from typing import TYPE_CHECKING
+
+from app.database import DATABASE_ERRORS
+from app.metrics import REGISTRY, MetricsRegistry
+
+
+if TYPE_CHECKING:
+    import asyncpg
+
+    from app.database import Database
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+# 同じ DB を使う別のアプリケーションのロックと衝突しないよう、キーの元になる名前に付ける。
+_LOCK_NAMESPACE = "discord-bot.leader"
+
+
+def advisory_lock_key(name: str) -> int:
+    """名前から pg_advisory_lock 用の 64 ビット符号付き整数キーを求める。"""
+
+    digest = hashlib.blake2b(f"{_LOCK_NAMESPACE}:{name}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+class LeaderElection:
+    """PostgreSQL のセッションレベルのアドバイザリロックでリーダーを 1 つに決める。
+
+    ``start`` すると ``retry_interval`` 秒ごとにロックの取得を試み、取得できたら
+    その接続を保持し続ける。保持中は ``heartbeat_interval`` 秒ごとに接続を確かめ、
+    接続が切れたり応答しなくなったりしたらリーダーを降りる。
+    リーダーの接続が切れると PostgreSQL がロックを解放するため、別のレプリカが
+    次の再試行で引き継ぐ。
+    """
+
+    def __init__(
+        self,
+        database: "Database",
+        name: str,
+        *,
+        retry_interval: float = 5.0,
+        heartbeat_interval: float = 5.0,
+        metrics: MetricsRegistry = REGISTRY,
+    ) -> None:
+        self.name = name
+        self._database = database
+        self._key = advisory_lock_key(name)
+        self._retry_interval = retry_interval
+        self._heartbeat_interval = heartbeat_interval
+        self._metrics = metrics
+        self._leader = asyncio.Event()
+        self._follower = asyncio.Event()
+        self._follower.set()
+        self._settled = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader.is_set()
+
+    async def wait_leader(self) -> None:
+        """リーダーになるまで待つ。"""
+
+        await self._leader.wait()
+
+    async def wait_settled(self) -> None:
+        """最初のロック取得の試行が終わるまで待つ。以降は ``is_leader`` で結果を判断できる。"""
+
+        await self._settled.wait()
+
+    async def wait_lost(self) -> None:
+        """リーダーでなくなるまで待つ。リーダーでなければすぐに戻る。"""
+
+        await self._follower.wait()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=f"leader-election-{self.name}")
+
+    async def close(self) -> None:
+        """選出をやめ、保持しているロックを解放する。"""
+
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self) -> None:
+        self._publish()
+        while True:
+            # DB に接続できない間も試行は続け、結果が出たことだけは知らせる。
+            try:
+                connection = await self._database.try_advisory_lock(self._key)
+            except DATABASE_ERRORS as exc:
+                LOGGER.debug("リーダーのロックを取得できませんでした (%s): %s", self.name, exc)
+                connection = None
+            if connection is None:
+                self._settled.set()
+                await asyncio.sleep(self._retry_interval)
+                continue
+
+            broken = False
+            try:
+                self._set_leader(True)
+                self._settled.set()
+                broken = await self._hold(connection)
+            finally:
+                self._set_leader(False)
+                await self._database.release_advisory_lock(connection, self._key, broken=broken)
+            await asyncio.sleep(self._retry_interval)
+
+    async def _hold(self, connection: "asyncpg.Connection") -> bool:
+        """接続が切れるまでロックを保持する。接続を破棄すべきなら True を返す。"""
+
+        dropped = asyncio.Event()
+
+        def on_terminated(_connection: "asyncpg.Connection") -> None:
+            dropped.set()
+
+        connection.add_termination_listener(on_terminated)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(dropped.wait(), timeout=self._heartbeat_interval)
+                except asyncio.TimeoutError:
+                    pass
+                else:
+                    LOGGER.warning("リーダーの DB 接続が切断されました (%s)。", self.name)
+                    return True
+                try:
+                    await asyncio.wait_for(connection.fetchval("SELECT 1"), timeout=self._heartbeat_interval)
+                except DATABASE_ERRORS as exc:
+                    # 応答しない接続はロックを保持したままの可能性があるため、破棄してセッションを終わらせる。
+                    LOGGER.warning("リーダーの DB 接続が応答しないため、リーダーを降ります (%s): %s", self.name, exc)
+                    return True
+        finally:
+            connection.remove_termination_listener(on_terminated)
+
+    def _set_leader(self, leader: bool) -> None:
+        if leader == self.is_leader:
+            return
+        if leader:
+            self._follower.clear()
+            self._leader.set()
+            self._metrics.increment("leader.elected", election=self.name)
+            LOGGER.info("リーダーに選出されました: %s", self.name)
+        else:
+            self._leader.clear()
+            self._follower.set()
+            self._metrics.increment("leader.lost", election=self.name)
+            LOGGER.info("リーダーを降りました: %s", self.name)
+        self._publish()
+
+    def _publish(self) -> None:
+        self._metrics.set_gauge("leader.is_leader", 1 if self.is_leader else 0, election=self.name)
+
+
+__all__ = ["LeaderElection", "advisory_lock_key"]
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Mapping
+
+from app.config import LoggingSettings, LogRateLimit
+
+
+CONTEXT_FIELDS = ("guild_id", "channel_id", "user_id")
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_log_context: contextvars.ContextVar[Mapping[str, Any]] = contextvars.ContextVar(
+    "log_context", default={}
+)
+
+
+@contextmanager
+def log_context(**fields: Any) -> Iterator[None]:
+    """with ブロック内のログに guild/channel/user などの文脈情報を付与する。"""
+
+    current = _log_context.get()
+    merged = {**current, **{key: value for key, value in fields.items() if value is not None}}
+    token = _log_context.set(merged)
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def _match_logger(name: str, table: Mapping[str, Any]) -> str | None:
+    """ロガー名に最も長く前方一致するキーを返す。"""
+
+    best: str | None = None
+    for key in table:
+        if name == key or name.startswith(key + "."):
+            if best is None or len(key) > len(best):
+                best = key
+    return best
+
+
+class ContextFilter(logging.Filter):
+    """呼び出し元スレッドで contextvars の文脈情報をレコードへ写す。"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _log_context.get()
+        for key in CONTEXT_FIELDS:
+            if not hasattr(record, key) and key in context:
+                setattr(record, key, context[key])
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """WARNING のレコードをロガーごとの確率で間引く。
+
+    INFO 以下の監査ログ（ロールの付与など）は出力量を LOG_LEVEL で決めるものとし、
+    間引かない。ERROR 以上も常に出力する。
+    """
+
+    def __init__(self, rates: Mapping[str, float]) -> None:
+        super().__init__()
+        self._rates = dict(rates)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self._rates or record.levelno != logging.WARNING:
+            return True
+        key = _match_logger(record.name, self._rates)
+        if key is None:
+            return True
+        return random.random() < self._rates[key]
+
+
+class RateLimitFilter(logging.Filter):
+    """WARNING のレコードをロガーごとの固定ウィンドウで制限する。
+
+    INFO 以下のレコードは数えも抑制もしないため、通常の出力量が WARNING の枠を
+    使い切って警告が落ちることはない。抑制した件数は次のウィンドウの最初の
+    レコードに追記する。
+    """
+
+    def __init__(self, limits: Mapping[str, LogRateLimit]) -> None:
+        super().__init__()
+        self._limits = dict(limits)
+        self._windows: Dict[str, list[float | int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self._limits or record.levelno != logging.WARNING:
+            return True
+        key = _match_logger(record.name, self._limits)
+        if key is None:
+            return True
+
+        limit = self._limits[key]
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.setdefault(key, [now, 0, 0])  # [開始時刻, 出力数, 抑制数]
+            if now - window[0] >= limit.window:
+                suppressed = int(window[2])
+                window[0], window[1], window[2] = now, 0, 0
+                if suppressed:
+                    record.msg = f"{record.msg} (直前の {suppressed} 件のログを抑制しました)"
+            if window[1] >= limit.count:
+                window[2] += 1
+                return False
+            window[1] += 1
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """1 行 1 レコードの JSON を出力するフォーマッター。"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in CONTEXT_FIELDS:
+            value = getattr(record, key, None)
+            if value is not None:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    """文脈フィールドを保持したまま例外情報を文字列化してキューへ積む。"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        prepared = logging.makeLogRecord(record.__dict__)
+        prepared.msg = record.getMessage()
+        prepared.args = None
+        prepared.exc_info = None
+        return prepared
+
+
+def configure_logging(settings: LoggingSettings) -> logging.handlers.QueueListener:
+    """ルートロガーをキュー経由の非同期出力に切り替え、リスナーを起動して返す。
+
+    イベントループ側はキューへ積むだけで戻り、標準出力への書き込みは
+    バックグラウンドスレッドが担う。終了時は返り値の ``stop()`` を呼ぶこと。
+    """
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if settings.json:
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    queue_handler = _ContextQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(SamplingFilter(settings.sample_rates))
+    queue_handler.addFilter(RateLimitFilter(settings.rate_limits))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.level)
+
+    listener = logging.handlers.QueueListener(
+        log_queue,
+        stream_handler,
+        respect_handler_level=True,
+    )
+    listener.start()
+    return listener
+
+
+__all__ = [
+    "ContextFilter",
+    "JsonFormatter",
+    "RateLimitFilter",
+    "SamplingFilter",
+    "configure_logging",
+    "log_context",
+]
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from typing import Dict, Tuple
+
+
+Labels = Tuple[Tuple[str, str], ...]
+MetricKey = Tuple[str, Labels]
+
+
+def _key(name: str, labels: Dict[str, object]) -> MetricKey:
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class MetricsRegistry:
+    """プロセス内のカウンターとゲージを保持する簡易レジストリ。
+
+    値はイベントループ上からのみ更新する前提で、ロックは取らない。
+    ラベルはキーワード引数で渡し、同じ名前でもラベルが異なれば別系列になる。
+    """
+
+    def __init__(self) -> None:
+        self._counters: Dict[MetricKey, float] = {}
+        self._gauges: Dict[MetricKey, float] = {}
+
+    def increment(self, name: str, value: float = 1, **labels: object) -> None:
+        key = _key(name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: object) -> None:
+        self._gauges[_key(name, labels)] = value
+
+    def counter(self, name: str, **labels: object) -> float:
+        return self._counters.get(_key(name, labels), 0)
+
+    def gauge(self, name: str, **labels: object) -> float | None:
+        return self._gauges.get(_key(name, labels))
+
+    def counters(self, name: str) -> Dict[Labels, float]:
+        """指定した名前のカウンターをラベルごとに返す。"""
+
+        return {labels: value for (metric, labels), value in self._counters.items() if metric == name}
+
+    def gauges(self, name: str) -> Dict[Labels, float]:
+        """指定した名前のゲージをラベルごとに返す。"""
+
+        return {labels: value for (metric, labels), value in self._gauges.items() if metric == name}
+
+    def snapshot(self) -> Dict[str, Dict[MetricKey, float]]:
+        return {"counters": dict(self._counters), "gauges": dict(self._gauges)}
+
+
+REGISTRY = MetricsRegistry()
+
+
+__all__ = ["Labels", "MetricsRegistry", "REGISTRY"]
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+from dataclasses import dataclass
+from types import ModuleType
+from typing import Any, Callable, Dict
+
+import discord
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+DEFAULT_PROFILE = "default"
+SPEED_PROFILE = "speed"
+RUNTIME_PROFILES = (DEFAULT_PROFILE, SPEED_PROFILE)
+
+# speed プロファイルで利用する任意依存パッケージ（import 名）。
+SPEED_PACKAGES = ("uvloop", "orjson", "zstandard", "zlib_ng")
+
+LoopFactory = Callable[[], asyncio.AbstractEventLoop]
+
+
+@dataclass(frozen=True, slots=True)
+class RuntimeProfile:
+    """適用したランタイムプロファイルと、実際に有効になった実装の組み合わせ。"""
+
+    name: str
+    event_loop: str
+    json: str
+    gateway_compression: str
+    loop_factory: LoopFactory | None = None
+
+    def describe(self) -> str:
+        return (
+            f"profile={self.name} loop={self.event_loop} json={self.json} "
+            f"gateway={self.gateway_compression}"
+        )
+
+
+class ZlibNgDecompressionContext:
+    """zlib-ng で zlib-stream を展開する discord.py 用の展開コンテキスト。
+
+    discord.py 標準の zlib 実装と同じく、Z_SYNC_FLUSH で終わるまでフレームを
+    バッファーに溜めてから 1 メッセージとして展開する。
+    """
+
+    __slots__ = ("context", "buffer")
+
+    COMPRESSION_TYPE: str = "zlib-stream"
+
+    def __init__(self) -> None:
+        zlib_ng = import_optional("zlib_ng.zlib_ng")
+        assert zlib_ng is not None
+        self.buffer = bytearray()
+        self.context = zlib_ng.decompressobj()
+
+    def decompress(self, data: bytes, /) -> str | None:
+        self.buffer.extend(data)
+        if len(data) < 4 or data[-4:] != b"\x00\x00\xff\xff":
+            return None
+
+        message = self.context.decompress(self.buffer)
+        self.buffer = bytearray()
+        return message.decode("utf-8")
+
+
+def available_packages() -> Dict[str, bool]:
+    """speed プロファイル用パッケージのインストール状況を返す。"""
+
+    return {name: import_optional(name) is not None for name in SPEED_PACKAGES}
+
+
+def uvloop_factory() -> LoopFactory | None:
+    uvloop = import_optional("uvloop")
+    return None if uvloop is None else uvloop.new_event_loop
+
+
+def enable_orjson() -> bool:
+    """discord.py の JSON 変換（REST とゲートウェイの両方）を orjson に切り替える。"""
+
+    orjson = import_optional("orjson")
+    if orjson is None:
+        return False
+
+    def to_json(obj: Any) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+    discord.utils._to_json = to_json
+    discord.utils._from_json = orjson.loads
+    return True
+
+
+def enable_fast_gateway_decompression() -> str:
+    """ゲートウェイの展開方式を利用可能な最速の実装にし、その名前を返す。
+
+    zstandard がインストールされていれば discord.py は import 時に zstd-stream を
+    選ぶため、そのまま使う。そうでなく zlib-ng があれば zlib-stream の展開を
+    zlib-ng に差し替える。
+    """
+
+    current = discord.utils._ActiveDecompressionContext
+    if current.COMPRESSION_TYPE != "zlib-stream":
+        return _compression_label()
+    if import_optional("zlib_ng.zlib_ng") is None:
+        return _compression_label()
+    discord.utils._ActiveDecompressionContext = ZlibNgDecompressionContext
+    return _compression_label()
+
+
+def apply_runtime_profile(name: str) -> RuntimeProfile:
+    """ランタイムプロファイルを適用する。イベントループの作成前に呼び出すこと。
+
+    ``default`` は discord.py と asyncio の既定の動作をそのまま使う。
+    ``speed`` は uvloop・orjson・高速なゲートウェイ展開のうち、インストール
+    されているものだけを有効にし、ないものは標準ライブラリのまま動作する。
+    """
+
+    if name not in RUNTIME_PROFILES:
+        raise ValueError(f"Unknown runtime profile: {name}")
+
+    if name == DEFAULT_PROFILE:
+        profile = RuntimeProfile(
+            name=name,
+            event_loop="asyncio",
+            json="orjson" if discord.utils.HAS_ORJSON else "json",
+            gateway_compression=_compression_label(),
+        )
+        LOGGER.info("ランタイムプロファイルを適用しました: %s", profile.describe())
+        return profile
+
+    missing = [package for package, installed in available_packages().items() if not installed]
+    loop_factory = uvloop_factory()
+    profile = RuntimeProfile(
+        name=name,
+        event_loop="uvloop" if loop_factory is not None else "asyncio",
+        json="orjson" if enable_orjson() else "json",
+        gateway_compression=enable_fast_gateway_decompression(),
+        loop_factory=loop_factory,
+    )
+    if missing:
+        LOGGER.warning(
+            "speed プロファイル用のパッケージが見つからないため標準実装を使います: %s",
+            ", ".join(missing),
+        )
+    LOGGER.info("ランタイムプロファイルを適用しました: %s", profile.describe())
+    return profile
+
+
+def _compression_label() -> str:
+    context = discord.utils._ActiveDecompressionContext
+    if context is ZlibNgDecompressionContext:
+        return "zlib-stream(zlib-ng)"
+    if context.COMPRESSION_TYPE == "zstd-stream":
+        return "zstd-stream"
+    return "zlib-stream(zlib)"
+
+
+def import_optional(name: str) -> ModuleType | None:
+    """任意依存パッケージを import する。インストールされていなければ None。"""
+
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+__all__ = [
+    "DEFAULT_PROFILE",
+    "LoopFactory",
+    "RUNTIME_PROFILES",
+    "RuntimeProfile",
+    "SPEED_PACKAGES",
+    "SPEED_PROFILE",
+    "ZlibNgDecompressionContext",
+    "apply_runtime_profile",
+    "available_packages",
+    "enable_fast_gateway_decompression",
+    "enable_orjson",
+    "import_optional",
+    "uvloop_factory",
+]
@@ -0,0 +1,346 @@
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, ContextManager, Dict, List, Protocol, Sequence
+
+from app.config import TracingSettings
+from app.metrics import REGISTRY, MetricsRegistry
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+# 書き出す属性値（SQL など）の最大文字数。
+ATTRIBUTE_VALUE_LIMIT = 256
+
+_current_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """1 つの処理区間。OpenTelemetry のスパンと同じ ID 体系（16 進の trace_id / span_id）を持つ。"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str | None, attributes: Dict[str, Any]) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: str | None = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1_000_000,
+            "attributes": {key: _attribute_value(value) for key, value in self.attributes.items()},
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """トレースしないときに返すスパン。属性の設定は何もしない。"""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+# nullcontext は状態を持たないため、無効時は同じインスタンスを使い回す。
+_NOOP_CONTEXT: ContextManager[Any] = nullcontext(_NOOP_SPAN)
+
+
+class _ActiveSpan:
+    __slots__ = ("_tracer", "_span", "_token")
+
+    def __init__(self, tracer: "Tracer", span: Span) -> None:
+        self._tracer = tracer
+        self._span = span
+        self._token: contextvars.Token["Span | None"] | None = None
+
+    def __enter__(self) -> Span:
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type: Any, exc: BaseException | None, traceback: Any) -> None:
+        span = self._span
+        span.end_ns = time.time_ns()
+        if exc is not None:
+            span.error = f"{exc_type.__name__}: {exc}" if exc_type is not None else str(exc)
+        if self._token is not None:
+            _current_span.reset(self._token)
+        self._tracer._finish(span)
+
+
+class SpanExporter(Protocol):
+    def export(self, spans: Sequence[Span]) -> None: ...
+
+    def shutdown(self) -> None: ...
+
+
+class Tracer:
+    """ゲートウェイイベントやインタラクションを起点にスパンを記録する軽量トレーサー。
+
+    ``root=True`` のスパン（イベント・インタラクション・ジョブ）だけが新しいトレースを
+    始め、``sample_rate`` の確率で記録するかを決める。それ以外のスパン（キャッシュ・DB・
+    REST）は記録中のトレースの中でだけ作られる。無効の間や記録しないトレースの中では
+    属性チェック 1 回で共有の空コンテキストを返すため、ほとんどコストがかからない。
+
+    終了したスパンは上限付きのキューに積み、``BatchSpanProcessor`` のスレッドが
+    まとめて書き出す。
+    """
+
+    def __init__(self, *, metrics: MetricsRegistry = REGISTRY) -> None:
+        self.enabled = False
+        self._sample_rate = 0.0
+        self._processor: BatchSpanProcessor | None = None
+        self._metrics = metrics
+
+    def configure(self, processor: "BatchSpanProcessor", *, sample_rate: float) -> None:
+        self._processor = processor
+        self._sample_rate = sample_rate
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+        self._processor = None
+
+    def span(self, name: str, *, root: bool = False, **attributes: Any) -> ContextManager[Any]:
+        """``with`` で囲んだ区間をスパンとして記録する。値は ``set_attribute`` を持つスパン。"""
+
+        if not self.enabled:
+            return _NOOP_CONTEXT
+        parent = _current_span.get()
+        if parent is None:
+            if not root or random.random() >= self._sample_rate:
+                return _NOOP_CONTEXT
+            return _ActiveSpan(self, Span(name, os.urandom(16).hex(), None, attributes))
+        return _ActiveSpan(self, Span(name, parent.trace_id, parent.span_id, attributes))
+
+    def _finish(self, span: Span) -> None:
+        processor = self._processor
+        if processor is not None and not processor.submit(span):
+            self._metrics.increment("tracing.dropped_spans")
+
+
+class BatchSpanProcessor:
+    """終了したスパンをバックグラウンドスレッドでまとめてエクスポーターに渡す。
+
+    イベントループ側はキューへ積むだけで戻る。キューがあふれたスパンは捨てる。
+    ``batch_size`` 件たまるか ``interval`` 秒経つたびに書き出し、``stop`` で残りを書き出す。
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        *,
+        batch_size: int = 512,
+        interval: float = 5.0,
+        max_queue_size: int = 4096,
+    ) -> None:
+        self._exporter = exporter
+        self._batch_size = batch_size
+        self._interval = interval
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(target=self._work, name="span-exporter", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def submit(self, span: Span) -> bool:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            return False
+        return True
+
+    def stop(self) -> None:
+        """キューに残ったスパンを書き出してスレッドを止める。"""
+
+        if not self._thread.is_alive():
+            return
+        self._queue.put(self._STOP)
+        self._thread.join()
+        self._exporter.shutdown()
+
+    def _work(self) -> None:
+        batch: List[Span] = []
+        deadline = time.monotonic() + self._interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if item is not None and item is not self._STOP:
+                batch.append(item)
+            if item is self._STOP or len(batch) >= self._batch_size or time.monotonic() >= deadline:
+                self._export(batch)
+                batch = []
+                deadline = time.monotonic() + self._interval
+            if item is self._STOP:
+                return
+
+    def _export(self, batch: List[Span]) -> None:
+        if not batch:
+            return
+        try:
+            self._exporter.export(batch)
+        except Exception:  # pragma: no cover - 書き出せなくても Bot の動作は続ける
+            LOGGER.exception("スパンを書き出せませんでした (件数=%s)。", len(batch))
+
+
+class FileSpanExporter:
+    """スパンを 1 行 1 件の JSON としてファイルに追記する。"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def export(self, spans: Sequence[Span]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as stream:
+            for span in spans:
+                stream.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str))
+                stream.write("\n")
+
+    def shutdown(self) -> None:
+        return None
+
+
+class OtlpHttpSpanExporter:
+    """スパンを OTLP/HTTP の JSON 形式でコレクター（``/v1/traces``）に送る。"""
+
+    def __init__(self, endpoint: str, *, service_name: str, timeout: float = 10.0) -> None:
+        self.endpoint = endpoint
+        self._service_name = service_name
+        self._timeout = timeout
+
+    def export(self, spans: Sequence[Span]) -> None:
+        body = json.dumps(self._payload(spans), default=str).encode()
+        request = urllib.request.Request(
+            self.endpoint,
+            data=body,
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self._timeout) as response:
+                response.read()
+        except OSError as exc:
+            LOGGER.warning("スパンを OTLP コレクターに送信できませんでした (件数=%s): %s", len(spans), exc)
+
+    def shutdown(self) -> None:
+        return None
+
+    def _payload(self, spans: Sequence[Span]) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [_otlp_attribute("service.name", self._service_name)]},
+                    "scopeSpans": [{"scope": {"name": __name__}, "spans": [_otlp_span(span) for span in spans]}],
+                }
+            ]
+        }
+
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [_otlp_attribute(key, value) for key, value in span.attributes.items()],
+        # 2 = STATUS_CODE_ERROR, 0 = STATUS_CODE_UNSET
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+    }
+    if span.parent_id is not None:
+        payload["parentSpanId"] = span.parent_id
+    return payload
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(_attribute_value(value))}}
+
+
+def _attribute_value(value: Any) -> Any:
+    # SQL などの長い文字列は書き出しスレッドで 1 行に詰めて切り詰める。
+    if not isinstance(value, str):
+        return value
+    compact = " ".join(value.split())
+    if len(compact) > ATTRIBUTE_VALUE_LIMIT:
+        return compact[:ATTRIBUTE_VALUE_LIMIT] + "…"
+    return compact
+
+
+TRACER = Tracer()
+
+
+def configure_tracing(settings: TracingSettings) -> BatchSpanProcessor | None:
+    """設定に従って ``TRACER`` を有効にし、書き出しスレッドを起動して返す。
+
+    無効の場合は None。終了時は返り値の ``stop()`` を呼んで残りのスパンを書き出すこと。
+    """
+
+    exporter: SpanExporter
+    if settings.exporter == "file":
+        exporter = FileSpanExporter(settings.file_path)
+    elif settings.exporter == "otlp" and settings.otlp_endpoint is not None:
+        exporter = OtlpHttpSpanExporter(settings.otlp_endpoint, service_name=settings.service_name)
+    else:
+        TRACER.disable()
+        return None
+
+    processor = BatchSpanProcessor(
+        exporter,
+        batch_size=settings.batch_size,
+        interval=settings.export_interval,
+    )
+    processor.start()
+    TRACER.configure(processor, sample_rate=settings.sample_rate)
+    LOGGER.info(
+        "トレースを有効にしました (exporter=%s, sample_rate=%s)。", settings.exporter, settings.sample_rate
+    )
+    return processor
+
+
+__all__ = [
+    "BatchSpanProcessor",
+    "FileSpanExporter",
+    "OtlpHttpSpanExporter",
+    "Span",
+    "SpanExporter",
+    "TRACER",
+    "Tracer",
+    "configure_tracing",
+]
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Mapping, Set, Tuple
+
+from app.metrics import REGISTRY, MetricsRegistry
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+# 待機列があふれたときの間引き方。
+SHED_DROP_OLDEST = "drop_oldest"  # 最も古い待機イベントを捨てて新しいものを入れる
+SHED_DROP_NEWEST = "drop_newest"  # 新しく届いたイベントを捨てる
+SHED_COLLAPSE = "collapse"  # 同じキーの待機イベントを 1 件にまとめ、あふれたら最も古いものを捨てる
+SHED_POLICIES = (SHED_DROP_OLDEST, SHED_DROP_NEWEST, SHED_COLLAPSE)
+
+# collapse で 1 件にまとめるメッセージの上限。超えた分は別の待機イベントとして積む。
+MAX_MERGED_MESSAGES = 20
+
+EventArgs = Tuple[Tuple[Any, ...], Dict[str, Any]]
+KeyFunc = Callable[[Tuple[Any, ...]], Hashable | None]
+MergeFunc = Callable[[EventArgs, EventArgs], EventArgs | None]
+Handler = Callable[..., Awaitable[Any]]
+
+
+@dataclass(frozen=True, slots=True)
+class GatePolicy:
+    """イベント種別ごとの同時実行数・待機列・間引き方・タイムアウト。
+
+    ``key`` はイベント引数からまとめる単位（チャンネルやメンバー）を返す。
+    ``merge`` を省略した collapse では新しいイベントが古いものを置き換える。
+    ``merge`` が None を返した場合はまとめずに、新しいイベントを待機列に積む。
+    """
+
+    concurrency: int
+    queue_size: int
+    shedding: str = SHED_DROP_OLDEST
+    timeout: float | None = None
+    key: KeyFunc | None = None
+    merge: MergeFunc | None = None
+
+    def __post_init__(self) -> None:
+        if self.shedding not in SHED_POLICIES:
+            raise ValueError(f"Unknown shedding policy: {self.shedding}")
+
+
+class _Pending:
+    __slots__ = ("handler", "args", "kwargs", "key", "enqueued_at")
+
+    def __init__(self, handler: Handler, args: Tuple[Any, ...], kwargs: Dict[str, Any], key: Hashable | None) -> None:
+        self.handler = handler
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.enqueued_at = time.monotonic()
+
+
+class EventGate:
+    """1 種類のイベントハンドラーの同時実行数と待機列を制限する。
+
+    同時実行数に空きがあればすぐにタスクを起動し、なければ上限付きの待機列に
+    積む。実行中のタスクは終わると待機列から次のイベントを取り出すため、
+    タスク数は ``concurrency`` を超えない。
+    """
+
+    def __init__(self, event: str, policy: GatePolicy, *, metrics: MetricsRegistry = REGISTRY) -> None:
+        self.event = event
+        self.policy = policy
+        self._label = event.removeprefix("on_")
+        self._metrics = metrics
+        self._queue: Deque[_Pending] = deque()
+        self._by_key: Dict[Hashable, _Pending] = {}
+        self._running = 0
+        self._tasks: Set[asyncio.Task[None]] = set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def submit(self, handler: Handler, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> None:
+        policy = self.policy
+        key = policy.key(args) if policy.key is not None else None
+        self._idle.clear()
+        if self._running < policy.concurrency:
+            self._spawn(_Pending(handler, args, kwargs, key))
+            return
+
+        if policy.shedding == SHED_COLLAPSE and key is not None:
+            queued = self._by_key.get(key)
+            if queued is not None:
+                merged: EventArgs | None = (args, kwargs)
+                if policy.merge is not None:
+                    merged = policy.merge((queued.args, queued.kwargs), (args, kwargs))
+                if merged is not None:
+                    queued.args, queued.kwargs = merged
+                    queued.handler = handler
+                    self._shed("collapsed")
+                    return
+
+        if len(self._queue) >= policy.queue_size:
+            if policy.shedding == SHED_DROP_NEWEST or not self._queue:
+                self._shed("dropped_newest")
+                return
+            dropped = self._queue.popleft()
+            if dropped.key is not None and self._by_key.get(dropped.key) is dropped:
+                del self._by_key[dropped.key]
+            self._shed("dropped_oldest")
+
+        pending = _Pending(handler, args, kwargs, key)
+        self._queue.append(pending)
+        if policy.shedding == SHED_COLLAPSE and key is not None:
+            self._by_key[key] = pending
+        self._publish()
+
+    async def join(self) -> None:
+        """待機列が空になり、実行中のハンドラーがなくなるまで待つ。"""
+
+        await self._idle.wait()
+
+    async def close(self) -> None:
+        """待機中のイベントを捨て、実行中のハンドラーを取り消す。"""
+
+        self._queue.clear()
+        self._by_key.clear()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._publish()
+
+    def _spawn(self, pending: _Pending) -> None:
+        self._running += 1
+        task = asyncio.create_task(self._work(pending), name=f"event-{self._label}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self._publish()
+
+    async def _work(self, pending: _Pending | None) -> None:
+        try:
+            while pending is not None:
+                self._metrics.increment(
+                    "admission.wait_seconds",
+                    time.monotonic() - pending.enqueued_at,
+                    event=self._label,
+                )
+                await self._run(pending)
+                pending = self._next()
+        finally:
+            self._running -= 1
+            if self._running == 0 and not self._queue:
+                self._idle.set()
+            self._publish()
+
+    async def _run(self, pending: _Pending) -> None:
+        try:
+            if self.policy.timeout is None:
+                await pending.handler(*pending.args, **pending.kwargs)
+            else:
+                await asyncio.wait_for(pending.handler(*pending.args, **pending.kwargs), self.policy.timeout)
+        except asyncio.TimeoutError:
+            self._metrics.increment("admission.timeouts", event=self._label)
+            LOGGER.warning("イベントハンドラーが時間内に完了しなかったため打ち切りました: %s", self.event)
+        except Exception:
+            LOGGER.exception("イベントハンドラーで予期しないエラーが発生しました: %s", self.event)
+
+    def _next(self) -> _Pending | None:
+        if not self._queue:
+            return None
+        pending = self._queue.popleft()
+        if pending.key is not None and self._by_key.get(pending.key) is pending:
+            del self._by_key[pending.key]
+        self._publish()
+        return pending
+
+    def _shed(self, reason: str) -> None:
+        self._metrics.increment("admission.shed", event=self._label, reason=reason)
+        LOGGER.debug("過負荷のためイベントを間引きました: event=%s reason=%s", self.event, reason)
+
+    def _publish(self) -> None:
+        self._metrics.set_gauge("admission.queue_depth", len(self._queue), event=self._label)
+        self._metrics.set_gauge("admission.running", self._running, event=self._label)
+
+
+class AdmissionController:
+    """ゲートウェイイベントのハンドラーをイベント種別ごとの EventGate に通す。
+
+    discord.py はイベントごとに新しいタスクを作るため、メッセージの大量投稿や
+    レイドでハンドラーが際限なく並行実行される。ここで同時実行数と待機列を
+    制限し、あふれたイベントはポリシーに従って間引く。
+    """
+
+    def __init__(self, policies: Mapping[str, GatePolicy], *, metrics: MetricsRegistry = REGISTRY) -> None:
+        self._gates = {event: EventGate(event, policy, metrics=metrics) for event, policy in policies.items()}
+
+    def admits(self, event: str) -> bool:
+        return event in self._gates
+
+    def submit(self, event: str, handler: Handler, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> None:
+        self._gates[event].submit(handler, args, kwargs)
+
+    def stats(self) -> Dict[str, int]:
+        stats: Dict[str, int] = {}
+        for gate in self._gates.values():
+            label = gate.event.removeprefix("on_")
+            stats[f"{label}_running"] = gate.running
+            stats[f"{label}_queued"] = len(gate)
+        return stats
+
+    async def join(self) -> None:
+        await asyncio.gather(*(gate.join() for gate in self._gates.values()))
+
+    async def close(self) -> None:
+        await asyncio.gather(*(gate.close() for gate in self._gates.values()))
+
+
+def message_key(args: Tuple[Any, ...]) -> Hashable | None:
+    """同じチャンネル・同じ投稿者のメッセージを 1 件にまとめるキー。"""
+
+    message = args[0]
+    author = getattr(message, "author", None)
+    channel = getattr(message, "channel", None)
+    if author is None or channel is None:
+        return None
+    return (channel.id, author.id)
+
+
+def merge_messages(old: EventArgs, new: EventArgs) -> EventArgs | None:
+    """同じチャンネル・同じ投稿者の連投を、1 回のハンドラー呼び出しにまとめる。
+
+    古いメッセージは捨てずに ``earlier_messages`` へ投稿順に残し、ハンドラーが
+    1 件ずつ書き換えや投稿数上限の判定を行えるようにする（最新の 1 件だけを
+    処理すると、連投したメンバーが判定をすり抜けてしまうため）。
+    ``MAX_MERGED_MESSAGES`` 件に達したらまとめずに新しい待機イベントにする。
+    """
+
+    (old_message,), old_kwargs = old
+    earlier = (*old_kwargs.get("earlier_messages", ()), old_message)
+    if len(earlier) >= MAX_MERGED_MESSAGES:
+        return None
+    return new[0], {"earlier_messages": earlier}
+
+
+def voice_state_key(args: Tuple[Any, ...]) -> Hashable | None:
+    """同じメンバーのボイス状態の変化を 1 件にまとめるキー。"""
+
+    member = args[0]
+    return (member.guild.id, member.id)
+
+
+def merge_voice_states(old: EventArgs, new: EventArgs) -> EventArgs:
+    """連続したボイス状態の変化を、最初の移動元から最後の移動先への 1 件にまとめる。
+
+    途中で通過したチャンネルは ``passed_channels`` に残し、ハンドラーが
+    無人になった一時VCを片付けられるようにする。
+    """
+
+    (_, first_before, middle_after), old_kwargs = old
+    (_, middle_before, last_after), _ = new
+    passed = (*old_kwargs.get("passed_channels", ()), middle_after.channel, middle_before.channel)
+    unique = {channel.id: channel for channel in passed if channel is not None}
+    return (new[0][0], first_before, last_after), {"passed_channels": tuple(unique.values())}
+
+
+__all__ = [
+    "AdmissionController",
+    "EventGate",
+    "GatePolicy",
+    "MAX_MERGED_MESSAGES",
+    "SHED_COLLAPSE",
+    "SHED_DROP_NEWEST",
+    "SHED_DROP_OLDEST",
+    "SHED_POLICIES",
+    "merge_messages",
+    "merge_voice_states",
+    "message_key",
+    "voice_state_key",
+]
@@ -1,12 +1,24 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, Coroutine, Sequence, Set
 
 import discord
 
+from app.tracing import TRACER
+
+from .admission import AdmissionController
+from .guild_index import GuildEligibilityIndex
+from .guild_state import GuildStateJanitor
+from .interactions import InteractionRunner
+from .recorder import GatewayRecorder
+
 
 if TYPE_CHECKING:
+    from app.jobs import JobRegistry
+
+    from .member_cache import ActiveMemberCache
     from .nickname_sync import NicknameSyncService
     from .temp_vc import TempVoiceChannelManager
 
@@ -23,11 +35,104 @@ class BotClient(discord.Client):
         intents: discord.Intents | None = None,
         temp_vc_manager: "TempVoiceChannelManager" | None = None,
         nickname_sync_service: "NicknameSyncService" | None = None,
+        member_cache: "ActiveMemberCache" | None = None,
+        interaction_runner: InteractionRunner | None = None,
+        recorder: GatewayRecorder | None = None,
+        admission: AdmissionController | None = None,
+        guild_index: GuildEligibilityIndex | None = None,
+        state_janitor: GuildStateJanitor | None = None,
+        jobs: "JobRegistry | None" = None,
     ) -> None:
-        super().__init__(intents=intents or discord.Intents.all())
+        # 全メンバーのキャッシュとギルド参加時のチャンクを無効化し、
+        # ボイス接続中のメンバーだけを discord.py 側に保持させる。
+        # それ以外のメンバーは ActiveMemberCache が必要な分だけ保持する。
+        super().__init__(
+            intents=intents or discord.Intents.all(),
+            member_cache_flags=discord.MemberCacheFlags(voice=True, joined=False),
+            chunk_guilds_at_startup=False,
+        )
         self.tree = discord.app_commands.CommandTree(self)
         self.temp_vc_manager = temp_vc_manager
         self.nickname_sync_service = nickname_sync_service
+        self.member_cache = member_cache
+        self.interaction_runner = interaction_runner or InteractionRunner()
+        self.recorder = recorder
+        self.admission = admission
+        self.guild_index = guild_index or GuildEligibilityIndex()
+        self.state_janitor = state_janitor
+        self.jobs = jobs
+        if recorder is not None:
+            # ゲートウェイは接続時にパーサーの辞書を参照するため、接続前に差し替える。
+            recorder.install(self._connection)
+        if TRACER.enabled:
+            _trace_rest_calls(self.http)
+        self._inflight: Set[asyncio.Task[Any]] = set()
+        self._draining = False
+
+    @property
+    def is_draining(self) -> bool:
+        return self._draining
+
+    def dispatch(self, event: str, /, *args: Any, **kwargs: Any) -> None:
+        # シャットダウン中は新しいイベントを受け付けない。
+        if self._draining:
+            return
+        super().dispatch(event, *args, **kwargs)
+
+    def _schedule_event(
+        self,
+        coro: Any,
+        event_name: str,
+        *args: Any,
+        **kwargs: Any,
+    ) -> asyncio.Task[Any] | None:
+        if TRACER.enabled:
+            coro = _traced_handler(coro, event_name)
+        if self.admission is not None and self.admission.admits(event_name):
+            # 同時実行数を制限するイベントはタスクを作らず、待機列に積む。
+            self.admission.submit(event_name, coro, args, kwargs)
+            return None
+        task = super()._schedule_event(coro, event_name, *args, **kwargs)
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+        return task
+
+    async def drain(self, *, timeout: float) -> None:
+        """新規イベントの受付を止め、処理中のハンドラーを最大 timeout 秒待つ。"""
+
+        self._draining = True
+        # コマンドツリーとビューのコールバックは _schedule_event を経由しないため、
+        # InteractionRunner が追跡している処理も待機対象に含める。
+        pending = {
+            task
+            for task in self._inflight | self.interaction_runner.pending
+            if task is not asyncio.current_task()
+        }
+        if self.admission is not None:
+            pending.add(asyncio.create_task(self.admission.join(), name="admission-drain"))
+        if not pending:
+            return
+
+        LOGGER.info("処理中のイベントハンドラーの完了を待機します (件数=%s)。", len(pending))
+        _, still_pending = await asyncio.wait(pending, timeout=timeout)
+        if not still_pending:
+            LOGGER.info("すべてのイベントハンドラーが完了しました。")
+            return
+
+        LOGGER.warning(
+            "期限内に完了しなかったイベントハンドラーをキャンセルします (件数=%s)。",
+            len(still_pending),
+        )
+        for task in still_pending:
+            task.cancel()
+        await asyncio.gather(*still_pending, return_exceptions=True)
+        if self.admission is not None:
+            await self.admission.close()
+
+    async def close(self) -> None:
+        await super().close()
+        if self.admission is not None:
+            await self.admission.close()
 
     async def on_ready(self) -> None:
         if self.user is None:
@@ -35,24 +140,122 @@ class BotClient(discord.Client):
             return
 
         LOGGER.info("ログイン完了: %s (ID: %s)", self.user, self.user.id)
+        # ジョブ管理がある場合、コマンドの同期と予備VCの補充はリーダーのレプリカだけが行う。
+        if self.jobs is None:
+            await self.sync_commands()
+            await self.warm_temp_vc_pools()
+        LOGGER.info("準備完了。")
+
+    async def sync_commands(self) -> None:
         await self.tree.sync()
         LOGGER.info("アプリケーションコマンドの同期が完了しました。")
-        LOGGER.info("準備完了。")
+
+    async def warm_temp_vc_pools(self) -> None:
+        if self.temp_vc_manager is not None:
+            self.temp_vc_manager.warm_pools(list(self.guilds))
 
     async def on_voice_state_update(
         self,
         member: discord.Member,
         before: discord.VoiceState,
         after: discord.VoiceState,
+        passed_channels: Sequence[discord.abc.GuildChannel] = (),
     ) -> None:
-        if self.temp_vc_manager is None:
+        manager = self.temp_vc_manager
+        if manager is None:
             return
 
-        await self.temp_vc_manager.handle_voice_state_update(member, before, after)
+        await manager.handle_voice_state_update(member, before, after)
+        # 過負荷時にまとめられたイベントで途中に通過したチャンネルも片付け対象にする。
+        for channel in passed_channels:
+            if isinstance(channel, discord.VoiceChannel) and channel not in (before.channel, after.channel):
+                await manager.release_if_empty(channel)
 
-    async def on_message(self, message: discord.Message) -> None:
+    async def on_guild_channel_create(self, channel: discord.abc.GuildChannel) -> None:
+        self.guild_index.channel_changed(channel)
+
+    async def on_guild_channel_update(
+        self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel
+    ) -> None:
+        self.guild_index.channel_changed(after)
+
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel) -> None:
+        self.guild_index.channel_removed(channel)
+        if self.state_janitor is not None:
+            self.state_janitor.channel_deleted(channel)
+
+    async def on_guild_role_create(self, role: discord.Role) -> None:
+        self.guild_index.role_changed(role)
+
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role) -> None:
+        self.guild_index.role_changed(after)
+
+    async def on_guild_role_delete(self, role: discord.Role) -> None:
+        self.guild_index.role_removed(role)
+        if self.state_janitor is not None:
+            self.state_janitor.role_deleted(role)
+
+    async def on_member_update(self, before: discord.Member, after: discord.Member) -> None:
+        self.guild_index.member_changed(before, after)
+
+    async def on_guild_remove(self, guild: discord.Guild) -> None:
+        self.guild_index.forget_guild(guild.id)
+        if self.state_janitor is not None:
+            self.state_janitor.guild_removed(guild.id)
+
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent) -> None:
+        if self.member_cache is not None:
+            self.member_cache.forget(payload.guild_id, payload.user.id)
+
+    async def on_message(
+        self,
+        message: discord.Message,
+        earlier_messages: Sequence[discord.Message] = (),
+    ) -> None:
         service = self.nickname_sync_service
         if service is None or message.author.bot or message.guild is None:
             return
 
+        # 過負荷時にまとめられた連投も、投稿順に 1 件ずつ判定する。
+        for earlier in earlier_messages:
+            await service.enforce(earlier)
         await service.enforce(message)
+
+
+def _traced_handler(handler: Any, event_name: str) -> Any:
+    async def traced(*args: Any, **kwargs: Any) -> Any:
+        with TRACER.span(f"event {event_name}", root=True, **_event_attributes(args)):
+            return await handler(*args, **kwargs)
+
+    return traced
+
+
+def _event_attributes(args: Sequence[Any]) -> dict[str, int]:
+    # 多くのイベントは最初の引数（メッセージ・メンバー・チャンネルなど）からギルドをたどれる。
+    if not args:
+        return {}
+    target = args[0]
+    attributes: dict[str, int] = {}
+    guild = getattr(target, "guild", None)
+    if guild is not None:
+        attributes["guild_id"] = guild.id
+    channel = getattr(target, "channel", None)
+    if channel is not None and getattr(channel, "id", None) is not None:
+        attributes["channel_id"] = channel.id
+    return attributes
+
+
+def _trace_rest_calls(http: discord.http.HTTPClient) -> None:
+    """REST 呼び出しごとにスパンを記録するよう HTTPClient.request を包む。"""
+
+    request = http.request
+
+    async def traced_request(route: discord.http.Route, **kwargs: Any) -> Any:
+        with TRACER.span(f"discord.rest {route.method}", http_method=route.method, http_route=route.path) as span:
+            try:
+                return await request(route, **kwargs)
+            except discord.HTTPException as exc:
+                span.set_attribute("http_status", exc.status)
+                raise
+
+    http.request = traced_request  # type: ignore[method-assign]
@@ -1,33 +1,64 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import math
+import re
+import time
 from dataclasses import dataclass
 from typing import Sequence, TYPE_CHECKING, cast
 
 import discord
 
+from bot.diagnostics import RuntimeDiagnostics, TraceDiffEntry
+from bot.guild_index import SELECT_OPTION_LIMIT
+from bot.interactions import InteractionReply, InteractionRunner
+from bot.nickname_sync.policy import PolicyCompileError, compile_allowlist
 from bot.temp_vc import (
+    MAX_POOL_SIZE,
+    QUOTA_CATEGORY,
     TempVCAlreadyExistsError,
     TempVCCategoryNotConfiguredError,
     TempVCCategoryNotFoundError,
+    TempVCQuotaExceededError,
     TempVoiceChannelManager,
+    UsageReport,
 )
 from views import NicknameSyncSetupView, SendModalView
 
 
 if TYPE_CHECKING:
     from bot.client import BotClient
-    from bot.nickname_sync import ChannelNicknameRuleRepository, NicknameSyncService
+    from bot.nickname_sync import (
+        BackfillProgress,
+        ChannelNicknameRule,
+        ChannelNicknameRuleRepository,
+        NicknameSyncBackfill,
+        NicknameSyncService,
+    )
 
 
 LOGGER = logging.getLogger(__name__)
 
 
+BACKFILL_PROGRESS_INTERVAL = 5.0
+MEMBER_CACHE_REPORT_LIMIT = 20
+DIAGNOSTICS_TRACE_LIMIT = 25
+DIAGNOSTICS_MESSAGE_LIMIT = 1900
+TEMP_VC_USAGE_MAX_HOURS = 24
+AUTOCOMPLETE_LABEL_LIMIT = 100
+POLICY_CLEAR_KEYWORDS = frozenset({"none", "なし"})
+_SNOWFLAKE_PATTERN = re.compile(r"\d{15,20}")
+_RATE_LIMIT_PATTERN = re.compile(r"\s*(\d+)\s*/\s*(\d+)\s*")
+
+
 async def register_commands(
     client: "BotClient",
     *,
     nickname_sync_service: "NicknameSyncService" | None = None,
     nickname_rule_repository: "ChannelNicknameRuleRepository" | None = None,
+    nickname_sync_backfill: "NicknameSyncBackfill" | None = None,
+    diagnostics: RuntimeDiagnostics | None = None,
 ) -> None:
     """クライアントのアプリケーションコマンドを登録する。"""
 
@@ -35,6 +66,8 @@ async def register_commands(
         client=client,
         nickname_sync_service=nickname_sync_service,
         nickname_rule_repository=nickname_rule_repository,
+        nickname_sync_backfill=nickname_sync_backfill,
+        diagnostics=diagnostics or RuntimeDiagnostics(),
     )
     registrar.register()
 
@@ -44,242 +77,593 @@ class _CommandRegistrar:
     client: "BotClient"
     nickname_sync_service: "NicknameSyncService | None" = None
     nickname_rule_repository: "ChannelNicknameRuleRepository | None" = None
+    nickname_sync_backfill: "NicknameSyncBackfill | None" = None
+    diagnostics: RuntimeDiagnostics | None = None
 
     def register(self) -> None:
         self._register_setup()
         self._register_temp_vc_creation()
         self._register_temp_vc_category()
+        self._register_temp_vc_pool()
+        self._register_temp_vc_lobby()
+        self._register_temp_vc_usage()
         self._register_nickname_sync_setup()
+        self._register_nickname_sync_policy()
+        self._register_nickname_sync_backfill()
+        self._register_member_cache_report()
+        self._register_diagnostics()
         # ブリッジ機能は temp/bridge_base へ移行済み
 
     @property
     def tree(self) -> discord.app_commands.CommandTree:
         return self.client.tree
 
+    @property
+    def runner(self) -> InteractionRunner:
+        return self.client.interaction_runner
+
     def _register_setup(self) -> None:
         @self.tree.command(
             name="setup", description="メッセージ送信のセットアップを行います。"
         )
         async def command_setup(interaction: discord.Interaction) -> None:
             LOGGER.info("/setup コマンドを実行したユーザー: %s", interaction.user)
-            await interaction.response.defer()
-            view = SendModalView()
-            await interaction.followup.send(
-                "📨 下のボタンからメッセージ送信モーダルを開けます。",
-                view=view,
-            )
+
+            async def work() -> InteractionReply:
+                return InteractionReply(
+                    content="📨 下のボタンからメッセージ送信モーダルを開けます。",
+                    view=SendModalView(runner=self.runner),
+                )
+
+            await self.runner.run(interaction, work, ephemeral=False)
 
     def _register_temp_vc_creation(self) -> None:
         @self.tree.command(
             name="vc", description="自分専用のボイスチャンネルを作成します。"
         )
         async def create_temp_vc(interaction: discord.Interaction) -> None:
-            manager = self.client.temp_vc_manager
-            if manager is None:
-                await _send_ephemeral(
-                    interaction,
-                    "一時VC機能が設定されていません。管理者に連絡してください。",
-                )
-                return
-
-            guild = interaction.guild
-            if guild is None:
-                await _send_ephemeral(
-                    interaction,
-                    "このコマンドはサーバー内でのみ使用できます。",
-                )
-                return
-
-            try:
-                channel = await manager.create_user_channel(
-                    guild=guild, user=interaction.user
-                )
-            except TempVCAlreadyExistsError as err:
-                await _send_ephemeral(
-                    interaction,
-                    f"すでに専用チャンネルがあります: {err.channel.mention}",
-                )
-                return
-            except TempVCCategoryNotConfiguredError:
-                await _send_ephemeral(
-                    interaction,
-                    "専用チャンネル用のカテゴリーが未設定です。管理者に連絡してください。",
-                )
-                return
-            except TempVCCategoryNotFoundError:
-                await _send_ephemeral(
-                    interaction,
-                    "専用チャンネル用のカテゴリーが見つかりませんでした。管理者に連絡してください。",
-                )
-                return
-            except Exception:  # pragma: no cover - 予期しないエラーの記録
-                LOGGER.exception("一時VC作成中に予期しないエラーが発生しました。")
-                await _send_ephemeral(
-                    interaction,
-                    "チャンネルの作成中にエラーが発生しました。しばらくしてから再試行してください。",
-                )
-                return
-
-            await _send_ephemeral(
-                interaction,
-                f"ボイスチャンネルを作成しました: {channel.mention}\n誰もいなくなったら自動で削除されます。",
-            )
+            async def work() -> str:
+                manager = self.client.temp_vc_manager
+                if manager is None:
+                    return "一時VC機能が設定されていません。管理者に連絡してください。"
+
+                guild = interaction.guild
+                if guild is None:
+                    return "このコマンドはサーバー内でのみ使用できます。"
+
+                try:
+                    channel = await manager.create_user_channel(
+                        guild=guild, user=interaction.user
+                    )
+                except TempVCAlreadyExistsError as err:
+                    return f"すでに専用チャンネルがあります: {err.channel.mention}"
+                except TempVCCategoryNotConfiguredError:
+                    return "専用チャンネル用のカテゴリーが未設定です。管理者に連絡してください。"
+                except TempVCCategoryNotFoundError:
+                    return "専用チャンネル用のカテゴリーが見つかりませんでした。管理者に連絡してください。"
+                except TempVCQuotaExceededError as err:
+                    return _format_temp_vc_quota(err)
+                except asyncio.TimeoutError:
+                    return "Discord への送信が混み合っています。しばらくしてから再試行してください。"
+                except Exception:  # pragma: no cover - 予期しないエラーの記録
+                    LOGGER.exception("一時VC作成中に予期しないエラーが発生しました。")
+                    return "チャンネルの作成中にエラーが発生しました。しばらくしてから再試行してください。"
+
+                return f"ボイスチャンネルを作成しました: {channel.mention}\n誰もいなくなったら自動で削除されます。"
+
+            await self.runner.run(interaction, work)
 
     def _register_temp_vc_category(self) -> None:
         @self.tree.command(
             name="vc_category", description="一時VCの作成先カテゴリを設定します。"
         )
+        @discord.app_commands.describe(category="作成先のカテゴリ（名前を入力して検索）")
         @discord.app_commands.checks.has_permissions(administrator=True)
         async def configure_temp_vc_category(
             interaction: discord.Interaction,
+            category: str | None = None,
         ) -> None:
-            manager = self.client.temp_vc_manager
-            if manager is None:
-                await _send_ephemeral(
-                    interaction,
-                    "一時VC機能が初期化されていません。ボットのログを確認してください。",
+            async def work() -> str | InteractionReply:
+                manager = self.client.temp_vc_manager
+                if manager is None:
+                    return "一時VC機能が初期化されていません。ボットのログを確認してください。"
+
+                guild = interaction.guild
+                if guild is None:
+                    return "このコマンドはサーバー内でのみ使用できます。"
+
+                index = self.client.guild_index
+                if category is not None:
+                    selected = index.resolve_category(guild, category)
+                    if selected is None:
+                        return "カテゴリが見つかりません。入力中に表示される候補から選択してください。"
+                    manager.set_category_for_guild(guild_id=guild.id, category_id=selected.id)
+                    manager.warm_pools([guild])
+                    return f"一時VCのカテゴリを {selected.mention} に設定しました。"
+
+                categories = index.categories(guild, limit=SELECT_OPTION_LIMIT + 1)
+                if not categories:
+                    return "カテゴリが見つかりません。サーバーにカテゴリを作成してから再試行してください。"
+                if len(categories) > SELECT_OPTION_LIMIT:
+                    # セレクトメニューには 25 件までしか並べられないため、検索で指定してもらう。
+                    return "カテゴリが多いため、`category` オプションに名前を入力して候補から選択してください。"
+
+                view = _CategorySelectView(
+                    categories=categories,
+                    manager=manager,
+                    guild=guild,
+                    runner=self.runner,
                 )
-                return
+                return InteractionReply(
+                    content="一時VCの作成先カテゴリを選択し、『確定』を押してください。",
+                    view=view,
+                )
+
+            await self.runner.run(interaction, work)
 
+        @configure_temp_vc_category.autocomplete("category")
+        async def category_autocomplete(
+            interaction: discord.Interaction, current: str
+        ) -> list[discord.app_commands.Choice[str]]:
             guild = interaction.guild
             if guild is None:
-                await _send_ephemeral(
-                    interaction,
-                    "このコマンドはサーバー内でのみ使用できます。",
-                )
-                return
+                return []
+            return [
+                _autocomplete_choice(category.name, category.id)
+                for category in self.client.guild_index.search_categories(guild, current)
+            ]
 
-            categories = guild.categories[:25]
-            if not categories:
-                await _send_ephemeral(
-                    interaction,
-                    "カテゴリが見つかりません。サーバーにカテゴリを作成してから再試行してください。",
-                )
-                return
+    def _register_temp_vc_pool(self) -> None:
+        @self.tree.command(
+            name="vc_pool",
+            description="一時VC用に事前作成しておく待機チャンネル数を設定します。",
+        )
+        @discord.app_commands.describe(size=f"待機チャンネル数 (0 で無効、最大 {MAX_POOL_SIZE})")
+        @discord.app_commands.checks.has_permissions(administrator=True)
+        async def configure_temp_vc_pool(
+            interaction: discord.Interaction,
+            size: discord.app_commands.Range[int, 0, MAX_POOL_SIZE],
+        ) -> None:
+            async def work() -> str:
+                manager = self.client.temp_vc_manager
+                if manager is None or manager.pool is None:
+                    return "一時VC機能が初期化されていません。ボットのログを確認してください。"
 
-            view = _CategorySelectView(
-                categories=categories,
-                manager=manager,
-                guild=guild,
-            )
+                guild = interaction.guild
+                if guild is None:
+                    return "このコマンドはサーバー内でのみ使用できます。"
 
-            await interaction.response.send_message(
-                "一時VCの作成先カテゴリを選択し、『確定』を押してください。",
-                view=view,
-                ephemeral=True,
-            )
+                if manager.get_category_for_guild(guild.id) is None:
+                    return "先に /vc_category で一時VCの作成先カテゴリを設定してください。"
+
+                manager.set_pool_size_for_guild(guild, size)
+                if size == 0:
+                    return "待機チャンネルを無効にしました。既存の待機チャンネルは順次削除されます。"
+                return f"待機チャンネル数を {size} に設定しました。バックグラウンドで準備します。"
+
+            await self.runner.run(interaction, work)
+
+    def _register_temp_vc_lobby(self) -> None:
+        @self.tree.command(
+            name="vc_lobby",
+            description="参加すると専用VCを作成して移動するロビーVCを設定します。",
+        )
+        @discord.app_commands.describe(channel="ロビーにするボイスチャンネル (省略するとロビーを解除)")
+        @discord.app_commands.checks.has_permissions(administrator=True)
+        async def configure_temp_vc_lobby(
+            interaction: discord.Interaction,
+            channel: discord.VoiceChannel | None = None,
+        ) -> None:
+            async def work() -> str:
+                manager = self.client.temp_vc_manager
+                if manager is None:
+                    return "一時VC機能が初期化されていません。ボットのログを確認してください。"
+
+                guild = interaction.guild
+                if guild is None:
+                    return "このコマンドはサーバー内でのみ使用できます。"
+
+                if channel is None:
+                    manager.set_lobby_for_guild(guild_id=guild.id, channel_id=None)
+                    return "ロビーVCを解除しました。"
+
+                if manager.get_category_for_guild(guild.id) is None:
+                    return "先に /vc_category で一時VCの作成先カテゴリを設定してください。"
+
+                bot_member = guild.me
+                if bot_member is not None and not channel.permissions_for(bot_member).move_members:
+                    return f"Bot に {channel.mention} での「メンバーを移動」権限を付与してください。"
+
+                manager.set_lobby_for_guild(guild_id=guild.id, channel_id=channel.id)
+                return f"{channel.mention} をロビーVCに設定しました。参加したユーザーには専用VCが作成され、自動で移動します。"
+
+            await self.runner.run(interaction, work)
+
+    def _register_temp_vc_usage(self) -> None:
+        @self.tree.command(
+            name="vc_usage",
+            description="一時VCの作成数・同時使用数・参加人数の推移を表示します。",
+        )
+        @discord.app_commands.describe(hours=f"集計する期間（時間、最大 {TEMP_VC_USAGE_MAX_HOURS}）")
+        @discord.app_commands.checks.has_permissions(administrator=True)
+        async def temp_vc_usage(
+            interaction: discord.Interaction,
+            hours: discord.app_commands.Range[int, 1, TEMP_VC_USAGE_MAX_HOURS] = 6,
+        ) -> None:
+            async def work() -> str:
+                manager = self.client.temp_vc_manager
+                if manager is None or manager.telemetry is None:
+                    return "一時VC機能が初期化されていません。ボットのログを確認してください。"
+
+                guild = interaction.guild
+                if guild is None:
+                    return "このコマンドはサーバー内でのみ使用できます。"
+
+                # 3 時間以下は 15 分、それより長い期間は 1 時間ごとに集計する。
+                bucket_minutes = 15 if hours <= 3 else 60
+                report = manager.telemetry.report(guild.id, minutes=hours * 60, bucket_minutes=bucket_minutes)
+                if report is None or report.covered_minutes == 0:
+                    return "このサーバーの一時VCの利用記録はまだありません。"
+                return _format_temp_vc_usage(report)
+
+            await self.runner.run(interaction, work)
 
     def _register_nickname_sync_setup(self) -> None:
         @self.tree.command(
             name="nickname_sync_setup",
             description="指定したチャンネルでニックネームとロールを同期します。",
         )
+        @discord.app_commands.describe(
+            channel="同期するチャンネル（名前を入力して検索）",
+            role="投稿者に付与するロール（名前を入力して検索）",
+        )
         @discord.app_commands.checks.has_permissions(manage_guild=True)
-        async def nickname_sync_setup(interaction: discord.Interaction) -> None:
-            repository = self.nickname_rule_repository
-            service = self.nickname_sync_service
-            if repository is None or service is None:
-                await _send_ephemeral(
-                    interaction,
-                    "ニックネーム同期機能が初期化されていません。ボットの設定を確認してください。",
+        async def nickname_sync_setup(
+            interaction: discord.Interaction,
+            channel: str | None = None,
+            role: str | None = None,
+        ) -> None:
+            async def work() -> str | InteractionReply:
+                repository = self.nickname_rule_repository
+                service = self.nickname_sync_service
+                if repository is None or service is None:
+                    return "ニックネーム同期機能が初期化されていません。ボットの設定を確認してください。"
+
+                guild = interaction.guild
+                if guild is None:
+                    return "このコマンドはサーバー内でのみ使用できます。"
+
+                if not isinstance(interaction.user, discord.Member):
+                    return "ユーザー情報を取得できませんでした。再度お試しください。"
+
+                bot_member = guild.me
+                if bot_member is None:
+                    return "Bot メンバー情報の取得に失敗しました。Bot を再起動してください。"
+
+                missing_permissions: list[str] = []
+                bot_permissions = bot_member.guild_permissions
+                if not bot_permissions.manage_messages:
+                    missing_permissions.append("メッセージの管理")
+                if not bot_permissions.manage_roles:
+                    missing_permissions.append("ロールの管理")
+                if missing_permissions:
+                    return "Bot に以下の権限を付与してください: " + ", ".join(missing_permissions)
+
+                index = self.client.guild_index
+                channels = index.text_channels(guild, limit=SELECT_OPTION_LIMIT + 1)
+                if not channels:
+                    return "設定可能なテキスト/アナウンスチャンネルが見つかりません。"
+
+                roles = index.assignable_roles(guild, limit=SELECT_OPTION_LIMIT + 1)
+                if not roles:
+                    return "Bot が付与できるロールがありません。Bot のロール順位を確認してください。"
+
+                selected_channel = index.resolve_text_channel(guild, channel) if channel is not None else None
+                if channel is not None and selected_channel is None:
+                    return "Bot が投稿できるチャンネルが見つかりません。入力中に表示される候補から選択してください。"
+                selected_role = index.resolve_assignable_role(guild, role) if role is not None else None
+                if role is not None and selected_role is None:
+                    return "Bot が付与できるロールが見つかりません。入力中に表示される候補から選択してください。"
+
+                if selected_channel is not None and selected_role is not None:
+                    rule = await repository.upsert_rule(
+                        guild_id=guild.id,
+                        channel_id=selected_channel.id,
+                        role_id=selected_role.id,
+                        updated_by=interaction.user.id,
+                    )
+                    service.invalidate_cache(rule.guild_id, rule.channel_id)
+                    return (
+                        f"{selected_channel.mention} を同期対象に設定し、"
+                        f"投稿者へ {selected_role.mention} を付与するよう構成しました。"
+                    )
+
+                # セレクトメニューには 25 件までしか並べられないため、多い方は検索で指定してもらう。
+                too_many = [
+                    option
+                    for option, candidates, selected in (
+                        ("channel", channels, selected_channel),
+                        ("role", roles, selected_role),
+                    )
+                    if selected is None and len(candidates) > SELECT_OPTION_LIMIT
+                ]
+                if too_many:
+                    options = " / ".join(f"`{option}`" for option in too_many)
+                    return f"候補が多いため、{options} オプションに名前を入力して候補から選択してください。"
+
+                view = NicknameSyncSetupView(
+                    guild=guild,
+                    requested_by=interaction.user,
+                    channels=(selected_channel,) if selected_channel is not None else channels,
+                    roles=(selected_role,) if selected_role is not None else roles,
+                    repository=repository,
+                    nickname_sync_service=service,
+                    runner=self.runner,
+                )
+                return InteractionReply(
+                    content="ニックネーム同期の対象チャンネルとロールを選択してください。",
+                    view=view,
                 )
-                return
 
+            await self.runner.run(interaction, work)
+
+        @nickname_sync_setup.autocomplete("channel")
+        async def channel_autocomplete(
+            interaction: discord.Interaction, current: str
+        ) -> list[discord.app_commands.Choice[str]]:
             guild = interaction.guild
             if guild is None:
-                await _send_ephemeral(
-                    interaction,
-                    "このコマンドはサーバー内でのみ使用できます。",
-                )
-                return
+                return []
+            return [
+                _autocomplete_choice(f"#{text_channel.name}", text_channel.id)
+                for text_channel in self.client.guild_index.search_text_channels(guild, current)
+            ]
+
+        @nickname_sync_setup.autocomplete("role")
+        async def role_autocomplete(
+            interaction: discord.Interaction, current: str
+        ) -> list[discord.app_commands.Choice[str]]:
+            guild = interaction.guild
+            if guild is None:
+                return []
+            return [
+                _autocomplete_choice(f"@{assignable.name}", assignable.id)
+                for assignable in self.client.guild_index.search_assignable_roles(guild, current)
+            ]
 
-            if not isinstance(interaction.user, discord.Member):
-                await _send_ephemeral(
-                    interaction,
-                    "ユーザー情報を取得できませんでした。再度お試しください。",
+    def _register_nickname_sync_policy(self) -> None:
+        @self.tree.command(
+            name="nickname_sync_policy",
+            description="ニックネーム同期チャンネルの適用ポリシーを表示・変更します。",
+        )
+        @discord.app_commands.describe(
+            channel="ポリシーを変更するニックネーム同期チャンネル",
+            extra_roles="追加で付与するロール（メンション・ID を空白区切り、none で解除）",
+            exempt_roles="このロールを持つメンバーは対象外（メンション・ID を空白区切り、none で解除）",
+            allow_pattern="このパターンに全体一致する投稿は書き換えない。* は任意の文字列、? は任意の 1 文字（none で解除）",
+            rewrite="投稿内容を表示名に書き換えるかどうか",
+            rate_limit="メンバーごとの投稿数上限「件数/秒数」。超過分は削除（none で解除）",
+        )
+        @discord.app_commands.checks.has_permissions(manage_guild=True)
+        async def nickname_sync_policy(
+            interaction: discord.Interaction,
+            channel: discord.TextChannel,
+            extra_roles: str | None = None,
+            exempt_roles: str | None = None,
+            allow_pattern: str | None = None,
+            rewrite: bool | None = None,
+            rate_limit: str | None = None,
+        ) -> None:
+            async def work() -> str:
+                repository = self.nickname_rule_repository
+                service = self.nickname_sync_service
+                if repository is None or service is None:
+                    return "ニックネーム同期機能が初期化されていません。ボットの設定を確認してください。"
+
+                guild = interaction.guild
+                if guild is None:
+                    return "このコマンドはサーバー内でのみ使用できます。"
+
+                rule = await repository.get_rule_for_channel(guild_id=guild.id, channel_id=channel.id)
+                if rule is None:
+                    return f"{channel.mention} はニックネーム同期の対象に設定されていません。"
+
+                options = (extra_roles, exempt_roles, allow_pattern, rewrite, rate_limit)
+                if all(option is None for option in options):
+                    return _format_policy(guild, channel, rule)
+
+                try:
+                    extra_role_ids = (
+                        _parse_role_ids(guild, extra_roles, assignable=True)
+                        if extra_roles is not None
+                        else rule.extra_role_ids
+                    )
+                    exempt_role_ids = (
+                        _parse_role_ids(guild, exempt_roles, assignable=False)
+                        if exempt_roles is not None
+                        else rule.exempt_role_ids
+                    )
+                    content_allowlist = rule.content_allowlist
+                    if allow_pattern is not None:
+                        content_allowlist = (
+                            ()
+                            if allow_pattern.strip().lower() in POLICY_CLEAR_KEYWORDS
+                            else (allow_pattern,)
+                        )
+                        compile_allowlist(content_allowlist)
+                    rate_limit_count, rate_limit_window = (
+                        _parse_rate_limit(rate_limit)
+                        if rate_limit is not None
+                        else (rule.rate_limit_count, rule.rate_limit_window)
+                    )
+                except (ValueError, PolicyCompileError) as exc:
+                    return f"ポリシーを更新できませんでした: {exc}"
+
+                updated = await repository.update_policy(
+                    guild_id=guild.id,
+                    channel_id=channel.id,
+                    extra_role_ids=extra_role_ids,
+                    exempt_role_ids=exempt_role_ids,
+                    content_allowlist=content_allowlist,
+                    rewrite_content=rule.rewrite_content if rewrite is None else rewrite,
+                    rate_limit_count=rate_limit_count,
+                    rate_limit_window=rate_limit_window,
+                    updated_by=interaction.user.id,
                 )
-                return
+                service.invalidate_cache(guild.id, channel.id)
+                if updated is None:
+                    return f"{channel.mention} はニックネーム同期の対象に設定されていません。"
+                LOGGER.info(
+                    "ニックネーム同期ポリシーを更新しました (guild=%s, channel=%s, user=%s)",
+                    guild.id,
+                    channel.id,
+                    interaction.user.id,
+                )
+                return "ポリシーを更新しました。\n" + _format_policy(guild, channel, updated)
+
+            await self.runner.run(interaction, work)
 
-            bot_member = guild.me
-            if bot_member is None:
-                await _send_ephemeral(
-                    interaction,
-                    "Bot メンバー情報の取得に失敗しました。Bot を再起動してください。",
+    def _register_nickname_sync_backfill(self) -> None:
+        @self.tree.command(
+            name="nickname_sync_backfill",
+            description="同期チャンネルの過去の投稿者にロールを付与します。",
+        )
+        @discord.app_commands.describe(
+            channel="バックフィルするニックネーム同期チャンネル",
+            restart="保存済みのチェックポイントを破棄して最初からやり直す",
+        )
+        @discord.app_commands.checks.has_permissions(manage_guild=True)
+        async def nickname_sync_backfill(
+            interaction: discord.Interaction,
+            channel: discord.TextChannel,
+            restart: bool = False,
+        ) -> None:
+            async def work() -> str:
+                backfill = self.nickname_sync_backfill
+                service = self.nickname_sync_service
+                if backfill is None or service is None:
+                    return "ニックネーム同期機能が初期化されていません。ボットの設定を確認してください。"
+
+                guild = interaction.guild
+                if guild is None:
+                    return "このコマンドはサーバー内でのみ使用できます。"
+
+                if backfill.is_running(guild.id, channel.id):
+                    return f"{channel.mention} のバックフィルは既に実行中です。"
+
+                rule = await service.get_rule(guild_id=guild.id, channel_id=channel.id)
+                if rule is None:
+                    return f"{channel.mention} はニックネーム同期の対象に設定されていません。"
+
+                last_reported = 0.0
+
+                async def report(progress: "BackfillProgress") -> None:
+                    nonlocal last_reported
+                    now = time.monotonic()
+                    final = progress.phase == "done" or progress.error is not None
+                    if not final and now - last_reported < BACKFILL_PROGRESS_INTERVAL:
+                        return
+                    last_reported = now
+                    try:
+                        await interaction.edit_original_response(
+                            content=_format_backfill_progress(channel, progress)
+                        )
+                    except discord.HTTPException:
+                        # 応答送信前やインタラクションのトークン失効後も処理自体は継続する。
+                        pass
+
+                backfill.start(
+                    channel=channel,
+                    rule=rule,
+                    requested_by=interaction.user.id,
+                    restart=restart,
+                    progress=report,
                 )
-                return
-
-            missing_permissions: list[str] = []
-            bot_permissions = bot_member.guild_permissions
-            if not bot_permissions.manage_messages:
-                missing_permissions.append("メッセージの管理")
-            if not bot_permissions.manage_roles:
-                missing_permissions.append("ロールの管理")
-            if missing_permissions:
-                await _send_ephemeral(
-                    interaction,
-                    "Bot に以下の権限を付与してください: " + ", ".join(missing_permissions),
+                LOGGER.info(
+                    "ニックネーム同期のバックフィルを開始しました (guild=%s, channel=%s, user=%s)",
+                    guild.id,
+                    channel.id,
+                    interaction.user.id,
                 )
-                return
+                return f"{channel.mention} の履歴を読み込んでいます…"
 
-            channels = self._collect_text_channels(guild=guild, bot_member=bot_member)
-            if not channels:
-                await _send_ephemeral(
-                    interaction,
-                    "設定可能なテキスト/アナウンスチャンネルが見つかりません。",
-                )
-                return
+            await self.runner.run(interaction, work)
 
-            roles = self._collect_assignable_roles(guild=guild, bot_member=bot_member)
-            if not roles:
-                await _send_ephemeral(
-                    interaction,
-                    "Bot が付与できるロールがありません。Bot のロール順位を確認してください。",
-                )
-                return
-
-            view = NicknameSyncSetupView(
-                guild=guild,
-                requested_by=interaction.user,
-                channels=channels,
-                roles=roles,
-                repository=repository,
-                nickname_sync_service=service,
-            )
+    def _register_member_cache_report(self) -> None:
+        @self.tree.command(
+            name="member_cache",
+            description="メンバーキャッシュの常駐状況を表示します（Bot オーナー専用）。",
+        )
+        async def member_cache_report(interaction: discord.Interaction) -> None:
+            async def work() -> str:
+                if not await self.client.is_owner(interaction.user):
+                    return "このコマンドは Bot のオーナーのみ実行できます。"
 
-            await interaction.response.send_message(
-                "ニックネーム同期の対象チャンネルとロールを選択してください。",
-                view=view,
-                ephemeral=True,
-            )
+                if self.client.member_cache is None:
+                    return "メンバーキャッシュが初期化されていません。"
 
-    @staticmethod
-    def _collect_text_channels(
-        *,
-        guild: discord.Guild,
-        bot_member: discord.Member,
-    ) -> Sequence[discord.TextChannel]:
-        eligible = [
-            channel
-            for channel in guild.text_channels
-            if channel.permissions_for(bot_member).send_messages
-        ]
-        return tuple(eligible[:25])
+                return self._format_member_cache_report()
 
-    @staticmethod
-    def _collect_assignable_roles(
-        *,
-        guild: discord.Guild,
-        bot_member: discord.Member,
-    ) -> Sequence[discord.Role]:
-        eligible = [
-            role
-            for role in guild.roles
-            if not role.is_default()
-            and not role.managed
-            and role < bot_member.top_role
+            await self.runner.run(interaction, work)
+
+    def _register_diagnostics(self) -> None:
+        @self.tree.command(
+            name="diagnostics",
+            description="キャッシュ・プール・メモリの状況を表示します（Bot オーナー専用）。",
+        )
+        @discord.app_commands.describe(
+            trace="tracemalloc による追跡の開始・停止",
+            top="追跡中に表示するメモリ増加箇所の件数",
+        )
+        @discord.app_commands.choices(
+            trace=[
+                discord.app_commands.Choice(name="開始", value="start"),
+                discord.app_commands.Choice(name="停止", value="stop"),
+            ]
+        )
+        async def diagnostics(
+            interaction: discord.Interaction,
+            trace: str | None = None,
+            top: discord.app_commands.Range[int, 1, DIAGNOSTICS_TRACE_LIMIT] = 10,
+        ) -> None:
+            async def work() -> str:
+                if not await self.client.is_owner(interaction.user):
+                    return "このコマンドは Bot のオーナーのみ実行できます。"
+
+                runtime = self.diagnostics
+                assert runtime is not None
+                notes: list[str] = []
+                if trace == "start":
+                    started = await runtime.tracer.start()
+                    notes.append("tracemalloc の追跡を開始しました。" if started else "tracemalloc は既に有効です。")
+                elif trace == "stop":
+                    stopped = runtime.tracer.stop()
+                    notes.append("tracemalloc の追跡を停止しました。" if stopped else "tracemalloc は有効になっていません。")
+
+                sections = runtime.collect(self.client)
+                trace_diff = None if trace == "start" else await runtime.tracer.diff(top)
+                return _format_diagnostics(notes, sections, trace_diff)
+
+            await self.runner.run(interaction, work)
+
+    def _format_member_cache_report(self) -> str:
+        cache = self.client.member_cache
+        assert cache is not None
+        report = cache.report()
+        lines = [
+            f"常駐メンバー: {len(cache)}/{cache.max_members} 人 "
+            f"(ヒット {cache.hits} / ミス {cache.misses})",
         ]
-        eligible.sort(key=lambda role: role.position, reverse=True)
-        return tuple(eligible[:25])
+        ranked = sorted(report.items(), key=lambda item: item[1], reverse=True)
+        for guild_id, count in ranked[:MEMBER_CACHE_REPORT_LIMIT]:
+            guild = self.client.get_guild(guild_id)
+            name = guild.name if guild is not None else "不明なサーバー"
+            voice_cached = len(guild.members) if guild is not None else 0
+            lines.append(f"- {name} ({guild_id}): {count} 人 (ボイス接続中 {voice_cached} 人)")
+        if len(ranked) > MEMBER_CACHE_REPORT_LIMIT:
+            lines.append(f"…ほか {len(ranked) - MEMBER_CACHE_REPORT_LIMIT} サーバー")
+        return "\n".join(lines)
+
 
 class _CategorySelectView(discord.ui.View):
     def __init__(
@@ -288,11 +672,13 @@ class _CategorySelectView(discord.ui.View):
         categories: Sequence[discord.CategoryChannel],
         manager: TempVoiceChannelManager,
         guild: discord.Guild,
+        runner: InteractionRunner,
     ) -> None:
         super().__init__(timeout=180)
         self._categories = tuple(categories)
         self.manager = manager
         self.guild = guild
+        self.runner = runner
         self.selected_category_id = self.manager.get_category_for_guild(self.guild.id)
         self.add_item(
             _CategorySelect(
@@ -348,29 +734,184 @@ class _ConfirmButton(discord.ui.Button):
             )
             return
 
-        view.manager.set_category_for_guild(
-            guild_id=view.guild.id,
-            category_id=selected_id,
+        async def work() -> InteractionReply:
+            view.manager.set_category_for_guild(
+                guild_id=view.guild.id,
+                category_id=selected_id,
+            )
+            view.manager.warm_pools([view.guild])
+            category = view.guild.get_channel(selected_id)
+            if isinstance(category, discord.CategoryChannel):
+                category_name = category.mention
+            else:
+                category_name = f"ID: {selected_id}"
+            view.stop()
+            return InteractionReply(content=f"一時VCのカテゴリを {category_name} に設定しました。")
+
+        await view.runner.run(interaction, work, name="vc_category.confirm", edit=True)
+
+
+def _autocomplete_choice(label: str, value: int) -> discord.app_commands.Choice[str]:
+    if len(label) > AUTOCOMPLETE_LABEL_LIMIT:
+        label = label[: AUTOCOMPLETE_LABEL_LIMIT - 1] + "…"
+    return discord.app_commands.Choice(name=label, value=str(value))
+
+
+def _parse_role_ids(
+    guild: discord.Guild,
+    raw: str,
+    *,
+    assignable: bool,
+) -> tuple[int, ...]:
+    if raw.strip().lower() in POLICY_CLEAR_KEYWORDS:
+        return ()
+
+    role_ids: list[int] = []
+    for match in _SNOWFLAKE_PATTERN.finditer(raw):
+        role = guild.get_role(int(match.group()))
+        if role is None or role.is_default():
+            raise ValueError(f"ロールが見つかりません: {match.group()}")
+        if assignable and (role.managed or (guild.me is not None and role >= guild.me.top_role)):
+            raise ValueError(f"Bot が付与できないロールです: {role.name}")
+        if role.id not in role_ids:
+            role_ids.append(role.id)
+    if not role_ids:
+        raise ValueError("ロールをメンションまたは ID で指定してください。")
+    return tuple(role_ids)
+
+
+def _parse_rate_limit(raw: str) -> tuple[int | None, int | None]:
+    if raw.strip().lower() in POLICY_CLEAR_KEYWORDS:
+        return None, None
+    match = _RATE_LIMIT_PATTERN.fullmatch(raw)
+    if match is None:
+        raise ValueError("投稿数上限は「件数/秒数」の形式で指定してください (例: 5/60)。")
+    count, window = int(match.group(1)), int(match.group(2))
+    if count <= 0 or window <= 0:
+        raise ValueError("投稿数上限の件数と秒数は 1 以上で指定してください。")
+    return count, window
+
+
+def _format_policy(
+    guild: discord.Guild,
+    channel: discord.TextChannel,
+    rule: "ChannelNicknameRule",
+) -> str:
+    def roles(role_ids: Sequence[int]) -> str:
+        if not role_ids:
+            return "なし"
+        labels = []
+        for role_id in role_ids:
+            role = guild.get_role(role_id)
+            labels.append(role.mention if role is not None else f"ID: {role_id}")
+        return " ".join(labels)
+
+    rate_limit = (
+        f"{rule.rate_limit_count} 件 / {rule.rate_limit_window} 秒"
+        if rule.rate_limit_count is not None and rule.rate_limit_window is not None
+        else "なし"
+    )
+    allowlist = " | ".join(f"`{pattern}`" for pattern in rule.content_allowlist) or "なし"
+    return "\n".join(
+        [
+            f"{channel.mention} のポリシー",
+            f"- 付与ロール: {roles(rule.role_ids)}",
+            f"- 除外ロール: {roles(rule.exempt_role_ids)}",
+            f"- 表示名への書き換え: {'有効' if rule.rewrite_content else '無効'}",
+            f"- 書き換えない投稿: {allowlist}",
+            f"- 投稿数上限: {rate_limit}",
+        ]
+    )
+
+
+def _format_temp_vc_quota(err: TempVCQuotaExceededError) -> str:
+    if err.scope == QUOTA_CATEGORY:
+        return "一時VCの数が上限に達しています。空いたチャンネルが削除されるまでお待ちください。"
+    wait = f"{math.ceil(err.retry_after)} 秒ほど" if err.retry_after else "しばらく"
+    return f"一時VCの作成が混み合っています。{wait}待ってから再試行してください。"
+
+
+def _format_temp_vc_usage(report: UsageReport) -> str:
+    lines = [
+        f"過去 {report.window_minutes // 60} 時間の一時VC利用状況（記録のある {report.covered_minutes} 分）",
+        f"- 作成 {report.created} / 削除 {report.deleted}",
+        f"- 同時チャンネル数: 最大 {report.peak_channels} / 平均 {report.average_channels:.1f} / 現在 {report.current_channels}",
+        f"- 参加人数: 最大 {report.peak_members} / 平均 {report.average_members:.1f} / 現在 {report.current_members}",
+    ]
+    for bucket in report.buckets:
+        if bucket.covered_minutes == 0:
+            continue
+        lines.append(
+            f"<t:{bucket.start}:t> 作成 {bucket.created} / 削除 {bucket.deleted} / "
+            f"最大 {bucket.peak_channels} ch・{bucket.peak_members} 人"
         )
-        category = view.guild.get_channel(selected_id)
-        if isinstance(category, discord.CategoryChannel):
-            category_name = category.mention
-        else:
-            category_name = f"ID: {selected_id}"
-        await interaction.response.edit_message(
-            content=f"一時VCのカテゴリを {category_name} に設定しました。",
-            view=None,
+    content = "\n".join(lines)
+    if len(content) > DIAGNOSTICS_MESSAGE_LIMIT:
+        content = content[:DIAGNOSTICS_MESSAGE_LIMIT] + "…"
+    return content
+
+
+def _format_diagnostics(
+    notes: Sequence[str],
+    sections: dict[str, dict[str, float]],
+    trace_diff: Sequence[TraceDiffEntry] | None,
+) -> str:
+    lines = list(notes)
+    for section, values in sections.items():
+        rendered = ", ".join(
+            f"{key}={_format_bytes(value) if key.endswith('_bytes') else int(value)}"
+            for key, value in values.items()
         )
-        view.stop()
+        lines.append(f"**{section}**: {rendered or '-'}")
 
+    if trace_diff is None:
+        lines.append("tracemalloc: 無効（`trace:開始` で有効化）")
+    elif not trace_diff:
+        lines.append("tracemalloc: 基準のスナップショットを取得しました。次回の実行で差分を表示します。")
+    else:
+        lines.append("tracemalloc: 前回からの増減（上位）")
+        lines.append("```")
+        for entry in trace_diff:
+            lines.append(
+                f"{entry.size_diff / 1024:+9.1f} KiB {entry.count_diff:+7d} "
+                f"(計 {entry.size / 1024:.1f} KiB) {entry.location}"
+            )
+        lines.append("```")
 
-async def _send_ephemeral(interaction: discord.Interaction, message: str) -> None:
-    """対話からエフェメラルメッセージを送信する補助関数。"""
+    content = "\n".join(lines)
+    if len(content) > DIAGNOSTICS_MESSAGE_LIMIT:
+        content = content[:DIAGNOSTICS_MESSAGE_LIMIT] + ("…\n```" if trace_diff else "…")
+    return content
 
-    if interaction.response.is_done():
-        await interaction.followup.send(message, ephemeral=True)
-    else:
-        await interaction.response.send_message(message, ephemeral=True)
+
+def _format_bytes(value: float) -> str:
+    return f"{value / (1024 * 1024):.1f}MiB"
+
+
+def _format_backfill_progress(
+    channel: discord.TextChannel,
+    progress: "BackfillProgress",
+) -> str:
+    if progress.error is not None:
+        resume = "読み込み済みの位置" if progress.phase == "scan" else "付与済みの位置"
+        return (
+            f"{channel.mention} のバックフィルが失敗しました: {progress.error}\n"
+            f"権限を確認してから同じコマンドを再実行すると、{resume}から再開します。"
+        )
+    if progress.phase == "scan":
+        return (
+            f"{channel.mention} の履歴を読み込んでいます… "
+            f"({progress.scanned_messages} 件 / 投稿者 {progress.distinct_authors} 人)"
+        )
+    if progress.phase == "grant":
+        return (
+            f"{channel.mention} の投稿者へロールを付与しています… "
+            f"({progress.processed_authors}/{progress.distinct_authors} 人, 付与 {progress.granted_count} 人)"
+        )
+    return (
+        f"{channel.mention} のバックフィルが完了しました。"
+        f"メッセージ {progress.scanned_messages} 件を確認し、{progress.granted_count} 人にロールを付与しました。"
+    )
 
 
 __all__ = ["register_commands"]
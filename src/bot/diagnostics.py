@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import asyncio
+import gc
+import logging
+import os
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Sequence, Tuple
+
+import discord
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows には resource モジュールがない
+    resource = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    from app.database import Database
+
+    from .client import BotClient
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+Section = Dict[str, float]
+
+# 差分に出しても役に立たない内部フレームを除外する。
+_TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+@dataclass(frozen=True, slots=True)
+class TraceDiffEntry:
+    """前回のスナップショットからのメモリ増減（1 行ぶん）。"""
+
+    location: str
+    size_diff: int
+    size: int
+    count_diff: int
+
+
+class MemoryTracer:
+    """tracemalloc を必要なときだけ有効にし、前回のスナップショットとの差分を返す。
+
+    無効の間は tracemalloc を止めたままにするため、通常運用時のコストはない。
+    有効化した時点のスナップショットを基準とし、``diff`` を呼ぶたびに基準を
+    最新のスナップショットへ進める。
+    """
+
+    def __init__(self, *, frames: int = 1) -> None:
+        self._frames = max(1, frames)
+        self._previous: tracemalloc.Snapshot | None = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def traced_memory(self) -> Tuple[int, int]:
+        """追跡中のメモリ量と最大値（バイト）。無効の場合は (0, 0)。"""
+
+        if not tracemalloc.is_tracing():
+            return 0, 0
+        return tracemalloc.get_traced_memory()
+
+    async def start(self) -> bool:
+        """追跡を開始して基準のスナップショットを取る。既に有効なら False。"""
+
+        if tracemalloc.is_tracing():
+            return False
+        tracemalloc.start(self._frames)
+        self._previous = await asyncio.to_thread(self._take_snapshot)
+        LOGGER.info("tracemalloc による追跡を開始しました (frames=%s)。", self._frames)
+        return True
+
+    def stop(self) -> bool:
+        """追跡を停止してスナップショットを破棄する。無効だった場合は False。"""
+
+        self._previous = None
+        if not tracemalloc.is_tracing():
+            return False
+        tracemalloc.stop()
+        LOGGER.info("tracemalloc による追跡を停止しました。")
+        return True
+
+    async def diff(self, limit: int) -> List[TraceDiffEntry] | None:
+        """前回のスナップショットからの増減が大きい順に ``limit`` 件返す。
+
+        追跡が無効の場合は None。スナップショットの取得と比較はイベントループを
+        長時間止めないよう別スレッドで行う。
+        """
+
+        if not tracemalloc.is_tracing():
+            return None
+        previous = self._previous
+        snapshot = await asyncio.to_thread(self._take_snapshot)
+        self._previous = snapshot
+        if previous is None:
+            return []
+        stats = await asyncio.to_thread(snapshot.compare_to, previous, "lineno")
+        return [
+            TraceDiffEntry(
+                location=_format_frame(stat.traceback),
+                size_diff=stat.size_diff,
+                size=stat.size,
+                count_diff=stat.count_diff,
+            )
+            for stat in stats[: max(0, limit)]
+        ]
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+
+
+class RuntimeDiagnostics:
+    """稼働中のプロセスのキャッシュ・プール・メモリの状況を集計する。"""
+
+    def __init__(self, *, database: "Database | None" = None, tracer: MemoryTracer | None = None) -> None:
+        self._database = database
+        self.tracer = tracer or MemoryTracer()
+
+    def collect(self, client: "BotClient") -> Dict[str, Section]:
+        """セクション名ごとの計測値を返す。値はすべて件数またはバイト数。"""
+
+        sections: Dict[str, Section] = {
+            "process": self._process_stats(),
+            "discord": _discord_cache_stats(client),
+        }
+
+        caches: Section = {}
+        if client.nickname_sync_service is not None:
+            caches["nickname_sync_rules"] = client.nickname_sync_service.cache_size
+            caches["nickname_sync_snapshot"] = client.nickname_sync_service.snapshot_size
+        if client.member_cache is not None:
+            caches["member_cache"] = len(client.member_cache)
+        caches["guild_index_guilds"] = len(client.guild_index)
+        manager = client.temp_vc_manager
+        if manager is not None:
+            for key, value in manager.stats().items():
+                caches[f"temp_vc_{key}"] = value
+        sections["caches"] = caches
+
+        pools: Section = {"interaction_tasks": len(client.interaction_runner.pending)}
+        if client.state_janitor is not None:
+            pools["guild_state_pending_purges"] = client.state_janitor.pending
+        if client.admission is not None:
+            for key, value in client.admission.stats().items():
+                pools[f"events_{key}"] = value
+        database_stats = self._database.pool_stats() if self._database is not None else None
+        if database_stats is not None:
+            for key, value in database_stats.items():
+                pools[f"db_{key}"] = value
+        if manager is not None and manager.pool is not None:
+            for key, value in manager.pool.stats().items():
+                pools[f"temp_vc_pool_{key}"] = value
+        sections["pools"] = pools
+        if client.jobs is not None:
+            sections["jobs"] = client.jobs.stats()
+        return sections
+
+    def _process_stats(self) -> Section:
+        stats: Section = {
+            "rss_bytes": _current_rss(),
+            "peak_rss_bytes": _peak_rss(),
+            "asyncio_tasks": len(asyncio.all_tasks()),
+            "gc_gen0": gc.get_count()[0],
+        }
+        if self.tracer.tracing:
+            traced, traced_peak = self.tracer.traced_memory()
+            stats["traced_bytes"] = traced
+            stats["traced_peak_bytes"] = traced_peak
+        return stats
+
+
+def _discord_cache_stats(client: discord.Client) -> Section:
+    guilds = client.guilds
+    views, modals = _count_views(client)
+    return {
+        "guilds": len(guilds),
+        "members": sum(len(guild.members) for guild in guilds),
+        "users": len(client.users),
+        "messages": len(client.cached_messages),
+        "views": views,
+        "modals": modals,
+    }
+
+
+def _count_views(client: discord.Client) -> Tuple[int, int]:
+    # discord.py は待ち受け中のビューを内部の ViewStore にだけ保持している。
+    # 非公開属性のため、構造が変わった場合は 0 件として扱う。
+    store = getattr(getattr(client, "_connection", None), "_view_store", None)
+    if store is None:
+        return 0, 0
+    view_ids = set()
+    for items in getattr(store, "_views", {}).values():
+        for item in items.values():
+            if item.view is not None:
+                view_ids.add(id(item.view))
+    for view in getattr(store, "_synced_message_views", {}).values():
+        view_ids.add(id(view))
+    return len(view_ids), len(getattr(store, "_modals", {}))
+
+
+def _current_rss() -> int:
+    try:
+        with open("/proc/self/statm", encoding="ascii") as statm:
+            resident_pages = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return 0
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def _peak_rss() -> int:
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KiB、macOS はバイト単位で返す。
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _format_frame(traceback: Sequence[tracemalloc.Frame]) -> str:
+    if not traceback:
+        return "<unknown>"
+    frame = traceback[0]
+    return f"{_shorten_path(frame.filename)}:{frame.lineno}"
+
+
+_STDLIB_DIR = os.path.dirname(os.__file__) + os.sep
+
+
+def _shorten_path(filename: str) -> str:
+    if filename.startswith(_STDLIB_DIR):
+        return filename[len(_STDLIB_DIR):]
+    for marker in ("site-packages" + os.sep, "src" + os.sep):
+        index = filename.rfind(marker)
+        if index != -1:
+            return filename[index + len(marker):]
+    return filename
+
+
+__all__ = ["MemoryTracer", "RuntimeDiagnostics", "TraceDiffEntry"]
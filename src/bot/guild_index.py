@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Dict, List, Tuple, TypeVar
+
+import discord
+
+from app.metrics import REGISTRY, MetricsRegistry
+
+from .name_search import NameSearchIndex
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+# セレクトメニューに並べられる選択肢の上限。
+SELECT_OPTION_LIMIT = 25
+
+_T = TypeVar("_T")
+
+
+class _GuildEntry:
+    """1 ギルド分の候補。``*_view`` は並べ替え済みの結果で、変更があると None に戻す。
+
+    ``*_search`` は同じ候補を名前で検索するための索引で、辞書と同時に更新する。
+    """
+
+    __slots__ = (
+        "channels",
+        "roles",
+        "categories",
+        "channels_dirty",
+        "roles_dirty",
+        "channel_view",
+        "role_view",
+        "category_view",
+        "channel_search",
+        "role_search",
+        "category_search",
+    )
+
+    def __init__(self) -> None:
+        self.channels: Dict[int, discord.TextChannel] = {}
+        self.roles: Dict[int, discord.Role] = {}
+        self.categories: Dict[int, discord.CategoryChannel] = {}
+        self.channels_dirty = True
+        self.roles_dirty = True
+        self.channel_view: Tuple[discord.TextChannel, ...] | None = None
+        self.role_view: Tuple[discord.Role, ...] | None = None
+        self.category_view: Tuple[discord.CategoryChannel, ...] | None = None
+        self.channel_search = NameSearchIndex()
+        self.role_search = NameSearchIndex()
+        self.category_search = NameSearchIndex()
+
+    def put_channel(self, channel: discord.TextChannel) -> None:
+        self.channels[channel.id] = channel
+        self.channel_search.add(channel.id, channel.name)
+        self.channel_view = None
+
+    def drop_channel(self, channel_id: int) -> None:
+        if self.channels.pop(channel_id, None) is not None:
+            self.channel_search.remove(channel_id)
+            self.channel_view = None
+
+    def put_role(self, role: discord.Role) -> None:
+        self.roles[role.id] = role
+        self.role_search.add(role.id, role.name)
+        self.role_view = None
+
+    def drop_role(self, role_id: int) -> None:
+        if self.roles.pop(role_id, None) is not None:
+            self.role_search.remove(role_id)
+            self.role_view = None
+
+    def put_category(self, category: discord.CategoryChannel) -> None:
+        self.categories[category.id] = category
+        self.category_search.add(category.id, category.name)
+        self.category_view = None
+
+    def drop_category(self, category_id: int) -> None:
+        if self.categories.pop(category_id, None) is not None:
+            self.category_search.remove(category_id)
+            self.category_view = None
+
+
+class GuildEligibilityIndex:
+    """セットアップ用コマンドの選択肢をギルドごとに保持する索引。
+
+    Bot が投稿できるテキストチャンネル、Bot が付与できるロール、カテゴリを
+    最初の参照時に 1 度だけ集計し、以降はチャンネル・ロール・Bot 自身の
+    メンバー更新イベントで差分だけを反映する。Bot のロールや @everyone の
+    権限が変わったときのように全体に影響する変更は、次の参照時に該当部分だけ
+    集計し直す。参照は変更がなければ並べ替え済みのタプルをそのまま返す。
+
+    候補が 25 件を超えるギルドのために、名前の前方一致・部分一致検索
+    （``search_*``）と、オートコンプリートで選ばれた値の解決（``resolve_*``）も
+    提供する。
+    """
+
+    def __init__(self, *, metrics: MetricsRegistry = REGISTRY) -> None:
+        self._entries: Dict[int, _GuildEntry] = {}
+        self._metrics = metrics
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def text_channels(
+        self, guild: discord.Guild, *, limit: int = SELECT_OPTION_LIMIT
+    ) -> Tuple[discord.TextChannel, ...]:
+        """Bot がメッセージを送信できるテキスト/アナウンスチャンネルを並び順で返す。"""
+
+        entry = self._channel_entry(guild)
+        if entry.channel_view is None:
+            entry.channel_view = tuple(sorted(entry.channels.values(), key=lambda channel: (channel.position, channel.id)))
+        return entry.channel_view[:limit]
+
+    def assignable_roles(self, guild: discord.Guild, *, limit: int = SELECT_OPTION_LIMIT) -> Tuple[discord.Role, ...]:
+        """Bot が付与できるロールを上位から返す。"""
+
+        entry = self._role_entry(guild)
+        if entry.role_view is None:
+            entry.role_view = tuple(sorted(entry.roles.values(), key=lambda role: role.position, reverse=True))
+        return entry.role_view[:limit]
+
+    def categories(
+        self, guild: discord.Guild, *, limit: int = SELECT_OPTION_LIMIT
+    ) -> Tuple[discord.CategoryChannel, ...]:
+        """ギルドのカテゴリを並び順で返す。"""
+
+        entry = self._entry(guild)
+        if entry.category_view is None:
+            entry.category_view = tuple(
+                sorted(entry.categories.values(), key=lambda category: (category.position, category.id))
+            )
+        return entry.category_view[:limit]
+
+    def search_text_channels(
+        self, guild: discord.Guild, query: str, *, limit: int = SELECT_OPTION_LIMIT
+    ) -> Tuple[discord.TextChannel, ...]:
+        """投稿できるチャンネルを名前で検索する。空の検索語なら並び順の先頭を返す。"""
+
+        if not query.strip():
+            return self.text_channels(guild, limit=limit)
+        entry = self._channel_entry(guild)
+        return self._search(entry.channel_search, entry.channels, query, limit, "channels")
+
+    def search_assignable_roles(
+        self, guild: discord.Guild, query: str, *, limit: int = SELECT_OPTION_LIMIT
+    ) -> Tuple[discord.Role, ...]:
+        if not query.strip():
+            return self.assignable_roles(guild, limit=limit)
+        entry = self._role_entry(guild)
+        return self._search(entry.role_search, entry.roles, query, limit, "roles")
+
+    def search_categories(
+        self, guild: discord.Guild, query: str, *, limit: int = SELECT_OPTION_LIMIT
+    ) -> Tuple[discord.CategoryChannel, ...]:
+        if not query.strip():
+            return self.categories(guild, limit=limit)
+        entry = self._entry(guild)
+        return self._search(entry.category_search, entry.categories, query, limit, "categories")
+
+    def resolve_text_channel(self, guild: discord.Guild, value: str) -> discord.TextChannel | None:
+        """オートコンプリートで選ばれた ID か一意な名前から、投稿できるチャンネルを求める。"""
+
+        entry = self._channel_entry(guild)
+        channel_id = entry.channel_search.lookup(value)
+        return entry.channels.get(channel_id) if channel_id is not None else None
+
+    def resolve_assignable_role(self, guild: discord.Guild, value: str) -> discord.Role | None:
+        entry = self._role_entry(guild)
+        role_id = entry.role_search.lookup(value)
+        return entry.roles.get(role_id) if role_id is not None else None
+
+    def resolve_category(self, guild: discord.Guild, value: str) -> discord.CategoryChannel | None:
+        entry = self._entry(guild)
+        category_id = entry.category_search.lookup(value)
+        return entry.categories.get(category_id) if category_id is not None else None
+
+    def channel_changed(self, channel: discord.abc.GuildChannel) -> None:
+        """チャンネルの作成・更新を反映する。"""
+
+        entry = self._entries.get(channel.guild.id)
+        if entry is None:
+            return
+        if isinstance(channel, discord.CategoryChannel):
+            entry.put_category(channel)
+            # 権限を同期している子チャンネルはカテゴリの上書き設定に従う。
+            for child in channel.text_channels:
+                self._evaluate_channel(entry, child)
+        elif isinstance(channel, discord.TextChannel):
+            self._evaluate_channel(entry, channel)
+
+    def channel_removed(self, channel: discord.abc.GuildChannel) -> None:
+        entry = self._entries.get(channel.guild.id)
+        if entry is None:
+            return
+        entry.drop_channel(channel.id)
+        entry.drop_category(channel.id)
+
+    def role_changed(self, role: discord.Role) -> None:
+        """ロールの作成・更新を反映する。"""
+
+        entry = self._entries.get(role.guild.id)
+        if entry is None:
+            return
+        if self._affects_bot(role):
+            # Bot の最上位ロールやチャンネル権限が変わりうるため、両方を集計し直す。
+            entry.channels_dirty = True
+            entry.roles_dirty = True
+            return
+        if entry.roles_dirty:
+            return
+        me = role.guild.me
+        if me is not None and _is_assignable(role, me):
+            entry.put_role(role)
+        else:
+            entry.drop_role(role.id)
+
+    def role_removed(self, role: discord.Role) -> None:
+        entry = self._entries.get(role.guild.id)
+        if entry is None:
+            return
+        entry.drop_role(role.id)
+        # 削除時点でメンバーからはロールが外れているため Bot が持っていたかは分からない。
+        # チャンネル権限は集計し直し、Bot の最上位ロールだった可能性があればロールも集計し直す。
+        entry.channels_dirty = True
+        me = role.guild.me
+        if me is None or role.position >= me.top_role.position:
+            entry.roles_dirty = True
+
+    def member_changed(self, before: discord.Member, after: discord.Member) -> None:
+        """Bot 自身のロールが変わったら、そのギルドの候補を集計し直す。"""
+
+        entry = self._entries.get(after.guild.id)
+        if entry is None or after.guild.me is None or after.id != after.guild.me.id:
+            return
+        if before._roles != after._roles:
+            entry.channels_dirty = True
+            entry.roles_dirty = True
+
+    def forget_guild(self, guild_id: int) -> None:
+        self._entries.pop(guild_id, None)
+
+    def _entry(self, guild: discord.Guild) -> _GuildEntry:
+        entry = self._entries.get(guild.id)
+        if entry is None:
+            entry = self._entries[guild.id] = _GuildEntry()
+            for category in guild.categories:
+                entry.put_category(category)
+        return entry
+
+    def _channel_entry(self, guild: discord.Guild) -> _GuildEntry:
+        entry = self._entry(guild)
+        if entry.channels_dirty:
+            self._rebuild_channels(guild, entry)
+        return entry
+
+    def _role_entry(self, guild: discord.Guild) -> _GuildEntry:
+        entry = self._entry(guild)
+        if entry.roles_dirty:
+            self._rebuild_roles(guild, entry)
+        return entry
+
+    def _rebuild_channels(self, guild: discord.Guild, entry: _GuildEntry) -> None:
+        me = guild.me
+        entry.channels = {}
+        entry.channel_search.clear()
+        if me is not None:
+            for channel in guild.text_channels:
+                if channel.permissions_for(me).send_messages:
+                    entry.put_channel(channel)
+        # Bot のメンバー情報がまだなければ、次の参照時にもう一度集計する。
+        entry.channels_dirty = me is None
+        entry.channel_view = None
+        self._metrics.increment("guild_index.rebuilds", kind="channels")
+
+    def _rebuild_roles(self, guild: discord.Guild, entry: _GuildEntry) -> None:
+        me = guild.me
+        entry.roles = {}
+        entry.role_search.clear()
+        if me is not None:
+            for role in guild.roles:
+                if _is_assignable(role, me):
+                    entry.put_role(role)
+        entry.roles_dirty = me is None
+        entry.role_view = None
+        self._metrics.increment("guild_index.rebuilds", kind="roles")
+
+    def _search(
+        self, search: NameSearchIndex, items: Dict[int, _T], query: str, limit: int, kind: str
+    ) -> Tuple[_T, ...]:
+        started = time.perf_counter()
+        found: List[_T] = [items[item_id] for item_id in search.search(query, limit=limit)]
+        self._metrics.increment("guild_index.searches", kind=kind)
+        self._metrics.increment("guild_index.search_seconds", time.perf_counter() - started, kind=kind)
+        return tuple(found)
+
+    @staticmethod
+    def _evaluate_channel(entry: _GuildEntry, channel: discord.TextChannel) -> None:
+        if entry.channels_dirty:
+            return
+        me = channel.guild.me
+        if me is not None and channel.permissions_for(me).send_messages:
+            entry.put_channel(channel)
+        else:
+            entry.drop_channel(channel.id)
+
+    @staticmethod
+    def _affects_bot(role: discord.Role) -> bool:
+        me = role.guild.me
+        return me is None or role.is_default() or me.get_role(role.id) is not None
+
+
+def _is_assignable(role: discord.Role, me: discord.Member) -> bool:
+    return not role.is_default() and not role.managed and role < me.top_role
+
+
+__all__ = ["GuildEligibilityIndex", "SELECT_OPTION_LIMIT"]
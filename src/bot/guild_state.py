@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Set
+
+import discord
+
+from app.database import DATABASE_ERRORS
+from app.metrics import REGISTRY, MetricsRegistry
+
+
+if TYPE_CHECKING:
+    from bot.member_cache import ActiveMemberCache
+    from bot.nickname_sync import ChannelNicknameRuleRepository, NicknameSyncService
+    from bot.temp_vc import TempVoiceChannelManager
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class GuildStateJanitor:
+    """削除されたチャンネル・ロールと、Bot が抜けたギルドの状態を片付ける。
+
+    ゲートウェイの削除イベントを受けると、メモリ上のキャッシュと一時VCの
+    ストアはその場で整理し、同期ルールの DB 行は ``batch_delay`` 秒の間に
+    届いた削除をまとめて 1 回の文で削除する。DB に届かなかった分は
+    次の書き込みまで保持して再試行する。
+
+    Bot が停止している間の削除のようにイベントで拾えなかったものは
+    ``sweep`` で補う。見当たらないギルドは一時的に利用できないだけの
+    ことがあるため、``departure_grace`` 回続けて見当たらなかったときだけ
+    Bot が抜けたものとして扱う。``client.guilds`` には自分のシャードのギルドしか
+    含まれないため、ほかのシャードが受け持つギルドは判定の対象から外す。
+    """
+
+    def __init__(
+        self,
+        *,
+        nickname_sync_service: "NicknameSyncService | None" = None,
+        rule_repository: "ChannelNicknameRuleRepository | None" = None,
+        temp_vc_manager: "TempVoiceChannelManager | None" = None,
+        member_cache: "ActiveMemberCache | None" = None,
+        batch_delay: float = 1.0,
+        departure_grace: int = 2,
+        metrics: MetricsRegistry = REGISTRY,
+    ) -> None:
+        self._service = nickname_sync_service
+        self._repository = rule_repository
+        self._manager = temp_vc_manager
+        self._member_cache = member_cache
+        self._batch_delay = batch_delay
+        self._departure_grace = max(1, departure_grace)
+        self._metrics = metrics
+        self._pending_guilds: Set[int] = set()
+        self._pending_channels: Set[int] = set()
+        self._pending_roles: Set[int] = set()
+        self._absences: Dict[int, int] = {}
+        self._flush_task: asyncio.Task[None] | None = None
+        self._flush_lock = asyncio.Lock()
+
+    @property
+    def pending(self) -> int:
+        """DB への反映を待っている削除の件数。"""
+
+        return len(self._pending_guilds) + len(self._pending_channels) + len(self._pending_roles)
+
+    def channel_deleted(self, channel: discord.abc.GuildChannel) -> None:
+        if self._manager is not None and self._manager.handle_channel_delete(channel):
+            self._metrics.increment("guild_state.evicted", kind="temp_vc_channel")
+        self._evict_rules(channel_ids=(channel.id,))
+        self._pending_channels.add(channel.id)
+        self._schedule_flush()
+
+    def role_deleted(self, role: discord.Role) -> None:
+        self._evict_rules(role_ids=(role.id,))
+        self._pending_roles.add(role.id)
+        self._schedule_flush()
+
+    def guild_removed(self, guild_id: int) -> None:
+        LOGGER.info("Bot が抜けたギルドの状態を破棄します: guild_id=%s", guild_id)
+        self._absences.pop(guild_id, None)
+        if self._manager is not None:
+            self._manager.forget_guild(guild_id)
+            self._metrics.increment("guild_state.evicted", kind="temp_vc_guild")
+        if self._member_cache is not None:
+            self._member_cache.forget_guild(guild_id)
+            self._metrics.increment("guild_state.evicted", kind="member_cache_guild")
+        self._evict_rules(guild_ids=(guild_id,))
+        self._pending_guilds.add(guild_id)
+        self._schedule_flush()
+
+    async def flush(self) -> bool:
+        """保留中の削除を DB に反映する。DB に届かなければ False を返し、次回に持ち越す。"""
+
+        async with self._flush_lock:
+            if self._repository is None or not self.pending:
+                self._clear_pending()
+                return True
+
+            guild_ids, channel_ids, role_ids = self._pending_guilds, self._pending_channels, self._pending_roles
+            self._clear_pending()
+            try:
+                result = await self._repository.purge(guild_ids=guild_ids, channel_ids=channel_ids, role_ids=role_ids)
+            except DATABASE_ERRORS as exc:
+                LOGGER.warning("削除されたチャンネル・ロールの同期ルールを整理できませんでした。後で再試行します: %s", exc)
+                self._pending_guilds |= guild_ids
+                self._pending_channels |= channel_ids
+                self._pending_roles |= role_ids
+                return False
+
+        if result.deleted or result.stripped:
+            LOGGER.info(
+                "削除されたチャンネル・ロールの同期ルールを整理しました (削除 %s 件, ロール除去 %s 件)",
+                len(result.deleted),
+                len(result.stripped),
+            )
+        self._metrics.increment("guild_state.purged_rules", len(result.deleted), action="deleted")
+        self._metrics.increment("guild_state.purged_rules", len(result.stripped), action="stripped")
+        return True
+
+    async def sweep(self, client: discord.Client) -> None:
+        """イベントで拾えなかった削除を、現在のギルド・チャンネル・ロールと突き合わせて片付ける。"""
+
+        if not client.is_ready():
+            return
+        # 一時的に利用できないギルドは、残っているとも抜けたとも判断しない。
+        unavailable = {guild.id for guild in client.guilds if guild.unavailable}
+        present = {guild.id: guild for guild in client.guilds if not guild.unavailable}
+        owned = _shard_filter(client)
+        missing: Set[int] = set()
+
+        if self._manager is not None:
+            for guild_id in self._manager.known_guild_ids():
+                if not owned(guild_id):
+                    continue
+                guild = present.get(guild_id)
+                if guild is None:
+                    missing.add(guild_id)
+                elif self._manager.sweep(guild):
+                    self._metrics.increment("guild_state.evicted", kind="temp_vc_sweep")
+
+        if self._member_cache is not None:
+            missing.update(
+                guild_id
+                for guild_id in self._member_cache.known_guild_ids()
+                if owned(guild_id) and guild_id not in present
+            )
+
+        if self._repository is not None:
+            try:
+                rules = await self._repository.list_rules()
+            except DATABASE_ERRORS as exc:
+                LOGGER.warning("同期ルールを取得できないため、ルールの整理を見送ります: %s", exc)
+                rules = []
+            for rule in rules:
+                if not owned(rule.guild_id):
+                    continue
+                guild = present.get(rule.guild_id)
+                if guild is None:
+                    missing.add(rule.guild_id)
+                    continue
+                if guild.get_channel(rule.channel_id) is None:
+                    self._pending_channels.add(rule.channel_id)
+                for role_id in (rule.role_id, *rule.extra_role_ids, *rule.exempt_role_ids):
+                    if guild.get_role(role_id) is None:
+                        self._pending_roles.add(role_id)
+            self._evict_rules(channel_ids=self._pending_channels, role_ids=self._pending_roles)
+
+        absent = missing - unavailable
+        self._absences = {guild_id: self._absences.get(guild_id, 0) + 1 for guild_id in absent}
+        for guild_id, count in list(self._absences.items()):
+            if count >= self._departure_grace:
+                self.guild_removed(guild_id)
+
+        self._metrics.increment("guild_state.sweeps")
+        await self.flush()
+
+    async def close(self) -> None:
+        """待機中のまとめ書きを取り消し、保留中の削除をその場で反映する。"""
+
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+    def _evict_rules(
+        self,
+        *,
+        guild_ids: Iterable[int] = (),
+        channel_ids: Iterable[int] = (),
+        role_ids: Iterable[int] = (),
+    ) -> None:
+        if self._service is None:
+            return
+        evicted = self._service.evict(guild_ids=guild_ids, channel_ids=channel_ids, role_ids=role_ids)
+        if evicted:
+            self._metrics.increment("guild_state.evicted", evicted, kind="nickname_rule")
+
+    def _schedule_flush(self) -> None:
+        if self._repository is None or (self._flush_task is not None and not self._flush_task.done()):
+            return
+        self._flush_task = asyncio.create_task(self._flush_later(), name="guild-state-purge")
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self._batch_delay)
+        await self.flush()
+
+    def _clear_pending(self) -> None:
+        self._pending_guilds = set()
+        self._pending_channels = set()
+        self._pending_roles = set()
+
+
+def _shard_filter(client: discord.Client) -> Callable[[int], bool]:
+    """ギルド ID がこのクライアントのシャードに属するかを判定する関数を返す。"""
+
+    shard_id = client.shard_id or 0
+    shard_count = client.shard_count or 1
+    return lambda guild_id: (guild_id >> 22) % shard_count == shard_id
+
+
+__all__ = ["GuildStateJanitor"]
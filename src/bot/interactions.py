@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Set, Union
+
+import discord
+
+from app.metrics import REGISTRY, MetricsRegistry
+from app.tracing import TRACER
+
+from .outbound import OutboundPriority, OutboundScheduler, run_outbound
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+# Discord はインタラクション作成から 3 秒以内の応答を要求する。
+INTERACTION_DEADLINE = 3.0
+
+TIMEOUT_MESSAGE = "処理に時間がかかりすぎたため中断しました。しばらくしてから再試行してください。"
+ERROR_MESSAGE = "処理中にエラーが発生しました。しばらくしてから再試行してください。"
+
+
+@dataclass(frozen=True, slots=True)
+class InteractionReply:
+    """インタラクション処理の結果として返す応答内容。"""
+
+    content: str
+    view: discord.ui.View | None = None
+
+
+WorkResult = Union[str, InteractionReply, None]
+Work = Callable[[], Awaitable[WorkResult]]
+
+
+class InteractionRunner:
+    """スラッシュコマンドとビューの処理を応答期限内に収める実行層。
+
+    処理本体はタスクとして開始し、インタラクション作成からの経過時間が
+    ``budget`` 秒に達するまでに終われば通常の応答を返す。間に合わなければ
+    その時点で defer して処理を待ち、結果をフォローアップ（コンポーネントの
+    場合は元メッセージの編集）で送る。処理全体は ``timeout`` 秒で打ち切る。
+
+    コマンドごとに応答件数・defer 件数・期限切れ件数などを ``metrics`` に記録する。
+    """
+
+    def __init__(
+        self,
+        *,
+        budget: float = 2.0,
+        timeout: float = 60.0,
+        metrics: MetricsRegistry = REGISTRY,
+        outbound: OutboundScheduler | None = None,
+    ) -> None:
+        self._budget = min(max(0.0, budget), INTERACTION_DEADLINE)
+        self._timeout = max(self._budget, timeout)
+        self._metrics = metrics
+        self._outbound = outbound
+        self._tasks: Set[asyncio.Task[Any]] = set()
+
+    @property
+    def pending(self) -> Set[asyncio.Task[Any]]:
+        """実行中の処理タスク（シャットダウン時の待機用）。"""
+
+        return {task for task in self._tasks if not task.done()}
+
+    async def run(
+        self,
+        interaction: discord.Interaction,
+        work: Work,
+        *,
+        name: str | None = None,
+        ephemeral: bool = True,
+        edit: bool = False,
+    ) -> None:
+        """``work`` を実行し、その結果でインタラクションに応答する。
+
+        ``edit=True`` の場合はコンポーネントが付いた元メッセージを結果で置き換える。
+        ``work`` が None を返した場合は応答済みとみなし、何も送らない。
+        """
+
+        label = name or _interaction_name(interaction)
+        with TRACER.span(
+            f"interaction {label}",
+            root=True,
+            guild_id=interaction.guild_id,
+            user_id=interaction.user.id,
+        ) as span:
+            started = time.monotonic()
+            self._metrics.increment("interactions.total", command=label)
+
+            task = asyncio.create_task(self._guard(work, label), name=f"interaction-{label}")
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+            done, _ = await asyncio.wait({task}, timeout=self._remaining_budget(interaction))
+            if done:
+                await self._respond(interaction, task.result(), label=label, ephemeral=ephemeral, edit=edit)
+                return
+
+            self._metrics.increment("interactions.deferred", command=label)
+            span.set_attribute("deferred", True)
+            acknowledged = await self._defer(interaction, label=label, ephemeral=ephemeral, edit=edit)
+
+            remaining = self._timeout - (time.monotonic() - started)
+            try:
+                result = await asyncio.wait_for(task, timeout=max(0.0, remaining))
+            except asyncio.TimeoutError:
+                self._metrics.increment("interactions.timeout", command=label)
+                LOGGER.warning("インタラクション処理がタイムアウトしました: command=%s timeout=%.1fs", label, self._timeout)
+                result = TIMEOUT_MESSAGE
+
+            if acknowledged:
+                await self._follow_up(interaction, result, label=label, ephemeral=ephemeral, edit=edit)
+
+    def deadline_misses(self) -> Dict[str, Dict[str, float]]:
+        """コマンドごとの defer・期限切れ・タイムアウト件数を返す。"""
+
+        report: Dict[str, Dict[str, float]] = {}
+        for metric in ("interactions.deferred", "interactions.expired", "interactions.timeout"):
+            for labels, value in self._metrics.counters(metric).items():
+                command = dict(labels).get("command", "?")
+                report.setdefault(command, {})[metric.split(".", 1)[1]] = value
+        return report
+
+    def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+
+    def _remaining_budget(self, interaction: discord.Interaction) -> float:
+        # ゲートウェイ配送の遅延も期限に含まれるため、作成時刻から数える。
+        age = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+        return min(self._budget, max(0.0, self._budget - age))
+
+    async def _guard(self, work: Work, label: str) -> WorkResult:
+        try:
+            return await work()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._metrics.increment("interactions.failed", command=label)
+            LOGGER.exception("インタラクション処理中に予期しないエラーが発生しました: command=%s", label)
+            return ERROR_MESSAGE
+
+    async def _respond(
+        self,
+        interaction: discord.Interaction,
+        result: WorkResult,
+        *,
+        label: str,
+        ephemeral: bool,
+        edit: bool,
+    ) -> None:
+        reply = _as_reply(result)
+        if reply is None or interaction.response.is_done():
+            if reply is not None:
+                await self._follow_up(interaction, reply, label=label, ephemeral=ephemeral, edit=edit)
+            return
+
+        async def send() -> None:
+            if edit:
+                await interaction.response.edit_message(content=reply.content, view=reply.view)
+            elif reply.view is not None:
+                await interaction.response.send_message(reply.content, view=reply.view, ephemeral=ephemeral)
+            else:
+                await interaction.response.send_message(reply.content, ephemeral=ephemeral)
+
+        try:
+            await self._send(interaction, send)
+        except discord.InteractionResponded:
+            # 処理中に別の経路で応答済みになった場合はフォローアップで送る。
+            await self._follow_up(interaction, reply, label=label, ephemeral=ephemeral, edit=edit)
+        except (discord.HTTPException, asyncio.TimeoutError) as exc:
+            self._record_expired(label, exc)
+
+    async def _defer(
+        self,
+        interaction: discord.Interaction,
+        *,
+        label: str,
+        ephemeral: bool,
+        edit: bool,
+    ) -> bool:
+        if interaction.response.is_done():
+            return True
+
+        async def defer() -> None:
+            if edit:
+                await interaction.response.defer()
+            else:
+                await interaction.response.defer(ephemeral=ephemeral, thinking=True)
+
+        try:
+            await self._send(interaction, defer)
+        except discord.InteractionResponded:
+            return True
+        except (discord.HTTPException, asyncio.TimeoutError) as exc:
+            # 応答できなくても処理自体は最後まで実行し、呼び出し元で待つ。
+            self._record_expired(label, exc)
+            return False
+        return True
+
+    async def _follow_up(
+        self,
+        interaction: discord.Interaction,
+        result: WorkResult,
+        *,
+        label: str,
+        ephemeral: bool,
+        edit: bool,
+    ) -> None:
+        reply = _as_reply(result)
+        if reply is None:
+            return
+
+        async def send() -> None:
+            if edit:
+                await interaction.edit_original_response(content=reply.content, view=reply.view)
+            elif reply.view is not None:
+                await interaction.followup.send(reply.content, view=reply.view, ephemeral=ephemeral)
+            else:
+                await interaction.followup.send(reply.content, ephemeral=ephemeral)
+
+        try:
+            await self._send(interaction, send)
+        except (discord.HTTPException, asyncio.TimeoutError) as exc:
+            LOGGER.warning("インタラクションの結果を送信できませんでした: command=%s error=%r", label, exc)
+
+    async def _send(self, interaction: discord.Interaction, func: Callable[[], Awaitable[None]]) -> None:
+        await run_outbound(self._outbound, OutboundPriority.INTERACTION, interaction.guild_id, func)
+
+    def _record_expired(self, label: str, error: BaseException) -> None:
+        self._metrics.increment("interactions.expired", command=label)
+        if isinstance(error, discord.NotFound):
+            LOGGER.warning("インタラクションの応答期限を過ぎました: command=%s", label)
+        else:
+            LOGGER.warning("インタラクションに応答できませんでした: command=%s error=%r", label, error)
+
+
+def _as_reply(result: WorkResult) -> InteractionReply | None:
+    if result is None or isinstance(result, InteractionReply):
+        return result
+    return InteractionReply(content=result)
+
+
+def _interaction_name(interaction: discord.Interaction) -> str:
+    if interaction.command is not None:
+        return interaction.command.qualified_name
+    # custom_id は自動生成される場合があり系列が増え続けるため使わない。
+    return interaction.type.name
+
+
+__all__ = [
+    "ERROR_MESSAGE",
+    "INTERACTION_DEADLINE",
+    "InteractionReply",
+    "InteractionRunner",
+    "TIMEOUT_MESSAGE",
+]
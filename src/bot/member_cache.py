@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Set, Tuple
+
+import discord
+
+from app.tracing import TRACER
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+MemberKey = Tuple[int, int]
+
+
+@dataclass(slots=True)
+class _CachedMember:
+    member: discord.Member
+    role_ids: FrozenSet[int]
+
+
+class ActiveMemberCache:
+    """最近アクティブだったメンバーだけを保持する LRU キャッシュ。
+
+    discord.py のメンバーキャッシュを無効化した代わりに、メッセージ投稿などで
+    観測したメンバーを最大 ``max_members`` 件まで保持する。キャッシュにない
+    メンバーは ``resolve`` で取得し、同じメンバーへの同時取得は 1 回の REST
+    呼び出しにまとめる。
+
+    キャッシュ外のメンバーには GUILD_MEMBER_UPDATE が配送されないため、
+    ロールは取得時点の ID 集合として保持し、Bot 自身の付与結果で更新する。
+    """
+
+    def __init__(self, *, max_members: int = 5000) -> None:
+        self._max_members = max(1, max_members)
+        self._members: OrderedDict[MemberKey, _CachedMember] = OrderedDict()
+        self._guild_counts: Dict[int, int] = {}
+        self._inflight: Dict[MemberKey, asyncio.Future[discord.Member | None]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_members(self) -> int:
+        return self._max_members
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def remember(self, member: discord.Member) -> None:
+        """メンバーを最新の状態で登録し、LRU の先頭へ移動する。"""
+
+        key = (member.guild.id, member.id)
+        if key in self._members:
+            self._members.move_to_end(key)
+        else:
+            self._guild_counts[key[0]] = self._guild_counts.get(key[0], 0) + 1
+        self._members[key] = _CachedMember(
+            member=member,
+            role_ids=frozenset(role.id for role in member.roles),
+        )
+
+        while len(self._members) > self._max_members:
+            evicted_key, _ = self._members.popitem(last=False)
+            self._decrement(evicted_key[0])
+
+    def get(self, guild_id: int, user_id: int) -> discord.Member | None:
+        key = (guild_id, user_id)
+        entry = self._members.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._members.move_to_end(key)
+        return entry.member
+
+    def has_role(self, guild_id: int, user_id: int, role_id: int) -> bool | None:
+        """キャッシュ上でロール保持を判定する。未登録なら None を返す。"""
+
+        entry = self._members.get((guild_id, user_id))
+        if entry is None:
+            return None
+        return role_id in entry.role_ids
+
+    def role_ids(self, guild_id: int, user_id: int) -> FrozenSet[int] | None:
+        """キャッシュ上のロール ID 集合を返す。未登録なら None を返す。"""
+
+        entry = self._members.get((guild_id, user_id))
+        return entry.role_ids if entry is not None else None
+
+    def note_role_added(self, guild_id: int, user_id: int, role_id: int) -> None:
+        entry = self._members.get((guild_id, user_id))
+        if entry is not None:
+            entry.role_ids = entry.role_ids | {role_id}
+
+    def forget(self, guild_id: int, user_id: int) -> None:
+        if self._members.pop((guild_id, user_id), None) is not None:
+            self._decrement(guild_id)
+
+    def forget_guild(self, guild_id: int) -> None:
+        for key in [key for key in self._members if key[0] == guild_id]:
+            del self._members[key]
+        self._guild_counts.pop(guild_id, None)
+
+    def known_guild_ids(self) -> Set[int]:
+        """メンバーを保持しているギルド。"""
+
+        return set(self._guild_counts)
+
+    async def resolve(self, guild: discord.Guild, user_id: int) -> discord.Member | None:
+        """キャッシュ → discord.py キャッシュ → REST の順でメンバーを取得する。"""
+
+        with TRACER.span("cache.member", guild_id=guild.id, user_id=user_id) as span:
+            member = self.get(guild.id, user_id)
+            if member is not None:
+                span.set_attribute("source", "active")
+                return member
+
+            member = guild.get_member(user_id)
+            if member is not None:
+                span.set_attribute("source", "discord")
+                self.remember(member)
+                return member
+
+            span.set_attribute("source", "rest")
+            key = (guild.id, user_id)
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = asyncio.ensure_future(self._fetch(guild, user_id))
+                self._inflight[key] = pending
+                pending.add_done_callback(lambda _: self._inflight.pop(key, None))
+            return await asyncio.shield(pending)
+
+    def report(self) -> Dict[int, int]:
+        """ギルド ID ごとの常駐メンバー数を返す。"""
+
+        return dict(self._guild_counts)
+
+    async def _fetch(self, guild: discord.Guild, user_id: int) -> discord.Member | None:
+        try:
+            member = await guild.fetch_member(user_id)
+        except discord.NotFound:
+            return None
+        except discord.HTTPException as exc:
+            LOGGER.warning(
+                "メンバー情報の取得に失敗しました (guild=%s, user=%s): %s",
+                guild.id,
+                user_id,
+                exc,
+            )
+            return None
+        self.remember(member)
+        return member
+
+    def _decrement(self, guild_id: int) -> None:
+        remaining = self._guild_counts.get(guild_id, 0) - 1
+        if remaining > 0:
+            self._guild_counts[guild_id] = remaining
+        else:
+            self._guild_counts.pop(guild_id, None)
+
+
+__all__ = ["ActiveMemberCache"]
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import bisect
+import unicodedata
+from typing import Dict, List, Set, Tuple
+
+
+# 部分一致に使う文字 n-gram の長さ。日本語の名前は 2 文字のことが多いため 2-gram も持つ。
+_GRAM_SIZES = (2, 3)
+_KATAKANA_START = ord("ァ")
+_KATAKANA_END = ord("ヶ")
+_KANA_OFFSET = ord("ァ") - ord("ぁ")
+
+
+def normalize_name(name: str) -> str:
+    """検索用に名前を正規化する。
+
+    NFKC で全角英数字・半角カナをそろえ、大文字小文字を区別せず、カタカナは
+    ひらがなに寄せる。絵文字や区切り記号（``・`` ``-`` ``｜`` など）は
+    チャンネル名の装飾に使われることが多いため取り除く。
+    """
+
+    folded = unicodedata.normalize("NFKC", name).casefold()
+    chars: List[str] = []
+    for char in folded:
+        code = ord(char)
+        if _KATAKANA_START <= code <= _KATAKANA_END:
+            chars.append(chr(code - _KANA_OFFSET))
+        elif char.isalnum():
+            chars.append(char)
+    return "".join(chars)
+
+
+def _grams(text: str, size: int) -> Set[str]:
+    return {text[index : index + size] for index in range(len(text) - size + 1)}
+
+
+class NameSearchIndex:
+    """ID と名前の組を前方一致・部分一致で検索する索引。
+
+    正規化した名前の整列済みリストを二分探索して前方一致を求め、
+    部分一致は 2-gram / 3-gram の転置インデックスで候補を絞ってから確かめる。
+    追加・削除は名前 1 件分の更新だけで済む。
+    """
+
+    def __init__(self) -> None:
+        self._names: Dict[int, str] = {}
+        self._sorted: List[Tuple[str, int]] = []
+        self._grams: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, item_id: object) -> bool:
+        return item_id in self._names
+
+    def add(self, item_id: int, name: str) -> None:
+        """名前を登録する。登録済みの ID は新しい名前で置き換える。"""
+
+        normalized = normalize_name(name)
+        current = self._names.get(item_id)
+        if current == normalized:
+            return
+        if current is not None:
+            self.remove(item_id)
+        self._names[item_id] = normalized
+        bisect.insort(self._sorted, (normalized, item_id))
+        for size in _GRAM_SIZES:
+            for gram in _grams(normalized, size):
+                self._grams.setdefault(gram, set()).add(item_id)
+
+    def remove(self, item_id: int) -> None:
+        normalized = self._names.pop(item_id, None)
+        if normalized is None:
+            return
+        index = bisect.bisect_left(self._sorted, (normalized, item_id))
+        if index < len(self._sorted) and self._sorted[index] == (normalized, item_id):
+            del self._sorted[index]
+        for size in _GRAM_SIZES:
+            for gram in _grams(normalized, size):
+                ids = self._grams.get(gram)
+                if ids is None:
+                    continue
+                ids.discard(item_id)
+                if not ids:
+                    del self._grams[gram]
+
+    def clear(self) -> None:
+        self._names.clear()
+        self._sorted.clear()
+        self._grams.clear()
+
+    def search(self, query: str, *, limit: int) -> List[int]:
+        """前方一致を名前順に、続いて部分一致を一致位置・名前の短い順に最大 ``limit`` 件返す。"""
+
+        needle = normalize_name(query)
+        if not needle or limit <= 0:
+            return []
+
+        matches: List[int] = []
+        index = bisect.bisect_left(self._sorted, (needle, -1))
+        while index < len(self._sorted) and len(matches) < limit:
+            name, item_id = self._sorted[index]
+            if not name.startswith(needle):
+                break
+            matches.append(item_id)
+            index += 1
+        if len(matches) >= limit or len(needle) < _GRAM_SIZES[0]:
+            return matches
+
+        seen = set(matches)
+        ranked: List[Tuple[int, int, str, int]] = []
+        for item_id in self._candidates(needle):
+            if item_id in seen:
+                continue
+            name = self._names[item_id]
+            position = name.find(needle)
+            if position > 0:
+                ranked.append((position, len(name), name, item_id))
+        ranked.sort()
+        matches.extend(item_id for *_, item_id in ranked[: limit - len(matches)])
+        return matches
+
+    def lookup(self, value: str) -> int | None:
+        """オートコンプリートの値（ID）か、一意に定まる名前から ID を求める。"""
+
+        stripped = value.strip()
+        if stripped.isdigit() and int(stripped) in self._names:
+            return int(stripped)
+        needle = normalize_name(stripped)
+        if not needle:
+            return None
+        index = bisect.bisect_left(self._sorted, (needle, -1))
+        exact = [item_id for name, item_id in self._sorted[index : index + 2] if name == needle]
+        return exact[0] if len(exact) == 1 else None
+
+    def _candidates(self, needle: str) -> Set[int]:
+        size = min(len(needle), _GRAM_SIZES[-1])
+        grams = sorted(_grams(needle, size), key=lambda gram: len(self._grams.get(gram, ())))
+        candidates: Set[int] | None = None
+        # 小さい集合から順に積集合を取り、空になったら打ち切る。
+        for gram in grams:
+            ids = self._grams.get(gram)
+            if not ids:
+                return set()
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                break
+        return candidates or set()
+
+
+__all__ = ["NameSearchIndex", "normalize_name"]
@@ -1,9 +1,23 @@
-from .models import ChannelNicknameRule
-from .repository import ChannelNicknameRuleRepository
+from .backfill import BackfillAlreadyRunningError, BackfillProgress, NicknameSyncBackfill
+from .models import BackfillCheckpoint, ChannelNicknameRule, RulePurgeResult
+from .policy import CompiledChannelPolicy, PolicyCompileError, PolicyDecision, compile_allowlist
+from .repository import BackfillCheckpointRepository, ChannelNicknameRuleRepository
 from .service import NicknameSyncService
+from .snapshot import RuleSnapshotStore
 
 __all__ = [
+    "BackfillAlreadyRunningError",
+    "BackfillCheckpoint",
+    "BackfillCheckpointRepository",
+    "BackfillProgress",
     "ChannelNicknameRule",
     "ChannelNicknameRuleRepository",
+    "CompiledChannelPolicy",
+    "NicknameSyncBackfill",
     "NicknameSyncService",
+    "PolicyCompileError",
+    "PolicyDecision",
+    "RulePurgeResult",
+    "RuleSnapshotStore",
+    "compile_allowlist",
 ]
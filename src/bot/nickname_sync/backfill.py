@@ -0,0 +1,333 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Tuple
+
+import discord
+
+from .models import BackfillCheckpoint, BackfillPhase, ChannelNicknameRule
+from .repository import BackfillCheckpointRepository
+from .service import NicknameSyncService
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+BackfillKey = Tuple[int, int]
+
+
+@dataclass(slots=True)
+class BackfillProgress:
+    """バックフィルの進捗状況。"""
+
+    phase: BackfillPhase
+    scanned_messages: int = 0
+    distinct_authors: int = 0
+    processed_authors: int = 0
+    granted_count: int = 0
+    error: str | None = None
+
+
+ProgressCallback = Callable[[BackfillProgress], Awaitable[None]]
+
+
+class BackfillAlreadyRunningError(Exception):
+    """同じチャンネルのバックフィルが既に実行中の場合に送出される。"""
+
+
+class NicknameSyncBackfill:
+    """チャンネル履歴を走査し、過去の投稿者へ同期ロールを付与する。
+
+    履歴は非同期イテレータで 1 件ずつ読み進め、投稿者 ID だけを集合に保持する。
+    ``progress_every`` 件ごとに、最後に読んだメッセージの位置と件数を保存し、
+    前回の保存以降に見つかった投稿者 ID だけを子テーブルへ追記する（一覧を毎回
+    書き直すと、書き込み量が投稿者数の 2 乗で増える）。付与中は付与済みの位置と
+    件数だけを更新する。Bot が再起動した場合、走査・付与とも保存した位置から再開する。
+    """
+
+    def __init__(
+        self,
+        *,
+        service: NicknameSyncService,
+        checkpoints: BackfillCheckpointRepository,
+        batch_size: int = 10,
+        batch_interval: float = 1.0,
+        progress_every: int = 500,
+    ) -> None:
+        self._service = service
+        self._checkpoints = checkpoints
+        self._batch_size = max(1, batch_size)
+        self._batch_interval = max(0.0, batch_interval)
+        self._progress_every = max(1, progress_every)
+        self._running: Dict[BackfillKey, asyncio.Task[BackfillProgress]] = {}
+
+    def is_running(self, guild_id: int, channel_id: int) -> bool:
+        task = self._running.get((guild_id, channel_id))
+        return task is not None and not task.done()
+
+    def start(
+        self,
+        *,
+        channel: discord.TextChannel,
+        rule: ChannelNicknameRule,
+        requested_by: int,
+        restart: bool = False,
+        progress: ProgressCallback | None = None,
+    ) -> asyncio.Task[BackfillProgress]:
+        """バックフィルをバックグラウンドタスクとして開始する。
+
+        失敗した場合は ``error`` を設定した進捗を ``progress`` に通知し、例外をログに残す。
+        """
+
+        key = (channel.guild.id, channel.id)
+        if self.is_running(*key):
+            raise BackfillAlreadyRunningError(f"backfill already running for channel {channel.id}")
+
+        task = asyncio.create_task(
+            self._run_reporting_failure(
+                channel=channel,
+                rule=rule,
+                requested_by=requested_by,
+                restart=restart,
+                progress=progress,
+            ),
+            name=f"nickname-sync-backfill-{channel.id}",
+        )
+        self._running[key] = task
+        task.add_done_callback(lambda finished: self._finished(key, finished))
+        return task
+
+    def _finished(self, key: BackfillKey, task: asyncio.Task[BackfillProgress]) -> None:
+        self._running.pop(key, None)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            LOGGER.error(
+                "バックフィルが失敗しました (guild=%s, channel=%s)",
+                key[0],
+                key[1],
+                exc_info=error,
+            )
+
+    async def _run_reporting_failure(
+        self,
+        *,
+        channel: discord.TextChannel,
+        rule: ChannelNicknameRule,
+        requested_by: int,
+        restart: bool,
+        progress: ProgressCallback | None,
+    ) -> BackfillProgress:
+        last = BackfillProgress(phase="scan")
+
+        async def remember(state: BackfillProgress) -> None:
+            nonlocal last
+            last = state
+            if progress is not None:
+                await progress(state)
+
+        try:
+            return await self.run(
+                channel=channel,
+                rule=rule,
+                requested_by=requested_by,
+                restart=restart,
+                progress=remember,
+            )
+        except Exception as exc:
+            last.error = f"{type(exc).__name__}: {exc}"
+            await self._report(progress, last)
+            raise
+
+    async def run(
+        self,
+        *,
+        channel: discord.TextChannel,
+        rule: ChannelNicknameRule,
+        requested_by: int,
+        restart: bool = False,
+        progress: ProgressCallback | None = None,
+    ) -> BackfillProgress:
+        guild = channel.guild
+        checkpoint = None
+        if not restart:
+            checkpoint = await self._checkpoints.get_checkpoint(
+                guild_id=guild.id,
+                channel_id=channel.id,
+            )
+            # ルールのロールが変わっていたら古いチェックポイントは使わない。
+            if checkpoint is not None and (
+                checkpoint.role_id != rule.role_id or checkpoint.phase == "done"
+            ):
+                checkpoint = None
+
+        if checkpoint is not None:
+            LOGGER.info(
+                "バックフィルをチェックポイントから再開します (guild=%s, channel=%s, phase=%s)",
+                guild.id,
+                channel.id,
+                checkpoint.phase,
+            )
+        else:
+            # 使わないチェックポイントの投稿者 ID が新しい走査に混ざらないよう、先に消しておく。
+            await self._checkpoints.delete_checkpoint(guild_id=guild.id, channel_id=channel.id)
+
+        author_ids, state = await self._scan_history(
+            channel=channel,
+            rule=rule,
+            requested_by=requested_by,
+            checkpoint=checkpoint,
+            progress=progress,
+        )
+        state = await self._grant_roles(
+            guild=guild,
+            channel=channel,
+            rule=rule,
+            requested_by=requested_by,
+            author_ids=author_ids,
+            checkpoint=checkpoint,
+            state=state,
+            progress=progress,
+        )
+
+        state.phase = "done"
+        await self._checkpoints.complete_checkpoint(
+            guild_id=guild.id,
+            channel_id=channel.id,
+            scanned_messages=state.scanned_messages,
+            granted_count=state.granted_count,
+        )
+        await self._report(progress, state)
+        LOGGER.info(
+            "バックフィルが完了しました (guild=%s, channel=%s, scanned=%s, authors=%s, granted=%s)",
+            guild.id,
+            channel.id,
+            state.scanned_messages,
+            state.distinct_authors,
+            state.granted_count,
+        )
+        return state
+
+    async def _scan_history(
+        self,
+        *,
+        channel: discord.TextChannel,
+        rule: ChannelNicknameRule,
+        requested_by: int,
+        checkpoint: BackfillCheckpoint | None,
+        progress: ProgressCallback | None,
+    ) -> tuple[list[int], BackfillProgress]:
+        author_ids: set[int] = set()
+        last_message_id: int | None = None
+        state = BackfillProgress(phase="scan")
+
+        if checkpoint is not None:
+            author_ids.update(checkpoint.author_ids)
+            last_message_id = checkpoint.last_message_id
+            state.scanned_messages = checkpoint.scanned_messages
+            state.granted_count = checkpoint.granted_count
+            if checkpoint.phase == "grant":
+                state.phase = "grant"
+                state.distinct_authors = len(author_ids)
+                return sorted(author_ids), state
+
+        unsaved: list[int] = []
+        after = discord.Object(id=last_message_id) if last_message_id is not None else None
+        async for message in channel.history(limit=None, after=after, oldest_first=True):
+            last_message_id = message.id
+            state.scanned_messages += 1
+            if not message.author.bot and message.author.id not in author_ids:
+                author_ids.add(message.author.id)
+                unsaved.append(message.author.id)
+
+            if state.scanned_messages % self._progress_every == 0:
+                state.distinct_authors = len(author_ids)
+                await self._save_scan(channel, rule, requested_by, state, last_message_id, unsaved)
+                unsaved = []
+                await self._report(progress, state)
+
+        ordered = sorted(author_ids)
+        state.phase = "grant"
+        state.distinct_authors = len(ordered)
+        await self._save_scan(channel, rule, requested_by, state, last_message_id, unsaved)
+        await self._report(progress, state)
+        return ordered, state
+
+    async def _grant_roles(
+        self,
+        *,
+        guild: discord.Guild,
+        channel: discord.TextChannel,
+        rule: ChannelNicknameRule,
+        requested_by: int,
+        author_ids: list[int],
+        checkpoint: BackfillCheckpoint | None,
+        state: BackfillProgress,
+        progress: ProgressCallback | None,
+    ) -> BackfillProgress:
+        start = 0
+        if checkpoint is not None and checkpoint.phase == "grant" and checkpoint.last_user_id is not None:
+            start = bisect_right(author_ids, checkpoint.last_user_id)
+        state.processed_authors = start
+
+        for offset in range(start, len(author_ids), self._batch_size):
+            batch = author_ids[offset : offset + self._batch_size]
+            for user_id in batch:
+                member = await self._service.resolve_member(guild, user_id)
+                if member is not None and await self._service.ensure_rule_roles(member, rule):
+                    state.granted_count += 1
+                state.processed_authors += 1
+
+            await self._checkpoints.update_progress(
+                guild_id=guild.id,
+                channel_id=channel.id,
+                phase=state.phase,
+                last_user_id=batch[-1],
+                scanned_messages=state.scanned_messages,
+                granted_count=state.granted_count,
+            )
+            await self._report(progress, state)
+            if self._batch_interval and offset + self._batch_size < len(author_ids):
+                await asyncio.sleep(self._batch_interval)
+
+        return state
+
+    async def _save_scan(
+        self,
+        channel: discord.TextChannel,
+        rule: ChannelNicknameRule,
+        requested_by: int,
+        state: BackfillProgress,
+        last_message_id: int | None,
+        new_author_ids: list[int],
+    ) -> None:
+        await self._checkpoints.save_scan_progress(
+            guild_id=channel.guild.id,
+            channel_id=channel.id,
+            role_id=rule.role_id,
+            phase=state.phase,
+            last_message_id=last_message_id,
+            new_author_ids=new_author_ids,
+            scanned_messages=state.scanned_messages,
+            requested_by=requested_by,
+        )
+
+    @staticmethod
+    async def _report(progress: ProgressCallback | None, state: BackfillProgress) -> None:
+        if progress is None:
+            return
+        try:
+            await progress(state)
+        except Exception:  # pragma: no cover - 進捗通知の失敗で処理を止めない
+            LOGGER.exception("バックフィル進捗の通知に失敗しました。")
+
+
+__all__ = [
+    "BackfillAlreadyRunningError",
+    "BackfillProgress",
+    "NicknameSyncBackfill",
+]
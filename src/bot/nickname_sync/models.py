@@ -2,6 +2,10 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime
+from typing import Literal
+
+
+BackfillPhase = Literal["scan", "grant", "done"]
 
 
 @dataclass(slots=True, frozen=True)
@@ -11,6 +15,47 @@ class ChannelNicknameRule:
     role_id: int
     updated_by: int
     updated_at: datetime
+    extra_role_ids: tuple[int, ...] = ()
+    exempt_role_ids: tuple[int, ...] = ()
+    content_allowlist: tuple[str, ...] = ()
+    rewrite_content: bool = True
+    rate_limit_count: int | None = None
+    rate_limit_window: int | None = None
+
+    @property
+    def role_ids(self) -> tuple[int, ...]:
+        """付与対象のロール ID（主ロールを先頭に重複なし）。"""
+
+        return tuple(dict.fromkeys((self.role_id, *self.extra_role_ids)))
+
+
+@dataclass(slots=True, frozen=True)
+class BackfillCheckpoint:
+    """履歴バックフィルの再開位置を表すチェックポイント。"""
+
+    guild_id: int
+    channel_id: int
+    role_id: int
+    phase: BackfillPhase
+    last_message_id: int | None
+    last_user_id: int | None
+    author_ids: tuple[int, ...]
+    scanned_messages: int
+    granted_count: int
+    requested_by: int
+    updated_at: datetime
+
+
+@dataclass(slots=True, frozen=True)
+class RulePurgeResult:
+    """削除されたチャンネル・ロール・ギルドに合わせてルールを整理した結果。
+
+    ``deleted`` は削除したルール、``stripped`` は追加ロール・除外ロールから
+    削除済みロールを取り除いたルールの (guild_id, channel_id)。
+    """
+
+    deleted: tuple[tuple[int, int], ...] = ()
+    stripped: tuple[tuple[int, int], ...] = ()
 
 
-__all__ = ["ChannelNicknameRule"]
+__all__ = ["BackfillCheckpoint", "BackfillPhase", "ChannelNicknameRule", "RulePurgeResult"]
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from enum import Enum
+from typing import AbstractSet, Dict, FrozenSet, Sequence, Tuple
+
+from .models import ChannelNicknameRule
+
+
+MAX_ALLOWLIST_PATTERN_LENGTH = 200
+
+
+class PolicyAction(Enum):
+    """コンパイル済みポリシーが投稿時に実行する処理。"""
+
+    REWRITE_CONTENT = "rewrite_content"
+    GRANT_ROLES = "grant_roles"
+
+
+class PolicyCompileError(ValueError):
+    """ルールの内容からポリシーを組み立てられない場合に送出される。"""
+
+
+@dataclass(frozen=True, slots=True)
+class PolicyDecision:
+    """1 件の投稿に対して実行すべき処理。"""
+
+    rewrite_to: str | None = None
+    grant_role_ids: FrozenSet[int] = frozenset()
+    delete: bool = False
+
+    @property
+    def is_noop(self) -> bool:
+        return self.rewrite_to is None and not self.grant_role_ids and not self.delete
+
+
+NOOP_DECISION = PolicyDecision()
+
+
+_GlobSegment = Tuple[str, FrozenSet[int]]  # (文字列, "?" の位置)
+
+
+def _parse_glob(pattern: str) -> Tuple[_GlobSegment, ...]:
+    """パターンを ``*`` で区切った断片に分ける。``\\`` の直後の文字はそのまま扱う。"""
+
+    segments = []
+    chars = []
+    wildcards = set()
+    escaped = False
+    for char in pattern:
+        if escaped:
+            chars.append(char)
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == "*":
+            segments.append(("".join(chars), frozenset(wildcards)))
+            chars, wildcards = [], set()
+        elif char == "?":
+            wildcards.add(len(chars))
+            chars.append(char)
+        else:
+            chars.append(char)
+    if escaped:
+        raise PolicyCompileError("allowlist pattern ends with an unfinished escape")
+    segments.append(("".join(chars), frozenset(wildcards)))
+    return tuple(segments)
+
+
+def _segment_at(segment: _GlobSegment, content: str, start: int) -> bool:
+    text, wildcards = segment
+    if not wildcards:
+        return content.startswith(text, start)
+    if start + len(text) > len(content):
+        return False
+    return all(
+        index in wildcards or content[start + index] == char for index, char in enumerate(text)
+    )
+
+
+def _find_segment(segment: _GlobSegment, content: str, start: int, stop: int) -> int:
+    text, wildcards = segment
+    if not wildcards:
+        return content.find(text, start, stop)
+    for position in range(start, stop - len(text) + 1):
+        if _segment_at(segment, content, position):
+            return position
+    return -1
+
+
+class _GlobPattern:
+    """``*``（任意の文字列）と ``?``（任意の 1 文字）だけを解釈する許可パターン。
+
+    ``*`` の間の断片を左から最初に見つかった位置で確定させていくため、評価は
+    パターン長×本文長に比例した時間で終わる。正規表現のように入力次第で
+    バックトラックが爆発することはなく、管理者が入力したパターンを投稿ごとに
+    イベントループ上で評価しても詰まらない。
+    """
+
+    __slots__ = ("_segments",)
+
+    def __init__(self, pattern: str) -> None:
+        self._segments = _parse_glob(pattern)
+
+    def fullmatch(self, content: str) -> bool:
+        head, *rest = self._segments
+        if not rest:
+            return len(content) == len(head[0]) and _segment_at(head, content, 0)
+        *middle, tail = rest
+        end = len(content) - len(tail[0])
+        if end < len(head[0]) or not _segment_at(head, content, 0) or not _segment_at(tail, content, end):
+            return False
+        position = len(head[0])
+        for segment in middle:
+            found = _find_segment(segment, content, position, end)
+            if found < 0:
+                return False
+            position = found + len(segment[0])
+        return True
+
+
+class ContentAllowlist:
+    """書き換えない投稿を表す許可パターンの集合。いずれかに全体一致すれば許可する。"""
+
+    __slots__ = ("_patterns",)
+
+    def __init__(self, patterns: Sequence[_GlobPattern]) -> None:
+        self._patterns = tuple(patterns)
+
+    def fullmatch(self, content: str) -> bool:
+        return any(pattern.fullmatch(content) for pattern in self._patterns)
+
+
+def compile_allowlist(patterns: Sequence[str]) -> ContentAllowlist | None:
+    """許可パターンを 1 件ずつ検証してコンパイルする。
+
+    パターンは ``*`` と ``?`` だけを特別扱いするワイルドカード形式で、それ以外の
+    文字（正規表現の記号を含む）は文字どおりに一致させる。
+    """
+
+    if not patterns:
+        return None
+    compiled = []
+    for pattern in patterns:
+        if not pattern:
+            raise PolicyCompileError("allowlist pattern must not be empty")
+        if len(pattern) > MAX_ALLOWLIST_PATTERN_LENGTH:
+            raise PolicyCompileError(
+                f"allowlist pattern is longer than {MAX_ALLOWLIST_PATTERN_LENGTH} characters"
+            )
+        compiled.append(_GlobPattern(pattern))
+    return ContentAllowlist(compiled)
+
+
+class _MemberRateLimiter:
+    """メンバーごとの固定ウィンドウ方式の投稿数カウンター。"""
+
+    __slots__ = ("_count", "_window", "_windows")
+
+    def __init__(self, count: int, window: float) -> None:
+        self._count = count
+        self._window = window
+        self._windows: Dict[int, Tuple[float, int]] = {}  # user_id -> (window_start, count)
+
+    def allow(self, user_id: int, now: float) -> bool:
+        started, used = self._windows.get(user_id, (now, 0))
+        if now - started >= self._window:
+            started, used = now, 0
+        used += 1
+        self._windows[user_id] = (started, used)
+        if len(self._windows) > 4096:
+            self._prune(now)
+        return used <= self._count
+
+    def _prune(self, now: float) -> None:
+        expired = [user_id for user_id, (started, _) in self._windows.items() if now - started >= self._window]
+        for user_id in expired:
+            del self._windows[user_id]
+
+
+class CompiledChannelPolicy:
+    """チャンネルの同期ルールを投稿時に高速に評価できる形へ変換したもの。
+
+    ルールの読み込み時に一度だけ組み立て、許可パターンのコンパイル、ロール ID の
+    frozenset 化、実行する処理の一覧作成を済ませておく。投稿時の評価は集合演算と
+    許可パターンの照合だけで、DB へのアクセスや設定の再解釈は行わない。
+    """
+
+    __slots__ = ("rule", "role_ids", "exempt_role_ids", "actions", "_allowlist", "_rate_limiter")
+
+    def __init__(self, rule: ChannelNicknameRule) -> None:
+        self.rule = rule
+        self.role_ids: FrozenSet[int] = frozenset(rule.role_ids)
+        self.exempt_role_ids: FrozenSet[int] = frozenset(rule.exempt_role_ids)
+        self._allowlist = compile_allowlist(rule.content_allowlist)
+
+        actions = []
+        if rule.rewrite_content:
+            actions.append(PolicyAction.REWRITE_CONTENT)
+        if self.role_ids:
+            actions.append(PolicyAction.GRANT_ROLES)
+        self.actions: Tuple[PolicyAction, ...] = tuple(actions)
+
+        self._rate_limiter: _MemberRateLimiter | None = None
+        if rule.rate_limit_count is not None and rule.rate_limit_window:
+            self._rate_limiter = _MemberRateLimiter(rule.rate_limit_count, float(rule.rate_limit_window))
+
+    def evaluate(
+        self,
+        *,
+        user_id: int,
+        member_role_ids: AbstractSet[int],
+        content: str,
+        display_name: str,
+        now: float,
+    ) -> PolicyDecision:
+        if self.exempt_role_ids and not self.exempt_role_ids.isdisjoint(member_role_ids):
+            return NOOP_DECISION
+
+        if self._rate_limiter is not None and not self._rate_limiter.allow(user_id, now):
+            return PolicyDecision(delete=True)
+
+        rewrite_to: str | None = None
+        grant_role_ids: FrozenSet[int] = frozenset()
+        for action in self.actions:
+            if action is PolicyAction.REWRITE_CONTENT:
+                if display_name and content != display_name and not self.is_allowed_content(content):
+                    rewrite_to = display_name
+            elif action is PolicyAction.GRANT_ROLES:
+                grant_role_ids = self.role_ids.difference(member_role_ids)
+
+        if rewrite_to is None and not grant_role_ids:
+            return NOOP_DECISION
+        return PolicyDecision(rewrite_to=rewrite_to, grant_role_ids=grant_role_ids)
+
+    def is_allowed_content(self, content: str) -> bool:
+        return self._allowlist is not None and self._allowlist.fullmatch(content)
+
+
+__all__ = [
+    "MAX_ALLOWLIST_PATTERN_LENGTH",
+    "CompiledChannelPolicy",
+    "ContentAllowlist",
+    "PolicyAction",
+    "PolicyCompileError",
+    "PolicyDecision",
+    "compile_allowlist",
+]
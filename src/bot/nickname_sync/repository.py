@@ -1,10 +1,10 @@
 from __future__ import annotations
 
-from typing import Any
+from typing import Any, Iterable, Sequence
 
 from app.database import Database
 
-from .models import ChannelNicknameRule
+from .models import BackfillCheckpoint, BackfillPhase, ChannelNicknameRule, RulePurgeResult
 
 
 UPSERT_RULE_SQL = r"""
@@ -16,19 +16,211 @@ SET
     role_id = EXCLUDED.role_id,
     updated_by = EXCLUDED.updated_by,
     updated_at = timezone('UTC', now())
-RETURNING guild_id, channel_id, role_id, updated_by, updated_at;
+RETURNING guild_id, channel_id, role_id, updated_by, updated_at,
+    extra_role_ids, exempt_role_ids, content_allowlist, rewrite_content,
+    rate_limit_count, rate_limit_window;
+"""
+
+
+UPDATE_POLICY_SQL = r"""
+UPDATE channel_nickname_rules
+SET
+    extra_role_ids = $3,
+    exempt_role_ids = $4,
+    content_allowlist = $5,
+    rewrite_content = $6,
+    rate_limit_count = $7,
+    rate_limit_window = $8,
+    updated_by = $9,
+    updated_at = timezone('UTC', now())
+WHERE guild_id = $1 AND channel_id = $2
+RETURNING guild_id, channel_id, role_id, updated_by, updated_at,
+    extra_role_ids, exempt_role_ids, content_allowlist, rewrite_content,
+    rate_limit_count, rate_limit_window;
 """
 
 
 GET_RULE_SQL = r"""
-SELECT guild_id, channel_id, role_id, updated_by, updated_at
+SELECT guild_id, channel_id, role_id, updated_by, updated_at,
+    extra_role_ids, exempt_role_ids, content_allowlist, rewrite_content,
+    rate_limit_count, rate_limit_window
+FROM channel_nickname_rules
+WHERE guild_id = $1 AND channel_id = $2;
+"""
+
+
+LIST_RULES_SQL = r"""
+SELECT guild_id, channel_id, role_id, updated_by, updated_at,
+    extra_role_ids, exempt_role_ids, content_allowlist, rewrite_content,
+    rate_limit_count, rate_limit_window
 FROM channel_nickname_rules
+ORDER BY guild_id, channel_id;
+"""
+
+
+# $1: 削除されたギルド、$2: 削除されたチャンネル、$3: 削除されたロール。
+# 主ロールが消えたルールは削除し、追加・除外ロールだけが消えたルールは配列から取り除く。
+# 同じ文の中で同じ行を二重に更新しないよう、更新対象からは削除対象の行を除く。
+PURGE_RULES_SQL = r"""
+WITH deleted_rules AS (
+    DELETE FROM channel_nickname_rules
+    WHERE guild_id = ANY($1::BIGINT[])
+        OR channel_id = ANY($2::BIGINT[])
+        OR role_id = ANY($3::BIGINT[])
+    RETURNING guild_id, channel_id
+), stripped_rules AS (
+    UPDATE channel_nickname_rules
+    SET
+        extra_role_ids = ARRAY(
+            SELECT role_id FROM unnest(extra_role_ids) WITH ORDINALITY AS roles(role_id, position)
+            WHERE role_id <> ALL($3::BIGINT[]) ORDER BY position
+        ),
+        exempt_role_ids = ARRAY(
+            SELECT role_id FROM unnest(exempt_role_ids) WITH ORDINALITY AS roles(role_id, position)
+            WHERE role_id <> ALL($3::BIGINT[]) ORDER BY position
+        ),
+        updated_at = timezone('UTC', now())
+    WHERE (extra_role_ids && $3::BIGINT[] OR exempt_role_ids && $3::BIGINT[])
+        AND NOT (
+            guild_id = ANY($1::BIGINT[])
+            OR channel_id = ANY($2::BIGINT[])
+            OR role_id = ANY($3::BIGINT[])
+        )
+    RETURNING guild_id, channel_id
+), deleted_checkpoints AS (
+    DELETE FROM nickname_sync_backfill_checkpoints
+    WHERE guild_id = ANY($1::BIGINT[])
+        OR channel_id = ANY($2::BIGINT[])
+        OR role_id = ANY($3::BIGINT[])
+    RETURNING guild_id, channel_id
+), deleted_backfill_authors AS (
+    DELETE FROM nickname_sync_backfill_authors
+    WHERE guild_id = ANY($1::BIGINT[])
+        OR channel_id = ANY($2::BIGINT[])
+        OR (guild_id, channel_id) IN (SELECT guild_id, channel_id FROM deleted_checkpoints)
+)
+SELECT TRUE AS deleted, guild_id, channel_id FROM deleted_rules
+UNION ALL
+SELECT FALSE AS deleted, guild_id, channel_id FROM stripped_rules;
+"""
+
+
+SAVE_BACKFILL_CHECKPOINT_SQL = r"""
+INSERT INTO nickname_sync_backfill_checkpoints (
+    guild_id, channel_id, role_id, phase, last_message_id, last_user_id,
+    author_ids, scanned_messages, granted_count, requested_by
+)
+VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+ON CONFLICT (guild_id, channel_id)
+DO UPDATE
+SET
+    role_id = EXCLUDED.role_id,
+    phase = EXCLUDED.phase,
+    last_message_id = EXCLUDED.last_message_id,
+    last_user_id = EXCLUDED.last_user_id,
+    author_ids = EXCLUDED.author_ids,
+    scanned_messages = EXCLUDED.scanned_messages,
+    granted_count = EXCLUDED.granted_count,
+    requested_by = EXCLUDED.requested_by,
+    updated_at = timezone('UTC', now())
+RETURNING guild_id, channel_id, role_id, phase, last_message_id, last_user_id,
+    author_ids, scanned_messages, granted_count, requested_by, updated_at;
+"""
+
+
+# 走査の途中経過を 1 文で保存する。投稿者 ID（$8）は前回の保存以降に見つかった分だけを
+# 子テーブルへ追記するため、書き込み量は投稿者数に比例する。
+SAVE_BACKFILL_SCAN_SQL = r"""
+WITH saved_checkpoint AS (
+    INSERT INTO nickname_sync_backfill_checkpoints (
+        guild_id, channel_id, role_id, phase, last_message_id, last_user_id,
+        scanned_messages, granted_count, requested_by
+    )
+    VALUES ($1, $2, $3, $4, $5, NULL, $6, 0, $7)
+    ON CONFLICT (guild_id, channel_id)
+    DO UPDATE
+    SET
+        role_id = EXCLUDED.role_id,
+        phase = EXCLUDED.phase,
+        last_message_id = EXCLUDED.last_message_id,
+        last_user_id = NULL,
+        scanned_messages = EXCLUDED.scanned_messages,
+        requested_by = EXCLUDED.requested_by,
+        updated_at = timezone('UTC', now())
+)
+INSERT INTO nickname_sync_backfill_authors (guild_id, channel_id, user_id)
+SELECT $1, $2, unnest($8::BIGINT[])
+ON CONFLICT DO NOTHING;
+"""
+
+
+COMPLETE_BACKFILL_CHECKPOINT_SQL = r"""
+WITH deleted_authors AS (
+    DELETE FROM nickname_sync_backfill_authors
+    WHERE guild_id = $1 AND channel_id = $2
+)
+UPDATE nickname_sync_backfill_checkpoints
+SET
+    phase = 'done',
+    last_message_id = NULL,
+    last_user_id = NULL,
+    author_ids = '{}',
+    scanned_messages = $3,
+    granted_count = $4,
+    updated_at = timezone('UTC', now())
+WHERE guild_id = $1 AND channel_id = $2;
+"""
+
+
+UPDATE_BACKFILL_PROGRESS_SQL = r"""
+UPDATE nickname_sync_backfill_checkpoints
+SET
+    phase = $3,
+    last_user_id = $4,
+    scanned_messages = $5,
+    granted_count = $6,
+    updated_at = timezone('UTC', now())
 WHERE guild_id = $1 AND channel_id = $2;
 """
 
 
+GET_BACKFILL_CHECKPOINT_SQL = r"""
+SELECT checkpoints.guild_id, checkpoints.channel_id, checkpoints.role_id, checkpoints.phase,
+    checkpoints.last_message_id, checkpoints.last_user_id,
+    checkpoints.author_ids || ARRAY(
+        SELECT authors.user_id FROM nickname_sync_backfill_authors AS authors
+        WHERE authors.guild_id = checkpoints.guild_id AND authors.channel_id = checkpoints.channel_id
+    ) AS author_ids,
+    checkpoints.scanned_messages, checkpoints.granted_count, checkpoints.requested_by,
+    checkpoints.updated_at
+FROM nickname_sync_backfill_checkpoints AS checkpoints
+WHERE checkpoints.guild_id = $1 AND checkpoints.channel_id = $2;
+"""
+
+
+DELETE_BACKFILL_CHECKPOINT_SQL = r"""
+WITH deleted_authors AS (
+    DELETE FROM nickname_sync_backfill_authors
+    WHERE guild_id = $1 AND channel_id = $2
+)
+DELETE FROM nickname_sync_backfill_checkpoints
+WHERE guild_id = $1 AND channel_id = $2;
+"""
+
+
+def _rule_key(guild_id: int, channel_id: int) -> tuple[str, int, int]:
+    return ("channel_nickname_rules", guild_id, channel_id)
+
+
+def _checkpoint_key(guild_id: int, channel_id: int) -> tuple[str, int, int]:
+    return ("nickname_sync_backfill_checkpoints", guild_id, channel_id)
+
+
 class ChannelNicknameRuleRepository:
-    """channel_nickname_rules テーブルを扱うリポジトリ。"""
+    """channel_nickname_rules テーブルを扱うリポジトリ。
+
+    参照はレプリカへ振り分け、書き込んだチャンネルの参照だけをしばらくプライマリで行う。
+    """
 
     def __init__(self, database: Database) -> None:
         self._database = database
@@ -41,6 +233,7 @@ class ChannelNicknameRuleRepository:
         role_id: int,
         updated_by: int,
     ) -> ChannelNicknameRule:
+        self._database.mark_written(_rule_key(guild_id, channel_id))
         record = await self._database.fetchrow(
             UPSERT_RULE_SQL,
             guild_id,
@@ -51,30 +244,251 @@ class ChannelNicknameRuleRepository:
         assert record is not None, "Upsert should always return the affected row."
         return self._record_to_model(record)
 
-    async def get_rule_for_channel(
+    async def update_policy(
         self,
         *,
         guild_id: int,
         channel_id: int,
+        extra_role_ids: Sequence[int],
+        exempt_role_ids: Sequence[int],
+        content_allowlist: Sequence[str],
+        rewrite_content: bool,
+        rate_limit_count: int | None,
+        rate_limit_window: int | None,
+        updated_by: int,
     ) -> ChannelNicknameRule | None:
+        """既存ルールのポリシー項目を更新する。ルールがなければ None を返す。"""
+
+        self._database.mark_written(_rule_key(guild_id, channel_id))
         record = await self._database.fetchrow(
+            UPDATE_POLICY_SQL,
+            guild_id,
+            channel_id,
+            list(extra_role_ids),
+            list(exempt_role_ids),
+            list(content_allowlist),
+            rewrite_content,
+            rate_limit_count,
+            rate_limit_window,
+            updated_by,
+        )
+        if record is None:
+            return None
+        return self._record_to_model(record)
+
+    async def get_rule_for_channel(
+        self,
+        *,
+        guild_id: int,
+        channel_id: int,
+    ) -> ChannelNicknameRule | None:
+        record = await self._database.fetchrow_readonly(
             GET_RULE_SQL,
             guild_id,
             channel_id,
+            key=_rule_key(guild_id, channel_id),
         )
         if record is None:
             return None
         return self._record_to_model(record)
 
+    async def list_rules(self) -> list[ChannelNicknameRule]:
+        """全ギルドの同期ルールを返す（ローカルスナップショットの更新用）。"""
+
+        records = await self._database.fetch_readonly(LIST_RULES_SQL)
+        return [self._record_to_model(record) for record in records]
+
+    async def purge(
+        self,
+        *,
+        guild_ids: Iterable[int] = (),
+        channel_ids: Iterable[int] = (),
+        role_ids: Iterable[int] = (),
+    ) -> RulePurgeResult:
+        """削除されたギルド・チャンネル・ロールを参照するルールとチェックポイントを 1 回で整理する。"""
+
+        records = await self._database.fetch(
+            PURGE_RULES_SQL,
+            list(guild_ids),
+            list(channel_ids),
+            list(role_ids),
+        )
+        deleted: list[tuple[int, int]] = []
+        stripped: list[tuple[int, int]] = []
+        for record in records:
+            key = (int(record["guild_id"]), int(record["channel_id"]))
+            (deleted if record["deleted"] else stripped).append(key)
+            self._database.mark_written(_rule_key(*key))
+            self._database.mark_written(_checkpoint_key(*key))
+        return RulePurgeResult(deleted=tuple(deleted), stripped=tuple(stripped))
+
     @staticmethod
     def _record_to_model(record: Any) -> ChannelNicknameRule:
+        rate_limit_count = record["rate_limit_count"]
+        rate_limit_window = record["rate_limit_window"]
         return ChannelNicknameRule(
             guild_id=int(record["guild_id"]),
             channel_id=int(record["channel_id"]),
             role_id=int(record["role_id"]),
             updated_by=int(record["updated_by"]),
             updated_at=record["updated_at"],
+            extra_role_ids=tuple(int(role_id) for role_id in record["extra_role_ids"] or ()),
+            exempt_role_ids=tuple(int(role_id) for role_id in record["exempt_role_ids"] or ()),
+            content_allowlist=tuple(record["content_allowlist"] or ()),
+            rewrite_content=bool(record["rewrite_content"]),
+            rate_limit_count=int(rate_limit_count) if rate_limit_count is not None else None,
+            rate_limit_window=int(rate_limit_window) if rate_limit_window is not None else None,
+        )
+
+
+class BackfillCheckpointRepository:
+    """nickname_sync_backfill_checkpoints テーブルと、走査中に見つかった投稿者を
+    保持する nickname_sync_backfill_authors テーブルを扱うリポジトリ。"""
+
+    def __init__(self, database: Database) -> None:
+        self._database = database
+
+    async def save_checkpoint(
+        self,
+        *,
+        guild_id: int,
+        channel_id: int,
+        role_id: int,
+        phase: BackfillPhase,
+        last_message_id: int | None,
+        last_user_id: int | None,
+        author_ids: Sequence[int],
+        scanned_messages: int,
+        granted_count: int,
+        requested_by: int,
+    ) -> BackfillCheckpoint:
+        self._database.mark_written(_checkpoint_key(guild_id, channel_id))
+        record = await self._database.fetchrow(
+            SAVE_BACKFILL_CHECKPOINT_SQL,
+            guild_id,
+            channel_id,
+            role_id,
+            phase,
+            last_message_id,
+            last_user_id,
+            list(author_ids),
+            scanned_messages,
+            granted_count,
+            requested_by,
+        )
+        assert record is not None, "Upsert should always return the affected row."
+        return self._record_to_model(record)
+
+    async def save_scan_progress(
+        self,
+        *,
+        guild_id: int,
+        channel_id: int,
+        role_id: int,
+        phase: BackfillPhase,
+        last_message_id: int | None,
+        new_author_ids: Sequence[int],
+        scanned_messages: int,
+        requested_by: int,
+    ) -> None:
+        """走査の再開位置と件数を保存し、前回の保存以降に見つかった投稿者 ID を追記する。"""
+
+        self._database.mark_written(_checkpoint_key(guild_id, channel_id))
+        await self._database.execute(
+            SAVE_BACKFILL_SCAN_SQL,
+            guild_id,
+            channel_id,
+            role_id,
+            phase,
+            last_message_id,
+            scanned_messages,
+            requested_by,
+            list(new_author_ids),
+        )
+
+    async def complete_checkpoint(
+        self,
+        *,
+        guild_id: int,
+        channel_id: int,
+        scanned_messages: int,
+        granted_count: int,
+    ) -> None:
+        """完了を記録し、不要になった投稿者 ID を削除する。"""
+
+        self._database.mark_written(_checkpoint_key(guild_id, channel_id))
+        await self._database.execute(
+            COMPLETE_BACKFILL_CHECKPOINT_SQL,
+            guild_id,
+            channel_id,
+            scanned_messages,
+            granted_count,
+        )
+
+    async def update_progress(
+        self,
+        *,
+        guild_id: int,
+        channel_id: int,
+        phase: BackfillPhase,
+        last_user_id: int | None,
+        scanned_messages: int,
+        granted_count: int,
+    ) -> None:
+        """投稿者 ID の一覧には触れず、付与位置と件数だけを更新する。"""
+
+        self._database.mark_written(_checkpoint_key(guild_id, channel_id))
+        await self._database.execute(
+            UPDATE_BACKFILL_PROGRESS_SQL,
+            guild_id,
+            channel_id,
+            phase,
+            last_user_id,
+            scanned_messages,
+            granted_count,
+        )
+
+    async def get_checkpoint(
+        self,
+        *,
+        guild_id: int,
+        channel_id: int,
+    ) -> BackfillCheckpoint | None:
+        record = await self._database.fetchrow_readonly(
+            GET_BACKFILL_CHECKPOINT_SQL,
+            guild_id,
+            channel_id,
+            key=_checkpoint_key(guild_id, channel_id),
+        )
+        if record is None:
+            return None
+        return self._record_to_model(record)
+
+    async def delete_checkpoint(self, *, guild_id: int, channel_id: int) -> None:
+        self._database.mark_written(_checkpoint_key(guild_id, channel_id))
+        await self._database.execute(
+            DELETE_BACKFILL_CHECKPOINT_SQL,
+            guild_id,
+            channel_id,
+        )
+
+    @staticmethod
+    def _record_to_model(record: Any) -> BackfillCheckpoint:
+        last_message_id = record["last_message_id"]
+        last_user_id = record["last_user_id"]
+        return BackfillCheckpoint(
+            guild_id=int(record["guild_id"]),
+            channel_id=int(record["channel_id"]),
+            role_id=int(record["role_id"]),
+            phase=record["phase"],
+            last_message_id=int(last_message_id) if last_message_id is not None else None,
+            last_user_id=int(last_user_id) if last_user_id is not None else None,
+            author_ids=tuple(sorted({int(author_id) for author_id in record["author_ids"] or ()})),
+            scanned_messages=int(record["scanned_messages"]),
+            granted_count=int(record["granted_count"]),
+            requested_by=int(record["requested_by"]),
+            updated_at=record["updated_at"],
         )
 
 
-__all__ = ["ChannelNicknameRuleRepository"]
+__all__ = ["BackfillCheckpointRepository", "ChannelNicknameRuleRepository"]
@@ -1,12 +1,27 @@
 from __future__ import annotations
 
+import asyncio
+import dataclasses
 import logging
-from typing import Dict, Tuple
+import time
+from typing import TYPE_CHECKING, Dict, FrozenSet, Iterable, List, Set, Tuple
 
 import discord
 
+from app.database import DATABASE_ERRORS
+from app.logging_setup import log_context
+from app.metrics import REGISTRY, MetricsRegistry
+from app.tracing import TRACER
+from bot.outbound import OutboundPriority, OutboundScheduler, run_outbound
+
 from .models import ChannelNicknameRule
+from .policy import CompiledChannelPolicy, PolicyCompileError
 from .repository import ChannelNicknameRuleRepository
+from .snapshot import RuleSnapshotStore
+
+
+if TYPE_CHECKING:
+    from bot.member_cache import ActiveMemberCache
 
 
 LOGGER = logging.getLogger(__name__)
@@ -15,12 +30,42 @@ LOGGER = logging.getLogger(__name__)
 CacheKey = Tuple[int, int]
 
 
+# DB からの参照に失敗した後、スナップショットだけで応答し続ける秒数。
+DATABASE_RETRY_INTERVAL = 30.0
+
+
 class NicknameSyncService:
-    """Nickname/Role 同期ルールを適用するサービス。"""
+    """Nickname/Role 同期ルールを適用するサービス。
 
-    def __init__(self, repository: ChannelNicknameRuleRepository) -> None:
+    ルールは DB から取得してチャンネル単位でキャッシュする。DB の応答が
+    ``lookup_timeout`` 秒を超えるか失敗した場合は、ローカルのスナップショットの
+    ルールで処理を続け、DB が回復した後の ``refresh_snapshot`` で置き換える。
+    """
+
+    def __init__(
+        self,
+        repository: ChannelNicknameRuleRepository,
+        *,
+        member_cache: "ActiveMemberCache | None" = None,
+        outbound: OutboundScheduler | None = None,
+        snapshot: RuleSnapshotStore | None = None,
+        lookup_timeout: float = 0.5,
+        metrics: MetricsRegistry = REGISTRY,
+    ) -> None:
         self._repository = repository
-        self._cache: Dict[CacheKey, ChannelNicknameRule | None] = {}
+        self._member_cache = member_cache
+        self._outbound = outbound
+        self._snapshot = snapshot
+        self._lookup_timeout = lookup_timeout
+        self._metrics = metrics
+        self._cache: Dict[CacheKey, CompiledChannelPolicy | None] = {}
+        self._snapshot_rules: Dict[CacheKey, ChannelNicknameRule] = {}
+        # スナップショットから補ったキャッシュエントリー（DB で確認できていないもの）。
+        self._fallback_keys: Set[CacheKey] = set()
+        self._database_retry_at = 0.0
+        if snapshot is not None:
+            self._replace_snapshot_rules(snapshot.load())
+            LOGGER.info("同期ルールのスナップショットを読み込みました: %s 件", len(self._snapshot_rules))
 
     async def enforce(self, message: discord.Message) -> None:
         guild = message.guild
@@ -31,36 +76,251 @@ class NicknameSyncService:
         if channel_id is None:
             return
 
-        rule = await self._get_rule(guild_id=guild.id, channel_id=channel_id)
-        if rule is None:
-            return
+        with log_context(guild_id=guild.id, channel_id=channel_id, user_id=message.author.id):
+            policy = await self._get_policy(guild_id=guild.id, channel_id=channel_id)
+            if policy is None:
+                return
 
-        member = message.author
-        if not isinstance(member, discord.Member):
-            return
+            member = message.author
+            if not isinstance(member, discord.Member):
+                return
+
+            decision = policy.evaluate(
+                user_id=member.id,
+                member_role_ids=self._member_role_ids(member),
+                content=message.content,
+                display_name=self._resolve_display_name(member),
+                now=time.monotonic(),
+            )
+            if decision.delete:
+                await self._delete_message(message)
+                return
+            if decision.rewrite_to is not None:
+                await self._edit_message_content(message, decision.rewrite_to)
+            for role_id in policy.rule.role_ids:
+                if role_id in decision.grant_role_ids:
+                    await self._ensure_role(member, role_id)
+
+    @property
+    def cache_size(self) -> int:
+        """キャッシュしているチャンネル数（ルールなしの結果も含む）。"""
+
+        return len(self._cache)
 
-        display_name = self._resolve_display_name(member)
-        if display_name and message.content != display_name:
-            await self._edit_message_content(message, display_name)
+    @property
+    def snapshot_size(self) -> int:
+        """ローカルスナップショットに保持しているルール数。"""
 
-        await self._ensure_role(member, rule.role_id)
+        return len(self._snapshot_rules)
 
     def invalidate_cache(self, guild_id: int, channel_id: int) -> None:
         self._cache.pop((guild_id, channel_id), None)
+        self._fallback_keys.discard((guild_id, channel_id))
+
+    def snapshot_rules(self) -> List[ChannelNicknameRule]:
+        """ローカルスナップショットのルール一覧（DB に届かないときの整理対象の把握用）。"""
+
+        return list(self._snapshot_rules.values())
+
+    def evict(
+        self,
+        *,
+        guild_ids: Iterable[int] = (),
+        channel_ids: Iterable[int] = (),
+        role_ids: Iterable[int] = (),
+    ) -> int:
+        """削除されたギルド・チャンネル・ロールに関わるキャッシュとスナップショットのルールを捨てる。
+
+        主ロール以外（追加・除外ロール）だけが一致したルールもキャッシュから外し、
+        次の参照で DB の整理後のルールを読み直させる。捨てたキャッシュ件数を返す。
+        """
+
+        guilds, channels, roles = set(guild_ids), set(channel_ids), set(role_ids)
+
+        def removed(key: CacheKey, rule: ChannelNicknameRule | None) -> bool:
+            return key[0] in guilds or key[1] in channels or (rule is not None and rule.role_id in roles)
+
+        def references(rule: ChannelNicknameRule | None) -> bool:
+            return rule is not None and not roles.isdisjoint((*rule.extra_role_ids, *rule.exempt_role_ids))
+
+        evicted = 0
+        for key, policy in list(self._cache.items()):
+            rule = policy.rule if policy is not None else None
+            if removed(key, rule) or references(rule):
+                del self._cache[key]
+                self._fallback_keys.discard(key)
+                evicted += 1
+        for key, rule in list(self._snapshot_rules.items()):
+            if removed(key, rule):
+                del self._snapshot_rules[key]
+            elif references(rule):
+                self._snapshot_rules[key] = dataclasses.replace(
+                    rule,
+                    extra_role_ids=tuple(role_id for role_id in rule.extra_role_ids if role_id not in roles),
+                    exempt_role_ids=tuple(role_id for role_id in rule.exempt_role_ids if role_id not in roles),
+                )
+        return evicted
+
+    async def refresh_snapshot(self) -> bool:
+        """DB からルール全件を読み直し、スナップショットとキャッシュを更新する。
+
+        DB に届かなかった場合は何も変更せず False を返す。
+        """
+
+        try:
+            rules = await self._repository.list_rules()
+        except DATABASE_ERRORS as exc:
+            LOGGER.warning("同期ルールのスナップショットを更新できませんでした: %s", exc)
+            return False
+
+        self._replace_snapshot_rules(rules)
+        self._database_retry_at = 0.0
+        self._reconcile_cache()
+        if self._snapshot is not None:
+            try:
+                await asyncio.to_thread(self._snapshot.save, rules)
+            except OSError:
+                LOGGER.exception("同期ルールのスナップショットを保存できませんでした: %s", self._snapshot.path)
+        self._metrics.set_gauge("nickname_sync.snapshot_rules", len(self._snapshot_rules))
+        LOGGER.debug("同期ルールのスナップショットを更新しました: %s 件", len(self._snapshot_rules))
+        return True
 
-    async def _get_rule(
+    async def get_rule(
         self,
         *,
         guild_id: int,
         channel_id: int,
     ) -> ChannelNicknameRule | None:
+        """キャッシュ経由でチャンネルの同期ルールを取得する。"""
+
+        policy = await self._get_policy(guild_id=guild_id, channel_id=channel_id)
+        return policy.rule if policy is not None else None
+
+    async def ensure_role(self, member: discord.Member, role_id: int) -> bool:
+        """メッセージ投稿時と同じ経路でロールを付与し、付与したかどうかを返す。"""
+
+        return await self._ensure_role(member, role_id)
+
+    async def ensure_rule_roles(self, member: discord.Member, rule: ChannelNicknameRule) -> bool:
+        """ルールの付与対象ロールを揃え、1 つでも付与したかどうかを返す。
+
+        除外ロールを持つメンバーには何もしない。
+        """
+
+        member_role_ids = self._member_role_ids(member)
+        if not member_role_ids.isdisjoint(rule.exempt_role_ids):
+            return False
+        granted = False
+        for role_id in rule.role_ids:
+            if role_id not in member_role_ids and await self._ensure_role(member, role_id):
+                granted = True
+        return granted
+
+    async def resolve_member(self, guild: discord.Guild, user_id: int) -> discord.Member | None:
+        """アクティブメンバーキャッシュ経由でメンバーを取得する。"""
+
+        if self._member_cache is not None:
+            return await self._member_cache.resolve(guild, user_id)
+        member = guild.get_member(user_id)
+        if member is not None:
+            return member
+        try:
+            return await guild.fetch_member(user_id)
+        except discord.NotFound:
+            return None
+        except discord.HTTPException as exc:
+            LOGGER.warning(
+                "メンバー情報の取得に失敗しました (guild=%s, user=%s): %s",
+                guild.id,
+                user_id,
+                exc,
+            )
+            return None
+
+    async def _get_policy(
+        self,
+        *,
+        guild_id: int,
+        channel_id: int,
+    ) -> CompiledChannelPolicy | None:
         key = (guild_id, channel_id)
-        if key not in self._cache:
-            self._cache[key] = await self._repository.get_rule_for_channel(
-                guild_id=guild_id,
-                channel_id=channel_id,
+        with TRACER.span("cache.nickname_rule", guild_id=guild_id, channel_id=channel_id) as span:
+            if key in self._cache:
+                span.set_attribute("hit", True)
+            else:
+                span.set_attribute("hit", False)
+                rule = await self._lookup_rule(key)
+                self._cache[key] = self._compile(rule) if rule is not None else None
+            return self._cache[key]
+
+    async def _lookup_rule(self, key: CacheKey) -> ChannelNicknameRule | None:
+        if time.monotonic() < self._database_retry_at:
+            return self._fallback_rule(key, "database_unavailable")
+        try:
+            rule = await asyncio.wait_for(
+                self._repository.get_rule_for_channel(guild_id=key[0], channel_id=key[1]),
+                timeout=self._lookup_timeout,
+            )
+        except asyncio.TimeoutError:
+            return self._on_lookup_failure(key, "timeout", f"{self._lookup_timeout}s 以内に応答がありません")
+        except DATABASE_ERRORS as exc:
+            return self._on_lookup_failure(key, "error", exc)
+        self._fallback_keys.discard(key)
+        return rule
+
+    def _on_lookup_failure(self, key: CacheKey, reason: str, detail: object) -> ChannelNicknameRule | None:
+        # 失敗のたびにタイムアウトまで待たないよう、しばらくは DB に問い合わせない。
+        self._database_retry_at = time.monotonic() + DATABASE_RETRY_INTERVAL
+        LOGGER.warning(
+            "同期ルールを DB から取得できないため、スナップショットを使います (guild=%s, channel=%s): %s",
+            key[0],
+            key[1],
+            detail,
+        )
+        return self._fallback_rule(key, reason)
+
+    def _fallback_rule(self, key: CacheKey, reason: str) -> ChannelNicknameRule | None:
+        self._metrics.increment("nickname_sync.rule_fallbacks", reason=reason)
+        self._fallback_keys.add(key)
+        return self._snapshot_rules.get(key)
+
+    def _replace_snapshot_rules(self, rules: Iterable[ChannelNicknameRule]) -> None:
+        self._snapshot_rules = {(rule.guild_id, rule.channel_id): rule for rule in rules}
+
+    def _reconcile_cache(self) -> None:
+        """DB から読み直したルールと食い違うキャッシュを捨て、次の参照で取り直させる。
+
+        ルールが変わっていないチャンネルはコンパイル済みポリシー（投稿数の
+        カウンターを含む）をそのまま残す。
+        """
+
+        for key, policy in list(self._cache.items()):
+            rule = self._snapshot_rules.get(key)
+            cached_rule = policy.rule if policy is not None else None
+            if key in self._fallback_keys or rule != cached_rule:
+                self._cache.pop(key, None)
+        self._fallback_keys.clear()
+
+    @staticmethod
+    def _compile(rule: ChannelNicknameRule) -> CompiledChannelPolicy | None:
+        try:
+            return CompiledChannelPolicy(rule)
+        except PolicyCompileError as exc:
+            LOGGER.error(
+                "同期ルールを読み込めないため、このチャンネルの同期を停止します (guild=%s, channel=%s): %s",
+                rule.guild_id,
+                rule.channel_id,
+                exc,
             )
-        return self._cache[key]
+            return None
+
+    def _member_role_ids(self, member: discord.Member) -> FrozenSet[int]:
+        if self._member_cache is not None:
+            self._member_cache.remember(member)
+            role_ids = self._member_cache.role_ids(member.guild.id, member.id)
+            if role_ids is not None:
+                return role_ids
+        return frozenset(role.id for role in member.roles)
 
     @staticmethod
     def _resolve_display_name(member: discord.Member) -> str:
@@ -72,7 +332,13 @@ class NicknameSyncService:
 
     async def _edit_message_content(self, message: discord.Message, content: str) -> None:
         try:
-            await message.edit(content=content)
+            await run_outbound(
+                self._outbound,
+                OutboundPriority.BACKGROUND,
+                message.guild.id if message.guild else None,
+                lambda: message.edit(content=content),
+                bucket=("edit_message", getattr(message.channel, "id", None)),
+            )
             LOGGER.debug(
                 "メッセージ内容をニックネームと同期しました (guild=%s, channel=%s, user=%s)",
                 message.guild.id if message.guild else "n/a",
@@ -87,7 +353,27 @@ class NicknameSyncService:
         except discord.HTTPException as exc:
             LOGGER.warning("メッセージ編集でHTTPエラーが発生しました: %s", exc)
 
-    async def _ensure_role(self, member: discord.Member, role_id: int) -> None:
+    async def _delete_message(self, message: discord.Message) -> None:
+        try:
+            await run_outbound(
+                self._outbound,
+                OutboundPriority.BACKGROUND,
+                message.guild.id if message.guild else None,
+                lambda: message.delete(),
+                bucket=("delete_message", getattr(message.channel, "id", None)),
+            )
+            LOGGER.debug("投稿間隔の上限を超えたメッセージを削除しました (user=%s)", message.author.id)
+        except discord.NotFound:
+            pass
+        except discord.Forbidden:
+            LOGGER.warning(
+                "メッセージ削除権限が不足しているため投稿数制限を適用できませんでした (channel=%s)",
+                getattr(message.channel, "id", "n/a"),
+            )
+        except discord.HTTPException as exc:
+            LOGGER.warning("メッセージ削除でHTTPエラーが発生しました: %s", exc)
+
+    async def _ensure_role(self, member: discord.Member, role_id: int) -> bool:
         role = member.guild.get_role(role_id)
         if role is None:
             LOGGER.warning(
@@ -95,13 +381,27 @@ class NicknameSyncService:
                 member.guild.id,
                 role_id,
             )
-            return
+            return False
 
-        if role in member.roles:
-            return
+        has_role = None
+        if self._member_cache is not None:
+            has_role = self._member_cache.has_role(member.guild.id, member.id, role_id)
+        if has_role is None:
+            # キャッシュ外ならメッセージ等に含まれるメンバー情報で判定する。
+            has_role = role in member.roles
+        if has_role:
+            return False
 
         try:
-            await member.add_roles(role, reason="Channel nickname sync enforcement")
+            await run_outbound(
+                self._outbound,
+                OutboundPriority.BACKGROUND,
+                member.guild.id,
+                lambda: member.add_roles(role, reason="Channel nickname sync enforcement"),
+                bucket=("add_role", member.guild.id),
+            )
+            if self._member_cache is not None:
+                self._member_cache.note_role_added(member.guild.id, member.id, role.id)
             LOGGER.info(
                 "ユーザーにロールを付与しました (guild=%s, user=%s, role=%s)",
                 member.guild.id,
@@ -114,8 +414,11 @@ class NicknameSyncService:
                 member.guild.id,
                 role.id,
             )
+            return False
         except discord.HTTPException as exc:
             LOGGER.warning("ロール付与でHTTPエラーが発生しました: %s", exc)
+            return False
+        return True
 
 
 __all__ = ["NicknameSyncService"]
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, List
+
+import discord
+
+from .models import ChannelNicknameRule
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+SNAPSHOT_VERSION = 1
+
+# スナップショットの形式:
+#   {"version": 1, "columns": [...], "rules": [[列の値, ...], ...]}
+# キー名を行ごとに繰り返さない配列形式にして、ファイルを小さく・読み込みを速くする。
+# 日時は ISO 8601 文字列で保存する。
+_COLUMNS = (
+    "guild_id",
+    "channel_id",
+    "role_id",
+    "updated_by",
+    "updated_at",
+    "extra_role_ids",
+    "exempt_role_ids",
+    "content_allowlist",
+    "rewrite_content",
+    "rate_limit_count",
+    "rate_limit_window",
+)
+
+
+class RuleSnapshotStore:
+    """同期ルール全件をデータディレクトリへ保存・読み込みするローカルスナップショット。
+
+    データベースが遅い・停止しているときのルール参照先として使う。
+    書き込みは一時ファイルへ出力してから置き換えるため、途中で停止しても
+    直前のスナップショットが壊れることはない。
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def load(self) -> List[ChannelNicknameRule]:
+        """スナップショットを読み込む。ファイルがない・壊れている場合は空のリスト。"""
+
+        try:
+            raw = self._path.read_bytes()
+        except FileNotFoundError:
+            return []
+        except OSError as exc:
+            LOGGER.warning("ルールのスナップショットを読み込めませんでした (%s): %s", self._path, exc)
+            return []
+
+        try:
+            payload = discord.utils._from_json(raw)
+            if payload.get("version") != SNAPSHOT_VERSION or payload.get("columns") != list(_COLUMNS):
+                raise ValueError(f"unsupported snapshot format: version={payload.get('version')}")
+            return [_row_to_rule(row) for row in payload["rules"]]
+        except (ValueError, TypeError, KeyError, AttributeError) as exc:
+            LOGGER.warning("ルールのスナップショットが壊れているため無視します (%s): %s", self._path, exc)
+            return []
+
+    def save(self, rules: Iterable[ChannelNicknameRule]) -> int:
+        """ルール全件でスナップショットを置き換え、保存した件数を返す。"""
+
+        rows = [_rule_to_row(rule) for rule in rules]
+        body = discord.utils._to_json({"version": SNAPSHOT_VERSION, "columns": _COLUMNS, "rules": rows})
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self._path.with_name(self._path.name + ".tmp")
+        with temporary.open("w", encoding="utf-8") as file:
+            file.write(body)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self._path)
+        return len(rows)
+
+
+def _rule_to_row(rule: ChannelNicknameRule) -> List[Any]:
+    return [
+        rule.guild_id,
+        rule.channel_id,
+        rule.role_id,
+        rule.updated_by,
+        rule.updated_at.isoformat(),
+        list(rule.extra_role_ids),
+        list(rule.exempt_role_ids),
+        list(rule.content_allowlist),
+        rule.rewrite_content,
+        rule.rate_limit_count,
+        rule.rate_limit_window,
+    ]
+
+
+def _row_to_rule(row: List[Any]) -> ChannelNicknameRule:
+    (
+        guild_id,
+        channel_id,
+        role_id,
+        updated_by,
+        updated_at,
+        extra_role_ids,
+        exempt_role_ids,
+        content_allowlist,
+        rewrite_content,
+        rate_limit_count,
+        rate_limit_window,
+    ) = row
+    return ChannelNicknameRule(
+        guild_id=int(guild_id),
+        channel_id=int(channel_id),
+        role_id=int(role_id),
+        updated_by=int(updated_by),
+        updated_at=datetime.fromisoformat(updated_at),
+        extra_role_ids=tuple(int(role_id) for role_id in extra_role_ids),
+        exempt_role_ids=tuple(int(role_id) for role_id in exempt_role_ids),
+        content_allowlist=tuple(str(pattern) for pattern in content_allowlist),
+        rewrite_content=bool(rewrite_content),
+        rate_limit_count=int(rate_limit_count) if rate_limit_count is not None else None,
+        rate_limit_window=int(rate_limit_window) if rate_limit_window is not None else None,
+    )
+
+
+__all__ = ["RuleSnapshotStore", "SNAPSHOT_VERSION"]
@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Awaitable, Callable, Dict, Hashable, List, Mapping, Tuple, TypeVar
+
+from app.metrics import REGISTRY, MetricsRegistry
+from app.tracing import TRACER
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+T = TypeVar("T")
+
+
+class OutboundPriority(IntEnum):
+    """REST 呼び出しの優先度クラス（値が小さいほど優先）。"""
+
+    INTERACTION = 0  # インタラクションへの応答
+    USER_VISIBLE = 1  # 一時VCの作成・移動など利用者が待っている処理
+    BACKGROUND = 2  # 片付け・ロール付与などのバックグラウンド処理
+
+
+@dataclass(order=True, slots=True)
+class _Waiter:
+    finish_tag: float
+    seq: int
+    start_tag: float = field(compare=False)
+    guild_id: int = field(compare=False)
+    bucket: Hashable | None = field(compare=False)
+    future: asyncio.Future[None] = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+
+class OutboundScheduler:
+    """Bot 全体の REST 呼び出しを優先度クラスとギルド間の公平性で並べる。
+
+    同時実行数を ``concurrency`` に制限し、空いた枠は優先度の高いクラスから
+    割り当てる。下位クラスは上位クラス用に ``reserved`` 枠ずつ残して使うため、
+    片付け処理が詰まっていてもインタラクション応答は待たされない。
+
+    同じクラス内ではギルドごとに仮想終了時刻を付ける重み付き公平キューイング
+    （WFQ）で順番を決め、特定のギルドの大量処理が他のギルドを飢えさせない。
+    実際のレート制限の待機は discord.py に任せ、ここでは順序だけを制御する。
+
+    discord.py はルートのレート制限を待つ間も枠を占有するため、同じ ``bucket``
+    （おおむね Discord のルートと主要パラメーター）の同時実行は ``per_bucket``
+    件までとし、1 つのルートの 429 待ちが他のルートを塞がないようにする。
+
+    ``call_timeout`` を指定すると、枠の待機をその秒数で打ち切り、
+    ``asyncio.TimeoutError`` を送出する。打ち切るのは待機だけで、始まった呼び出しは
+    取り消さない（作成済みのチャンネルを呼び出し元が記録できなくなるため）。
+    したがって ``asyncio.TimeoutError`` を受け取った場合、``func`` は呼ばれていない。
+    """
+
+    def __init__(
+        self,
+        *,
+        concurrency: int = 8,
+        reserved: int = 1,
+        per_bucket: int = 2,
+        guild_weights: Mapping[int, float] | None = None,
+        call_timeout: float | None = None,
+        metrics: MetricsRegistry = REGISTRY,
+    ) -> None:
+        self._concurrency = max(1, concurrency)
+        self._call_timeout = call_timeout
+        self._reserved = max(0, reserved)
+        self._per_bucket = max(1, per_bucket)
+        self._guild_weights = dict(guild_weights or {})
+        self._metrics = metrics
+        self._queues: Dict[OutboundPriority, List[_Waiter]] = {priority: [] for priority in OutboundPriority}
+        self._virtual_time: Dict[OutboundPriority, float] = {priority: 0.0 for priority in OutboundPriority}
+        self._last_finish: Dict[Tuple[OutboundPriority, int], float] = {}
+        self._guild_depths: Dict[Tuple[OutboundPriority, int], int] = {}
+        self._depths: Dict[OutboundPriority, int] = {priority: 0 for priority in OutboundPriority}
+        self._inflight: Dict[OutboundPriority, int] = {priority: 0 for priority in OutboundPriority}
+        self._bucket_inflight: Dict[Hashable, int] = {}
+        self._seq = itertools.count()
+
+    @property
+    def concurrency(self) -> int:
+        return self._concurrency
+
+    async def submit(
+        self,
+        priority: OutboundPriority,
+        guild_id: int | None,
+        func: Callable[[], Awaitable[T]],
+        *,
+        bucket: Hashable | None = None,
+        cost: float = 1.0,
+        timeout: float | None = None,
+    ) -> T:
+        """実行枠を確保してから ``func`` を呼び出し、その結果を返す。
+
+        ``timeout`` は枠の待機の上限で、省略するとスケジューラーの ``call_timeout`` を使う。
+        """
+
+        guild = guild_id or 0
+        timeout = self._call_timeout if timeout is None else timeout
+        with TRACER.span("outbound.wait", priority=priority.name, guild_id=guild):
+            if timeout is None:
+                await self._acquire(priority, guild, bucket, cost)
+            else:
+                try:
+                    await asyncio.wait_for(self._acquire(priority, guild, bucket, cost), timeout)
+                except asyncio.TimeoutError:
+                    self._metrics.increment("outbound.timeouts", priority=priority.name)
+                    raise
+        try:
+            return await func()
+        finally:
+            self._release(priority, bucket)
+
+    def queue_depths(self) -> Dict[OutboundPriority, int]:
+        return dict(self._depths)
+
+    def guild_depths(self, priority: OutboundPriority | None = None) -> Dict[int, int]:
+        """ギルド ID ごとの待機件数を返す。priority を省略すると全クラスの合計。"""
+
+        depths: Dict[int, int] = {}
+        for (queued_priority, guild_id), depth in self._guild_depths.items():
+            if priority is None or queued_priority == priority:
+                depths[guild_id] = depths.get(guild_id, 0) + depth
+        return depths
+
+    def inflight(self) -> Dict[OutboundPriority, int]:
+        return dict(self._inflight)
+
+    async def _acquire(
+        self,
+        priority: OutboundPriority,
+        guild_id: int,
+        bucket: Hashable | None,
+        cost: float,
+    ) -> None:
+        self._metrics.increment("outbound.requests", priority=priority.name)
+        if (
+            self._can_start(priority, bucket)
+            and not any(self._depths[p] for p in OutboundPriority if p <= priority)
+        ):
+            self._start(priority, bucket)
+            return
+
+        key = (priority, guild_id)
+        start_tag = max(self._virtual_time[priority], self._last_finish.get(key, 0.0))
+        finish_tag = start_tag + cost / self._guild_weights.get(guild_id, 1.0)
+        self._last_finish[key] = finish_tag
+        waiter = _Waiter(
+            finish_tag=finish_tag,
+            seq=next(self._seq),
+            start_tag=start_tag,
+            guild_id=guild_id,
+            bucket=bucket,
+            future=asyncio.get_running_loop().create_future(),
+            enqueued_at=time.monotonic(),
+        )
+        heapq.heappush(self._queues[priority], waiter)
+        self._guild_depths[key] = self._guild_depths.get(key, 0) + 1
+        self._depths[priority] += 1
+        self._publish(priority)
+        # 取り消し済みの待機者だけが残っている場合に備え、その場で割り当てを試みる。
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 枠が割り当てられた直後に取り消された場合は枠を返す。
+                self._release(priority, bucket)
+            else:
+                waiter.future.cancel()
+                self._dequeued(priority, waiter)
+                # 取り消された待機者はヒープに残り、割り当て時に読み飛ばされる。
+            raise
+
+    def _can_start(self, priority: OutboundPriority, bucket: Hashable | None = None) -> bool:
+        limit = max(1, self._concurrency - self._reserved * int(priority))
+        if sum(self._inflight.values()) >= limit:
+            return False
+        return bucket is None or self._bucket_inflight.get(bucket, 0) < self._per_bucket
+
+    def _start(self, priority: OutboundPriority, bucket: Hashable | None) -> None:
+        self._inflight[priority] += 1
+        if bucket is not None:
+            self._bucket_inflight[bucket] = self._bucket_inflight.get(bucket, 0) + 1
+        self._metrics.set_gauge("outbound.inflight", self._inflight[priority], priority=priority.name)
+
+    def _release(self, priority: OutboundPriority, bucket: Hashable | None) -> None:
+        self._inflight[priority] -= 1
+        if bucket is not None:
+            remaining = self._bucket_inflight.get(bucket, 0) - 1
+            if remaining > 0:
+                self._bucket_inflight[bucket] = remaining
+            else:
+                self._bucket_inflight.pop(bucket, None)
+        self._metrics.set_gauge("outbound.inflight", self._inflight[priority], priority=priority.name)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        for priority in OutboundPriority:
+            queue = self._queues[priority]
+            blocked: List[_Waiter] = []
+            while queue and self._can_start(priority):
+                waiter = heapq.heappop(queue)
+                if waiter.future.done():
+                    continue
+                if not self._can_start(priority, waiter.bucket):
+                    # 同じルートの実行中が上限に達している待機者は順番を保ったまま後回しにする。
+                    blocked.append(waiter)
+                    continue
+                self._virtual_time[priority] = max(self._virtual_time[priority], waiter.start_tag)
+                self._dequeued(priority, waiter)
+                self._metrics.increment(
+                    "outbound.wait_seconds",
+                    time.monotonic() - waiter.enqueued_at,
+                    priority=priority.name,
+                )
+                self._start(priority, waiter.bucket)
+                waiter.future.set_result(None)
+            for waiter in blocked:
+                heapq.heappush(queue, waiter)
+            if self._depths[priority] > len(blocked):
+                # 上位クラスに待機者がいる間は下位クラスへ枠を渡さない。
+                break
+
+    def _dequeued(self, priority: OutboundPriority, waiter: _Waiter) -> None:
+        key = (priority, waiter.guild_id)
+        self._depths[priority] -= 1
+        remaining = self._guild_depths.get(key, 0) - 1
+        if remaining > 0:
+            self._guild_depths[key] = remaining
+        else:
+            self._guild_depths.pop(key, None)
+            # 待機がなくなったギルドの仮想時刻は次回の到着時に現在値から始める。
+            if self._last_finish.get(key, 0.0) <= self._virtual_time[priority]:
+                self._last_finish.pop(key, None)
+        self._publish(priority)
+
+    def _publish(self, priority: OutboundPriority) -> None:
+        self._metrics.set_gauge("outbound.queue_depth", self._depths[priority], priority=priority.name)
+
+
+async def run_outbound(
+    scheduler: OutboundScheduler | None,
+    priority: OutboundPriority,
+    guild_id: int | None,
+    func: Callable[[], Awaitable[T]],
+    *,
+    bucket: Hashable | None = None,
+    timeout: float | None = None,
+) -> T:
+    """スケジューラーが設定されていれば経由し、なければそのまま ``func`` を呼ぶ。
+
+    ``timeout`` は枠の待機の上限で、スケジューラーがない場合は待機がないため使わない。
+    """
+
+    if scheduler is None:
+        return await func()
+    return await scheduler.submit(priority, guild_id, func, bucket=bucket, timeout=timeout)
+
+
+__all__ = ["OutboundPriority", "OutboundScheduler", "run_outbound"]
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import logging
+import struct
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, Sequence
+
+import discord
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+# 記録ファイルの形式:
+#   先頭に MAGIC（非圧縮）、以降は zlib ストリーム。展開した中身は
+#   [_RECORD ヘッダー (時刻 float64, イベント名長 u16, データ長 u32)][イベント名][JSON] の繰り返し。
+# 一定件数ごとに Z_SYNC_FLUSH するため、異常終了しても直前までのレコードは読み出せる。
+MAGIC = b"GWREC1\n"
+FILE_SUFFIX = ".gwrec"
+_RECORD = struct.Struct(">dHI")
+
+DEFAULT_RECORDED_EVENTS = frozenset(
+    {
+        "READY",
+        "GUILD_CREATE",
+        "GUILD_UPDATE",
+        "GUILD_DELETE",
+        "CHANNEL_CREATE",
+        "CHANNEL_UPDATE",
+        "CHANNEL_DELETE",
+        "GUILD_ROLE_CREATE",
+        "GUILD_ROLE_UPDATE",
+        "GUILD_ROLE_DELETE",
+        "GUILD_MEMBER_UPDATE",
+        "GUILD_MEMBER_REMOVE",
+        "MESSAGE_CREATE",
+        "VOICE_STATE_UPDATE",
+    }
+)
+
+# 再接続に使える情報は記録しない。
+_READY_SCRUBBED_KEYS = ("session_id", "resume_gateway_url")
+
+
+@dataclass(frozen=True, slots=True)
+class RecordedEvent:
+    """記録ファイルから読み出した 1 件のゲートウェイイベント。"""
+
+    timestamp: float
+    event: str
+    data: Any
+
+
+class GatewayRecorder:
+    """BotClient が処理したゲートウェイの DISPATCH ペイロードをファイルへ記録する。
+
+    ``install`` で ConnectionState のパーサーを包み、対象イベントだけを
+    長さ付きのレコードとして圧縮ファイルへ追記する。ファイルが ``max_bytes``
+    を超えたら新しいファイルへ切り替え、古いものから ``max_files`` 個を残して
+    削除する。書き込みに失敗した場合は記録だけを止め、イベント処理は続ける。
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        events: Iterable[str] = DEFAULT_RECORDED_EVENTS,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_files: int = 5,
+        flush_every: int = 64,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._directory = directory
+        self._events = frozenset(event.upper() for event in events)
+        self._max_bytes = max(1024, max_bytes)
+        self._max_files = max(1, max_files)
+        self._flush_every = max(1, flush_every)
+        self._clock = clock
+        self._file: BinaryIO | None = None
+        self._compressor: Any = None
+        self._written = 0
+        self._pending = 0
+        self._sequence = 0
+        self._enabled = True
+        self.recorded = 0
+
+    @property
+    def events(self) -> frozenset[str]:
+        return self._events
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def install(self, state: Any) -> None:
+        """ConnectionState のパーサーを、記録してから元の処理を呼ぶものに差し替える。
+
+        ゲートウェイは接続時に同じ辞書を参照するため、接続前に呼び出すこと。
+        """
+
+        parsers: Dict[str, Callable[[Any], Any]] = state.parsers
+        for event in sorted(self._events):
+            parser = parsers.get(event)
+            if parser is None:
+                LOGGER.warning("記録対象のイベントを処理するパーサーがありません: %s", event)
+                continue
+            parsers[event] = self._wrap(event, parser)
+
+    def record(self, event: str, data: Any) -> None:
+        if not self._enabled:
+            return
+        if event == "READY" and isinstance(data, dict):
+            data = {key: value for key, value in data.items() if key not in _READY_SCRUBBED_KEYS}
+        try:
+            self._write(event, data)
+        except Exception:
+            self._enabled = False
+            LOGGER.exception("ゲートウェイイベントの記録に失敗したため、記録を停止します。")
+            self._close_file()
+
+    def close(self) -> None:
+        self._enabled = False
+        self._close_file()
+
+    def _wrap(self, event: str, parser: Callable[[Any], Any]) -> Callable[[Any], Any]:
+        def parse(data: Any) -> Any:
+            self.record(event, data)
+            return parser(data)
+
+        return parse
+
+    def _write(self, event: str, data: Any) -> None:
+        if self._file is None:
+            self._open_file()
+        assert self._file is not None
+
+        name = event.encode("ascii")
+        body = discord.utils._to_json(data).encode("utf-8")
+        chunk = self._compressor.compress(_RECORD.pack(self._clock(), len(name), len(body)) + name + body)
+        self.recorded += 1
+        self._pending += 1
+        if self._pending >= self._flush_every:
+            chunk += self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._pending = 0
+        if chunk:
+            self._file.write(chunk)
+            self._written += len(chunk)
+        if self._pending == 0:
+            self._file.flush()
+        if self._written >= self._max_bytes:
+            self._close_file()
+
+    def _open_file(self) -> None:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+        self._sequence += 1
+        path = self._directory / f"gateway-{stamp}-{self._sequence:04d}{FILE_SUFFIX}"
+        self._file = path.open("wb")
+        self._file.write(MAGIC)
+        self._compressor = zlib.compressobj(6)
+        self._written = len(MAGIC)
+        self._pending = 0
+        LOGGER.info("ゲートウェイイベントの記録先を切り替えました: %s", path)
+        self._prune()
+
+    def _close_file(self) -> None:
+        file, self._file = self._file, None
+        if file is None:
+            return
+        try:
+            file.write(self._compressor.flush(zlib.Z_FINISH))
+        finally:
+            file.close()
+            self._compressor = None
+
+    def _prune(self) -> None:
+        recordings = list_recordings(self._directory)
+        for path in recordings[: max(0, len(recordings) - self._max_files)]:
+            try:
+                path.unlink()
+            except OSError:
+                LOGGER.warning("古い記録ファイルを削除できませんでした: %s", path)
+
+
+def list_recordings(directory: Path) -> list[Path]:
+    """ディレクトリ内の記録ファイルを古い順に返す。"""
+
+    if not directory.is_dir():
+        return []
+    return sorted(directory.glob(f"*{FILE_SUFFIX}"))
+
+
+def read_recording(path: Path, *, chunk_size: int = 64 * 1024) -> Iterator[RecordedEvent]:
+    """記録ファイルを先頭から読み出す。末尾の書きかけのレコードは読み飛ばす。"""
+
+    with path.open("rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"not a gateway recording: {path}")
+        decompressor = zlib.decompressobj()
+        buffer = bytearray()
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            try:
+                buffer.extend(decompressor.decompress(chunk))
+            except zlib.error:
+                LOGGER.warning("記録ファイルの途中が壊れているため、以降を読み飛ばします: %s", path)
+                break
+            yield from _drain_records(buffer)
+
+
+def read_recordings(paths: Sequence[Path]) -> Iterator[RecordedEvent]:
+    """ファイルまたはディレクトリの記録を古い順に連結して読み出す。"""
+
+    for path in paths:
+        files = list_recordings(path) if path.is_dir() else [path]
+        for file in files:
+            yield from read_recording(file)
+
+
+def _drain_records(buffer: bytearray) -> Iterator[RecordedEvent]:
+    offset = 0
+    while len(buffer) - offset >= _RECORD.size:
+        timestamp, name_length, data_length = _RECORD.unpack_from(buffer, offset)
+        end = offset + _RECORD.size + name_length + data_length
+        if len(buffer) < end:
+            break
+        name_start = offset + _RECORD.size
+        event = bytes(buffer[name_start : name_start + name_length]).decode("ascii")
+        data = discord.utils._from_json(bytes(buffer[name_start + name_length : end]).decode("utf-8"))
+        yield RecordedEvent(timestamp=timestamp, event=event, data=data)
+        offset = end
+    del buffer[:offset]
+
+
+__all__ = [
+    "DEFAULT_RECORDED_EVENTS",
+    "GatewayRecorder",
+    "RecordedEvent",
+    "list_recordings",
+    "read_recording",
+    "read_recordings",
+]
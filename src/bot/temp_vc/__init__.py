@@ -0,0 +1,33 @@
+from .errors import (
+    TempVCAlreadyExistsError,
+    TempVCCategoryNotConfiguredError,
+    TempVCCategoryNotFoundError,
+    TempVCError,
+    TempVCQuotaExceededError,
+)
+from .manager import TempVoiceChannelManager
+from .pool import MAX_POOL_SIZE, TempVCChannelPool
+from .quotas import QUOTA_CATEGORY, QUOTA_GUILD, QUOTA_USER, TempVCQuotas
+from .stores import TempVCCategoryStore, TempVCChannelStore, TempVCPoolStore
+from .telemetry import TempVCTelemetry, UsageBucket, UsageReport
+
+__all__ = [
+    "MAX_POOL_SIZE",
+    "QUOTA_CATEGORY",
+    "QUOTA_GUILD",
+    "QUOTA_USER",
+    "TempVCError",
+    "TempVCAlreadyExistsError",
+    "TempVCCategoryNotFoundError",
+    "TempVCCategoryNotConfiguredError",
+    "TempVCQuotaExceededError",
+    "TempVCQuotas",
+    "TempVCCategoryStore",
+    "TempVCChannelStore",
+    "TempVCChannelPool",
+    "TempVCPoolStore",
+    "TempVCTelemetry",
+    "TempVoiceChannelManager",
+    "UsageBucket",
+    "UsageReport",
+]
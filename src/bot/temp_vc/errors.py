@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import discord
+
+
+class TempVCError(Exception):
+    """Base class for temporary voice channel related errors."""
+
+
+class TempVCAlreadyExistsError(TempVCError):
+    """Raised when a user already has an associated temporary voice channel."""
+
+    def __init__(self, channel: discord.VoiceChannel) -> None:
+        super().__init__("temporary voice channel already exists")
+        self.channel = channel
+
+
+class TempVCCategoryNotFoundError(TempVCError):
+    """Raised when the configured category does not exist in the guild."""
+
+    def __init__(self, category_id: int) -> None:
+        super().__init__("temporary voice channel category not found")
+        self.category_id = category_id
+
+
+class TempVCCategoryNotConfiguredError(TempVCError):
+    """Raised when no category has been configured for the guild."""
+
+    def __init__(self, guild_id: int) -> None:
+        super().__init__("temporary voice channel category not configured")
+        self.guild_id = guild_id
+
+
+class TempVCQuotaExceededError(TempVCError):
+    """Raised when a creation request is over a per-user, per-guild or per-category quota."""
+
+    def __init__(self, scope: str, *, retry_after: float | None = None) -> None:
+        super().__init__(f"temporary voice channel quota exceeded: {scope}")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+__all__ = [
+    "TempVCError",
+    "TempVCAlreadyExistsError",
+    "TempVCCategoryNotFoundError",
+    "TempVCCategoryNotConfiguredError",
+    "TempVCQuotaExceededError",
+]
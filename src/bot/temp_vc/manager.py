@@ -0,0 +1,513 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+import discord
+
+from app.logging_setup import log_context
+from bot.outbound import OutboundPriority, OutboundScheduler, run_outbound
+
+from .errors import (
+    TempVCAlreadyExistsError,
+    TempVCCategoryNotConfiguredError,
+    TempVCCategoryNotFoundError,
+    TempVCQuotaExceededError,
+)
+from .pool import TempVCChannelPool, claimed_overwrites
+from .quotas import TempVCQuotas
+from .stores import TempVCCategoryStore, TempVCChannelStore
+from .telemetry import TempVCTelemetry
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+LobbyKey = Tuple[int, int]  # (guild_id, user_id)
+
+
+@dataclass(slots=True)
+class TempVoiceChannelManager:
+    """Manage creation and cleanup of per-user temporary voice channels."""
+
+    category_store: TempVCCategoryStore
+    channel_store: TempVCChannelStore
+    pool: TempVCChannelPool | None = None
+    lobby_cooldown: float = 5.0
+    outbound: OutboundScheduler | None = None
+    telemetry: TempVCTelemetry | None = None
+    quotas: TempVCQuotas | None = None
+    _user_channels: Dict[int, Dict[int, List[int]]] | None = None  # guild_id -> user_id -> [channel_id]
+    _lobby_inflight: Set[LobbyKey] = field(default_factory=set)
+    _lobby_last_join: Dict[LobbyKey, float] = field(default_factory=dict)
+    _creating: Dict[int, int] = field(default_factory=dict)  # guild_id -> creations in flight
+
+    def __post_init__(self) -> None:
+        if self._user_channels is None:
+            self._user_channels = self.channel_store.load_all()
+
+    async def create_user_channel(
+        self,
+        *,
+        guild: discord.Guild,
+        user: discord.abc.User,
+    ) -> discord.VoiceChannel:
+        """Create a temporary voice channel for the given user.
+
+        Raises:
+            TempVCAlreadyExistsError: If the user already has a managed channel.
+            TempVCCategoryNotFoundError: If the configured category is missing.
+            TempVCCategoryNotConfiguredError: If the category is not set for the guild.
+            TempVCQuotaExceededError: If the user, the guild or the category is over its quota.
+            asyncio.TimeoutError: If the outbound queue was too busy to start the REST
+                call in time. Nothing was created in that case.
+        """
+
+        category_id = self.category_store.get_category_id(guild.id)
+        if category_id is None:
+            raise TempVCCategoryNotConfiguredError(guild.id)
+
+        category = guild.get_channel(category_id)
+        if not isinstance(category, discord.CategoryChannel):
+            raise TempVCCategoryNotFoundError(category_id)
+
+        guild_mapping = self._user_channels.setdefault(guild.id, {})
+        existing_channel = self._resolve_existing_channel(
+            guild,
+            user_id=user.id,
+            channel_ids=list(guild_mapping.get(user.id, [])),
+        )
+        if existing_channel is not None:
+            raise TempVCAlreadyExistsError(existing_channel)
+
+        # Checked in memory before any REST call so that spam is rejected without cost.
+        if self.quotas is not None:
+            self.quotas.acquire(
+                guild_id=guild.id,
+                user_id=user.id,
+                active_channels=self._active_channel_count(guild.id),
+            )
+
+        self._creating[guild.id] = self._creating.get(guild.id, 0) + 1
+        try:
+            channel: discord.VoiceChannel | None = None
+            if self.pool is not None:
+                channel = await self.pool.claim(guild, category=category, user=user)
+            if channel is None:
+                channel = await run_outbound(
+                    self.outbound,
+                    OutboundPriority.USER_VISIBLE,
+                    guild.id,
+                    lambda: guild.create_voice_channel(
+                        name=f"{user.display_name}のVC",
+                        category=category,
+                        overwrites=claimed_overwrites(user),
+                        reason=f"Temporary voice channel requested by {user} ({user.id})",
+                    ),
+                    bucket=("create_channel", guild.id),
+                )
+        finally:
+            remaining = self._creating.pop(guild.id) - 1
+            if remaining:
+                self._creating[guild.id] = remaining
+
+        # The guild mapping may have been dropped by a concurrent cleanup while awaiting.
+        user_channels = self._user_channels.setdefault(guild.id, {}).setdefault(user.id, [])
+        user_channels.append(channel.id)
+        self.channel_store.add_channel(guild.id, user.id, channel.id)
+        self._record_usage(guild, created=True)
+        return channel
+
+    async def handle_voice_state_update(
+        self,
+        member: discord.Member,
+        before: discord.VoiceState,
+        after: discord.VoiceState,
+    ) -> None:
+        """Move lobby joiners into their own channel and delete emptied channels."""
+
+        if self.telemetry is not None and self._touches_managed_channel(member.guild.id, before, after):
+            self._record_usage(member.guild)
+
+        moved_to: discord.VoiceChannel | None = None
+        if after.channel is not None and after.channel != before.channel:
+            moved_to = await self._handle_lobby_join(member, after.channel)
+
+        channel = before.channel
+        if channel is None or not isinstance(channel, discord.VoiceChannel):
+            return
+        if moved_to is not None and moved_to.id == channel.id:
+            # The member was just moved back into the channel they left.
+            return
+
+        await self.release_if_empty(channel)
+
+    async def release_if_empty(self, channel: discord.VoiceChannel) -> None:
+        """Delete (or recycle into the pool) a managed channel that nobody is in."""
+
+        owner_user_id = self._find_owner(channel.guild.id, channel.id)
+        if owner_user_id is None:
+            return
+
+        if channel.members:
+            return
+
+        await self._cleanup_channel(channel, owner_user_id)
+
+    async def _cleanup_channel(self, channel: discord.VoiceChannel, owner_user_id: int) -> None:
+        with log_context(guild_id=channel.guild.id, channel_id=channel.id, user_id=owner_user_id):
+            if self.pool is not None and await self.pool.release(channel):
+                # Recycled into the spare pool instead of being deleted.
+                self._forget_channel(channel.guild.id, owner_user_id, channel.id)
+                self._record_usage(channel.guild, deleted=True)
+                return
+
+            try:
+                await run_outbound(
+                    self.outbound,
+                    OutboundPriority.BACKGROUND,
+                    channel.guild.id,
+                    lambda: channel.delete(reason="Temporary voice channel cleanup (empty)"),
+                    bucket=("channel", channel.id),
+                )
+            except discord.HTTPException as exc:
+                LOGGER.warning("一時VCの削除に失敗しました: channel_id=%s error=%s", channel.id, exc)
+                return
+
+            self._forget_channel(channel.guild.id, owner_user_id, channel.id)
+            self._record_usage(channel.guild, deleted=True)
+
+    def set_category_for_guild(self, *, guild_id: int, category_id: int) -> None:
+        """Persist the category used for temporary voice channels in the given guild."""
+
+        self.category_store.set_category_id(guild_id, category_id)
+        # Reset state so future creations use the fresh category and stale mappings don't linger.
+        self._user_channels.pop(guild_id, None)
+        self.channel_store.clear_guild(guild_id)
+        # Spares in the previous category are removed by the next pool refill.
+
+    def get_category_for_guild(self, guild_id: int) -> Optional[int]:
+        """Return the configured category id for the given guild, if any."""
+
+        return self.category_store.get_category_id(guild_id)
+
+    def set_lobby_for_guild(self, *, guild_id: int, channel_id: Optional[int]) -> None:
+        """Persist the join-to-create lobby channel for the guild (None disables it)."""
+
+        self.category_store.set_lobby_channel_id(guild_id, channel_id)
+
+    def get_lobby_for_guild(self, guild_id: int) -> Optional[int]:
+        """Return the configured lobby channel id for the given guild, if any."""
+
+        return self.category_store.get_lobby_channel_id(guild_id)
+
+    def set_pool_size_for_guild(self, guild: discord.Guild, size: int) -> None:
+        """Persist the number of spare channels to keep ready and resize the pool."""
+
+        if self.pool is None:
+            return
+        self.pool.set_target_size(guild.id, size)
+        self.pool.schedule_refill(guild)
+
+    def warm_pools(self, guilds: List[discord.Guild]) -> None:
+        """Reconcile stored spares with the live guilds and top the pools up."""
+
+        if self.pool is None:
+            return
+        for guild in guilds:
+            self.pool.schedule_refill(guild)
+
+    def handle_channel_delete(self, channel: discord.abc.GuildChannel) -> bool:
+        """Drop every reference to a deleted channel; return whether any state changed."""
+
+        changed = self._drop_channel_references(channel.guild, channel.id)
+        if changed:
+            self._record_usage(channel.guild)
+        return changed
+
+    def forget_guild(self, guild_id: int) -> None:
+        """Release all stored and in-memory state of a guild the bot has left."""
+
+        self._user_channels.pop(guild_id, None)
+        self.channel_store.clear_guild(guild_id)
+        self.category_store.remove_guild(guild_id)
+        if self.pool is not None:
+            self.pool.forget_guild(guild_id)
+        if self.telemetry is not None:
+            self.telemetry.forget_guild(guild_id)
+        if self.quotas is not None:
+            self.quotas.forget_guild(guild_id)
+        for key in [key for key in self._lobby_last_join if key[0] == guild_id]:
+            del self._lobby_last_join[key]
+
+    def known_guild_ids(self) -> Set[int]:
+        """Guilds with any stored temp VC state."""
+
+        guild_ids = set(self._user_channels) | self.channel_store.guild_ids() | self.category_store.guild_ids()
+        if self.pool is not None:
+            guild_ids |= self.pool.store.guild_ids()
+        return guild_ids
+
+    def sweep(self, guild: discord.Guild) -> int:
+        """Drop references to channels of ``guild`` that no longer exist; return how many."""
+
+        referenced = {
+            channel_id for channel_ids in self._user_channels.get(guild.id, {}).values() for channel_id in channel_ids
+        }
+        referenced.update(
+            channel_id
+            for channel_id in (
+                self.category_store.get_category_id(guild.id),
+                self.category_store.get_lobby_channel_id(guild.id),
+            )
+            if channel_id is not None
+        )
+        removed = sum(
+            self._drop_channel_references(guild, channel_id)
+            for channel_id in referenced
+            if guild.get_channel(channel_id) is None
+        )
+        if removed:
+            self._record_usage(guild)
+        # Missing spares are dropped by the refill's own reconciliation.
+        if self.pool is not None:
+            self.pool.schedule_refill(guild)
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """Sizes of the in-memory ownership and lobby state, for diagnostics."""
+
+        user_channels = self._user_channels or {}
+        stats = {
+            "guilds": len(user_channels),
+            "owners": sum(len(mapping) for mapping in user_channels.values()),
+            "channels": sum(
+                len(channel_ids) for mapping in user_channels.values() for channel_ids in mapping.values()
+            ),
+            "lobby_cooldowns": len(self._lobby_last_join),
+            "telemetry_guilds": len(self.telemetry) if self.telemetry is not None else 0,
+        }
+        if self.quotas is not None:
+            stats.update(self.quotas.stats())
+        return stats
+
+    def close(self) -> None:
+        """Flush and close the underlying TinyDB storage."""
+
+        if self.telemetry is not None:
+            self.telemetry.flush()
+        if self.pool is not None:
+            self.pool.close()
+        self.category_store.db.close()
+        if self.channel_store.db is not self.category_store.db:
+            self.channel_store.db.close()
+
+    async def _handle_lobby_join(
+        self,
+        member: discord.Member,
+        channel: discord.abc.Connectable,
+    ) -> discord.VoiceChannel | None:
+        """Give a member who joined the lobby their own channel and move them into it.
+
+        Joins are debounced per user: while a join is being handled, or within
+        ``lobby_cooldown`` seconds of the previous one, further lobby joins are ignored.
+        """
+
+        guild = member.guild
+        if member.bot or self.category_store.get_lobby_channel_id(guild.id) != channel.id:
+            return None
+
+        key = (guild.id, member.id)
+        now = time.monotonic()
+        last_join = self._lobby_last_join.get(key)
+        if key in self._lobby_inflight or (last_join is not None and now - last_join < self.lobby_cooldown):
+            LOGGER.debug("ロビー参加を連続参加として無視しました: guild_id=%s user_id=%s", guild.id, member.id)
+            return None
+        self._remember_lobby_join(key, now)
+
+        self._lobby_inflight.add(key)
+        try:
+            with log_context(guild_id=guild.id, channel_id=channel.id, user_id=member.id):
+                return await self._move_into_own_channel(member)
+        finally:
+            self._lobby_inflight.discard(key)
+
+    async def _move_into_own_channel(self, member: discord.Member) -> discord.VoiceChannel | None:
+        try:
+            target = await self.create_user_channel(guild=member.guild, user=member)
+        except TempVCAlreadyExistsError as err:
+            target = err.channel
+        except TempVCQuotaExceededError:
+            # Already counted in metrics; the member simply stays in the lobby.
+            return None
+        except (TempVCCategoryNotConfiguredError, TempVCCategoryNotFoundError) as err:
+            LOGGER.warning("ロビーから一時VCを作成できません: guild_id=%s error=%r", member.guild.id, err)
+            return None
+        except discord.HTTPException as exc:
+            LOGGER.warning("ロビーからの一時VC作成に失敗しました: user_id=%s error=%s", member.id, exc)
+            return None
+        except asyncio.TimeoutError:
+            LOGGER.warning("送信待ちが混み合っているため、ロビーからの一時VC作成を見送りました: user_id=%s", member.id)
+            return None
+
+        try:
+            await run_outbound(
+                self.outbound,
+                OutboundPriority.USER_VISIBLE,
+                member.guild.id,
+                lambda: member.move_to(target, reason="Temporary voice channel lobby"),
+                bucket=("edit_member", member.guild.id),
+            )
+        except (discord.HTTPException, asyncio.TimeoutError) as exc:
+            # Typically the member left the lobby before the move; don't leave an empty channel behind.
+            LOGGER.info("ロビーから一時VCへの移動に失敗しました: user_id=%s error=%r", member.id, exc)
+            if not target.members:
+                await self._cleanup_channel(target, member.id)
+            return None
+        return target
+
+    def _active_channel_count(self, guild_id: int) -> int:
+        """Managed channels of the guild (all in its category) plus creations in flight."""
+
+        owned = sum(len(channel_ids) for channel_ids in self._user_channels.get(guild_id, {}).values())
+        return owned + self._creating.get(guild_id, 0)
+
+    def _remember_lobby_join(self, key: LobbyKey, now: float) -> None:
+        self._lobby_last_join[key] = now
+        if len(self._lobby_last_join) > 1024:
+            expired = [k for k, joined in self._lobby_last_join.items() if now - joined >= self.lobby_cooldown]
+            for expired_key in expired:
+                del self._lobby_last_join[expired_key]
+
+    def _resolve_existing_channel(
+        self,
+        guild: discord.Guild,
+        *,
+        user_id: int,
+        channel_ids: List[int],
+    ) -> Optional[discord.VoiceChannel]:
+        if not channel_ids:
+            return None
+
+        guild_mapping = self._user_channels.setdefault(guild.id, {})
+        valid_ids: List[int] = []
+        existing: Optional[discord.VoiceChannel] = None
+
+        for channel_id in channel_ids:
+            channel = guild.get_channel(channel_id)
+            if isinstance(channel, discord.VoiceChannel):
+                if channel_id not in valid_ids:
+                    valid_ids.append(channel_id)
+                if existing is None:
+                    existing = channel
+            else:
+                LOGGER.info(
+                    "存在しない一時VCを登録解除します: guild_id=%s user_id=%s channel_id=%s",
+                    guild.id,
+                    user_id,
+                    channel_id,
+                )
+                self.channel_store.remove_channel(guild.id, user_id, channel_id)
+
+        if valid_ids:
+            guild_mapping[user_id] = valid_ids
+            self.channel_store.set_channels(guild.id, user_id, valid_ids)
+        else:
+            guild_mapping.pop(user_id, None)
+            self.channel_store.set_channels(guild.id, user_id, [])
+            if not guild_mapping:
+                self._user_channels.pop(guild.id, None)
+
+        return existing
+
+    def _touches_managed_channel(
+        self,
+        guild_id: int,
+        before: discord.VoiceState,
+        after: discord.VoiceState,
+    ) -> bool:
+        if before.channel == after.channel:
+            return False
+        return any(
+            channel is not None and self._find_owner(guild_id, channel.id) is not None
+            for channel in (before.channel, after.channel)
+        )
+
+    def _record_usage(self, guild: discord.Guild, *, created: bool = False, deleted: bool = False) -> None:
+        """Feed creations/deletions and the guild's current temp VC occupancy to the telemetry."""
+
+        if self.telemetry is None:
+            return
+        channel_ids = [
+            channel_id
+            for channel_ids in self._user_channels.get(guild.id, {}).values()
+            for channel_id in channel_ids
+        ]
+        members = 0
+        for channel_id in channel_ids:
+            channel = guild.get_channel(channel_id)
+            if isinstance(channel, discord.VoiceChannel):
+                members += len(channel.members)
+        if created:
+            self.telemetry.record_created(guild.id)
+        if deleted:
+            self.telemetry.record_deleted(guild.id)
+        self.telemetry.observe(guild.id, channels=len(channel_ids), members=members)
+
+    def _drop_channel_references(self, guild: discord.Guild, channel_id: int) -> bool:
+        changed = False
+        owner_user_id = self._find_owner(guild.id, channel_id)
+        if owner_user_id is not None:
+            # Deleted by someone else (the bot's own cleanup forgets the channel first).
+            self._forget_channel(guild.id, owner_user_id, channel_id)
+            changed = True
+        if self.pool is not None and self.pool.forget_channel(guild.id, channel_id):
+            changed = True
+        if self.category_store.get_category_id(guild.id) == channel_id:
+            LOGGER.info("一時VCカテゴリーが削除されたため設定を解除しました: guild_id=%s", guild.id)
+            self.category_store.clear_category_id(guild.id)
+            changed = True
+        if self.category_store.get_lobby_channel_id(guild.id) == channel_id:
+            LOGGER.info("ロビーチャンネルが削除されたため設定を解除しました: guild_id=%s", guild.id)
+            self.category_store.set_lobby_channel_id(guild.id, None)
+            changed = True
+        return changed
+
+    def _find_owner(self, guild_id: int, channel_id: int) -> Optional[int]:
+        guild_mapping = self._user_channels.get(guild_id)
+        if not guild_mapping:
+            return None
+
+        for user_id, stored_channel_ids in guild_mapping.items():
+            if channel_id in stored_channel_ids:
+                return user_id
+        return None
+
+    def _forget_channel(self, guild_id: int, user_id: int, channel_id: int) -> None:
+        guild_mapping = self._user_channels.get(guild_id)
+        if not guild_mapping:
+            self.channel_store.set_channels(guild_id, user_id, [])
+            return
+
+        user_channels = guild_mapping.get(user_id)
+        if not user_channels:
+            self.channel_store.set_channels(guild_id, user_id, [])
+            if not guild_mapping:
+                self._user_channels.pop(guild_id, None)
+            return
+
+        filtered = [cid for cid in user_channels if cid != channel_id]
+        if filtered:
+            guild_mapping[user_id] = filtered
+            self.channel_store.set_channels(guild_id, user_id, filtered)
+        else:
+            guild_mapping.pop(user_id, None)
+            self.channel_store.set_channels(guild_id, user_id, [])
+            if not guild_mapping:
+                self._user_channels.pop(guild_id, None)
+
+
+__all__ = ["TempVoiceChannelManager"]
@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Coroutine, Dict, List, Mapping, Set
+
+import discord
+
+from bot.outbound import OutboundPriority, OutboundScheduler, run_outbound
+
+from .stores import TempVCCategoryStore, TempVCPoolStore
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+SPARE_CHANNEL_NAME = "待機中のVC"
+MAX_POOL_SIZE = 10
+
+
+def _spare_overwrites(guild: discord.Guild) -> Mapping[Any, discord.PermissionOverwrite]:
+    overwrites: Dict[Any, discord.PermissionOverwrite] = {
+        guild.default_role: discord.PermissionOverwrite(view_channel=False, connect=False),
+    }
+    if guild.me is not None:
+        overwrites[guild.me] = discord.PermissionOverwrite(
+            view_channel=True,
+            connect=True,
+            manage_channels=True,
+        )
+    return overwrites
+
+
+def claimed_overwrites(user: discord.abc.Snowflake) -> Mapping[Any, discord.PermissionOverwrite]:
+    """Permission overwrites of a user-owned temporary voice channel."""
+
+    return {user: discord.PermissionOverwrite(manage_channels=True)}
+
+
+@dataclass(slots=True)
+class TempVCChannelPool:
+    """Keep hidden spare voice channels ready so `/vc` can claim one instantly.
+
+    Spares live in the guild's configured category, hidden from @everyone.
+    Claiming a spare is a single channel edit (rename + overwrites); the pool is
+    then topped up in the background. Emptied channels are recycled into the pool
+    instead of being deleted while the pool is below its target size.
+    """
+
+    store: TempVCPoolStore
+    category_store: TempVCCategoryStore
+    default_size: int = 0
+    outbound: OutboundScheduler | None = None
+    _spares: Dict[int, List[int]] = field(default_factory=dict)  # guild_id -> [channel_id]
+    _channel_objects: Dict[int, discord.VoiceChannel] = field(default_factory=dict)
+    _locks: Dict[int, asyncio.Lock] = field(default_factory=dict)
+    _tasks: Set[asyncio.Task[None]] = field(default_factory=set)
+
+    def __post_init__(self) -> None:
+        self._spares = self.store.load_all()
+
+    def target_size(self, guild_id: int) -> int:
+        size = self.category_store.get_pool_size(guild_id)
+        if size is None:
+            size = self.default_size
+        return max(0, min(size, MAX_POOL_SIZE))
+
+    def set_target_size(self, guild_id: int, size: int) -> None:
+        self.category_store.set_pool_size(guild_id, max(0, min(size, MAX_POOL_SIZE)))
+
+    def spare_count(self, guild_id: int) -> int:
+        return len(self._spares.get(guild_id, ()))
+
+    def stats(self) -> Dict[str, int]:
+        """Totals across guilds, for diagnostics."""
+
+        return {
+            "guilds": len(self._spares),
+            "spares": sum(len(channel_ids) for channel_ids in self._spares.values()),
+            "cached_channels": len(self._channel_objects),
+            "tasks": len(self._tasks),
+        }
+
+    def is_spare(self, guild_id: int, channel_id: int) -> bool:
+        return channel_id in self._spares.get(guild_id, ())
+
+    async def claim(
+        self,
+        guild: discord.Guild,
+        *,
+        category: discord.CategoryChannel,
+        user: discord.abc.User,
+    ) -> discord.VoiceChannel | None:
+        """Hand a spare channel over to ``user``; return None if none is usable.
+
+        Raises:
+            asyncio.TimeoutError: If no outbound slot freed up in time. The edit was
+                never sent, so the spare is put back into the pool.
+        """
+
+        spares = self._spares.get(guild.id)
+        claimed: discord.VoiceChannel | None = None
+        while spares and claimed is None:
+            channel_id = spares.pop(0)
+            self.store.remove_channel(guild.id, channel_id)
+            channel = self._lookup(guild, channel_id)
+            self._channel_objects.pop(channel_id, None)
+            if channel is None:
+                continue
+            if channel.category_id != category.id:
+                self._spawn(self._delete(channel, "Temporary voice channel pool (stale spare)"))
+                continue
+
+            try:
+                await run_outbound(
+                    self.outbound,
+                    OutboundPriority.USER_VISIBLE,
+                    guild.id,
+                    lambda: channel.edit(
+                        name=f"{user.display_name}のVC",
+                        overwrites=claimed_overwrites(user),
+                        reason=f"Temporary voice channel requested by {user} ({user.id})",
+                    ),
+                    bucket=("channel", channel.id),
+                )
+            except asyncio.TimeoutError:
+                self._add(guild.id, channel.id)
+                self._channel_objects[channel.id] = channel
+                raise
+            except discord.HTTPException as exc:
+                LOGGER.warning("待機VCの割り当てに失敗しました: channel_id=%s error=%s", channel.id, exc)
+                self._spawn(self._delete(channel, "Temporary voice channel pool (claim failed)"))
+                continue
+            claimed = channel
+
+        self.schedule_refill(guild)
+        return claimed
+
+    async def release(self, channel: discord.VoiceChannel) -> bool:
+        """Hide an emptied channel and keep it as a spare if the pool needs one."""
+
+        guild = channel.guild
+        if self.spare_count(guild.id) >= self.target_size(guild.id):
+            return False
+        if channel.category_id != self.category_store.get_category_id(guild.id):
+            return False
+
+        try:
+            await run_outbound(
+                self.outbound,
+                OutboundPriority.BACKGROUND,
+                guild.id,
+                lambda: channel.edit(
+                    name=SPARE_CHANNEL_NAME,
+                    overwrites=_spare_overwrites(guild),
+                    reason="Temporary voice channel returned to pool",
+                ),
+                bucket=("channel", channel.id),
+            )
+        except discord.HTTPException as exc:
+            LOGGER.warning("一時VCを待機VCに戻せませんでした: channel_id=%s error=%s", channel.id, exc)
+            return False
+
+        self._add(guild.id, channel.id)
+        return True
+
+    def schedule_refill(self, guild: discord.Guild) -> None:
+        """Top up (or trim) the guild's pool in the background."""
+
+        if self.target_size(guild.id) <= 0 and not self._spares.get(guild.id):
+            return
+        self._spawn(self.refill(guild), name=f"temp-vc-pool-refill-{guild.id}")
+
+    async def refill(self, guild: discord.Guild) -> None:
+        lock = self._locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            category_id = self.category_store.get_category_id(guild.id)
+            category = guild.get_channel(category_id) if category_id is not None else None
+            target = self.target_size(guild.id) if isinstance(category, discord.CategoryChannel) else 0
+
+            spares = self._spares.setdefault(guild.id, [])
+            for channel_id in list(spares):
+                channel = self._lookup(guild, channel_id)
+                if channel is not None and channel.category_id == category_id:
+                    continue
+                self._remove(guild.id, channel_id)
+                if channel is not None:
+                    await self._delete(channel, "Temporary voice channel pool (stale spare)")
+
+            while len(self._spares.get(guild.id, ())) > target:
+                channel_id = self._spares[guild.id][-1]
+                channel = self._lookup(guild, channel_id)
+                self._remove(guild.id, channel_id)
+                if channel is not None:
+                    await self._delete(channel, "Temporary voice channel pool (shrunk)")
+
+            while isinstance(category, discord.CategoryChannel) and len(self._spares.get(guild.id, ())) < target:
+                try:
+                    channel = await run_outbound(
+                        self.outbound,
+                        OutboundPriority.BACKGROUND,
+                        guild.id,
+                        lambda: guild.create_voice_channel(
+                            name=SPARE_CHANNEL_NAME,
+                            category=category,
+                            overwrites=_spare_overwrites(guild),
+                            reason="Temporary voice channel pool refill",
+                        ),
+                        bucket=("create_channel", guild.id),
+                    )
+                except discord.HTTPException as exc:
+                    LOGGER.warning("待機VCの作成に失敗しました: guild_id=%s error=%s", guild.id, exc)
+                    break
+                # Until CHANNEL_CREATE arrives the channel is only known from this response.
+                self._channel_objects[channel.id] = channel
+                self._add(guild.id, channel.id)
+
+            if not self._spares.get(guild.id):
+                self._spares.pop(guild.id, None)
+
+    def forget_channel(self, guild_id: int, channel_id: int) -> bool:
+        """Stop tracking a spare that was deleted outside the pool; return whether it was one."""
+
+        if not self.is_spare(guild_id, channel_id):
+            return False
+        self._remove(guild_id, channel_id)
+        if not self._spares.get(guild_id):
+            self._spares.pop(guild_id, None)
+        return True
+
+    def forget_guild(self, guild_id: int) -> None:
+        """Drop the spares and per-guild state of a guild the bot is no longer in."""
+
+        for channel_id in self._spares.pop(guild_id, []):
+            self._channel_objects.pop(channel_id, None)
+        self.store.remove_guild(guild_id)
+        self._locks.pop(guild_id, None)
+
+    def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+
+    def _add(self, guild_id: int, channel_id: int) -> None:
+        spares = self._spares.setdefault(guild_id, [])
+        if channel_id not in spares:
+            spares.append(channel_id)
+        self.store.add_channel(guild_id, channel_id)
+
+    def _lookup(self, guild: discord.Guild, channel_id: int) -> discord.VoiceChannel | None:
+        channel = guild.get_channel(channel_id)
+        if isinstance(channel, discord.VoiceChannel):
+            return channel
+        return self._channel_objects.get(channel_id)
+
+    def _remove(self, guild_id: int, channel_id: int) -> None:
+        self._channel_objects.pop(channel_id, None)
+        spares = self._spares.get(guild_id)
+        if spares and channel_id in spares:
+            spares.remove(channel_id)
+        self.store.remove_channel(guild_id, channel_id)
+
+    async def _delete(self, channel: discord.VoiceChannel, reason: str) -> None:
+        try:
+            await run_outbound(
+                self.outbound,
+                OutboundPriority.BACKGROUND,
+                channel.guild.id,
+                lambda: channel.delete(reason=reason),
+                bucket=("channel", channel.id),
+            )
+        except discord.NotFound:
+            pass
+        except discord.HTTPException as exc:
+            LOGGER.warning("待機VCの削除に失敗しました: channel_id=%s error=%s", channel.id, exc)
+
+    def _spawn(self, coro: Coroutine[Any, Any, None], *, name: str | None = None) -> None:
+        task = asyncio.create_task(coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._finish_task)
+
+    def _finish_task(self, task: asyncio.Task[None]) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            LOGGER.error("待機VCのバックグラウンド処理が失敗しました。", exc_info=task.exception())
+
+
+__all__ = ["MAX_POOL_SIZE", "SPARE_CHANNEL_NAME", "TempVCChannelPool", "claimed_overwrites"]
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Callable, Dict, Hashable, Tuple
+
+from app.metrics import REGISTRY, MetricsRegistry
+
+from .errors import TempVCQuotaExceededError
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+QUOTA_USER = "user"
+QUOTA_GUILD = "guild"
+QUOTA_CATEGORY = "category"
+
+# Discord allows at most 50 channels per category; leave room for the spare pool.
+DEFAULT_MAX_CHANNELS_PER_CATEGORY = 40
+
+QuotaRate = Tuple[int, float]  # (count, window seconds)
+
+
+class _TokenBuckets:
+    """Token buckets keyed by an id: ``count`` tokens, refilled evenly over ``window`` seconds."""
+
+    __slots__ = ("_capacity", "_rate", "_buckets")
+
+    def __init__(self, count: int, window: float) -> None:
+        self._capacity = float(count)
+        self._rate = count / window
+        self._buckets: Dict[Hashable, Tuple[float, float]] = {}  # key -> (tokens, updated_at)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def retry_after(self, key: Hashable, now: float) -> float:
+        """Seconds until ``key`` has a whole token again (0 if one is available now)."""
+
+        tokens = self._tokens(key, now)
+        if tokens >= 1.0:
+            return 0.0
+        return (1.0 - tokens) / self._rate
+
+    def take(self, key: Hashable, now: float) -> None:
+        self._buckets[key] = (self._tokens(key, now) - 1.0, now)
+        if len(self._buckets) > 4096:
+            self._prune(now)
+
+    def forget(self, predicate: Callable[[Hashable], bool]) -> None:
+        for key in [key for key in self._buckets if predicate(key)]:
+            del self._buckets[key]
+
+    def _tokens(self, key: Hashable, now: float) -> float:
+        state = self._buckets.get(key)
+        if state is None:
+            return self._capacity
+        tokens, updated_at = state
+        return min(self._capacity, tokens + (now - updated_at) * self._rate)
+
+    def _prune(self, now: float) -> None:
+        # Full buckets carry no state worth keeping.
+        full = [key for key in self._buckets if self._tokens(key, now) >= self._capacity]
+        for key in full:
+            del self._buckets[key]
+
+
+class TempVCQuotas:
+    """In-memory admission checks for temp VC creation, evaluated before any REST call.
+
+    - ``user_rate``: creations per member of a guild, as ``(count, window)``.
+    - ``guild_rate``: creations per guild, so a coordinated spam from many accounts
+      cannot exhaust the channel limit or the bot-wide REST budget.
+    - ``max_channels_per_category``: concurrent temp channels in the guild's category.
+
+    ``None`` (or 0 for the category cap) disables a check. Tokens are only taken
+    when every check passes, so a rejected request does not consume the others.
+    """
+
+    def __init__(
+        self,
+        *,
+        user_rate: QuotaRate | None = (3, 60.0),
+        guild_rate: QuotaRate | None = (30, 60.0),
+        max_channels_per_category: int = DEFAULT_MAX_CHANNELS_PER_CATEGORY,
+        clock: Callable[[], float] = time.monotonic,
+        metrics: MetricsRegistry = REGISTRY,
+    ) -> None:
+        self._users = _TokenBuckets(*user_rate) if user_rate is not None else None
+        self._guilds = _TokenBuckets(*guild_rate) if guild_rate is not None else None
+        self._max_channels = max_channels_per_category
+        self._clock = clock
+        self._metrics = metrics
+
+    def acquire(self, *, guild_id: int, user_id: int, active_channels: int) -> None:
+        """Admit one channel creation or raise ``TempVCQuotaExceededError``.
+
+        ``active_channels`` is the number of temp channels currently owned (or being
+        created) in the guild's category.
+        """
+
+        if self._max_channels and active_channels >= self._max_channels:
+            self._reject(QUOTA_CATEGORY, guild_id, user_id, retry_after=None)
+
+        now = self._clock()
+        user_key = (guild_id, user_id)
+        if self._users is not None:
+            wait = self._users.retry_after(user_key, now)
+            if wait > 0:
+                self._reject(QUOTA_USER, guild_id, user_id, retry_after=wait)
+        if self._guilds is not None:
+            wait = self._guilds.retry_after(guild_id, now)
+            if wait > 0:
+                self._reject(QUOTA_GUILD, guild_id, user_id, retry_after=wait)
+
+        if self._users is not None:
+            self._users.take(user_key, now)
+        if self._guilds is not None:
+            self._guilds.take(guild_id, now)
+        self._metrics.increment("temp_vc.quota_admitted")
+
+    def forget_guild(self, guild_id: int) -> None:
+        if self._users is not None:
+            self._users.forget(lambda key: key[0] == guild_id)  # type: ignore[index]
+        if self._guilds is not None:
+            self._guilds.forget(lambda key: key == guild_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "quota_user_buckets": len(self._users) if self._users is not None else 0,
+            "quota_guild_buckets": len(self._guilds) if self._guilds is not None else 0,
+        }
+
+    def _reject(self, scope: str, guild_id: int, user_id: int, *, retry_after: float | None) -> None:
+        self._metrics.increment("temp_vc.quota_rejected", scope=scope)
+        LOGGER.debug(
+            "一時VCの作成を制限しました: scope=%s guild_id=%s user_id=%s retry_after=%s",
+            scope,
+            guild_id,
+            user_id,
+            retry_after,
+        )
+        raise TempVCQuotaExceededError(scope, retry_after=retry_after)
+
+
+__all__ = [
+    "DEFAULT_MAX_CHANNELS_PER_CATEGORY",
+    "QUOTA_CATEGORY",
+    "QUOTA_GUILD",
+    "QUOTA_USER",
+    "QuotaRate",
+    "TempVCQuotas",
+]
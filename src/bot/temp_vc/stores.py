@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from tinydb import TinyDB
+from tinydb.table import Table
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+# The stores below index their table once on load and keep the index in sync on
+# every write, so reads are plain dict lookups and writes address documents by
+# doc_id instead of running a Query (a full table scan in TinyDB). They assume
+# they are the only writer of their table while the bot is running.
+
+
+@dataclass(slots=True)
+class TempVCCategoryStore:
+    """Persist and retrieve configured temporary VC categories."""
+
+    db: TinyDB
+    table_name: str = "temp_vc_categories"
+    _table: Table = field(init=False, repr=False)
+    _records: Dict[int, Dict[str, Any]] = field(init=False, repr=False)  # guild_id -> record
+    _doc_ids: Dict[int, int] = field(init=False, repr=False)  # guild_id -> doc_id
+
+    def __post_init__(self) -> None:
+        self._table = self.db.table(self.table_name)
+        self._records = {}
+        self._doc_ids = {}
+        for document in self._table.all():
+            try:
+                guild_id = int(document["guild_id"])
+            except (KeyError, TypeError, ValueError):
+                LOGGER.warning("無効な一時VCカテゴリーレコードをスキップしました: %s", document)
+                continue
+            self._records[guild_id] = dict(document)
+            self._doc_ids[guild_id] = document.doc_id
+
+    def get_category_id(self, guild_id: int) -> Optional[int]:
+        return self._get_int(guild_id, "category_id")
+
+    def set_category_id(self, guild_id: int, category_id: int) -> None:
+        self._update(guild_id, {"category_id": int(category_id)})
+
+    def get_pool_size(self, guild_id: int) -> Optional[int]:
+        return self._get_int(guild_id, "pool_size")
+
+    def set_pool_size(self, guild_id: int, pool_size: int) -> None:
+        self._update(guild_id, {"pool_size": int(pool_size)})
+
+    def clear_category_id(self, guild_id: int) -> None:
+        if self._get_int(guild_id, "category_id") is not None:
+            self._update(guild_id, {"category_id": None})
+
+    def get_lobby_channel_id(self, guild_id: int) -> Optional[int]:
+        return self._get_int(guild_id, "lobby_channel_id")
+
+    def set_lobby_channel_id(self, guild_id: int, channel_id: Optional[int]) -> None:
+        self._update(
+            guild_id,
+            {"lobby_channel_id": int(channel_id) if channel_id is not None else None},
+        )
+
+    def guild_ids(self) -> Set[int]:
+        return set(self._records)
+
+    def remove_guild(self, guild_id: int) -> None:
+        """Drop every setting stored for the guild."""
+
+        guild_id = int(guild_id)
+        self._records.pop(guild_id, None)
+        doc_id = self._doc_ids.pop(guild_id, None)
+        if doc_id is not None:
+            self._table.remove(doc_ids=[doc_id])
+
+    def _get_int(self, guild_id: int, key: str) -> Optional[int]:
+        record = self._records.get(int(guild_id))
+        if record is None or record.get(key) is None:
+            return None
+        # Store values as int for consistency even if TinyDB loads as other types.
+        return int(record[key])
+
+    def _update(self, guild_id: int, fields: Dict[str, Any]) -> None:
+        guild_id = int(guild_id)
+        record = self._records.setdefault(guild_id, {"guild_id": guild_id})
+        if all(record.get(key) == value and key in record for key, value in fields.items()):
+            return
+        record.update(fields)
+
+        doc_id = self._doc_ids.get(guild_id)
+        if doc_id is None:
+            self._doc_ids[guild_id] = self._table.insert(dict(record))
+        else:
+            self._table.update(fields, doc_ids=[doc_id])
+
+
+@dataclass(slots=True)
+class TempVCChannelStore:
+    """Persist and retrieve temporary VC ownership mappings."""
+
+    db: TinyDB
+    table_name: str = "temp_vc_channels"
+    _table: Table = field(init=False, repr=False)
+    _channels: Dict[Tuple[int, int], List[int]] = field(init=False, repr=False)  # (guild_id, user_id) -> ids
+    _doc_ids: Dict[Tuple[int, int], int] = field(init=False, repr=False)
+    _guild_users: Dict[int, Set[int]] = field(init=False, repr=False)  # guild_id -> {user_id}
+
+    def __post_init__(self) -> None:
+        self._table = self.db.table(self.table_name)
+        self._channels = {}
+        self._doc_ids = {}
+        self._guild_users = {}
+        for document in self._table.all():
+            try:
+                guild_id = int(document["guild_id"])
+                user_id = int(document["user_id"])
+            except (KeyError, TypeError, ValueError):
+                LOGGER.warning("無効な一時VCレコードをスキップしました: %s", document)
+                continue
+
+            key = (guild_id, user_id)
+            self._doc_ids[key] = document.doc_id
+            self._guild_users.setdefault(guild_id, set()).add(user_id)
+            self._channels[key] = self._sanitize_channel_ids(document.get("channel_ids"))
+
+    def load_all(self) -> Dict[int, Dict[int, List[int]]]:
+        snapshot: Dict[int, Dict[int, List[int]]] = {}
+        for (guild_id, user_id), channel_ids in self._channels.items():
+            if not channel_ids:
+                continue
+            guild_mapping = snapshot.setdefault(guild_id, {})
+            guild_mapping[user_id] = list(channel_ids)
+        return snapshot
+
+    def add_channel(self, guild_id: int, user_id: int, channel_id: int) -> None:
+        existing = self._get_channel_ids(guild_id, user_id)
+        existing.append(int(channel_id))
+        self.set_channels(guild_id, user_id, existing)
+
+    def remove_channel(self, guild_id: int, user_id: int, channel_id: int) -> None:
+        existing = self._get_channel_ids(guild_id, user_id)
+        filtered = [cid for cid in existing if cid != int(channel_id)]
+        self.set_channels(guild_id, user_id, filtered)
+
+    def set_channels(self, guild_id: int, user_id: int, channel_ids: List[int]) -> None:
+        key = (int(guild_id), int(user_id))
+        sanitized = self._sanitize_channel_ids(channel_ids)
+        doc_id = self._doc_ids.get(key)
+
+        if not sanitized:
+            self._channels.pop(key, None)
+            if doc_id is not None:
+                del self._doc_ids[key]
+                self._discard_user(*key)
+                self._table.remove(doc_ids=[doc_id])
+            return
+
+        if doc_id is not None and self._channels.get(key) == sanitized:
+            return
+        self._channels[key] = sanitized
+        if doc_id is None:
+            self._doc_ids[key] = self._table.insert(
+                {"guild_id": key[0], "user_id": key[1], "channel_ids": list(sanitized)}
+            )
+            self._guild_users.setdefault(key[0], set()).add(key[1])
+        else:
+            self._table.update({"channel_ids": list(sanitized)}, doc_ids=[doc_id])
+
+    def guild_ids(self) -> Set[int]:
+        return set(self._guild_users)
+
+    def clear_guild(self, guild_id: int) -> None:
+        guild_id = int(guild_id)
+        doc_ids = []
+        for user_id in self._guild_users.pop(guild_id, set()):
+            key = (guild_id, user_id)
+            self._channels.pop(key, None)
+            doc_id = self._doc_ids.pop(key, None)
+            if doc_id is not None:
+                doc_ids.append(doc_id)
+        if doc_ids:
+            self._table.remove(doc_ids=doc_ids)
+
+    def _get_channel_ids(self, guild_id: int, user_id: int) -> List[int]:
+        return list(self._channels.get((int(guild_id), int(user_id)), ()))
+
+    def _discard_user(self, guild_id: int, user_id: int) -> None:
+        users = self._guild_users.get(guild_id)
+        if users is None:
+            return
+        users.discard(user_id)
+        if not users:
+            del self._guild_users[guild_id]
+
+    @staticmethod
+    def _sanitize_channel_ids(raw: Optional[List[object]]) -> List[int]:
+        sanitized: List[int] = []
+        if not raw:
+            return sanitized
+
+        for value in raw:
+            try:
+                channel_id = int(value)
+            except (TypeError, ValueError):
+                continue
+            if channel_id not in sanitized:
+                sanitized.append(channel_id)
+        return sanitized
+
+
+@dataclass(slots=True)
+class TempVCPoolStore:
+    """Persist the ids of hidden spare voice channels kept ready per guild."""
+
+    db: TinyDB
+    table_name: str = "temp_vc_pool"
+    _table: Table = field(init=False, repr=False)
+    _entries: Dict[int, Tuple[int, int]] = field(init=False, repr=False)  # channel_id -> (guild_id, doc_id)
+
+    def __post_init__(self) -> None:
+        self._table = self.db.table(self.table_name)
+        self._entries = {}
+        for document in self._table.all():
+            try:
+                guild_id = int(document["guild_id"])
+                channel_id = int(document["channel_id"])
+            except (KeyError, TypeError, ValueError):
+                LOGGER.warning("無効な待機VCレコードをスキップしました: %s", document)
+                continue
+            self._entries[channel_id] = (guild_id, document.doc_id)
+
+    def load_all(self) -> Dict[int, List[int]]:
+        snapshot: Dict[int, List[int]] = {}
+        for channel_id, (guild_id, _) in self._entries.items():
+            snapshot.setdefault(guild_id, []).append(channel_id)
+        return snapshot
+
+    def add_channel(self, guild_id: int, channel_id: int) -> None:
+        channel_id = int(channel_id)
+        entry = self._entries.get(channel_id)
+        if entry is not None:
+            if entry[0] == int(guild_id):
+                return
+            self._table.update({"guild_id": int(guild_id)}, doc_ids=[entry[1]])
+            self._entries[channel_id] = (int(guild_id), entry[1])
+            return
+        doc_id = self._table.insert({"guild_id": int(guild_id), "channel_id": channel_id})
+        self._entries[channel_id] = (int(guild_id), doc_id)
+
+    def remove_channel(self, guild_id: int, channel_id: int) -> None:
+        entry = self._entries.get(int(channel_id))
+        if entry is None or entry[0] != int(guild_id):
+            return
+        del self._entries[int(channel_id)]
+        self._table.remove(doc_ids=[entry[1]])
+
+    def guild_ids(self) -> Set[int]:
+        return {guild_id for guild_id, _ in self._entries.values()}
+
+    def remove_guild(self, guild_id: int) -> None:
+        guild_id = int(guild_id)
+        removed = [channel_id for channel_id, (owner, _) in self._entries.items() if owner == guild_id]
+        doc_ids = [self._entries.pop(channel_id)[1] for channel_id in removed]
+        if doc_ids:
+            self._table.remove(doc_ids=doc_ids)
+
+
+__all__ = [
+    "TempVCCategoryStore",
+    "TempVCChannelStore",
+    "TempVCPoolStore",
+]
+
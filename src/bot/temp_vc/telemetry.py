@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import logging
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from app.metrics import REGISTRY, MetricsRegistry
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+# Persisted layout (zlib-compressed after MAGIC):
+#   _HEADER (capacity u32, guild count u32), then per guild
+#   _GUILD (guild_id u64, last_minute i64, channels u32, members u32) followed by the
+#   ring arrays in _ARRAY_FIELDS order as little-endian raw bytes.
+MAGIC = b"TVCTEL1\n"
+_HEADER = struct.Struct("<II")
+_GUILD = struct.Struct("<QqII")
+_ARRAY_FIELDS = ("minutes", "created", "deleted", "peak_channels", "peak_members")
+_TYPECODES = {"minutes": "i", "created": "H", "deleted": "H", "peak_channels": "H", "peak_members": "I"}
+_U16_MAX = 0xFFFF
+
+
+@dataclass(frozen=True, slots=True)
+class UsageBucket:
+    """Aggregated temp VC usage over ``minutes`` minutes starting at ``start`` (UNIX seconds)."""
+
+    start: int
+    minutes: int
+    covered_minutes: int
+    created: int
+    deleted: int
+    peak_channels: int
+    peak_members: int
+
+
+@dataclass(frozen=True, slots=True)
+class UsageReport:
+    """Temp VC usage of one guild over a window, split into equal buckets."""
+
+    window_minutes: int
+    covered_minutes: int
+    created: int
+    deleted: int
+    peak_channels: int
+    peak_members: int
+    average_channels: float
+    average_members: float
+    current_channels: int
+    current_members: int
+    buckets: List[UsageBucket]
+
+
+class _GuildSeries:
+    """Fixed-size per-minute ring buffers for one guild.
+
+    Slot ``minute % capacity`` holds the events and peaks of ``minute``; a slot
+    whose stamp in ``minutes`` does not match belongs to a minute with no data.
+    """
+
+    __slots__ = ("minutes", "created", "deleted", "peak_channels", "peak_members", "last_minute", "channels", "members")
+
+    def __init__(self, capacity: int) -> None:
+        self.minutes = array("i", [-1]) * capacity
+        self.created = array("H", [0]) * capacity
+        self.deleted = array("H", [0]) * capacity
+        self.peak_channels = array("H", [0]) * capacity
+        self.peak_members = array("I", [0]) * capacity
+        self.last_minute = -1
+        self.channels = 0
+        self.members = 0
+
+
+class TempVCTelemetry:
+    """Minute-resolution history of temporary voice channel usage per guild.
+
+    Creations, deletions and the peak number of concurrent temp channels and of
+    members in them are kept in array-backed ring buffers holding the last
+    ``capacity`` minutes, so memory stays constant regardless of uptime. Minutes
+    without events inherit the current counts. When ``path`` is given, the
+    buffers are loaded from it on start and written back (compressed) at most
+    every ``flush_interval`` seconds and on ``flush``.
+    """
+
+    def __init__(
+        self,
+        *,
+        path: Path | None = None,
+        capacity: int = 1440,
+        flush_interval: float = 300.0,
+        clock: Callable[[], float] = time.time,
+        metrics: MetricsRegistry = REGISTRY,
+    ) -> None:
+        self._path = path
+        self._capacity = max(1, capacity)
+        self._flush_interval = flush_interval
+        self._clock = clock
+        self._metrics = metrics
+        self._series: Dict[int, _GuildSeries] = {}
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        if path is not None:
+            self._load(path)
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def record_created(self, guild_id: int) -> None:
+        series, slot = self._current(guild_id)
+        series.created[slot] = min(series.created[slot] + 1, _U16_MAX)
+        self._metrics.increment("temp_vc.created", guild=guild_id)
+        self._touch()
+
+    def record_deleted(self, guild_id: int) -> None:
+        series, slot = self._current(guild_id)
+        series.deleted[slot] = min(series.deleted[slot] + 1, _U16_MAX)
+        self._metrics.increment("temp_vc.deleted", guild=guild_id)
+        self._touch()
+
+    def observe(self, guild_id: int, *, channels: int, members: int) -> None:
+        """Record the current number of temp channels and of members inside them."""
+
+        series, slot = self._current(guild_id)
+        series.channels = min(channels, _U16_MAX)
+        series.members = members
+        if series.channels > series.peak_channels[slot]:
+            series.peak_channels[slot] = series.channels
+        if members > series.peak_members[slot]:
+            series.peak_members[slot] = members
+        self._metrics.set_gauge("temp_vc.channels", channels, guild=guild_id)
+        self._metrics.set_gauge("temp_vc.members", members, guild=guild_id)
+        self._touch()
+
+    def report(self, guild_id: int, *, minutes: int, bucket_minutes: int) -> UsageReport | None:
+        """Summarise the last ``minutes`` minutes (capped at the capacity), or None without data."""
+
+        if guild_id not in self._series:
+            return None
+        series, _ = self._current(guild_id)
+        minutes = max(1, min(minutes, self._capacity))
+        bucket_minutes = max(1, min(bucket_minutes, minutes))
+        first_minute = series.last_minute - minutes + 1
+
+        buckets: List[UsageBucket] = []
+        channel_total = member_total = 0
+        for bucket_start in range(first_minute, series.last_minute + 1, bucket_minutes):
+            bucket_end = min(bucket_start + bucket_minutes, series.last_minute + 1)
+            covered = created = deleted = peak_channels = peak_members = 0
+            for minute in range(bucket_start, bucket_end):
+                slot = minute % self._capacity
+                if series.minutes[slot] != minute:
+                    continue
+                covered += 1
+                created += series.created[slot]
+                deleted += series.deleted[slot]
+                peak_channels = max(peak_channels, series.peak_channels[slot])
+                peak_members = max(peak_members, series.peak_members[slot])
+                channel_total += series.peak_channels[slot]
+                member_total += series.peak_members[slot]
+            buckets.append(
+                UsageBucket(
+                    start=bucket_start * 60,
+                    minutes=bucket_end - bucket_start,
+                    covered_minutes=covered,
+                    created=created,
+                    deleted=deleted,
+                    peak_channels=peak_channels,
+                    peak_members=peak_members,
+                )
+            )
+
+        covered_minutes = sum(bucket.covered_minutes for bucket in buckets)
+        return UsageReport(
+            window_minutes=minutes,
+            covered_minutes=covered_minutes,
+            created=sum(bucket.created for bucket in buckets),
+            deleted=sum(bucket.deleted for bucket in buckets),
+            peak_channels=max((bucket.peak_channels for bucket in buckets), default=0),
+            peak_members=max((bucket.peak_members for bucket in buckets), default=0),
+            average_channels=channel_total / covered_minutes if covered_minutes else 0.0,
+            average_members=member_total / covered_minutes if covered_minutes else 0.0,
+            current_channels=series.channels,
+            current_members=series.members,
+            buckets=buckets,
+        )
+
+    def forget_guild(self, guild_id: int) -> None:
+        if self._series.pop(guild_id, None) is not None:
+            self._touch()
+
+    def flush(self) -> None:
+        """Write the buffers to ``path`` if anything changed since the last write."""
+
+        self._last_flush = time.monotonic()
+        if self._path is None or not self._dirty:
+            return
+        try:
+            data = self.dumps()
+            temporary = self._path.with_name(self._path.name + ".tmp")
+            temporary.write_bytes(data)
+            os.replace(temporary, self._path)
+        except OSError:
+            LOGGER.exception("一時VCの利用状況を保存できませんでした: %s", self._path)
+            return
+        self._dirty = False
+
+    def dumps(self) -> bytes:
+        chunks = [_HEADER.pack(self._capacity, len(self._series))]
+        for guild_id, series in self._series.items():
+            chunks.append(_GUILD.pack(guild_id, series.last_minute, series.channels, series.members))
+            for name in _ARRAY_FIELDS:
+                chunks.append(_to_little_endian(getattr(series, name)))
+        return MAGIC + zlib.compress(b"".join(chunks), 6)
+
+    def loads(self, data: bytes) -> None:
+        """Replace the buffers with ones produced by ``dumps``.
+
+        Raises:
+            ValueError: If the data is not a telemetry dump or its capacity differs.
+        """
+
+        if not data.startswith(MAGIC):
+            raise ValueError("not a temp VC telemetry dump")
+        try:
+            payload = zlib.decompress(data[len(MAGIC) :])
+        except zlib.error as exc:
+            raise ValueError(f"corrupt temp VC telemetry dump: {exc}") from exc
+        capacity, guild_count = _HEADER.unpack_from(payload, 0)
+        if capacity != self._capacity:
+            raise ValueError(f"telemetry capacity changed: {capacity} -> {self._capacity}")
+
+        offset = _HEADER.size
+        loaded: Dict[int, _GuildSeries] = {}
+        for _ in range(guild_count):
+            guild_id, _last_minute, channels, members = _GUILD.unpack_from(payload, offset)
+            offset += _GUILD.size
+            series = _GuildSeries(capacity)
+            for name in _ARRAY_FIELDS:
+                values: array = getattr(series, name)
+                size = values.itemsize * capacity
+                if len(payload) < offset + size:
+                    raise ValueError("truncated temp VC telemetry dump")
+                values[:] = _from_little_endian(_TYPECODES[name], payload[offset : offset + size])
+                offset += size
+            # ``last_minute`` stays unset: the downtime is left as minutes without data
+            # instead of being filled with the counts from before the restart.
+            series.channels = channels
+            series.members = members
+            loaded[guild_id] = series
+        self._series = loaded
+
+    def _load(self, path: Path) -> None:
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return
+        except OSError as exc:
+            LOGGER.warning("一時VCの利用状況を読み込めませんでした (%s): %s", path, exc)
+            return
+        try:
+            self.loads(data)
+        except (ValueError, struct.error) as exc:
+            LOGGER.warning("一時VCの利用状況を読み込めないため破棄します (%s): %s", path, exc)
+
+    def _current(self, guild_id: int) -> tuple[_GuildSeries, int]:
+        series = self._series.get(guild_id)
+        if series is None:
+            series = self._series[guild_id] = _GuildSeries(self._capacity)
+        minute = int(self._clock() // 60)
+        if minute > series.last_minute:
+            self._advance(series, minute)
+        return series, series.last_minute % self._capacity
+
+    def _advance(self, series: _GuildSeries, minute: int) -> None:
+        # Minutes without events keep the current counts as their peaks.
+        start = minute if series.last_minute < 0 else max(series.last_minute + 1, minute - self._capacity + 1)
+        for filled in range(start, minute + 1):
+            slot = filled % self._capacity
+            series.minutes[slot] = filled
+            series.created[slot] = 0
+            series.deleted[slot] = 0
+            series.peak_channels[slot] = series.channels
+            series.peak_members[slot] = series.members
+        series.last_minute = minute
+
+    def _touch(self) -> None:
+        self._dirty = True
+        if self._path is not None and time.monotonic() - self._last_flush >= self._flush_interval:
+            self.flush()
+
+
+def _to_little_endian(values: array) -> bytes:
+    if sys.byteorder == "little":
+        return values.tobytes()
+    swapped = array(values.typecode, values)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def _from_little_endian(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+__all__ = ["TempVCTelemetry", "UsageBucket", "UsageReport"]
@@ -0,0 +1 @@
+"""開発・負荷試験用のツール群。本番の Bot からは参照しない。"""
@@ -0,0 +1,295 @@
+"""speed プロファイルの効果を、ゲートウェイイベントのデコードとディスパッチで比較する。
+
+合成したゲートウェイイベント（MESSAGE_CREATE など）を Discord と同じ形式で
+圧縮し、次の 2 つを実装の組み合わせごとに測る。
+
+- decode: フレームの展開と JSON の解析だけを繰り返したときのイベント数/秒
+- dispatch: 展開・解析したイベントを ``BotClient.dispatch`` に渡し、
+  ハンドラーのタスクがすべて終わるまでのイベント数/秒（イベントループの差が出る）
+
+インストールされていないパッケージの組み合わせは省略する。
+
+実行例::
+
+    cd src && python -m devtools.bench_speed --events 20000 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import statistics
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+from app.speed import LoopFactory, ZlibNgDecompressionContext, available_packages, import_optional
+from bot import BotClient
+
+
+Loads = Callable[[Any], Any]
+
+
+@dataclass(frozen=True, slots=True)
+class _Codec:
+    name: str
+    frames: Sequence[bytes]
+    context_factory: Callable[[], Any]
+
+
+class _StdlibZlibContext:
+    """discord.py の zlib-stream 展開と同じ処理を標準の zlib で行う。"""
+
+    __slots__ = ("context", "buffer")
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+        self.context = zlib.decompressobj()
+
+    def decompress(self, data: bytes, /) -> str | None:
+        self.buffer.extend(data)
+        if len(data) < 4 or data[-4:] != b"\x00\x00\xff\xff":
+            return None
+        message = self.context.decompress(self.buffer)
+        self.buffer = bytearray()
+        return message.decode("utf-8")
+
+
+class _ZstdContext:
+    __slots__ = ("decompressor",)
+
+    def __init__(self) -> None:
+        zstandard = import_optional("zstandard")
+        assert zstandard is not None
+        self.decompressor = zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, data: bytes, /) -> str | None:
+        return self.decompressor.decompress(data).decode("utf-8")
+
+
+def _snowflake(rng: random.Random) -> str:
+    return str(rng.randrange(10**17, 10**19))
+
+
+def _user(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "id": _snowflake(rng),
+        "username": f"user{rng.randrange(100000)}",
+        "global_name": "ユーザー" + str(rng.randrange(1000)),
+        "discriminator": "0",
+        "avatar": "%032x" % rng.getrandbits(128),
+        "public_flags": 0,
+    }
+
+
+def _member(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "roles": [_snowflake(rng) for _ in range(rng.randrange(1, 6))],
+        "nick": None,
+        "joined_at": "2024-01-01T00:00:00.000000+00:00",
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+
+
+def build_events(count: int, *, seed: int = 0) -> List[Dict[str, Any]]:
+    """本番の受信比率に近い構成のゲートウェイ DISPATCH ペイロードを作る。"""
+
+    rng = random.Random(seed)
+    guild_id = _snowflake(rng)
+    events: List[Dict[str, Any]] = []
+    for sequence in range(1, count + 1):
+        roll = rng.random()
+        if roll < 0.55:
+            event_type = "MESSAGE_CREATE"
+            data: Dict[str, Any] = {
+                "id": _snowflake(rng),
+                "channel_id": _snowflake(rng),
+                "guild_id": guild_id,
+                "author": _user(rng),
+                "member": _member(rng),
+                "content": "こんにちは " * rng.randrange(1, 30),
+                "timestamp": "2024-01-01T00:00:00.000000+00:00",
+                "edited_timestamp": None,
+                "tts": False,
+                "mention_everyone": False,
+                "mentions": [],
+                "mention_roles": [],
+                "attachments": [],
+                "embeds": [],
+                "pinned": False,
+                "type": 0,
+                "flags": 0,
+            }
+        elif roll < 0.75:
+            event_type = "TYPING_START"
+            data = {
+                "channel_id": _snowflake(rng),
+                "guild_id": guild_id,
+                "user_id": _snowflake(rng),
+                "timestamp": int(time.time()),
+                "member": {**_member(rng), "user": _user(rng)},
+            }
+        elif roll < 0.9:
+            event_type = "VOICE_STATE_UPDATE"
+            data = {
+                "guild_id": guild_id,
+                "channel_id": _snowflake(rng) if rng.random() < 0.5 else None,
+                "user_id": _snowflake(rng),
+                "member": {**_member(rng), "user": _user(rng)},
+                "session_id": "%032x" % rng.getrandbits(128),
+                "deaf": False,
+                "mute": False,
+                "self_deaf": False,
+                "self_mute": rng.random() < 0.3,
+                "self_video": False,
+                "suppress": False,
+                "request_to_speak_timestamp": None,
+            }
+        else:
+            event_type = "GUILD_MEMBER_UPDATE"
+            data = {**_member(rng), "guild_id": guild_id, "user": _user(rng)}
+        events.append({"op": 0, "s": sequence, "t": event_type, "d": data})
+    return events
+
+
+def build_codecs(events: Iterable[Dict[str, Any]]) -> List[_Codec]:
+    """インストール済みの展開実装ごとに、ゲートウェイと同じ形式のフレーム列を作る。"""
+
+    payloads = [json.dumps(event, separators=(",", ":"), ensure_ascii=False).encode("utf-8") for event in events]
+
+    compressor = zlib.compressobj()
+    zlib_frames = [compressor.compress(payload) + compressor.flush(zlib.Z_SYNC_FLUSH) for payload in payloads]
+    codecs = [_Codec("zlib", zlib_frames, _StdlibZlibContext)]
+    if import_optional("zlib_ng.zlib_ng") is not None:
+        codecs.append(_Codec("zlib-ng", zlib_frames, ZlibNgDecompressionContext))
+
+    zstandard = import_optional("zstandard")
+    if zstandard is not None:
+        stream = zstandard.ZstdCompressor().compressobj()
+        zstd_frames = [
+            stream.compress(payload) + stream.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK) for payload in payloads
+        ]
+        codecs.append(_Codec("zstd", zstd_frames, _ZstdContext))
+    return codecs
+
+
+def json_loaders() -> List[Tuple[str, Loads]]:
+    loaders: List[Tuple[str, Loads]] = [("json", json.loads)]
+    orjson = import_optional("orjson")
+    if orjson is not None:
+        loaders.append(("orjson", orjson.loads))
+    return loaders
+
+
+def event_loops() -> List[Tuple[str, LoopFactory]]:
+    loops: List[Tuple[str, LoopFactory]] = [("asyncio", asyncio.new_event_loop)]
+    uvloop = import_optional("uvloop")
+    if uvloop is not None:
+        loops.append(("uvloop", uvloop.new_event_loop))
+    return loops
+
+
+def bench_decode(codec: _Codec, loads: Loads) -> float:
+    """全フレームを展開・解析するのにかかった秒数を返す。"""
+
+    context = codec.context_factory()
+    started = time.perf_counter()
+    for frame in codec.frames:
+        message = context.decompress(frame)
+        if message is not None:
+            loads(message)
+    return time.perf_counter() - started
+
+
+async def _dispatch_all(codec: _Codec, loads: Loads) -> float:
+    client = BotClient()
+    handled = 0
+
+    async def on_bench_event(payload: Dict[str, Any]) -> None:
+        nonlocal handled
+        handled += 1
+
+    client.on_bench_event = on_bench_event  # type: ignore[attr-defined]
+    context = codec.context_factory()
+    async with client:
+        started = time.perf_counter()
+        for frame in codec.frames:
+            message = context.decompress(frame)
+            if message is None:
+                continue
+            client.dispatch("bench_event", loads(message))
+            # ゲートウェイの受信ループと同様に、イベントごとにループへ制御を返す。
+            await asyncio.sleep(0)
+        while client._inflight:
+            await asyncio.gather(*client._inflight)
+        elapsed = time.perf_counter() - started
+    assert handled == len(codec.frames)
+    return elapsed
+
+
+def bench_dispatch(loop_factory: LoopFactory, codec: _Codec, loads: Loads) -> float:
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        return runner.run(_dispatch_all(codec, loads))
+
+
+def _median_rate(samples: Sequence[float], events: int) -> float:
+    return events / statistics.median(samples)
+
+
+def _print_table(title: str, rows: List[Tuple[str, float]]) -> None:
+    baseline = rows[0][1]
+    print(title)
+    for label, rate in rows:
+        print(f"  {label:<32} {rate:>12,.0f} events/s  x{rate / baseline:.2f}")
+
+
+def run_benchmark(args: argparse.Namespace) -> None:
+    events = build_events(args.events, seed=args.seed)
+    codecs = build_codecs(events)
+    loaders = json_loaders()
+    size = sum(len(frame) for frame in codecs[0].frames)
+    print(f"events: {len(events)} (compressed {size / 1024:.0f} KiB), repeat: {args.repeat}")
+    print("installed: " + ", ".join(f"{name}={'yes' if ok else 'no'}" for name, ok in available_packages().items()))
+
+    decode_rows = []
+    for codec in codecs:
+        for loader_name, loads in loaders:
+            samples = [bench_decode(codec, loads) for _ in range(args.repeat)]
+            decode_rows.append((f"{codec.name} + {loader_name}", _median_rate(samples, len(events))))
+    _print_table("decode (展開 + JSON 解析):", decode_rows)
+
+    dispatch_rows = []
+    for loop_name, loop_factory in event_loops():
+        for codec, (loader_name, loads) in ((codecs[0], loaders[0]), (codecs[-1], loaders[-1])):
+            label = f"{loop_name} + {codec.name} + {loader_name}"
+            if any(row[0] == label for row in dispatch_rows):
+                continue
+            samples = [bench_dispatch(loop_factory, codec, loads) for _ in range(args.repeat)]
+            dispatch_rows.append((label, _median_rate(samples, len(events))))
+    _print_table("dispatch (展開 + 解析 + BotClient.dispatch):", dispatch_rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="speed プロファイルのデコード・ディスパッチ性能比較")
+    parser.add_argument("--events", type=int, default=20000, help="合成するゲートウェイイベント数")
+    parser.add_argument("--repeat", type=int, default=5, help="各組み合わせの試行回数（中央値を表示）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    # 音声関連パッケージがない旨の警告はベンチマークに関係しない。
+    logging.getLogger("discord.client").setLevel(logging.ERROR)
+    run_benchmark(args)
+
+
+__all__ = ["build_codecs", "build_events", "run_benchmark"]
+
+
+if __name__ == "__main__":
+    main()
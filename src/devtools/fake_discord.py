@@ -0,0 +1,424 @@
+"""Discord REST API の代替となるローカル HTTP サーバー。
+
+Bot が利用する一部のエンドポイントだけを実装し、本物と同じ形式の
+``X-RateLimit-*`` ヘッダーと 429 応答（ルート単位・グローバル）を返す。
+``DISCORD_API_BASE_URL=http://127.0.0.1:8787/api/v10`` を設定すると Bot の
+REST 呼び出しをこのサーバーへ向けられる。
+
+起動例::
+
+    python -m devtools.fake_discord --port 8787 --global-limit 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from aiohttp import web
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+API_PREFIX = "/api/v10"
+
+Handler = Callable[[web.Request], Awaitable[web.StreamResponse]]
+
+
+def _json_response(
+    payload: Any,
+    *,
+    status: int = 200,
+    headers: Dict[str, str] | None = None,
+) -> web.Response:
+    # discord.py は Content-Type が厳密に application/json の場合のみ JSON として扱う。
+    response_headers = {"Content-Type": "application/json", **(headers or {})}
+    return web.Response(body=json.dumps(payload).encode(), status=status, headers=response_headers)
+
+
+@dataclass(frozen=True, slots=True)
+class RouteLimit:
+    """ルートごとのレート制限（window 秒あたり limit 件）。"""
+
+    limit: int
+    window: float
+
+
+DEFAULT_ROUTE_LIMITS: Dict[str, RouteLimit] = {
+    "POST /guilds/{guild_id}/channels": RouteLimit(limit=5, window=5.0),
+    "PATCH /channels/{channel_id}": RouteLimit(limit=2, window=10.0),
+    "DELETE /channels/{channel_id}": RouteLimit(limit=5, window=5.0),
+    "PATCH /channels/{channel_id}/messages/{message_id}": RouteLimit(limit=5, window=5.0),
+    "PUT /guilds/{guild_id}/members/{user_id}/roles/{role_id}": RouteLimit(limit=10, window=10.0),
+    "PATCH /guilds/{guild_id}/members/{user_id}": RouteLimit(limit=10, window=10.0),
+    "GET /guilds/{guild_id}/members/{user_id}": RouteLimit(limit=5, window=1.0),
+    "DELETE /channels/{channel_id}/messages/{message_id}": RouteLimit(limit=5, window=1.0),
+}
+
+DEFAULT_ROUTE_LIMIT = RouteLimit(limit=50, window=1.0)
+
+
+@dataclass(slots=True)
+class _Bucket:
+    limit: RouteLimit
+    hash: str
+    reset_at: float = 0.0
+    remaining: int = 0
+
+
+@dataclass(slots=True)
+class FakeDiscordStats:
+    """サーバー側で観測したリクエスト数と 429 の件数。"""
+
+    requests: Dict[str, int] = field(default_factory=dict)
+    route_limited: Dict[str, int] = field(default_factory=dict)
+    global_limited: int = 0
+
+    def record(self, route: str, *, limited: bool = False) -> None:
+        table = self.route_limited if limited else self.requests
+        table[route] = table.get(route, 0) + 1
+
+
+class FakeDiscordServer:
+    """Bot が使う Discord REST エンドポイントのインメモリ実装。"""
+
+    def __init__(
+        self,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 8787,
+        route_limits: Dict[str, RouteLimit] | None = None,
+        global_limit: int = 50,
+        latency: float = 0.0,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.route_limits = dict(DEFAULT_ROUTE_LIMITS if route_limits is None else route_limits)
+        self.global_limit = global_limit
+        self.latency = latency
+        self.stats = FakeDiscordStats()
+        self.channels: Dict[int, Dict[str, Any]] = {}
+        self.member_roles: Dict[Tuple[int, int], set[int]] = {}
+        self._buckets: Dict[Tuple[str, str], _Bucket] = {}
+        self._global_window_start = 0.0
+        self._global_count = 0
+        self._ids = itertools.count(1)
+        self._runner: web.AppRunner | None = None
+        self.bot_user_id = self.next_id()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}{API_PREFIX}"
+
+    def register_channel(self, payload: Dict[str, Any]) -> None:
+        """外部で作られたチャンネル（リプレイ中のギルドなど）を編集・削除できるようにする。"""
+
+        self.channels[int(payload["id"])] = dict(payload)
+
+    def next_id(self) -> int:
+        # Discord のエポックを基準にした Snowflake 風の ID を払い出す。
+        millis = int(time.time() * 1000) - 1420070400000
+        return (millis << 22) | (next(self._ids) & 0x3FFFFF)
+
+    async def start(self) -> None:
+        app = web.Application()
+        routes = [
+            ("GET", "/users/@me", self._get_current_user),
+            ("GET", "/oauth2/applications/@me", self._get_application),
+            ("POST", "/guilds/{guild_id}/channels", self._create_channel),
+            ("PATCH", "/channels/{channel_id}", self._edit_channel),
+            ("DELETE", "/channels/{channel_id}", self._delete_channel),
+            ("PATCH", "/channels/{channel_id}/messages/{message_id}", self._edit_message),
+            ("DELETE", "/channels/{channel_id}/messages/{message_id}", self._delete_message),
+            ("PUT", "/guilds/{guild_id}/members/{user_id}/roles/{role_id}", self._add_role),
+            ("GET", "/guilds/{guild_id}/members/{user_id}", self._get_member),
+            ("PATCH", "/guilds/{guild_id}/members/{user_id}", self._edit_member),
+            ("POST", "/interactions/{interaction_id}/{token}/callback", self._interaction_callback),
+            ("POST", "/webhooks/{application_id}/{token}", self._followup),
+            ("PATCH", "/webhooks/{application_id}/{token}/messages/{message_id}", self._edit_followup),
+        ]
+        for method, path, handler in routes:
+            app.router.add_route(method, API_PREFIX + path, self._rate_limited(method, path, handler))
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        LOGGER.info("疑似 Discord API を起動しました: %s", self.base_url)
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    # ------------------------------------------------------------------
+    # レート制限
+    # ------------------------------------------------------------------
+    def _rate_limited(self, method: str, path: str, handler: Handler) -> Handler:
+        route = f"{method} {path}"
+        limit = self.route_limits.get(route, DEFAULT_ROUTE_LIMIT)
+        # Discord と同様にメジャーパラメーター単位でバケットを分ける。
+        major_key = "guild_id" if "{guild_id}" in path else "channel_id" if "{channel_id}" in path else None
+        bucket_hash = hashlib.sha1(route.encode()).hexdigest()[:16]
+
+        async def wrapper(request: web.Request) -> web.StreamResponse:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+
+            now = time.time()
+            global_retry = self._consume_global(now)
+            if global_retry is not None:
+                self.stats.global_limited += 1
+                return self._too_many_requests(global_retry, is_global=True)
+
+            major = request.match_info.get(major_key, "") if major_key else ""
+            bucket = self._buckets.get((route, major))
+            if bucket is None or now >= bucket.reset_at:
+                bucket = _Bucket(limit=limit, hash=bucket_hash, reset_at=now + limit.window, remaining=limit.limit)
+                self._buckets[(route, major)] = bucket
+
+            headers = {
+                "X-RateLimit-Limit": str(limit.limit),
+                "X-RateLimit-Bucket": bucket.hash,
+                "X-RateLimit-Reset": f"{bucket.reset_at:.3f}",
+                "X-RateLimit-Reset-After": f"{max(0.0, bucket.reset_at - now):.3f}",
+            }
+            if bucket.remaining <= 0:
+                self.stats.record(route, limited=True)
+                headers["X-RateLimit-Remaining"] = "0"
+                return self._too_many_requests(bucket.reset_at - now, headers=headers)
+
+            bucket.remaining -= 1
+            headers["X-RateLimit-Remaining"] = str(bucket.remaining)
+            self.stats.record(route)
+            response = await handler(request)
+            response.headers.update(headers)
+            return response
+
+        return wrapper
+
+    def _consume_global(self, now: float) -> float | None:
+        if now - self._global_window_start >= 1.0:
+            self._global_window_start = now
+            self._global_count = 0
+        if self._global_count >= self.global_limit:
+            return 1.0 - (now - self._global_window_start)
+        self._global_count += 1
+        return None
+
+    @staticmethod
+    def _too_many_requests(
+        retry_after: float,
+        *,
+        is_global: bool = False,
+        headers: Dict[str, str] | None = None,
+    ) -> web.Response:
+        response_headers = dict(headers or {})
+        # discord.py は Via ヘッダーの無い 429 を Cloudflare による遮断とみなす。
+        response_headers["Via"] = "1.1 google"
+        response_headers["Retry-After"] = f"{max(retry_after, 0.0):.3f}"
+        response_headers["X-RateLimit-Scope"] = "global" if is_global else "user"
+        if is_global:
+            response_headers["X-RateLimit-Global"] = "true"
+        return _json_response(
+            {
+                "message": "You are being rate limited.",
+                "retry_after": round(max(retry_after, 0.0), 3),
+                "global": is_global,
+            },
+            status=429,
+            headers=response_headers,
+        )
+
+    # ------------------------------------------------------------------
+    # ペイロード
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _timestamp() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    @staticmethod
+    def user_payload(user_id: int, *, bot: bool = False) -> Dict[str, Any]:
+        return {
+            "id": str(user_id),
+            "username": f"user{user_id % 10000}",
+            "discriminator": "0",
+            "global_name": None,
+            "avatar": None,
+            "bot": bot,
+        }
+
+    def member_payload(self, guild_id: int, user_id: int) -> Dict[str, Any]:
+        roles = self.member_roles.get((guild_id, user_id), set())
+        return {
+            "user": self.user_payload(user_id),
+            "roles": [str(role_id) for role_id in sorted(roles)],
+            "joined_at": self._timestamp(),
+            "deaf": False,
+            "mute": False,
+            "nick": None,
+            "flags": 0,
+        }
+
+    def message_payload(self, channel_id: int, message_id: int, content: str) -> Dict[str, Any]:
+        return {
+            "id": str(message_id),
+            "channel_id": str(channel_id),
+            "author": self.user_payload(self.bot_user_id, bot=True),
+            "content": content,
+            "timestamp": self._timestamp(),
+            "edited_timestamp": self._timestamp(),
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": [],
+            "pinned": False,
+            "type": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # エンドポイント
+    # ------------------------------------------------------------------
+    async def _get_current_user(self, request: web.Request) -> web.Response:
+        return _json_response(self.user_payload(self.bot_user_id, bot=True))
+
+    async def _get_application(self, request: web.Request) -> web.Response:
+        return _json_response(
+            {
+                "id": str(self.bot_user_id),
+                "name": "fake-application",
+                "icon": None,
+                "description": "",
+                "bot_public": False,
+                "bot_require_code_grant": False,
+                "owner": self.user_payload(self.bot_user_id),
+                "verify_key": "",
+                "flags": 0,
+            }
+        )
+
+    async def _create_channel(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        guild_id = request.match_info["guild_id"]
+        channel = {
+            "id": str(self.next_id()),
+            "guild_id": guild_id,
+            "type": int(body.get("type", 2)),
+            "name": body.get("name", "channel"),
+            "position": 0,
+            "parent_id": body.get("parent_id"),
+            "permission_overwrites": body.get("permission_overwrites", []),
+            "bitrate": 64000,
+            "user_limit": 0,
+            "rtc_region": None,
+            "nsfw": False,
+        }
+        self.channels[int(channel["id"])] = channel
+        return _json_response(channel, status=201)
+
+    async def _edit_channel(self, request: web.Request) -> web.Response:
+        channel = self.channels.get(int(request.match_info["channel_id"]))
+        if channel is None:
+            return self._not_found("Unknown Channel", 10003)
+        body = await request.json()
+        for key in ("name", "parent_id", "permission_overwrites", "position"):
+            if key in body:
+                channel[key] = body[key]
+        return _json_response(channel)
+
+    async def _delete_channel(self, request: web.Request) -> web.Response:
+        channel = self.channels.pop(int(request.match_info["channel_id"]), None)
+        if channel is None:
+            return self._not_found("Unknown Channel", 10003)
+        return _json_response(channel)
+
+    async def _edit_message(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        payload = self.message_payload(
+            int(request.match_info["channel_id"]),
+            int(request.match_info["message_id"]),
+            body.get("content", ""),
+        )
+        return _json_response(payload)
+
+    async def _delete_message(self, request: web.Request) -> web.Response:
+        return web.Response(status=204)
+
+    async def _add_role(self, request: web.Request) -> web.Response:
+        key = (int(request.match_info["guild_id"]), int(request.match_info["user_id"]))
+        self.member_roles.setdefault(key, set()).add(int(request.match_info["role_id"]))
+        return web.Response(status=204)
+
+    async def _get_member(self, request: web.Request) -> web.Response:
+        guild_id = int(request.match_info["guild_id"])
+        user_id = int(request.match_info["user_id"])
+        return _json_response(self.member_payload(guild_id, user_id))
+
+    async def _edit_member(self, request: web.Request) -> web.Response:
+        guild_id = int(request.match_info["guild_id"])
+        user_id = int(request.match_info["user_id"])
+        return _json_response(self.member_payload(guild_id, user_id))
+
+    async def _interaction_callback(self, request: web.Request) -> web.Response:
+        return web.Response(status=204)
+
+    async def _followup(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        return _json_response(self.message_payload(0, self.next_id(), body.get("content", "")))
+
+    async def _edit_followup(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        message_id = int(request.match_info["message_id"])
+        return _json_response(self.message_payload(0, message_id, body.get("content", "")))
+
+    @staticmethod
+    def _not_found(message: str, code: int) -> web.Response:
+        return _json_response({"message": message, "code": code}, status=404)
+
+
+__all__ = ["FakeDiscordServer", "FakeDiscordStats", "RouteLimit"]
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    server = FakeDiscordServer(
+        host=args.host,
+        port=args.port,
+        global_limit=args.global_limit,
+        latency=args.latency,
+    )
+    await server.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="疑似 Discord REST API サーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--global-limit", type=int, default=50, help="1 秒あたりのグローバル上限")
+    parser.add_argument("--latency", type=float, default=0.0, help="各応答に加える遅延（秒）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
+
@@ -0,0 +1,312 @@
+"""記録したゲートウェイイベントを BotClient に流し直し、本番の負荷をオフラインで再現する。
+
+``GATEWAY_RECORD=true`` で記録したファイル（またはそのディレクトリ）を読み、
+ConnectionState のパーサー経由で ``BotClient`` へ渡す。ハンドラーから出る
+REST 呼び出しは疑似 Discord API が受けるため、トークンやネットワークは不要。
+
+``--speed 1`` で記録時と同じ間隔、``--speed 10`` で 10 倍速、``--speed 0`` で
+待ち時間なしに流す。``--profile`` を指定すると cProfile の結果を保存して上位を表示する。
+``--trace`` を指定するとイベントごとのスパン（キャッシュ・REST 呼び出しを含む）を書き出す。
+
+実行例::
+
+    cd src && python -m devtools.replay data/recordings --speed 0 \\
+        --temp-vc 123:456 --nickname-rule 123:789:1011 --profile replay.pstats
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import cProfile
+import logging
+import pstats
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Tuple
+
+import discord
+from tinydb import TinyDB
+from tinydb.storages import MemoryStorage
+
+from app.config import TracingSettings
+from app.metrics import REGISTRY
+from app.tracing import configure_tracing
+from bot import BotClient
+from bot.admission import (
+    SHED_POLICIES,
+    AdmissionController,
+    GatePolicy,
+    merge_voice_states,
+    message_key,
+    voice_state_key,
+)
+from bot.interactions import InteractionRunner
+from bot.member_cache import ActiveMemberCache
+from bot.nickname_sync import ChannelNicknameRule, NicknameSyncService
+from bot.outbound import OutboundPriority, OutboundScheduler
+from bot.recorder import RecordedEvent, read_recordings
+from bot.temp_vc import (
+    TempVCCategoryStore,
+    TempVCChannelPool,
+    TempVCChannelStore,
+    TempVCPoolStore,
+    TempVoiceChannelManager,
+)
+
+from .fake_discord import FakeDiscordServer
+from .soak import StaticRuleRepository, _Timings
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+PROFILE_REPORT_LIMIT = 25
+
+
+def _parse_ids(raw: str, count: int, option: str) -> Tuple[int, ...]:
+    parts = raw.split(":")
+    if len(parts) != count or not all(part.isdigit() for part in parts):
+        raise argparse.ArgumentTypeError(f"{option} は {':'.join(['ID'] * count)} の形式で指定してください: {raw}")
+    return tuple(int(part) for part in parts)
+
+
+def _register_channels(server: FakeDiscordServer, recorded: RecordedEvent) -> None:
+    # 記録時から存在するチャンネルも、疑似サーバー上で編集・削除できるようにする。
+    data = recorded.data
+    if recorded.event == "GUILD_CREATE":
+        for channel in data.get("channels", ()):
+            server.register_channel({**channel, "guild_id": data["id"]})
+    elif recorded.event in ("CHANNEL_CREATE", "CHANNEL_UPDATE") and "id" in data:
+        server.register_channel(data)
+
+
+def _build_admission(args: argparse.Namespace) -> AdmissionController | None:
+    if args.event_concurrency <= 0:
+        return None
+    return AdmissionController(
+        {
+            "on_message": GatePolicy(
+                concurrency=args.event_concurrency,
+                queue_size=args.event_queue,
+                shedding=args.shed_policy,
+                timeout=args.event_timeout,
+                key=message_key,
+            ),
+            "on_voice_state_update": GatePolicy(
+                concurrency=args.event_concurrency,
+                queue_size=args.event_queue,
+                shedding=args.shed_policy,
+                timeout=args.event_timeout,
+                key=voice_state_key,
+                merge=merge_voice_states,
+            ),
+        }
+    )
+
+
+def _timed(timings: _Timings, name: str, handler: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return await timings.measure(name, lambda: handler(*args, **kwargs))
+
+    return wrapper
+
+
+async def run_replay(args: argparse.Namespace) -> None:
+    server = FakeDiscordServer(port=args.port, global_limit=args.global_limit, latency=args.latency)
+    await server.start()
+    discord.http.Route.BASE = server.base_url
+
+    # BotClient は生成時にトレースの有無を見て REST 呼び出しを包むため、先に有効にする。
+    span_processor = (
+        configure_tracing(TracingSettings(exporter="file", file_path=args.trace, sample_rate=args.trace_sample_rate))
+        if args.trace is not None
+        else None
+    )
+    outbound = OutboundScheduler(concurrency=args.outbound_concurrency)
+    database = TinyDB(storage=MemoryStorage)
+    category_store = TempVCCategoryStore(database)
+    manager = TempVoiceChannelManager(
+        category_store=category_store,
+        channel_store=TempVCChannelStore(database),
+        pool=TempVCChannelPool(
+            store=TempVCPoolStore(database),
+            category_store=category_store,
+            outbound=outbound,
+        ),
+        outbound=outbound,
+    )
+    for guild_id, category_id in args.temp_vc:
+        manager.set_category_for_guild(guild_id=guild_id, category_id=category_id)
+
+    now = datetime.now(timezone.utc)
+    rules = [
+        ChannelNicknameRule(
+            guild_id=guild_id,
+            channel_id=channel_id,
+            role_id=role_id,
+            updated_by=server.bot_user_id,
+            updated_at=now,
+        )
+        for guild_id, channel_id, role_id in args.nickname_rule
+    ]
+    member_cache = ActiveMemberCache()
+    client = BotClient(
+        temp_vc_manager=manager,
+        nickname_sync_service=NicknameSyncService(
+            StaticRuleRepository(*rules),  # type: ignore[arg-type]
+            member_cache=member_cache,
+            outbound=outbound,
+        ),
+        member_cache=member_cache,
+        interaction_runner=InteractionRunner(outbound=outbound),
+        admission=_build_admission(args),
+    )
+    timings = _Timings()
+    client.on_message = _timed(timings, "on_message", client.on_message)  # type: ignore[method-assign]
+    client.on_voice_state_update = _timed(  # type: ignore[method-assign]
+        timings, "on_voice_state_update", client.on_voice_state_update
+    )
+
+    counts: Counter[str] = Counter()
+    errors: Counter[str] = Counter()
+    max_lag = 0.0
+    profiler = cProfile.Profile() if args.profile else None
+    try:
+        await client.login("replay-token")
+        state = client._connection
+        loop = asyncio.get_running_loop()
+        first_timestamp: float | None = None
+        started = loop.time()
+        if profiler is not None:
+            profiler.enable()
+
+        for recorded in read_recordings(args.recordings):
+            if args.limit and sum(counts.values()) >= args.limit:
+                break
+            if first_timestamp is None:
+                first_timestamp = recorded.timestamp
+            if args.speed > 0:
+                due = started + (recorded.timestamp - first_timestamp) / args.speed
+                delay = due - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    max_lag = max(max_lag, -delay)
+
+            counts[recorded.event] += 1
+            if recorded.event == "READY":
+                # セッションは張らないため、Bot 自身のユーザー情報だけを記録時のものにする。
+                state.user = discord.ClientUser(state=state, data=recorded.data["user"])
+                continue
+            _register_channels(server, recorded)
+            parser = state.parsers.get(recorded.event)
+            if parser is None:
+                errors[f"{recorded.event} (no parser)"] += 1
+                continue
+            try:
+                parser(recorded.data)
+            except Exception:
+                errors[recorded.event] += 1
+                LOGGER.exception("イベントの処理に失敗しました: %s", recorded.event)
+            # ゲートウェイの受信ループと同様に、イベントごとにループへ制御を返す。
+            await asyncio.sleep(0)
+
+        await client.drain(timeout=args.drain_timeout)
+        elapsed = loop.time() - started
+        if profiler is not None:
+            profiler.disable()
+    finally:
+        manager.close()
+        await client.close()
+        await server.stop()
+        if span_processor is not None:
+            span_processor.stop()
+
+    total = sum(counts.values())
+    print(f"events: {total} in {elapsed:.2f}s ({total / elapsed if elapsed else 0:,.0f} events/s, max lag {max_lag:.3f}s)")
+    for event, count in counts.most_common():
+        print(f"  {event:<24} {count:>8} errors={errors.get(event, 0)}")
+    for event, count in errors.items():
+        if event not in counts:
+            print(f"  {event:<24} errors={count}")
+    for line in timings.summary():
+        print(line)
+    print("server requests:")
+    for route, count in sorted(server.stats.requests.items()):
+        limited = server.stats.route_limited.get(route, 0)
+        print(f"  {route:<60} ok={count:<5} 429={limited}")
+    print("outbound scheduler:")
+    for priority in OutboundPriority:
+        count = REGISTRY.counter("outbound.requests", priority=priority.name)
+        waited = REGISTRY.counter("outbound.wait_seconds", priority=priority.name)
+        if count:
+            print(f"  {priority.name:<14} requests={count:<6.0f} avg_wait={waited / count * 1000:8.1f}ms")
+
+    shed = REGISTRY.counters("admission.shed")
+    timeouts = REGISTRY.counters("admission.timeouts")
+    if shed or timeouts:
+        print("admission control:")
+        for labels, count in sorted(shed.items()):
+            print(f"  shed {dict(labels)} = {count:.0f}")
+        for labels, count in sorted(timeouts.items()):
+            print(f"  timeout {dict(labels)} = {count:.0f}")
+
+    if args.trace is not None:
+        print(f"spans saved to {args.trace}")
+    if profiler is not None:
+        profiler.dump_stats(args.profile)
+        print(f"profile saved to {args.profile}")
+        pstats.Stats(profiler).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_REPORT_LIMIT)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="記録したゲートウェイイベントのリプレイ")
+    parser.add_argument("recordings", nargs="+", type=Path, help="記録ファイルまたはそのディレクトリ")
+    parser.add_argument("--speed", type=float, default=1.0, help="再生速度の倍率 (0 で待ち時間なし)")
+    parser.add_argument("--limit", type=int, default=0, help="再生するイベント数の上限 (0 で無制限)")
+    parser.add_argument(
+        "--temp-vc",
+        action="append",
+        default=[],
+        type=lambda raw: _parse_ids(raw, 2, "--temp-vc"),
+        metavar="GUILD:CATEGORY",
+        help="一時VCカテゴリーを設定するギルド",
+    )
+    parser.add_argument(
+        "--nickname-rule",
+        action="append",
+        default=[],
+        type=lambda raw: _parse_ids(raw, 3, "--nickname-rule"),
+        metavar="GUILD:CHANNEL:ROLE",
+        help="ニックネーム同期ルール",
+    )
+    parser.add_argument(
+        "--event-concurrency",
+        type=int,
+        default=0,
+        help="on_message / on_voice_state_update の同時実行数（0 で流量制御なし）",
+    )
+    parser.add_argument("--event-queue", type=int, default=500, help="流量制御の待機列の長さ")
+    parser.add_argument("--shed-policy", choices=SHED_POLICIES, default="collapse", help="待機列があふれたときの間引き方")
+    parser.add_argument("--event-timeout", type=float, default=30.0, help="イベントハンドラーのタイムアウト秒数")
+    parser.add_argument("--profile", type=Path, default=None, help="cProfile の結果を保存するパス")
+    parser.add_argument("--trace", type=Path, default=None, help="スパンを JSON Lines で書き出すパス")
+    parser.add_argument("--trace-sample-rate", type=float, default=1.0, help="トレースを記録するイベントの割合")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--outbound-concurrency", type=int, default=8)
+    parser.add_argument("--global-limit", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--drain-timeout", type=float, default=60.0, help="再生後にハンドラーの完了を待つ秒数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run_replay(args))
+
+
+__all__ = ["run_replay"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""疑似 Discord API に対して一時VC・ニックネーム同期の負荷をかける。
+
+``TempVoiceChannelManager`` と ``NicknameSyncService`` を本番と同じコードで
+動かし、discord.py のレート制限処理込みでの所要時間と 429 の発生数を測る。
+ネットワーク接続や Discord のトークンは不要。
+
+実行例::
+
+    cd src && python -m devtools.soak --users 40 --messages 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, List
+
+import discord
+from tinydb import TinyDB
+from tinydb.storages import MemoryStorage
+
+from app.metrics import REGISTRY
+from bot.nickname_sync import ChannelNicknameRule, NicknameSyncService
+from bot.outbound import OutboundPriority, OutboundScheduler
+from bot.temp_vc import (
+    TempVCCategoryStore,
+    TempVCChannelPool,
+    TempVCChannelStore,
+    TempVCPoolStore,
+    TempVoiceChannelManager,
+)
+
+from .fake_discord import FakeDiscordServer
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class _Timings:
+    samples: Dict[str, List[float]] = field(default_factory=dict)
+    errors: Dict[str, int] = field(default_factory=dict)
+
+    async def measure(self, name: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        try:
+            return await func()
+        except Exception:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            LOGGER.exception("%s が失敗しました。", name)
+            return None
+        finally:
+            self.samples.setdefault(name, []).append(time.perf_counter() - started)
+
+    def summary(self) -> List[str]:
+        lines = []
+        for name, values in sorted(self.samples.items()):
+            ordered = sorted(values)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            lines.append(
+                f"{name:<24} n={len(values):<5} p50={statistics.median(ordered) * 1000:8.1f}ms "
+                f"p95={p95 * 1000:8.1f}ms max={ordered[-1] * 1000:8.1f}ms "
+                f"errors={self.errors.get(name, 0)}"
+            )
+        return lines
+
+
+class StaticRuleRepository:
+    """固定のニックネーム同期ルールを返すインメモリのリポジトリ。"""
+
+    def __init__(self, *rules: ChannelNicknameRule) -> None:
+        self._rules = {(rule.guild_id, rule.channel_id): rule for rule in rules}
+
+    async def get_rule_for_channel(self, *, guild_id: int, channel_id: int) -> ChannelNicknameRule | None:
+        return self._rules.get((guild_id, channel_id))
+
+
+def _guild_payload(server: FakeDiscordServer, guild_id: int, category_id: int, text_id: int, role_id: int) -> Dict[str, Any]:
+    def role(role_id: int, name: str, position: int) -> Dict[str, Any]:
+        return {
+            "id": str(role_id),
+            "name": name,
+            "color": 0,
+            "hoist": False,
+            "position": position,
+            "permissions": "0",
+            "managed": False,
+            "mentionable": False,
+        }
+
+    def channel(channel_id: int, name: str, channel_type: int) -> Dict[str, Any]:
+        return {
+            "id": str(channel_id),
+            "guild_id": str(guild_id),
+            "name": name,
+            "type": channel_type,
+            "position": 0,
+            "parent_id": None,
+            "permission_overwrites": [],
+            "nsfw": False,
+        }
+
+    return {
+        "id": str(guild_id),
+        "name": "soak-guild",
+        "icon": None,
+        "owner_id": str(server.bot_user_id),
+        "roles": [role(guild_id, "@everyone", 0), role(role_id, "synced", 1)],
+        "channels": [channel(category_id, "temp-vc", 4), channel(text_id, "nickname-sync", 0)],
+        "members": [],
+        "emojis": [],
+        "stickers": [],
+        "features": [],
+        "member_count": 0,
+    }
+
+
+def _message_payload(server: FakeDiscordServer, guild_id: int, channel_id: int, user_id: int) -> Dict[str, Any]:
+    member = server.member_payload(guild_id, user_id)
+    user = member.pop("user")
+    return {
+        "id": str(server.next_id()),
+        "channel_id": str(channel_id),
+        "guild_id": str(guild_id),
+        "author": user,
+        "member": member,
+        "content": "hello",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0,
+    }
+
+
+async def run_soak(args: argparse.Namespace) -> None:
+    server = FakeDiscordServer(port=args.port, global_limit=args.global_limit, latency=args.latency)
+    await server.start()
+    discord.http.Route.BASE = server.base_url
+
+    client = discord.Client(intents=discord.Intents.default())
+    timings = _Timings()
+    try:
+        await client.login("soak-test-token")
+        state = client._connection
+
+        guild_id, category_id, text_id, role_id = (server.next_id() for _ in range(4))
+        guild = discord.Guild(
+            data=_guild_payload(server, guild_id, category_id, text_id, role_id),  # type: ignore[arg-type]
+            state=state,
+        )
+        state._add_guild(guild)
+        text_channel = guild.get_channel(text_id)
+        assert isinstance(text_channel, discord.TextChannel)
+
+        members = []
+        for _ in range(args.users):
+            user_id = server.next_id()
+            members.append(
+                discord.Member(data=server.member_payload(guild_id, user_id), guild=guild, state=state)  # type: ignore[arg-type]
+            )
+
+        outbound = OutboundScheduler(concurrency=args.outbound_concurrency) if args.outbound_concurrency else None
+        database = TinyDB(storage=MemoryStorage)
+        category_store = TempVCCategoryStore(database)
+        manager = TempVoiceChannelManager(
+            category_store=category_store,
+            channel_store=TempVCChannelStore(database),
+            pool=TempVCChannelPool(
+                store=TempVCPoolStore(database),
+                category_store=category_store,
+                default_size=args.pool_size,
+                outbound=outbound,
+            ),
+            outbound=outbound,
+        )
+        manager.set_category_for_guild(guild_id=guild_id, category_id=category_id)
+        if manager.pool is not None and args.pool_size:
+            await manager.pool.refill(guild)
+
+        rule = ChannelNicknameRule(
+            guild_id=guild_id,
+            channel_id=text_id,
+            role_id=role_id,
+            updated_by=server.bot_user_id,
+            updated_at=datetime.now(timezone.utc),
+        )
+        service = NicknameSyncService(StaticRuleRepository(rule), outbound=outbound)  # type: ignore[arg-type]
+
+        async def voice_cycle(member: discord.Member) -> None:
+            channel = await timings.measure(
+                "temp_vc.create",
+                lambda: manager.create_user_channel(guild=guild, user=member),
+            )
+            if channel is None:
+                return
+            guild._channels[channel.id] = channel
+            before = SimpleNamespace(channel=channel)
+            after = SimpleNamespace(channel=None)
+            await timings.measure(
+                "temp_vc.cleanup",
+                lambda: manager.handle_voice_state_update(member, before, after),  # type: ignore[arg-type]
+            )
+
+        async def post_message(index: int) -> None:
+            member = members[index % len(members)]
+            data = _message_payload(server, guild_id, text_id, member.id)
+            message = discord.Message(state=state, channel=text_channel, data=data)  # type: ignore[arg-type]
+            await timings.measure("nickname_sync.enforce", lambda: service.enforce(message))
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(voice_cycle(member) for member in members),
+            *(post_message(index) for index in range(args.messages)),
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        manager.close()
+        await client.close()
+        await server.stop()
+
+    print(f"wall time: {elapsed:.2f}s")
+    for line in timings.summary():
+        print(line)
+    print("server requests:")
+    for route, count in sorted(server.stats.requests.items()):
+        limited = server.stats.route_limited.get(route, 0)
+        print(f"  {route:<60} ok={count:<5} 429={limited}")
+    print(f"  global 429: {server.stats.global_limited}")
+    if args.outbound_concurrency:
+        print("outbound scheduler:")
+        for priority in OutboundPriority:
+            count = REGISTRY.counter("outbound.requests", priority=priority.name)
+            waited = REGISTRY.counter("outbound.wait_seconds", priority=priority.name)
+            if count:
+                print(f"  {priority.name:<14} requests={count:<6.0f} avg_wait={waited / count * 1000:8.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="疑似 Discord API を使ったソークテスト")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--users", type=int, default=20, help="一時VCを作成・削除するユーザー数")
+    parser.add_argument("--messages", type=int, default=100, help="同期チャンネルへ投稿するメッセージ数")
+    parser.add_argument("--pool-size", type=int, default=0, help="事前作成しておく待機VCの数")
+    parser.add_argument(
+        "--outbound-concurrency",
+        type=int,
+        default=8,
+        help="OutboundScheduler の同時実行数 (0 でスケジューラーを使わない)",
+    )
+    parser.add_argument("--global-limit", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run_soak(args))
+
+
+__all__ = ["StaticRuleRepository", "run_soak"]
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,16 @@ from __future__ import annotations
 import asyncio
 import logging
 
-from app import build_discord_app, load_config
+from app import (
+    apply_runtime_profile,
+    build_discord_app,
+    configure_logging,
+    configure_tracing,
+    load_config,
+    load_logging_settings,
+    load_runtime_profile,
+    load_tracing_settings,
+)
 
 
 LOGGER = logging.getLogger(__name__)
@@ -25,8 +34,17 @@ async def run_bot() -> None:
 def main() -> None:
     """Entry point for launching the Discord bot."""
 
-    logging.basicConfig(level=logging.INFO)
-    asyncio.run(run_bot())
+    listener = configure_logging(load_logging_settings())
+    span_processor = None
+    try:
+        span_processor = configure_tracing(load_tracing_settings())
+        profile = apply_runtime_profile(load_runtime_profile())
+        with asyncio.Runner(loop_factory=profile.loop_factory) as runner:
+            runner.run(run_bot())
+    finally:
+        if span_processor is not None:
+            span_processor.stop()
+        listener.stop()
 
 
 if __name__ == "__main__":
@@ -4,6 +4,7 @@ from typing import Sequence, cast
 
 import discord
 
+from bot.interactions import InteractionReply, InteractionRunner
 from bot.nickname_sync import ChannelNicknameRuleRepository, NicknameSyncService
 
 
@@ -19,9 +20,11 @@ class NicknameSyncSetupView(discord.ui.View):
         roles: Sequence[discord.Role],
         repository: ChannelNicknameRuleRepository,
         nickname_sync_service: NicknameSyncService,
+        runner: InteractionRunner,
     ) -> None:
         super().__init__(timeout=180)
         self.guild = guild
+        self.runner = runner
         self._requested_by_id = requested_by.id
         self.repository = repository
         self.nickname_sync_service = nickname_sync_service
@@ -134,30 +137,33 @@ class _NicknameConfirmButton(discord.ui.Button):
 
     async def callback(self, interaction: discord.Interaction) -> None:  # pragma: no cover - UI コールバック
         view = cast(NicknameSyncSetupView, self.view)
-        try:
-            channel_id, role_id = await view.save_selection()
-        except ValueError:
+        if view.selected_channel_id is None or view.selected_role_id is None:
             await interaction.response.send_message(
                 "チャンネルとロールを選択してください。",
                 ephemeral=True,
             )
             return
-        except Exception as exc:  # pragma: no cover - 予期しないエラーの通知
-            await interaction.response.send_message(
-                f"設定の保存中にエラーが発生しました: {exc}",
-                ephemeral=True,
+
+        async def work() -> InteractionReply:
+            try:
+                channel_id, role_id = await view.save_selection()
+            except Exception as exc:  # pragma: no cover - 予期しないエラーの通知
+                # ビューは残し、同じ選択のまま再試行できるようにする。
+                return InteractionReply(
+                    content=f"設定の保存中にエラーが発生しました: {exc}",
+                    view=view,
+                )
+
+            channel = view.guild.get_channel(channel_id)
+            channel_label = channel.mention if isinstance(channel, discord.TextChannel) else f"ID: {channel_id}"
+            role = view.guild.get_role(role_id)
+            role_label = role.mention if isinstance(role, discord.Role) else f"ID: {role_id}"
+            view.stop()
+            return InteractionReply(
+                content=f"{channel_label} を同期対象に設定し、投稿者へ {role_label} を付与するよう構成しました。",
             )
-            return
 
-        channel = view.guild.get_channel(channel_id)
-        channel_label = channel.mention if isinstance(channel, discord.TextChannel) else f"ID: {channel_id}"
-        role = view.guild.get_role(role_id)
-        role_label = role.mention if isinstance(role, discord.Role) else f"ID: {role_id}"
-        await interaction.response.edit_message(
-            content=f"{channel_label} を同期対象に設定し、投稿者へ {role_label} を付与するよう構成しました。",
-            view=None,
-        )
-        view.stop()
+        await view.runner.run(interaction, work, name="nickname_sync_setup.confirm", edit=True)
 
 
 class _NicknameCancelButton(discord.ui.Button):
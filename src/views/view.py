@@ -5,23 +5,26 @@ import logging
 import discord
 from discord.abc import Messageable
 
+from bot.interactions import InteractionRunner
+
 LOGGER = logging.getLogger(__name__)
 
 
 class SendModalView(discord.ui.View):
     """セットアップメッセージに添付される送信モーダル用ビュー。"""
 
-    def __init__(self) -> None:
+    def __init__(self, *, runner: InteractionRunner) -> None:
         super().__init__(timeout=None)
-        self.add_item(_SendModalButton())
+        self.add_item(_SendModalButton(runner=runner))
 
 
 class _SendModalButton(discord.ui.Button):
-    def __init__(self) -> None:
+    def __init__(self, *, runner: InteractionRunner) -> None:
         super().__init__(label="メッセージ送信", style=discord.ButtonStyle.primary)
+        self._runner = runner
 
     async def callback(self, interaction: discord.Interaction) -> None:  # pragma: no cover - UI コールバック
-        await interaction.response.send_modal(SendMessageModal())
+        await interaction.response.send_modal(SendMessageModal(runner=self._runner))
 
 
 class SendMessageModal(discord.ui.Modal, title="メッセージ送信"):
@@ -38,12 +41,22 @@ class SendMessageModal(discord.ui.Modal, title="メッセージ送信"):
     SUCCESS_MESSAGE = "<#{channel_id}> にメッセージを送信しました。"
     ERROR_GENERAL = "エラー: {error}"
 
+    def __init__(self, *, runner: InteractionRunner) -> None:
+        super().__init__()
+        self._runner = runner
+
     async def on_submit(self, interaction: discord.Interaction) -> None:  # pragma: no cover - UI コールバック
+        await self._runner.run(
+            interaction,
+            lambda: self._send(interaction),
+            name="setup.send_message",
+        )
+
+    async def _send(self, interaction: discord.Interaction) -> str:
         try:
             channel_id_int = int(self.channel_id.value)
         except ValueError:
-            await interaction.response.send_message(self.ERROR_INVALID_ID, ephemeral=True)
-            return
+            return self.ERROR_INVALID_ID
 
         try:
             channel = interaction.client.get_channel(channel_id_int)
@@ -51,30 +64,18 @@ class SendMessageModal(discord.ui.Modal, title="メッセージ送信"):
                 try:
                     channel = await interaction.client.fetch_channel(channel_id_int)
                 except discord.NotFound:
-                    await interaction.response.send_message(self.ERROR_CHANNEL_NOT_FOUND, ephemeral=True)
-                    return
+                    return self.ERROR_CHANNEL_NOT_FOUND
                 except discord.HTTPException as exc:
-                    await interaction.response.send_message(
-                        self.ERROR_GENERAL.format(error=str(exc)),
-                        ephemeral=True,
-                    )
-                    return
+                    return self.ERROR_GENERAL.format(error=str(exc))
 
             if not isinstance(channel, Messageable):
-                await interaction.response.send_message(self.ERROR_CHANNEL_NOT_FOUND, ephemeral=True)
-                return
+                return self.ERROR_CHANNEL_NOT_FOUND
 
             await channel.send(self.message.value)
-            await interaction.response.send_message(
-                self.SUCCESS_MESSAGE.format(channel_id=channel.id),
-                ephemeral=True,
-            )
+            return self.SUCCESS_MESSAGE.format(channel_id=channel.id)
         except Exception as exc:  # pragma: no cover - 想定外エラーの通知
             LOGGER.exception("モーダル送信処理中にエラーが発生しました。")
-            await interaction.response.send_message(
-                self.ERROR_GENERAL.format(error=str(exc)),
-                ephemeral=True,
-            )
+            return self.ERROR_GENERAL.format(error=str(exc))
 
 
 __all__ = ["SendModalView"]
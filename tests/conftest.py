@@ -0,0 +1,10 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+# bot パッケージは app を先に読み込んでおかないと循環インポートになる。
+import app  # noqa: E402,F401
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any, List, Tuple
+
+import pytest
+
+from app.metrics import MetricsRegistry
+from bot.admission import (
+    MAX_MERGED_MESSAGES,
+    SHED_COLLAPSE,
+    SHED_DROP_NEWEST,
+    SHED_DROP_OLDEST,
+    EventGate,
+    GatePolicy,
+    merge_messages,
+    merge_voice_states,
+    message_key,
+    voice_state_key,
+)
+
+
+CHANNEL = SimpleNamespace(id=10)
+
+
+def _message(message_id: int, author_id: int = 1, channel: Any = CHANNEL) -> SimpleNamespace:
+    return SimpleNamespace(id=message_id, author=SimpleNamespace(id=author_id), channel=channel)
+
+
+def _shed_counts(metrics: MetricsRegistry) -> dict[str, float]:
+    return {dict(labels)["reason"]: value for labels, value in metrics.counters("admission.shed").items()}
+
+
+async def _run_blocked(policy: GatePolicy, submissions: List[Tuple[Any, ...]]) -> Tuple[list, MetricsRegistry]:
+    """1 件目のハンドラーを止めたまま残りを積み、待機列がはけた後の呼び出し順を返す。"""
+
+    metrics = MetricsRegistry()
+    gate = EventGate("on_message", policy, metrics=metrics)
+    release = asyncio.Event()
+    calls: list = []
+
+    async def blocker(*args: Any, **kwargs: Any) -> None:
+        await release.wait()
+
+    async def handler(message: Any, earlier_messages: Tuple[Any, ...] = ()) -> None:
+        calls.append(([earlier.id for earlier in earlier_messages], message.id))
+
+    gate.submit(blocker, (None,), {})
+    for args in submissions:
+        gate.submit(handler, args, {})
+    release.set()
+    await asyncio.wait_for(gate.join(), 1.0)
+    return calls, metrics
+
+
+def test_collapse_with_merge_messages_runs_every_message_in_order() -> None:
+    policy = GatePolicy(concurrency=1, queue_size=10, shedding=SHED_COLLAPSE, key=message_key, merge=merge_messages)
+    calls, metrics = asyncio.run(_run_blocked(policy, [(_message(i),) for i in range(5)]))
+
+    assert calls == [([0, 1, 2, 3], 4)]
+    assert _shed_counts(metrics) == {"collapsed": 4}
+
+
+def test_collapse_keeps_different_authors_and_channels_apart() -> None:
+    policy = GatePolicy(concurrency=1, queue_size=10, shedding=SHED_COLLAPSE, key=message_key, merge=merge_messages)
+    other_channel = SimpleNamespace(id=11)
+    submissions = [
+        (_message(1, author_id=1),),
+        (_message(2, author_id=2),),
+        (_message(3, author_id=1, channel=other_channel),),
+        (_message(4, author_id=1),),
+    ]
+    calls, _ = asyncio.run(_run_blocked(policy, submissions))
+
+    assert calls == [([1], 4), ([], 2), ([], 3)]
+
+
+def test_merge_messages_starts_a_new_entry_when_the_batch_is_full() -> None:
+    policy = GatePolicy(concurrency=1, queue_size=10, shedding=SHED_COLLAPSE, key=message_key, merge=merge_messages)
+    total = MAX_MERGED_MESSAGES + 3
+    calls, _ = asyncio.run(_run_blocked(policy, [(_message(i),) for i in range(total)]))
+
+    assert [len(earlier) + 1 for earlier, _ in calls] == [MAX_MERGED_MESSAGES, 3]
+    assert [message_id for earlier, latest in calls for message_id in (*earlier, latest)] == list(range(total))
+
+
+def test_collapse_without_merge_keeps_only_the_newest_event() -> None:
+    policy = GatePolicy(concurrency=1, queue_size=10, shedding=SHED_COLLAPSE, key=message_key)
+    calls, metrics = asyncio.run(_run_blocked(policy, [(_message(i),) for i in range(3)]))
+
+    assert calls == [([], 2)]
+    assert _shed_counts(metrics) == {"collapsed": 2}
+
+
+def test_collapse_without_key_falls_back_to_drop_oldest() -> None:
+    policy = GatePolicy(concurrency=1, queue_size=2, shedding=SHED_COLLAPSE, key=lambda args: None)
+    calls, metrics = asyncio.run(_run_blocked(policy, [(_message(i),) for i in range(4)]))
+
+    assert calls == [([], 2), ([], 3)]
+    assert _shed_counts(metrics) == {"dropped_oldest": 2}
+
+
+def test_drop_oldest_keeps_the_newest_events() -> None:
+    policy = GatePolicy(concurrency=1, queue_size=2, shedding=SHED_DROP_OLDEST, key=message_key)
+    calls, metrics = asyncio.run(_run_blocked(policy, [(_message(i),) for i in range(5)]))
+
+    assert calls == [([], 3), ([], 4)]
+    assert _shed_counts(metrics) == {"dropped_oldest": 3}
+
+
+def test_drop_newest_keeps_the_oldest_events() -> None:
+    policy = GatePolicy(concurrency=1, queue_size=2, shedding=SHED_DROP_NEWEST, key=message_key)
+    calls, metrics = asyncio.run(_run_blocked(policy, [(_message(i),) for i in range(5)]))
+
+    assert calls == [([], 0), ([], 1)]
+    assert _shed_counts(metrics) == {"dropped_newest": 3}
+
+
+def test_zero_queue_size_sheds_everything_beyond_concurrency() -> None:
+    policy = GatePolicy(concurrency=1, queue_size=0, shedding=SHED_DROP_OLDEST, key=message_key)
+    calls, metrics = asyncio.run(_run_blocked(policy, [(_message(i),) for i in range(2)]))
+
+    assert calls == []
+    assert _shed_counts(metrics) == {"dropped_newest": 2}
+
+
+def test_unknown_shedding_policy_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        GatePolicy(concurrency=1, queue_size=1, shedding="random")
+
+
+def test_merge_voice_states_spans_first_before_to_last_after() -> None:
+    guild = SimpleNamespace(id=1)
+    member = SimpleNamespace(id=2, guild=guild)
+    lobby, first, second = (SimpleNamespace(id=channel_id) for channel_id in (100, 200, 300))
+
+    def state(channel: Any) -> SimpleNamespace:
+        return SimpleNamespace(channel=channel)
+
+    merged = merge_voice_states(((member, state(lobby), state(first)), {}), ((member, state(first), state(second)), {}))
+    merged = merge_voice_states(merged, ((member, state(second), state(None)), {}))
+    (merged_member, before, after), kwargs = merged
+
+    assert merged_member is member
+    assert before.channel is lobby and after.channel is None
+    assert {channel.id for channel in kwargs["passed_channels"]} == {200, 300}
+    assert voice_state_key((member,)) == (1, 2)
+
+
+def test_message_key_ignores_messages_without_author_or_channel() -> None:
+    assert message_key((SimpleNamespace(author=None, channel=CHANNEL),)) is None
+    assert message_key((_message(1, author_id=7),)) == (10, 7)
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from bot.name_search import NameSearchIndex, normalize_name
+
+
+def _index(**names: str) -> NameSearchIndex:
+    index = NameSearchIndex()
+    for item_id, name in names.items():
+        index.add(int(item_id.removeprefix("id")), name)
+    return index
+
+
+def test_normalize_folds_width_case_kana_and_decoration() -> None:
+    assert normalize_name("ＡＢＣ") == "abc"
+    assert normalize_name("ｶﾀｶﾅ") == normalize_name("かたかな")
+    assert normalize_name("🎮・ゲーム｜雑談-1") == "げーむ雑談1"
+    assert normalize_name("・－｜🎮") == ""
+
+
+def test_prefix_matches_come_before_substring_matches() -> None:
+    index = _index(id1="雑談ゲーム", id2="ゲーム", id3="ゲーム実況", id4="大ゲーム")
+
+    assert index.search("ゲーム", limit=10) == [2, 3, 4, 1]
+
+
+def test_substring_matches_rank_by_position_then_length() -> None:
+    index = _index(id1="abcxyz", id2="axyz", id3="abxyzlong", id4="abxyz")
+
+    assert index.search("xyz", limit=10) == [2, 4, 3, 1]
+
+
+def test_search_matches_across_kana_and_width() -> None:
+    index = _index(id1="ボイスチャット", id2="ﾎﾞｲｽ")
+
+    # どちらも前方一致なので、正規化後の名前順（短い「ぼいす」が先）に並ぶ。
+    assert index.search("ぼいす", limit=10) == [2, 1]
+    assert index.search("ボイス", limit=10) == [2, 1]
+
+
+def test_limit_is_respected_and_zero_or_empty_queries_return_nothing() -> None:
+    index = _index(id1="aa1", id2="aa2", id3="aa3", id4="xaa")
+
+    assert index.search("aa", limit=2) == [1, 2]
+    assert index.search("aa", limit=0) == []
+    assert index.search("・・", limit=10) == []
+
+
+def test_single_character_query_uses_prefix_only() -> None:
+    index = _index(id1="abc", id2="cab")
+
+    # 1 文字では n-gram を引けないので部分一致は返さない。
+    assert index.search("a", limit=10) == [1]
+
+
+def test_readding_replaces_the_previous_name() -> None:
+    index = _index(id1="old name")
+    index.add(1, "new name")
+
+    assert index.search("old", limit=10) == []
+    assert index.search("new", limit=10) == [1]
+    assert index.search("name", limit=10) == [1]
+    assert len(index) == 1
+
+
+def test_remove_drops_the_entry_and_its_grams() -> None:
+    index = _index(id1="general", id2="general2")
+    index.remove(1)
+    index.remove(99)  # 未登録の ID は無視する
+
+    assert 1 not in index and 2 in index
+    assert index.search("general", limit=10) == [2]
+    assert index.search("neral", limit=10) == [2]
+    index.remove(2)
+    assert index.search("neral", limit=10) == []
+    assert index._grams == {}
+
+
+def test_lookup_accepts_ids_and_unique_names_only() -> None:
+    index = _index(id1="Lobby", id2="ｌｏｂｂｙ", id3="Music")
+
+    assert index.lookup("3") == 3
+    assert index.lookup(" 3 ") == 3
+    assert index.lookup("999") is None
+    assert index.lookup("music") == 3
+    # 正規化すると同じ名前になる 2 件はどちらか決められない。
+    assert index.lookup("LOBBY") is None
+    assert index.lookup("mus") is None
+    assert index.lookup("🎮") is None
+
+
+def test_clear_empties_the_index() -> None:
+    index = _index(id1="abc")
+    index.clear()
+
+    assert len(index) == 0
+    assert index.search("abc", limit=10) == []
+    assert index.lookup("abc") is None
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from bot.nickname_sync.policy import MAX_ALLOWLIST_PATTERN_LENGTH, PolicyCompileError, compile_allowlist
+
+
+def _matches(pattern: str, content: str) -> bool:
+    allowlist = compile_allowlist([pattern])
+    assert allowlist is not None
+    return allowlist.fullmatch(content)
+
+
+@pytest.mark.parametrize(
+    ("pattern", "content", "expected"),
+    [
+        ("hello", "hello", True),
+        ("hello", "hello!", False),
+        ("*", "", True),
+        ("*", "anything\nat all", True),
+        ("a*c", "ac", True),
+        ("a*c", "abbbc", True),
+        ("a*c", "a", False),
+        ("a?c", "abc", True),
+        ("a?c", "ac", False),
+        ("*b*b", "abb", True),
+        ("a*a", "a", False),
+        ("?*?", "x", False),
+        ("a**b", "ab", True),
+        ("https://*", "https://example.com", True),
+        (r"\*", "*", True),
+        (r"\*", "a", False),
+        (r"\?", "?", True),
+        ("(a|aa)+", "(a|aa)+", True),
+        ("(a|aa)+", "aaaa", False),
+    ],
+)
+def test_wildcards_match_the_whole_content(pattern: str, content: str, expected: bool) -> None:
+    assert _matches(pattern, content) is expected
+
+
+def test_any_pattern_in_the_allowlist_can_match() -> None:
+    allowlist = compile_allowlist(["!*", "*.png"])
+    assert allowlist is not None
+
+    assert allowlist.fullmatch("!command")
+    assert allowlist.fullmatch("image.png")
+    assert allowlist.fullmatch("image.png!") is False
+    assert compile_allowlist([]) is None
+
+
+@pytest.mark.parametrize("pattern", ["", "trailing\\", "x" * (MAX_ALLOWLIST_PATTERN_LENGTH + 1)])
+def test_invalid_patterns_are_rejected_one_by_one(pattern: str) -> None:
+    with pytest.raises(PolicyCompileError):
+        compile_allowlist(["valid", pattern])
+
+
+def test_adversarial_input_is_matched_in_linear_time() -> None:
+    allowlist = compile_allowlist(["*a*a*a*a*a*a*a*a*a*a*b", "(a|aa)+"])
+    assert allowlist is not None
+
+    started = time.perf_counter()
+    assert allowlist.fullmatch("a" * 4000 + "c") is False
+    assert time.perf_counter() - started < 0.5
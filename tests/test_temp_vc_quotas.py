@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import pytest
+
+from app.metrics import MetricsRegistry
+from bot.temp_vc.errors import TempVCQuotaExceededError
+from bot.temp_vc.quotas import QUOTA_CATEGORY, QUOTA_GUILD, QUOTA_USER, TempVCQuotas, _TokenBuckets
+
+
+def test_new_bucket_starts_full() -> None:
+    buckets = _TokenBuckets(3, 60.0)
+
+    assert buckets.retry_after("a", 0.0) == 0.0
+    assert len(buckets) == 0
+
+
+def test_retry_after_counts_down_to_the_next_whole_token() -> None:
+    buckets = _TokenBuckets(3, 60.0)  # 20 秒ごとに 1 トークン
+    for _ in range(3):
+        buckets.take("a", 0.0)
+
+    assert buckets.retry_after("a", 0.0) == pytest.approx(20.0)
+    assert buckets.retry_after("a", 15.0) == pytest.approx(5.0)
+    assert buckets.retry_after("a", 20.0) == 0.0
+
+
+def test_refill_never_exceeds_capacity() -> None:
+    buckets = _TokenBuckets(2, 10.0)
+    buckets.take("a", 0.0)
+    # 長時間あいても容量の 2 件までしか連続で取れない。
+    buckets.take("a", 1_000.0)
+    buckets.take("a", 1_000.0)
+
+    assert buckets.retry_after("a", 1_000.0) == pytest.approx(5.0)
+
+
+def test_buckets_are_independent_per_key() -> None:
+    buckets = _TokenBuckets(1, 60.0)
+    buckets.take("a", 0.0)
+
+    assert buckets.retry_after("a", 0.0) > 0.0
+    assert buckets.retry_after("b", 0.0) == 0.0
+
+
+def test_forget_drops_matching_keys_only() -> None:
+    buckets = _TokenBuckets(1, 60.0)
+    for key in ((1, 1), (1, 2), (2, 1)):
+        buckets.take(key, 0.0)
+
+    buckets.forget(lambda key: key[0] == 1)
+
+    assert len(buckets) == 1
+    assert buckets.retry_after((1, 1), 0.0) == 0.0
+    assert buckets.retry_after((2, 1), 0.0) > 0.0
+
+
+def test_prune_discards_only_refilled_buckets() -> None:
+    buckets = _TokenBuckets(1, 1.0)
+    for key in range(4096):
+        buckets.take(key, 0.0)
+    # 4097 件目で整理が走る。古いバケツは満タンに戻っているので捨てられ、新しいものは残る。
+    buckets.take("fresh", 10.0)
+
+    assert len(buckets) == 1
+    assert buckets.retry_after("fresh", 10.0) > 0.0
+
+
+def _quotas(**kwargs: object) -> tuple[TempVCQuotas, list[float], MetricsRegistry]:
+    now = [0.0]
+    metrics = MetricsRegistry()
+    quotas = TempVCQuotas(clock=lambda: now[0], metrics=metrics, **kwargs)  # type: ignore[arg-type]
+    return quotas, now, metrics
+
+
+def test_user_quota_rejects_with_retry_after() -> None:
+    quotas, now, _ = _quotas(user_rate=(1, 30.0), guild_rate=None)
+    quotas.acquire(guild_id=1, user_id=1, active_channels=0)
+
+    with pytest.raises(TempVCQuotaExceededError) as excinfo:
+        quotas.acquire(guild_id=1, user_id=1, active_channels=0)
+    assert excinfo.value.scope == QUOTA_USER
+    assert excinfo.value.retry_after == pytest.approx(30.0)
+
+    now[0] = 30.0
+    quotas.acquire(guild_id=1, user_id=1, active_channels=0)
+
+
+def test_rejected_request_does_not_consume_other_quotas() -> None:
+    quotas, _, metrics = _quotas(user_rate=(1, 60.0), guild_rate=(2, 60.0))
+    quotas.acquire(guild_id=1, user_id=1, active_channels=0)
+    for _ in range(3):
+        with pytest.raises(TempVCQuotaExceededError):
+            quotas.acquire(guild_id=1, user_id=1, active_channels=0)
+
+    # 拒否された 3 回はギルドのトークンを使っていないので、別のメンバーはまだ作れる。
+    quotas.acquire(guild_id=1, user_id=2, active_channels=0)
+    with pytest.raises(TempVCQuotaExceededError) as excinfo:
+        quotas.acquire(guild_id=1, user_id=3, active_channels=0)
+    assert excinfo.value.scope == QUOTA_GUILD
+    assert metrics.counters("temp_vc.quota_admitted") == {(): 2}
+
+
+def test_category_cap_applies_before_rate_limits() -> None:
+    quotas, _, _ = _quotas(max_channels_per_category=2)
+
+    with pytest.raises(TempVCQuotaExceededError) as excinfo:
+        quotas.acquire(guild_id=1, user_id=1, active_channels=2)
+    assert excinfo.value.scope == QUOTA_CATEGORY
+    assert excinfo.value.retry_after is None
+    assert quotas.stats() == {"quota_user_buckets": 0, "quota_guild_buckets": 0}
+
+
+def test_disabled_quotas_admit_everything() -> None:
+    quotas, _, _ = _quotas(user_rate=None, guild_rate=None, max_channels_per_category=0)
+    for _ in range(100):
+        quotas.acquire(guild_id=1, user_id=1, active_channels=1_000)
+
+
+def test_forget_guild_resets_only_that_guild() -> None:
+    quotas, _, _ = _quotas(user_rate=(1, 60.0), guild_rate=(1, 60.0))
+    quotas.acquire(guild_id=1, user_id=1, active_channels=0)
+    quotas.acquire(guild_id=2, user_id=1, active_channels=0)
+
+    quotas.forget_guild(1)
+
+    quotas.acquire(guild_id=1, user_id=1, active_channels=0)
+    with pytest.raises(TempVCQuotaExceededError):
+        quotas.acquire(guild_id=2, user_id=1, active_channels=0)